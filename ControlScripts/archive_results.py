@@ -0,0 +1,140 @@
+#!/usr/bin/python
+
+from core.archive import ARCHIVE_EXTENSION, DEFAULT_LEVEL, archive, createArchive
+from core.parsing import isPositiveInt
+import os
+import shutil
+import sys
+import zlib
+
+if __name__ != "__main__":
+    raise Exception( "Do not import" )
+
+mode = None
+remove = False
+workers = None
+level = DEFAULT_LEVEL
+outputDir = None
+names = []
+
+# Parse arguments
+for arg in sys.argv[1:]:
+    if arg in ['--create', '--extract', '--list']:
+        if mode is not None and mode != arg[2:]:
+            raise Exception( "Only one of --create, --extract and --list allowed" )
+        mode = arg[2:]
+    elif arg == '--remove':
+        remove = True
+    elif arg[:10] == '--workers=':
+        if not isPositiveInt( arg[10:], True ):
+            raise Exception( "--workers expects a positive, non-zero integer" )
+        workers = int( arg[10:] )
+    elif arg[:8] == '--level=':
+        if not isPositiveInt( arg[8:], True ) or int( arg[8:] ) > 9:
+            raise Exception( "--level expects an integer from 1 to 9" )
+        level = int( arg[8:] )
+    elif arg[:9] == '--output=':
+        outputDir = arg[9:]
+    elif arg == '--help':
+        print """
+archive_results.py [options] directory|archive [directory|archive [...]]
+
+creates, extracts and lists random-access compressed archives of results directories
+Arguments:
+    --create          Archive each directory to directory{0} (the default)
+    --remove          Remove each directory after it has been archived and every block of the archive has been
+                      read back and checked
+    --workers=number  The number of processes compressing in parallel, defaults to the number of local CPUs
+    --level=level     The zlib compression level, from 1 (fastest) to 9 (smallest), defaults to {1}
+    --extract         Extract each archive to the directory it was created from
+    --output=dir      Extract to this directory instead; only with a single archive
+    --list            List the files in each archive with their sizes
+    --help            This text and exit
+
+Each file is compressed in independent blocks, so any part of it can be read without extracting the archive.
+reparse.py --archive=path reparses scenarios straight from an archive.
+
+Example:
+    archive_results.py --remove --workers=8 Results/my_campaign
+""".format( ARCHIVE_EXTENSION, DEFAULT_LEVEL )
+        sys.exit()
+    elif arg[:2] == '--':
+        raise Exception( "Unknown argument: {0}. Try --help.".format( arg ) )
+    else:
+        names.append( arg )
+
+if mode is None:
+    mode = 'create'
+if len(names) == 0:
+    raise Exception( "No directories or archives given. Try --help." )
+if remove and mode != 'create':
+    raise Exception( "--remove is only used with --create" )
+if outputDir is not None and ( mode != 'extract' or len(names) != 1 ):
+    raise Exception( "--output is only used with --extract of a single archive" )
+
+def checkArchive( archivePath, sourceDir ):
+    """
+    Checks that an archive holds all directories and files of a directory, and that all its blocks can be read.
+
+    Every block is decompressed, which verifies its zlib checksum, and the decompressed sizes must add up to the size
+    of the file.
+
+    @param  archivePath     The path to the archive.
+    @param  sourceDir       The archived directory.
+    """
+    archiveObject = archive( archivePath )
+    try:
+        for dirPath, _, fileNames in os.walk( sourceDir ):
+            relDir = os.path.relpath( dirPath, sourceDir )
+            if not archiveObject.isdir( relDir ):
+                raise Exception( "Archive {0} does not hold directory {1}".format( archivePath, dirPath ) )
+            for fileName in fileNames:
+                path = os.path.join( dirPath, fileName )
+                if not os.path.isfile( path ):
+                    continue
+                relPath = os.path.relpath( path, sourceDir )
+                if not archiveObject.isfile( relPath ) or archiveObject.getsize( relPath ) != os.path.getsize( path ):
+                    raise Exception( "Archive {0} does not match {1}".format( archivePath, path ) )
+                blocks = archiveObject.files[archive.normalize( relPath )][3]
+                size = 0
+                for index in xrange( len(blocks) ):
+                    try:
+                        size += len( archiveObject.readBlock( blocks, index ) )
+                    except zlib.error as exc:
+                        raise Exception( "Archive {0} has a corrupt block of {1}: {2}".format( archivePath, path, exc.__str__() ) )
+                if size != os.path.getsize( path ):
+                    raise Exception( "Archive {0} holds {1} bytes of {2} instead of {3}".format( archivePath, size, path, os.path.getsize( path ) ) )
+    finally:
+        archiveObject.close()
+
+for name in names:
+    if mode == 'create':
+        name = os.path.normpath( name )
+        if not os.path.isdir( name ):
+            print "Warning! {0} is not a directory, skipping.".format( name )
+            continue
+        archivePath = name + ARCHIVE_EXTENSION
+        if os.path.exists( archivePath ):
+            print "Warning! {0} already exists, skipping {1}.".format( archivePath, name )
+            continue
+        print "Archiving {0} to {1}".format( name, archivePath )
+        createArchive( name, archivePath, workers, level )
+        if remove:
+            checkArchive( archivePath, name )
+            shutil.rmtree( name )
+    else:
+        archiveObject = archive( name )
+        try:
+            if mode == 'list':
+                for path in sorted( archiveObject.files ):
+                    print "{0}\t{1}".format( archiveObject.getsize( path ), path )
+            else:
+                target = outputDir
+                if target is None:
+                    if name[-len(ARCHIVE_EXTENSION):] != ARCHIVE_EXTENSION:
+                        raise Exception( "Can't tell where to extract {0} to; use --output".format( name ) )
+                    target = name[:-len(ARCHIVE_EXTENSION)]
+                print "Extracting {0} to {1}".format( name, target )
+                archiveObject.extract( target )
+        finally:
+            archiveObject.close()
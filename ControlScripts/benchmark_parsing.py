@@ -0,0 +1,78 @@
+#!/usr/bin/python
+
+from run_campaign import ScenarioRunner, loadModule, loadCoreModule
+from core.campaign import Campaign
+from core.parsing import tokenize
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+if __name__ != "__main__":
+    raise Exception( "Do not import" )
+
+lineCount = 100000
+
+# Parse arguments
+for arg in sys.argv[1:]:
+    if arg[:8] == '--lines=':
+        lineCount = int(arg[8:])
+    elif arg == '--help':
+        print """
+benchmark_parsing.py [options]
+
+benchmarks the scenario file parser on a synthetic scenario
+Arguments:
+    --lines=n         Generate a scenario of about n lines, default 100000
+    --help            This text and exit
+
+The synthetic scenario declares a test host, client, parser and file and fills the remaining lines with executions and
+comments. Both the tokenizer by itself and a full read of the scenario are timed.
+"""
+        sys.exit()
+    else:
+        raise Exception( "Unknown argument: {0}. Try --help.".format( arg ) )
+
+# Fake classes
+class FakeCampaign:
+    campaignResultsDir = ''
+    def __init__(self, campaignResultsDir):
+        self.campaignResultsDir = campaignResultsDir
+
+Campaign.testEnvDir = os.path.abspath( os.path.join( os.path.dirname( sys.argv[0] ), '..' ) )
+Campaign.loadModule = staticmethod(loadModule)
+Campaign.loadCoreModule = staticmethod(loadCoreModule)
+
+tmpDir = tempfile.mkdtemp()
+try:
+    # Generate the synthetic scenario
+    scenarioPath = os.path.join( tmpDir, 'scenario' )
+    f = open( scenarioPath, 'w' )
+    f.write( "[host:test__]\nname=test\n\n[client:test__]\nname=test\nlocation=.\nparser=test\n\n[parser:none]\nname=test\n\n[file:test__]\nname=test\nrootHash[1]=97bb2117ad9bc68bc8bec3cca3a113ef30aebc37\n\n" )
+    lines = 15
+    n = 0
+    while lines < lineCount:
+        f.write( "# execution {0}\n[execution]\nhost=test\nfile=test\nclient=test\n\n".format( n ) )
+        lines += 6
+        n += 1
+    f.close()
+    print "Generated a scenario of {0} lines with {1} executions".format( lines, n )
+
+    # Time the tokenizer by itself
+    start = time.time()
+    f = open( scenarioPath, 'r' )
+    tokens = 0
+    for _ in tokenize( f ):
+        tokens += 1
+    f.close()
+    print "Tokenized {0} tokens in {1:.3f} seconds".format( tokens, time.time() - start )
+
+    # Time a full read of the scenario
+    os.makedirs( os.path.join( tmpDir, 'scenarios', 'benchmark' ) )
+    scenario = ScenarioRunner( 'benchmark', [scenarioPath], 600, True, FakeCampaign( tmpDir ) )
+    start = time.time()
+    scenario.read()
+    print "Read the scenario in {0:.3f} seconds".format( time.time() - start )
+finally:
+    shutil.rmtree( tmpDir )
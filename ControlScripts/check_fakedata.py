@@ -0,0 +1,134 @@
+#!/usr/bin/python
+
+from core.meta import meta, merkleHasher, pieceHasher
+from modules.file.fakedata import fakedataGeneratorFiles, fakedataBlocks
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import subprocess
+
+if __name__ != "__main__":
+    raise Exception( "Do not import" )
+
+# The cases checked as (ksize, offset), chosen to cover rounding of the size, carries into the higher bytes of the
+# counter and wrapping of the counter at 2^32
+cases = [(1, 0), (3, 0), (4, 7), (8, 65535), (64, 0xfeff), (1028, 12345), (4096, 0xfff000), (2048, 2 ** 32 - 1000)]
+# The block sizes fakedataBlocks(...) is checked with, in bytes
+blocksizes = [4, 4092, 65536, 1024 * 1024]
+# The root hashes checked, in the notation of the rootHash parameters of file:fakedata
+rootHashes = [1, 4, '1L']
+
+# Parse arguments
+for arg in sys.argv[1:]:
+    if arg == '--help':
+        print """
+check_fakedata.py [options]
+
+checks that the fake data generated in memory by file:fakedata is identical to what Utils/fakedata/genfakedata writes
+Arguments:
+    --help            This text and exit
+
+genfakedata is compiled in a temporary directory with g++ and run for a fixed set of sizes and counter offsets. For
+each, the output is compared byte by byte with modules.file.fakedata.fakedataBlocks(...) for several block sizes, and
+the root hashes and torrent file calculated from the data in memory, as file:fakedata does, are compared with those
+calculated by core.meta.meta from the file genfakedata wrote. The root hashes are also compared with a straightforward
+reference that builds the hash tree level by level from the file, so they don't only depend on core.meta.merkleHasher.
+The exit status is 1 if anything differs.
+"""
+        sys.exit()
+    else:
+        raise Exception( "Unknown argument: {0}. Try --help.".format( arg ) )
+
+def readFile( path ):
+    """
+    Returns the contents of a file.
+    """
+    f = open( path, 'rb' )
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+def referenceRootHash( data, compact, blocksize ):
+    """
+    Calculates the Merkle root hash of data level by level, as described for core.meta.meta.calculateMerkleRootHash(...).
+    """
+    chunksize = 1024 * blocksize
+    level = [hashlib.sha1( data[i:i + chunksize] ).digest() for i in xrange( 0, len(data), chunksize )]
+    maxLevel = 63
+    if compact:
+        maxLevel = 0
+        while 2 ** maxLevel < len(level):
+            maxLevel += 1
+    for _ in xrange( maxLevel ):
+        if len(level) % 2:
+            level.append( '\0' * 20 )
+        level = [hashlib.sha1( level[i] + level[i + 1] ).digest() for i in xrange( 0, len(level), 2 )]
+    return level[0]
+
+srcDir = os.path.join( os.path.dirname( os.path.abspath( sys.argv[0] ) ), '..', 'Utils', 'fakedata' )
+failures = 0
+tmpDir = tempfile.mkdtemp()
+try:
+    binary = os.path.join( tmpDir, 'genfakedata' )
+    sources = [os.path.join( srcDir, f ) for f in fakedataGeneratorFiles if f[-4:] == '.cpp']
+    proc = subprocess.Popen( ['g++', '-O2'] + sources + ['-o', binary], stdout=subprocess.PIPE, stderr=subprocess.STDOUT )
+    out = proc.communicate()[0]
+    if proc.returncode != 0:
+        raise Exception( "Could not compile genfakedata: {0}".format( out ) )
+    for ksize, offset in cases:
+        name = 'fake-{0}-{1}'.format( ksize, offset )
+        path = os.path.join( tmpDir, name )
+        proc = subprocess.Popen( [binary, path, str(ksize), str(offset)], stdout=subprocess.PIPE, stderr=subprocess.STDOUT )
+        out = proc.communicate()[0]
+        if proc.returncode != 0:
+            raise Exception( "genfakedata failed for size {0} and offset {1}: {2}".format( ksize, offset, out ) )
+        expected = readFile( path )
+        size = len(expected)
+        problems = []
+        for blocksize in blocksizes:
+            if ''.join( fakedataBlocks( ksize, offset, blocksize ) ) != expected:
+                problems.append( 'data with blocksize {0}'.format( blocksize ) )
+        # Hash the data in memory like file:fakedata does
+        hashers = {}
+        for cs in rootHashes:
+            if type(cs) != int and cs[-1:] == 'L':
+                hashers[cs] = merkleHasher( size, False, int(cs[:-1]) )
+            else:
+                hashers[cs] = merkleHasher( size, True, cs )
+        torrentHasher = pieceHasher( 1024 * 1024 )
+        for data in fakedataBlocks( ksize, offset ):
+            for h in hashers.itervalues():
+                h.update( data )
+            torrentHasher.update( data )
+        for cs in rootHashes:
+            if type(cs) != int and cs[-1:] == 'L':
+                fromFile = meta.calculateMerkleRootHash( path, False, int(cs[:-1]) )
+                reference = referenceRootHash( expected, False, int(cs[:-1]) )
+            else:
+                fromFile = meta.calculateMerkleRootHash( path, True, cs )
+                reference = referenceRootHash( expected, True, cs )
+            fromMemory = hashers[cs].digest()
+            if fromMemory != reference or fromFile != reference:
+                problems.append( 'root hash {0}'.format( cs ) )
+        memoryTorrent = os.path.join( tmpDir, name + '.memory.torrent' )
+        fileTorrent = os.path.join( tmpDir, name + '.file.torrent' )
+        meta.generateTorrentFileFromPieces( name, size, torrentHasher.digest(), memoryTorrent )
+        meta.generateTorrentFile( path, fileTorrent )
+        if readFile( memoryTorrent ) != readFile( fileTorrent ):
+            problems.append( 'torrent' )
+        os.remove( path )
+        if problems:
+            failures += 1
+            print "FAIL: size {0}K and offset {1}: {2} differ".format( ksize, offset, ', '.join( problems ) )
+        else:
+            print "OK: size {0}K and offset {1}".format( ksize, offset )
+finally:
+    shutil.rmtree( tmpDir )
+
+if failures:
+    print "FAIL: {0} of {1} cases differ from genfakedata".format( failures, len(cases) )
+    sys.exit( 1 )
+print "PASS: all {0} cases are identical to genfakedata".format( len(cases) )
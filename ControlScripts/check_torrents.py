@@ -0,0 +1,136 @@
+#!/usr/bin/python
+
+import core.meta
+from core.meta import meta, buildFileList, buildPieces
+import os
+import sys
+import random
+import shutil
+import hashlib
+import tempfile
+
+if __name__ != "__main__":
+    raise Exception( "Do not import" )
+
+seed = 1
+
+# The piece sizes checked, in bytes
+blocksizes = [16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024]
+# The numbers of worker processes buildPieces(...) is checked with
+workerCounts = [1, 2, 3, 8]
+
+# Parse arguments
+for arg in sys.argv[1:]:
+    if arg[:7] == '--seed=':
+        seed = int(arg[7:])
+    elif arg == '--help':
+        print """
+check_torrents.py [options]
+
+checks that torrent files built with pieces hashed in parallel are bit-identical to those built by plain sequential hashing
+Arguments:
+    --seed=n          The seed of the random generator for the fixture data, default 1
+    --help            This text and exit
+
+Fixtures are written to a temporary directory: single files with sizes around the piece boundaries and a directory
+tree of files of all kinds of sizes, including empty files. For each fixture and piece size the pieces are hashed
+sequentially by a straightforward reference implementation and by core.meta.buildPieces(...) with several numbers of
+worker processes. The lower size limit for parallel hashing is lifted, so even the small fixtures are split over the
+workers. The torrent files of core.meta.meta.generateTorrentFile(...) are then compared byte by byte with those built
+from the reference pieces. The exit status is 1 if anything differs.
+"""
+        sys.exit()
+    else:
+        raise Exception( "Unknown argument: {0}. Try --help.".format( arg ) )
+
+def writeFixture( rnd, path, size ):
+    """
+    Writes a file of size random bytes.
+    """
+    f = open( path, 'wb' )
+    while size > 0:
+        n = min( size, 65536 )
+        f.write( ''.join( [chr( rnd.getrandbits( 8 ) ) for _ in xrange( n )] ) )
+        size -= n
+    f.close()
+
+def referencePieces( path, fileList_, blocksize ):
+    """
+    Hashes the pieces of the concatenated files sequentially, the plain way.
+    """
+    pieces = []
+    piece = ''
+    for fileEntry in fileList_:
+        f = open( os.path.join( path, *(fileEntry['path']) ), 'rb' )
+        data = f.read()
+        f.close()
+        piece += data
+        while len(piece) >= blocksize:
+            pieces.append( hashlib.sha1( piece[:blocksize] ).digest() )
+            piece = piece[blocksize:]
+    if piece:
+        pieces.append( hashlib.sha1( piece ).digest() )
+    return ''.join( pieces )
+
+def readFile( path ):
+    """
+    Returns the contents of a file.
+    """
+    f = open( path, 'rb' )
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+core.meta.PARALLEL_PIECES_MINSIZE = 0
+rnd = random.Random( seed )
+failures = 0
+checks = 0
+tmpDir = tempfile.mkdtemp()
+try:
+    fixtures = []
+    for size in [1, 16 * 1024 - 1, 16 * 1024, 64 * 1024 + 1, 1024 * 1024, 3 * 1024 * 1024 + 12345]:
+        path = os.path.join( tmpDir, 'single-{0}'.format( size ) )
+        writeFixture( rnd, path, size )
+        fixtures.append( path )
+    treeDir = os.path.join( tmpDir, 'tree' )
+    for subdir in ['a', 'a/b', 'c']:
+        os.makedirs( os.path.join( treeDir, subdir ) )
+    for name, size in [('x', 0), ('a/y', 1), ('a/b/z', 16 * 1024 - 1), ('a/b/empty', 0), ('c/w', 700000), ('c/v', 65536), ('u', 2 * 1024 * 1024 + 3)]:
+        writeFixture( rnd, os.path.join( treeDir, name ), size )
+    fixtures.append( treeDir )
+
+    for path in fixtures:
+        if os.path.isfile( path ):
+            fileList_ = [{'length': os.stat( path ).st_size, 'path': []}]
+        else:
+            fileList_ = buildFileList( path )
+        for blocksize in blocksizes:
+            checks += 1
+            problems = []
+            expected = referencePieces( path, fileList_, blocksize )
+            for workers in workerCounts:
+                if buildPieces( path, fileList_, blocksize, workers ) != expected:
+                    problems.append( 'pieces with {0} workers'.format( workers ) )
+            referenceTorrent = os.path.join( tmpDir, 'reference.torrent' )
+            builtTorrent = os.path.join( tmpDir, 'built.torrent' )
+            meta.generateTorrentFile( path, referenceTorrent, blocksize, pieces = expected )
+            meta.generateTorrentFile( path, builtTorrent, blocksize )
+            if readFile( builtTorrent ) != readFile( referenceTorrent ):
+                problems.append( 'torrent' )
+            if os.path.isfile( path ):
+                meta.generateTorrentFileFromPieces( os.path.basename( path ), fileList_[0]['length'], expected, builtTorrent, blocksize )
+                if readFile( builtTorrent ) != readFile( referenceTorrent ):
+                    problems.append( 'torrent from pieces' )
+            if problems:
+                failures += 1
+                print "FAIL: {0} with pieces of {1} bytes: {2} differ".format( os.path.basename( path ), blocksize, ', '.join( problems ) )
+            else:
+                print "OK: {0} with pieces of {1} bytes".format( os.path.basename( path ), blocksize )
+finally:
+    shutil.rmtree( tmpDir )
+
+if failures:
+    print "FAIL: {0} of {1} checks differ from sequential hashing".format( failures, checks )
+    sys.exit( 1 )
+print "PASS: all {0} checks are bit-identical to sequential hashing".format( checks )
@@ -0,0 +1,224 @@
+#!/usr/bin/python
+
+from modules.tc import netem
+import random
+import sys
+
+if __name__ != "__main__":
+    raise Exception( "Do not import" )
+
+packetCount = 2000
+listCount = 200
+seed = 1
+
+# Parse arguments
+for arg in sys.argv[1:]:
+    if arg[:10] == '--packets=':
+        packetCount = int(arg[10:])
+    elif arg[:8] == '--lists=':
+        listCount = int(arg[8:])
+    elif arg[:7] == '--seed=':
+        seed = int(arg[7:])
+    elif arg == '--help':
+        print """
+check_u32_filters.py [options]
+
+checks that the u32 filters of tc:netem send the same packets to the target as one linear filter per value would
+Arguments:
+    --packets=n       Classify n random packets per filter list, default 2000
+    --lists=n         Generate n random filter lists, default 200
+    --seed=n          The seed of the random generator, default 1
+    --help            This text and exit
+
+For each random list of ports or addresses the filters of modules.tc.netem.u32Filters(...) are generated twice: as
+they are installed, with hashed u32 tables for long lists, and with a linear filter per value. Both are classified by
+a simulation of the u32 classifier on random packets, which are biased towards the values in the list and towards
+other values in the same hash buckets. Host names are resolved by a fixed fake resolver, just like tc resolves them
+when the filters are added. The exit status is 1 if any packet is classified differently.
+"""
+        sys.exit()
+    else:
+        raise Exception( "Unknown argument: {0}. Try --help.".format( arg ) )
+
+# The fake resolver for host names in the lists
+hostNames = dict( [( 'node{0}'.format( i ), '10.{0}.{1}.{2}'.format( i / 256 / 256 % 256, i / 256 % 256, i % 256 ) ) for i in xrange( 512 )] )
+
+def parseAddress( value ):
+    """
+    Returns (address, mask) as integers for an address, subnet or host name.
+    """
+    value = hostNames.get( value, value )
+    bits = 32
+    if '/' in value:
+        value, bits = value.split( '/' )
+        bits = int(bits)
+    parts = [int(p) for p in value.split( '.' )]
+    address = ( parts[0] << 24 ) | ( parts[1] << 16 ) | ( parts[2] << 8 ) | parts[3]
+    mask = ( 0xffffffff << ( 32 - bits ) ) & 0xffffffff
+    return ( address & mask, mask )
+
+def parseFilter( command ):
+    """
+    Parses a filter command of u32Filters(...).
+
+    @return A dictionary with the table, bucket, matches as (offset, value, mask), hashkey as (offset, mask), link
+            and target of the filter, or with the handle and divisor of a new hash table.
+    """
+    tokens = command.split()
+    if 'divisor' in tokens:
+        return { 'handle': tokens[tokens.index( 'handle' ) + 1].rstrip( ':' ), 'divisor': int( tokens[tokens.index( 'divisor' ) + 1] ) }
+    tokens = tokens[tokens.index( 'u32' ) + 1:]
+    result = { 'table': '800', 'bucket': 0, 'matches': [], 'hashkey': None, 'link': None, 'target': None }
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == 'ht':
+            table, bucket = tokens[i + 1].split( ':' )[:2]
+            result['table'] = table
+            result['bucket'] = int( bucket or '0', 16 )
+            i += 2
+        elif tokens[i] == 'match' and tokens[i + 1] == 'ip':
+            field = tokens[i + 2]
+            if field in ['sport', 'dport']:
+                port = int(tokens[i + 3])
+                if field == 'sport':
+                    result['matches'].append( ( 20, port << 16, int( tokens[i + 4], 16 ) << 16 ) )
+                else:
+                    result['matches'].append( ( 20, port, int( tokens[i + 4], 16 ) ) )
+                i += 5
+            else:
+                address, mask = parseAddress( tokens[i + 3] )
+                result['matches'].append( ( { 'src': 12, 'dst': 16 }[field], address, mask ) )
+                i += 4
+        elif tokens[i] == 'match' and tokens[i + 1] == 'u32':
+            result['matches'].append( ( 0, int( tokens[i + 2], 0 ), int( tokens[i + 3], 0 ) ) )
+            i += 4
+        elif tokens[i] == 'hashkey':
+            result['hashkey'] = ( int( tokens[i + 4] ), int( tokens[i + 2], 16 ) )
+            i += 5
+        elif tokens[i] == 'link':
+            result['link'] = tokens[i + 1].rstrip( ':' )
+            i += 2
+        else:
+            result['target'] = ' '.join( tokens[i:] )
+            break
+    return result
+
+def loadFilters( commands ):
+    """
+    Returns the u32 tables of the filter commands as a dictionary (table, bucket)->list of filters in order.
+    """
+    tables = { ( '800', 0 ): [] }
+    for command in commands:
+        f = parseFilter( command )
+        if 'divisor' in f:
+            for bucket in xrange( f['divisor'] ):
+                tables[( f['handle'], bucket )] = []
+            continue
+        if ( f['table'], f['bucket'] ) not in tables:
+            raise Exception( "Filter added to a table that doesn't exist: {0}".format( command ) )
+        if f['link'] is not None and ( f['link'], 0 ) not in tables:
+            raise Exception( "Filter links to a table that doesn't exist: {0}".format( command ) )
+        tables[( f['table'], f['bucket'] )].append( f )
+    return tables
+
+def classify( tables, words, table = '800', bucket = 0 ):
+    """
+    Simulates the u32 classifier: returns the target of the first matching filter, following links into hash
+    tables and continuing in the linking table when nothing in the bucket matches, or None for no match.
+
+    @param  words       A dictionary offset->32-bit word of the packet.
+    """
+    for f in tables[( table, bucket )]:
+        if not all( [words[offset] & mask == value for offset, value, mask in f['matches']] ):
+            continue
+        if f['link'] is None:
+            return f['target']
+        offset, mask = f['hashkey']
+        shift = 0
+        while mask and not ( mask >> shift ) & 1:
+            shift += 1
+        target = classify( tables, words, f['link'], ( ( words[offset] & mask ) >> shift ) & 0xff )
+        if target is not None:
+            return target
+    return None
+
+def randomValues( rnd, field ):
+    """
+    Returns a random list of values for a field, of a length around HASH_THRESHOLD or well above it.
+    """
+    count = rnd.choice( [rnd.randint( 1, netem.HASH_THRESHOLD * 2 ), rnd.randint( 1, 300 )] )
+    if field in ['sport', 'dport']:
+        return rnd.sample( xrange( 1, 65536 ), count )
+    values = []
+    for _ in xrange( count ):
+        kind = rnd.random()
+        if kind < 0.6:
+            values.append( '10.{0}.{1}.{2}'.format( rnd.randint( 0, 3 ), rnd.randint( 0, 255 ), rnd.randint( 0, 255 ) ) )
+        elif kind < 0.7:
+            values.append( '10.{0}.{1}.{2}/32'.format( rnd.randint( 0, 3 ), rnd.randint( 0, 255 ), rnd.randint( 0, 255 ) ) )
+        elif kind < 0.85:
+            values.append( rnd.choice( hostNames.keys() ) )
+        else:
+            bits = rnd.choice( [8, 16, 24, 30] )
+            address, mask = parseAddress( '10.{0}.{1}.{2}/{3}'.format( rnd.randint( 0, 3 ), rnd.randint( 0, 255 ), rnd.randint( 0, 255 ), bits ) )
+            values.append( '{0}.{1}.{2}.{3}/{4}'.format( address >> 24, ( address >> 16 ) & 0xff, ( address >> 8 ) & 0xff, address & 0xff, bits ) )
+    return values
+
+def randomPacket( rnd, field, values ):
+    """
+    Returns the words of a random packet, with its field biased towards the values and their hash buckets.
+    """
+    src = rnd.getrandbits( 32 )
+    dst = rnd.getrandbits( 32 )
+    ports = [rnd.randint( 0, 65535 ), rnd.randint( 0, 65535 )]
+    kind = rnd.random()
+    if field in ['sport', 'dport']:
+        value = rnd.choice( values )
+        if kind >= 0.4 and kind < 0.8:
+            value = ( value & 0xff ) | ( rnd.randint( 0, 255 ) << 8 )
+        elif kind >= 0.8:
+            value = rnd.randint( 0, 65535 )
+        ports[field == 'dport'] = value
+    else:
+        address, mask = parseAddress( rnd.choice( values ) )
+        if kind < 0.4:
+            value = address | ( rnd.getrandbits( 32 ) & ~mask & 0xffffffff )
+        elif kind < 0.8:
+            value = ( address & 0xff ) | ( rnd.getrandbits( 24 ) << 8 )
+        else:
+            value = rnd.getrandbits( 32 )
+        if field == 'src':
+            src = value
+        else:
+            dst = value
+    return { 0: rnd.getrandbits( 32 ), 12: src, 16: dst, 20: ( ports[0] << 16 ) | ports[1] }
+
+rnd = random.Random( seed )
+threshold = netem.HASH_THRESHOLD
+hashedLists = 0
+failures = 0
+for n in xrange( listCount ):
+    field = rnd.choice( ['src', 'dst', 'sport', 'dport'] )
+    values = randomValues( rnd, field )
+    target = 'flowid 50:10'
+    generated = loadFilters( netem.u32Filters( 'eth0', '50:', field, values, target ) )
+    netem.HASH_THRESHOLD = len(values) + 1
+    try:
+        linear = loadFilters( netem.u32Filters( 'eth0', '50:', field, values, target ) )
+    finally:
+        netem.HASH_THRESHOLD = threshold
+    if len(generated) > 1:
+        hashedLists += 1
+    for _ in xrange( packetCount ):
+        words = randomPacket( rnd, field, values )
+        expected = classify( linear, words )
+        if classify( generated, words ) != expected:
+            failures += 1
+            if failures <= 10:
+                print "Mismatch for {0} list {1} of {2} values on packet {3}: expected {4}".format( field, n, len(values), dict( [( o, '0x{0:08x}'.format( w ) ) for o, w in words.items()] ), expected )
+
+print "Classified {0} packets for each of {1} filter lists ({2} hashed)".format( packetCount, listCount, hashedLists )
+if failures:
+    print "FAIL: {0} packets were classified differently".format( failures )
+    sys.exit( 1 )
+print "PASS: the generated filters classify all packets like the linear filters"
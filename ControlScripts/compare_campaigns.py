@@ -0,0 +1,102 @@
+#!/usr/bin/python
+
+from core.parsing import isPositiveFloat, isPositiveInt
+from core.regression import TESTS, scenarioExecutions, summarizeExecutions, compareScenario, hasRegression, writeReport
+import os
+import sys
+
+if __name__ != "__main__":
+    raise Exception( "Do not import" )
+
+threshold = 0.05
+alpha = 0.05
+test = 'mannwhitney'
+resamples = 2000
+scenarioNames = []
+dirNames = []
+
+# Parse arguments
+for arg in sys.argv[1:]:
+    if arg[:12] == '--threshold=':
+        if not isPositiveFloat( arg[12:] ):
+            raise Exception( "--threshold expects a positive floating point number" )
+        threshold = float( arg[12:] ) / 100
+    elif arg[:8] == '--alpha=':
+        if not isPositiveFloat( arg[8:], True ) or float( arg[8:] ) >= 1:
+            raise Exception( "--alpha expects a floating point number between 0 and 1" )
+        alpha = float( arg[8:] )
+    elif arg[:7] == '--test=':
+        if arg[7:] not in TESTS:
+            raise Exception( "--test expects one of {0}".format( ', '.join( TESTS ) ) )
+        test = arg[7:]
+    elif arg[:12] == '--resamples=':
+        if not isPositiveInt( arg[12:], True ):
+            raise Exception( "--resamples expects a positive, non-zero integer" )
+        resamples = int( arg[12:] )
+    elif arg[:11] == '--scenario=':
+        scenarioNames.append( arg[11:] )
+    elif arg == '--help':
+        print """
+compare_campaigns.py [options] baseline candidate
+
+compares the results of a candidate campaign with those of a baseline campaign to find performance regressions
+Arguments:
+    --threshold=percent     The change of the median that is allowed, default 5
+    --alpha=level           The significance level, default 0.05
+    --test=name             The test that decides whether a change is significant: mannwhitney (default) for a
+                            two-sided Mann-Whitney U test, bootstrap for a bootstrap confidence interval of the change
+                            of the median that excludes 0
+    --resamples=number      The number of bootstrap resamples, default 2000
+    --scenario=name         Only compare this scenario; may be given multiple times
+    --help                  This text and exit
+
+baseline and candidate are the results directories of the campaigns. Scenarios are matched by name and their
+executions by number and role. The fraction of the leechers that completed, the download times of the completed
+leechers, the mean download speeds of the leechers and the mean upload speeds of the seeders are compared, see
+core.regression. The roles are read from the isSeeder_N files of processor:saveisseeder; executions without one are
+taken to be leechers.
+
+A report is printed for each scenario and the exit status is 1 if any metric of any scenario regressed.
+
+Example:
+    compare_campaigns.py --threshold=10 /path/to/results/baseline /path/to/results/candidate
+"""
+        sys.exit()
+    elif arg[:2] == '--':
+        raise Exception( "Unknown argument: {0}. Try --help.".format( arg ) )
+    else:
+        dirNames.append( arg )
+
+if len(dirNames) != 2:
+    raise Exception( "Expected a baseline and a candidate campaign. Try --help." )
+for dirName in dirNames:
+    if not os.path.isdir( os.path.join( dirName, 'scenarios' ) ):
+        raise Exception( "{0} seems not to be the results directory of a campaign".format( dirName ) )
+
+baselineScenarios = os.listdir( os.path.join( dirNames[0], 'scenarios' ) )
+candidateScenarios = os.listdir( os.path.join( dirNames[1], 'scenarios' ) )
+if scenarioNames:
+    for name in scenarioNames:
+        if name not in baselineScenarios or name not in candidateScenarios:
+            raise Exception( "Scenario {0} is not in both campaigns".format( name ) )
+else:
+    scenarioNames = sorted( [name for name in candidateScenarios if name in baselineScenarios] )
+    for name in sorted( set( baselineScenarios ) ^ set( candidateScenarios ) ):
+        print "Warning! Scenario {0} is only in one of the campaigns, skipping.".format( name )
+    if not scenarioNames:
+        raise Exception( "The campaigns have no scenarios in common" )
+
+failed = []
+for name in scenarioNames:
+    baseline = summarizeExecutions( scenarioExecutions( os.path.join( dirNames[0], 'scenarios', name ) ) )
+    candidate = summarizeExecutions( scenarioExecutions( os.path.join( dirNames[1], 'scenarios', name ) ) )
+    results, notes = compareScenario( baseline, candidate, threshold, alpha, test, resamples )
+    writeReport( sys.stdout, name, results, notes )
+    if hasRegression( results ):
+        failed.append( name )
+
+print
+if failed:
+    print "FAIL: {0} of {1} scenarios regressed: {2}".format( len(failed), len(scenarioNames), ', '.join( failed ) )
+    sys.exit( 1 )
+print "PASS: no regressions in {0} scenarios".format( len(scenarioNames) )
@@ -0,0 +1,595 @@
+import os
+import re
+import stat
+import struct
+import zlib
+import collections
+import multiprocessing
+import __builtin__
+
+# Random-access compressed archives of results directories
+#
+# An archive holds a directory tree (usually the results directory of a campaign) in a single file:
+#   header      ARCHIVE_HEADER: magic and block size
+#   data        each file as independently zlib-compressed blocks of the block size (the last block is shorter);
+#               files are stored in the order of the tree, so all files of an execution are one contiguous member
+#   index       the zlib-compressed central index of all directories and files, see archiveIndex(...)
+#   trailer     ARCHIVE_TRAILER: offset and length of the index and magic
+# Any part of any file can be read by decompressing only the blocks that hold it, so archives need not be extracted to
+# be read. The blocks are compressed in parallel. archiveOverlay lets unmodified code (such as parsers run by
+# reparse.py) read files from an archive as if they were on disk.
+
+ARCHIVE_MAGIC = 'P2PARC01'
+ARCHIVE_HEADER = struct.Struct( '<8sI' )
+ARCHIVE_TRAILER = struct.Struct( '<QQ8s' )
+
+# The extension of archive files
+ARCHIVE_EXTENSION = '.archive'
+
+# The default number of bytes of a file that are compressed as one block
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# The default zlib compression level
+DEFAULT_LEVEL = 6
+
+# Matches the relative paths of raw logs in the results directory of a campaign
+RAW_LOG_PATTERN = re.compile( r'(^|/)executions/exec_[0-9]+/logs(/|$)' )
+
+# The builtin open, also when an archiveOverlay is installed
+realOpen = __builtin__.open
+
+def compressBlock( task ):
+    """
+    Reads and compresses a block of a file. Runs in a worker process.
+
+    @param  task    A tuple (path, offset, length, level).
+
+    @return The compressed block.
+    """
+    path, offset, length, level = task
+    fObj = realOpen( path, 'rb' )
+    try:
+        fObj.seek( offset )
+        data = fObj.read( length )
+    finally:
+        fObj.close()
+    if len(data) != length:
+        raise Exception( "{0} changed while it was archived".format( path ) )
+    return zlib.compress( data, level )
+
+def packString( value ):
+    """
+    Packs a string for the index.
+
+    @param  value   The string.
+
+    @return The packed string.
+    """
+    return struct.pack( '<I', len(value) ) + value
+
+def archiveIndex( dirs, files ):
+    """
+    Creates the central index of an archive, uncompressed.
+
+    The index holds the number of directories followed by each directory as its path, mode and mtime, and then the
+    number of files followed by each file as its path, mode, mtime, size, number of blocks and the offset and
+    compressed length of each block.
+
+    @param  dirs    The list of tuples (relative path, mode, mtime) of the directories.
+    @param  files   The list of tuples (relative path, mode, mtime, size, list of (offset, length) of its blocks) of the files.
+
+    @return The index.
+    """
+    parts = [struct.pack( '<I', len(dirs) )]
+    for path, mode, mtime in dirs:
+        parts.append( packString( path ) + struct.pack( '<Id', mode, mtime ) )
+    parts.append( struct.pack( '<I', len(files) ) )
+    for path, mode, mtime, size, blocks in files:
+        parts.append( packString( path ) + struct.pack( '<IdQI', mode, mtime, size, len(blocks) ) )
+        parts.append( ''.join( [struct.pack( '<QI', offset, length ) for offset, length in blocks] ) )
+    return ''.join( parts )
+
+def createArchive( sourceDir, archivePath, workers = None, level = DEFAULT_LEVEL, blockSize = BLOCK_SIZE ):
+    """
+    Archives a directory tree.
+
+    The blocks are compressed by a pool of worker processes. Only a few blocks per worker are in flight at any time,
+    so memory use does not depend on the size of the tree. The archive is written to a temporary file that is renamed
+    to archivePath when complete.
+
+    @param  sourceDir       The directory to archive.
+    @param  archivePath     The path to the archive to create.
+    @param  workers         The number of worker processes, None for the number of local CPUs.
+    @param  level           The zlib compression level, 1 (fastest) to 9 (smallest).
+    @param  blockSize       The number of bytes of a file to compress as one block.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    dirs = []
+    files = []
+    for dirPath, dirNames, fileNames in os.walk( sourceDir ):
+        dirNames.sort()
+        relDir = os.path.relpath( dirPath, sourceDir ).replace( os.sep, '/' )
+        if relDir == '.':
+            relDir = ''
+        else:
+            st = os.stat( dirPath )
+            dirs.append( ( relDir, stat.S_IMODE( st.st_mode ), st.st_mtime ) )
+        for fileName in sorted( fileNames ):
+            path = os.path.join( dirPath, fileName )
+            if not os.path.isfile( path ):
+                continue
+            st = os.stat( path )
+            files.append( ( '/'.join( [p for p in [relDir, fileName] if p] ), path, stat.S_IMODE( st.st_mode ), st.st_mtime, st.st_size ) )
+    tmpPath = archivePath + '.tmp'
+    files = [f for f in files if os.path.abspath( f[1] ) not in [os.path.abspath( archivePath ), os.path.abspath( tmpPath )]]
+    fObj = realOpen( tmpPath, 'wb' )
+    pool = None
+    try:
+        fObj.write( ARCHIVE_HEADER.pack( ARCHIVE_MAGIC, blockSize ) )
+        tasks = ( ( index, ( files[index][1], offset, min( blockSize, files[index][4] - offset ), level ) )
+                  for index in xrange( len(files) ) for offset in xrange( 0, files[index][4], blockSize ) )
+        if workers > 1:
+            pool = multiprocessing.Pool( workers )
+        blocks = [[] for _ in files]
+        pending = collections.deque()
+        while True:
+            # Keep a few blocks per worker in flight and write the blocks in order
+            while len(pending) < workers * 4:
+                try:
+                    index, task = tasks.next()
+                except StopIteration:
+                    break
+                if pool:
+                    pending.append( ( index, pool.apply_async( compressBlock, ( task, ) ) ) )
+                else:
+                    pending.append( ( index, compressBlock( task ) ) )
+            if not pending:
+                break
+            index, data = pending.popleft()
+            if pool:
+                data = data.get()
+            blocks[index].append( ( fObj.tell(), len(data) ) )
+            fObj.write( data )
+        if pool:
+            pool.close()
+            pool.join()
+            pool = None
+        index = zlib.compress( archiveIndex( dirs, [( f[0], f[2], f[3], f[4], blocks[i] ) for i, f in enumerate( files )] ), level )
+        offset = fObj.tell()
+        fObj.write( index )
+        fObj.write( ARCHIVE_TRAILER.pack( offset, len(index), ARCHIVE_MAGIC ) )
+        fObj.close()
+        os.rename( tmpPath, archivePath )
+    except:
+        if pool:
+            pool.terminate()
+        fObj.close()
+        if os.path.exists( tmpPath ):
+            os.remove( tmpPath )
+        raise
+
+class archive:
+    """
+    Reads an archive created by createArchive(...).
+
+    Paths are relative to the archived directory and use '/'. Use close() when done.
+    """
+
+    path = None             # The path to the archive
+    blockSize = 0           # The number of bytes of a file in each block
+    dirs = None             # Dictionary relative path->(mode, mtime) of all directories
+    files = None            # Dictionary relative path->(mode, mtime, size, list of (offset, length) of its blocks) of all files
+    children = None         # Dictionary relative path of a directory->list of the names in it; '' is the archived directory
+    fileObj = None          # The file object of the archive
+
+    def __init__(self, path):
+        """
+        Opens an archive and reads its index.
+
+        @param  path        The path to the archive.
+        """
+        self.path = path
+        self.fileObj = realOpen( path, 'rb' )
+        try:
+            magic, self.blockSize = ARCHIVE_HEADER.unpack( self.fileObj.read( ARCHIVE_HEADER.size ) )
+            if magic != ARCHIVE_MAGIC:
+                raise Exception( "{0} is not an archive".format( path ) )
+            self.fileObj.seek( -ARCHIVE_TRAILER.size, os.SEEK_END )
+            offset, length, magic = ARCHIVE_TRAILER.unpack( self.fileObj.read( ARCHIVE_TRAILER.size ) )
+            if magic != ARCHIVE_MAGIC:
+                raise Exception( "Archive {0} is truncated".format( path ) )
+            self.fileObj.seek( offset )
+            self.readIndex( zlib.decompress( self.fileObj.read( length ) ) )
+        except:
+            self.close()
+            raise
+
+    def readIndex(self, index):
+        """
+        Reads the central index, see archiveIndex(...).
+
+        @param  index       The uncompressed index.
+        """
+        self.dirs = {}
+        self.files = {}
+        self.children = {'': []}
+        pos = 0
+        for kind in ['dir', 'file']:
+            count = struct.unpack_from( '<I', index, pos )[0]
+            pos += 4
+            for _ in xrange( count ):
+                length = struct.unpack_from( '<I', index, pos )[0]
+                path = index[pos + 4:pos + 4 + length]
+                pos += 4 + length
+                if kind == 'dir':
+                    self.dirs[path] = struct.unpack_from( '<Id', index, pos )
+                    pos += 12
+                    self.children[path] = []
+                else:
+                    mode, mtime, size, blockCount = struct.unpack_from( '<IdQI', index, pos )
+                    pos += 24
+                    blocks = [struct.unpack_from( '<QI', index, pos + 12 * i ) for i in xrange( blockCount )]
+                    pos += 12 * blockCount
+                    self.files[path] = ( mode, mtime, size, blocks )
+                parent, _, name = path.rpartition( '/' )
+                self.children[parent].append( name )
+
+    def close(self):
+        """
+        Closes the archive.
+        """
+        if self.fileObj:
+            self.fileObj.close()
+            self.fileObj = None
+
+    @staticmethod
+    def normalize(path):
+        """
+        Normalizes a relative path in the archive.
+
+        @param  path        The relative path.
+
+        @return The normalized path, '' for the archived directory itself.
+        """
+        path = os.path.normpath( path ).replace( os.sep, '/' ).strip( '/' )
+        if path == '.':
+            return ''
+        return path
+
+    def isdir(self, path):
+        return archive.normalize( path ) in self.children
+
+    def isfile(self, path):
+        return archive.normalize( path ) in self.files
+
+    def exists(self, path):
+        return self.isdir( path ) or self.isfile( path )
+
+    def getsize(self, path):
+        path = archive.normalize( path )
+        if path in self.files:
+            return self.files[path][2]
+        return 0
+
+    def getmtime(self, path):
+        path = archive.normalize( path )
+        if path in self.files:
+            return self.files[path][1]
+        return self.dirs[path][1]
+
+    def listdir(self, path):
+        """
+        Lists a directory in the archive.
+
+        @param  path        The relative path of the directory.
+
+        @return The list of names in the directory.
+        """
+        path = archive.normalize( path )
+        if path not in self.children:
+            raise OSError( 2, 'No such directory in archive {0}'.format( self.path ), path )
+        return list( self.children[path] )
+
+    def readBlock(self, blocks, index, fObj = None):
+        """
+        Reads and decompresses a block of a file.
+
+        @param  blocks      The list of (offset, length) of the blocks of the file.
+        @param  index       The index of the block.
+        @param  fObj        The file object of the archive to read from, None for the shared one.
+
+        @return The data in the block.
+        """
+        if fObj is None:
+            fObj = self.fileObj
+        offset, length = blocks[index]
+        fObj.seek( offset )
+        return zlib.decompress( fObj.read( length ) )
+
+    def open(self, path):
+        """
+        Opens a file in the archive for reading.
+
+        @param  path        The relative path of the file.
+
+        @return An archiveFile.
+        """
+        path = archive.normalize( path )
+        if path not in self.files:
+            raise IOError( 2, 'No such file in archive {0}'.format( self.path ), path )
+        return archiveFile( self, path )
+
+    def extract(self, targetDir, prefix = '', exclude = None):
+        """
+        Extracts (part of) the archive. Files that already exist are left alone.
+
+        @param  targetDir   The directory to extract to; it takes the place of the archived directory.
+        @param  prefix      The relative path of the directory to extract, '' for everything.
+        @param  exclude     A compiled pattern: files whose relative path it matches are not extracted. Optional.
+
+        @return The number of files extracted.
+        """
+        prefix = archive.normalize( prefix )
+        def selected( path ):
+            return prefix == '' or path == prefix or path.startswith( prefix + '/' )
+        if not os.path.isdir( targetDir ):
+            os.makedirs( targetDir )
+        for path in sorted( self.dirs ):
+            if selected( path ) and not os.path.isdir( os.path.join( targetDir, path ) ):
+                os.makedirs( os.path.join( targetDir, path ) )
+        count = 0
+        for path in sorted( self.files ):
+            if not selected( path ) or ( exclude is not None and exclude.search( path ) ):
+                continue
+            target = os.path.join( targetDir, path )
+            if os.path.exists( target ):
+                continue
+            mode, mtime, _, blocks = self.files[path]
+            fObj = realOpen( target, 'wb' )
+            try:
+                for index in xrange( len(blocks) ):
+                    fObj.write( self.readBlock( blocks, index ) )
+            finally:
+                fObj.close()
+            os.chmod( target, mode )
+            os.utime( target, ( mtime, mtime ) )
+            count += 1
+        # Creating the contents changed the mtimes of the directories
+        for path in sorted( self.dirs, reverse = True ):
+            if selected( path ):
+                os.utime( os.path.join( targetDir, path ), ( self.dirs[path][1], self.dirs[path][1] ) )
+        return count
+
+class archiveFile:
+    """
+    A read-only file object for a file in an archive, see archive.open(...).
+
+    Supports read, readline, readlines, iteration, seek and tell. Only the blocks that are read are decompressed.
+    """
+
+    archive = None          # The archive
+    name = None             # The relative path of the file
+    size = 0                # The size of the file
+    blocks = None           # The list of (offset, length) of the blocks of the file
+    position = 0            # The current position in the file
+    blockIndex = None       # The index of the block in blockData
+    blockData = None        # The last decompressed block
+    fileObj = None          # The file object of the archive used by this file
+    closed = False
+
+    def __init__(self, archiveObject, path):
+        self.archive = archiveObject
+        self.name = path
+        self.size = archiveObject.files[path][2]
+        self.blocks = archiveObject.files[path][3]
+        # A file object of its own, so files in the archive can be read side by side
+        self.fileObj = realOpen( archiveObject.path, 'rb' )
+
+    def __iter__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        self.close()
+
+    def close(self):
+        if self.fileObj:
+            self.fileObj.close()
+            self.fileObj = None
+        self.blockData = None
+        self.closed = True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence = os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise IOError( 22, 'Invalid argument' )
+        self.position = offset
+
+    def loadBlock(self):
+        """
+        Makes sure the block at the current position is in blockData.
+
+        @return The offset of the current position in blockData, or None at the end of the file.
+        """
+        if self.closed:
+            raise ValueError( 'I/O operation on closed file' )
+        if self.position >= self.size:
+            return None
+        index = self.position / self.archive.blockSize
+        if index != self.blockIndex:
+            self.blockData = self.archive.readBlock( self.blocks, index, self.fileObj )
+            self.blockIndex = index
+        return self.position - index * self.archive.blockSize
+
+    def read(self, size = -1):
+        parts = []
+        while size != 0:
+            offset = self.loadBlock()
+            if offset is None:
+                break
+            end = len(self.blockData)
+            if size > 0:
+                end = min( end, offset + size )
+                size -= end - offset
+            parts.append( self.blockData[offset:end] )
+            self.position += end - offset
+        return ''.join( parts )
+
+    def readline(self, size = -1):
+        # Only the line itself is sliced from the block, so reading all lines of a block is linear
+        parts = []
+        while size != 0:
+            offset = self.loadBlock()
+            if offset is None:
+                break
+            end = len(self.blockData)
+            if size > 0:
+                end = min( end, offset + size )
+            newline = self.blockData.find( '\n', offset, end )
+            if newline >= 0:
+                end = newline + 1
+            if size > 0:
+                size -= end - offset
+            parts.append( self.blockData[offset:end] )
+            self.position += end - offset
+            if newline >= 0:
+                break
+        return ''.join( parts )
+
+    def readlines(self, sizehint = 0):
+        lines = []
+        total = 0
+        while True:
+            line = self.readline()
+            if line == '':
+                break
+            lines.append( line )
+            total += len(line)
+            if sizehint > 0 and total >= sizehint:
+                break
+        return lines
+
+    def next(self):
+        line = self.readline()
+        if line == '':
+            raise StopIteration
+        return line
+
+class archiveOverlay:
+    """
+    Overlays an archive on a directory, so code that uses open(...), os.listdir(...) and os.path.exists(...),
+    isfile(...), isdir(...), getsize(...) and getmtime(...) sees the files of the archive as if they were extracted
+    there.
+
+    Files on disk take precedence: files that are not on disk are read from the archive and directory listings are
+    merged. Anything written goes to disk as usual, so the directories to write to must exist on disk (see
+    archive.extract(...)). Other file operations, such as os.stat(...), mmap and external programs, only see the disk.
+
+    Use install() and uninstall(); the overlay is installed process-wide.
+    """
+
+    archive = None          # The archive
+    root = None             # The absolute path of the directory the archive is overlaid on
+    originals = None        # Dictionary name->original function of the replaced functions
+
+    def __init__(self, archiveObject, root):
+        """
+        @param  archiveObject   The archive.
+        @param  root            The directory to overlay the archive on.
+        """
+        self.archive = archiveObject
+        self.root = os.path.abspath( root )
+        self.originals = None
+
+    def relativePath(self, path):
+        """
+        Returns the path in the archive of a path on disk.
+
+        @param  path        The path on disk.
+
+        @return The relative path in the archive, or None if path is not in the overlaid directory.
+        """
+        if not isinstance( path, basestring ):
+            return None
+        path = os.path.abspath( path )
+        if path == self.root:
+            return ''
+        if not path.startswith( self.root + os.sep ):
+            return None
+        return path[len(self.root) + 1:]
+
+    def install(self):
+        """
+        Installs the overlay.
+        """
+        if self.originals is not None:
+            raise Exception( "The archive overlay is already installed" )
+        self.originals = {
+            'open': __builtin__.open,
+            'listdir': os.listdir,
+            'exists': os.path.exists,
+            'isfile': os.path.isfile,
+            'isdir': os.path.isdir,
+            'getsize': os.path.getsize,
+            'getmtime': os.path.getmtime,
+        }
+        originals = self.originals
+        overlay = self
+        def overlayOpen( name, mode = 'r', *args, **kwargs ):
+            path = overlay.relativePath( name )
+            if path is None or originals['exists']( name ) or mode.lstrip( 'rbU' ) != '' or not overlay.archive.isfile( path ):
+                return originals['open']( name, mode, *args, **kwargs )
+            return overlay.archive.open( path )
+        def overlayListdir( name ):
+            path = overlay.relativePath( name )
+            if path is None or not overlay.archive.isdir( path ):
+                return originals['listdir']( name )
+            names = overlay.archive.listdir( path )
+            if originals['isdir']( name ):
+                names += [n for n in originals['listdir']( name ) if n not in names]
+            return names
+        def overlayTest( test, archiveTest ):
+            def overlayFunction( name ):
+                if test( name ):
+                    return True
+                path = overlay.relativePath( name )
+                return path is not None and archiveTest( path )
+            return overlayFunction
+        def overlayGet( get, archiveGet ):
+            def overlayFunction( name ):
+                path = overlay.relativePath( name )
+                if path is None or originals['exists']( name ) or not overlay.archive.exists( path ):
+                    return get( name )
+                return archiveGet( path )
+            return overlayFunction
+        __builtin__.open = overlayOpen
+        os.listdir = overlayListdir
+        os.path.exists = overlayTest( originals['exists'], self.archive.exists )
+        os.path.isfile = overlayTest( originals['isfile'], self.archive.isfile )
+        os.path.isdir = overlayTest( originals['isdir'], self.archive.isdir )
+        os.path.getsize = overlayGet( originals['getsize'], self.archive.getsize )
+        os.path.getmtime = overlayGet( originals['getmtime'], self.archive.getmtime )
+
+    def uninstall(self):
+        """
+        Uninstalls the overlay, restoring the original functions.
+        """
+        if self.originals is None:
+            return
+        __builtin__.open = self.originals['open']
+        os.listdir = self.originals['listdir']
+        os.path.exists = self.originals['exists']
+        os.path.isfile = self.originals['isfile']
+        os.path.isdir = self.originals['isdir']
+        os.path.getsize = self.originals['getsize']
+        os.path.getmtime = self.originals['getmtime']
+        self.originals = None
@@ -1,3 +1,7 @@
+import os
+import shutil
+import hashlib
+import tempfile
 from subprocess import STDOUT
 from subprocess import PIPE
 from subprocess import Popen
@@ -44,16 +48,25 @@ class builder(coreObject):
         This default implementation does nothing if buildCommand(...) returns None.
         Otherwise it starts a local bash instance and gives the buildCommand(...) as input to that.
 
+        If the source knows the revision of the sources (see core.source.source.revision(...)) the build is looked
+        up in the local build cache first. A cached build is copied into the local sources instead of building; a
+        succesful new build is added to the cache.
+
         @param  client      The client for which the sources are to be built locally.
         
         @return True iff the building was succesful.
         """
         buildCommand = self.buildCommand(client)
         if buildCommand:
+            if self.isInCleanup():
+                return False
+            cachedBuild = self.getCachedBuild(client)
+            if cachedBuild:
+                Campaign.logger.log( "Using cached build {1} for client {0}".format( client.name, cachedBuild ) )
+                self.copyArtifacts( client, cachedBuild, client.sourceObj.localLocation(client) )
+                return True
             result = ''
             try:
-                if self.isInCleanup():
-                    return False
                 proc = Popen('bash', bufsize=8192, stdin=PIPE, stdout=PIPE, stderr=STDOUT, cwd=client.sourceObj.localLocation(client) )
                 if self.isInCleanup():
                     proc.kill()
@@ -62,8 +75,119 @@ class builder(coreObject):
             except Exception:
                 Campaign.logger.log( result )
                 raise Exception( "Could not build client {0} locally using builder {1}".format( client.name, self.__class__.__name__ ) )
+            if proc.returncode == 0:
+                self.storeCachedBuild(client)
         return True
-    
+
+    def buildCacheKey(self, client):
+        """
+        Returns the key of the local build of the client in the local build cache.
+
+        The key is derived from the location and revision of the sources, the builder and the build command. Only
+        builds of sources with a known revision can be cached.
+
+        @param  client      The client for which the sources are to be built locally.
+
+        @return The key, or None if the build can't be cached.
+        """
+        revision = client.sourceObj.revision(client)
+        buildCommand = self.buildCommand(client)
+        if revision is None or not buildCommand:
+            return None
+        return hashlib.sha1( repr( (client.location, revision, self.__class__.__name__, buildCommand) ) ).hexdigest()
+
+    def getCachedBuild(self, client):
+        """
+        Returns the cached local build of the client, if any.
+
+        @param  client      The client for which the sources are to be built locally.
+
+        @return The path to the directory with the cached build artifacts, or None if there is no cached build.
+        """
+        key = self.buildCacheKey(client)
+        if not key:
+            return None
+        path = os.path.join( Campaign.getCacheDir( 'builds' ), key )
+        if os.path.isdir( path ):
+            return path
+        return None
+
+    def buildArtifacts(self, client):
+        """
+        Returns the files resulting from a local build of the client, relative to the local sources.
+
+        These files are stored in the local build cache. The default implementation uses the source layout of the
+        client if it has one, or its binary layout otherwise.
+
+        @param  client      The client for which the sources are to be built locally.
+
+        @return The list of relative paths, or None to store the complete sources (except version control data).
+        """
+        if client.getSourceLayout():
+            return [entry[0] for entry in client.getSourceLayout()]
+        if client.getBinaryLayout():
+            return [entry for entry in client.getBinaryLayout() if entry[-1:] != '/']
+        return None
+
+    def copyArtifacts(self, client, sourceDir, destinationDir):
+        """
+        Copies the build artifacts of the client from one directory to another.
+
+        Artifacts that are directories are copied with all their contents (except version control data), merged into
+        the directory in destinationDir if that already exists.
+
+        @param  client          The client for which the sources are to be built locally.
+        @param  sourceDir       The directory containing the artifacts.
+        @param  destinationDir  The directory to copy the artifacts to, which must exist.
+        """
+        artifacts = self.buildArtifacts(client)
+        if artifacts is None:
+            artifacts = ['.']
+        files = []
+        for artifact in artifacts:
+            if not os.path.exists( os.path.join( sourceDir, artifact ) ):
+                raise Exception( "Build artifact {0} of client {1} is missing from {2}".format( artifact, client.name, sourceDir ) )
+            if not os.path.isdir( os.path.join( sourceDir, artifact ) ):
+                files.append( artifact )
+                continue
+            for root, dirs, names in os.walk( os.path.join( sourceDir, artifact ) ):
+                if '.git' in dirs:
+                    dirs.remove( '.git' )
+                relRoot = os.path.relpath( root, sourceDir )
+                if not os.path.isdir( os.path.join( destinationDir, relRoot ) ):
+                    os.makedirs( os.path.join( destinationDir, relRoot ) )
+                files += [os.path.join( relRoot, f ) for f in names]
+        for f in files:
+            if not os.path.isdir( os.path.dirname( os.path.join( destinationDir, f ) ) ):
+                os.makedirs( os.path.dirname( os.path.join( destinationDir, f ) ) )
+            shutil.copy2( os.path.join( sourceDir, f ), os.path.join( destinationDir, f ) )
+
+    def storeCachedBuild(self, client):
+        """
+        Adds the local build of the client to the local build cache.
+
+        Does nothing if the build can't be cached or is already cached. Failing to store the build is logged, but
+        not fatal.
+
+        @param  client      The client for which the sources have been built locally.
+        """
+        key = self.buildCacheKey(client)
+        if not key:
+            return
+        path = os.path.join( Campaign.getCacheDir( 'builds' ), key )
+        if os.path.isdir( path ):
+            return
+        # Fill a temporary directory next to the final one and rename afterwards: the cache may be shared by parallel campaigns
+        tmpPath = tempfile.mkdtemp( prefix = '{0}.tmp'.format( key ), dir = Campaign.getCacheDir( 'builds' ) )
+        try:
+            self.copyArtifacts( client, client.sourceObj.localLocation(client), tmpPath )
+            os.rename( tmpPath, path )
+        except Exception as exc:
+            Campaign.logger.log( "Could not store the build of client {0} in the local build cache: {1}".format( client.name, exc.__str__() ) )
+        finally:
+            if os.path.exists( tmpPath ):
+                shutil.rmtree( tmpPath )
+
     def buildRemote(self, client, host):
         """
         Build the remote source for the client on the host.
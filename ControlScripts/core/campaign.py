@@ -28,6 +28,7 @@ class Campaign:
     testEnvDir = None       # Global location of the testing environment directory (the one containing
                             # the ControlScripts directory
     resultsDir = None       # Global location of the results for any campaign
+    cacheDir = None         # Global location of local caches that are kept across campaigns
     
     def __init__(self):
         raise Exception( "Do not instantiate" )
@@ -42,6 +43,31 @@ class Campaign:
         # This method is mainly preferred to fool static analysers
         return Campaign.currentCampaign
     
+    @staticmethod
+    def getCacheDir(name):
+        """
+        Returns the path to a local cache directory, creating it if needed.
+        
+        Caches in this directory are kept across campaigns and may be shared by campaigns running in parallel,
+        so anything written there should be written atomically.
+        
+        @param  name    The name of the cache, which will be a subdirectory of the global cache directory.
+        
+        @return The path to the cache directory.
+        """
+        baseDir = Campaign.cacheDir
+        if not baseDir:
+            baseDir = os.path.join( Campaign.testEnvDir, 'Cache' )
+        path = os.path.join( baseDir, name )
+        if not os.path.isdir( path ):
+            try:
+                os.makedirs( path )
+            except OSError:
+                # Possibly created in parallel by another campaign
+                if not os.path.isdir( path ):
+                    raise
+        return path
+
     @staticmethod
     def notInitialized():
         """
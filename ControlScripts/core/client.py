@@ -5,10 +5,12 @@ import threading
 import re
 import time
 import posixpath
+import shutil
 
-from core.parsing import isValidName
+from core.parsing import isValidName, isPositiveFloat
 from core.campaign import Campaign
 from core.coreObject import coreObject
+from core.sampler import sampler
 
 def parseError( msg ):
     raise Exception( "Parse error for client object on line {0}: {1}".format( Campaign.currentLineNumber, msg ) )
@@ -38,9 +40,12 @@ class client(coreObject):
     pids_finished = {}          # Dictionary execution-number->True for those execution numbers that have already finished
     
     profile = False             # Flag to include external profiling code
+    profileInterval = None      # The interval between profiling samples in seconds (float)
+    samplerHosts = None         # Dictionary host->True for the hosts on which the executions are profiled by the resource sampler
     logStart = False            # Flag to include logging of the starting time of the client on the remote host
-    
-    onHosts = None              # Temporary list of hosts where this client will run; do not use
+
+    remoteBuilds = None         # Dictionary host->True for the hosts on which prepareRemoteBuilds(...) already prepared and built the client
+    remoteBuilds__lock = None   # Lock object to guard the remoteBuilds dictionary
 
     # For more clarity: the way source, isRemote, location and builder work together is as follows.
     #
@@ -67,7 +72,9 @@ class client(coreObject):
         self.pid__lock = threading.Lock()
         self.pids = {}
         self.pids_finished = {}
-        self.onHosts = []
+        self.remoteBuilds = {}
+        self.remoteBuilds__lock = threading.Lock()
+        self.samplerHosts = {}
 
     def parseSetting(self, key, value):
         """
@@ -126,6 +133,12 @@ class client(coreObject):
             self.isRemote = ( value != '' )
         elif key == 'profile':
             self.profile = ( value != '' )
+        elif key == 'profileInterval':
+            if self.profileInterval is not None:
+                parseError( 'Profile interval already set: {0}'.format( self.profileInterval ) )
+            if not isPositiveFloat( value, True ):
+                parseError( 'Profile interval must be a positive, non-zero number of seconds' )
+            self.profileInterval = float( value )
         elif key == 'logStart':
             self.logStart = ( value != '' )
         else:
@@ -140,6 +153,8 @@ class client(coreObject):
 
         An Exception is raised in the case of insanity.
         """
+        if self.profileInterval is None:
+            self.profileInterval = 1.0
         if self.name == '':
             if self.__class__.__name__ in self.scenario.getObjectsDict( 'client' ):
                 raise Exception( "Client object declared at line {0} was not given a name and default name {1} was already taken".format( self.declarationLine, self.__class__.__name__ ) )
@@ -239,6 +254,104 @@ class client(coreObject):
                     return
                 raise Exception( "A local build of client {0} failed".format( self.name ) )
 
+    def prepareRemoteBuilds(self, hosts):
+        """
+        Prepares and builds the client once per platform for remote clients.
+
+        The hosts are grouped by their platform fingerprint (see host.getPlatformFingerprint()). For each group the
+        sources are prepared and built on one host, after which the prepared source directory is packed, retrieved
+        and unpacked on the other hosts of the group. The groups are handled in parallel, each in a thread of its own,
+        even if every host has a platform of its own. prepareHost(...) will skip preparing and building on all hosts
+        handled here.
+
+        This is only done for remote clients whose source prepares into a directory of its own on each host, i.e.
+        for which sourceObj.prepareCommand(...) is not None. Other clients are prepared and built on each host by
+        prepareHost(...) as usual.
+
+        @param  hosts           The hosts on which this client will run.
+        """
+        if not self.isRemote or self.sourceObj.prepareCommand( self ) is None:
+            return
+        groups = {}
+        for host in hosts:
+            fingerprint = host.getPlatformFingerprint()
+            if fingerprint not in groups:
+                groups[fingerprint] = []
+            groups[fingerprint].append( host )
+        if self.builder:
+            print "Remotely compiling client {0} once for each of {1} platforms".format( self.name, len(groups) )
+        errors = []
+        threads = []
+        for fingerprint in groups:
+            t = threading.Thread( target = self.prepareRemoteBuildGroup, args = (groups[fingerprint], errors) )
+            t.daemon = True
+            threads.append( t )
+            t.start()
+        for t in threads:
+            t.join()
+        if len(errors) > 0:
+            raise errors[0]
+
+    def prepareRemoteBuildGroup(self, hosts, errors):
+        """
+        Prepares and builds the client on the first of the hosts and distributes the result to the others.
+
+        Helper for prepareRemoteBuilds(...), run in a thread of its own.
+
+        @param  hosts           The hosts sharing one platform fingerprint.
+        @param  errors          List to which an Exception that occurs is appended.
+        """
+        try:
+            buildHost = hosts[0]
+            if self.isInCleanup():
+                return
+            if not self.sourceObj.prepareRemote( self, buildHost ):
+                if self.isInCleanup():
+                    return
+                raise Exception( "The source of client {0} could not be prepared remotely on host {1}".format( self.name, buildHost.name ) )
+            if self.isInCleanup():
+                return
+            if not self.builderObj.buildRemote( self, buildHost ):
+                if self.isInCleanup():
+                    return
+                raise Exception( "A remote build of client {0} failed on host {1}".format( self.name, buildHost.name ) )
+            self.remoteBuilds__lock.acquire()
+            try:
+                self.remoteBuilds[buildHost] = True
+            finally:
+                self.remoteBuilds__lock.release()
+            if len(hosts) < 2:
+                return
+            # Pack the prepared sources on the build host and retrieve them
+            remoteArchive = '{0}/build-{1}.tar.gz'.format( self.getClientDir( buildHost ), self.name )
+            res = buildHost.sendCommand( 'tar -czf "{0}" -C "{1}" . && echo "OK"'.format( remoteArchive, self.sourceObj.remoteLocation( self, buildHost ) ) )
+            if res.splitlines()[-1:] != ["OK"]:
+                raise Exception( "Client {0} could not pack its build on host {1} for distribution. Response: {2}".format( self.name, buildHost.name, res ) )
+            localDir = tempfile.mkdtemp()
+            try:
+                localArchive = os.path.join( localDir, 'build.tar.gz' )
+                buildHost.getFile( remoteArchive, localArchive )
+                buildHost.sendCommand( 'rm -f "{0}"'.format( remoteArchive ) )
+                for host in hosts[1:]:
+                    if self.isInCleanup():
+                        return
+                    remoteArchive = '{0}/build-{1}.tar.gz'.format( self.getClientDir( host ), self.name )
+                    host.sendCommand( 'mkdir -p "{0}"'.format( self.sourceObj.remoteLocation( self, host ) ) )
+                    host.sendFile( localArchive, remoteArchive, True )
+                    res = host.sendCommand( 'tar -xzf "{0}" -C "{1}" && rm -f "{0}" && echo "OK"'.format( remoteArchive, self.sourceObj.remoteLocation( self, host ) ) )
+                    if res.splitlines()[-1:] != ["OK"]:
+                        raise Exception( "Client {0} could not unpack the build from host {1} on host {2}. Response: {3}".format( self.name, buildHost.name, host.name, res ) )
+                    self.remoteBuilds__lock.acquire()
+                    try:
+                        self.remoteBuilds[host] = True
+                    finally:
+                        self.remoteBuilds__lock.release()
+            finally:
+                shutil.rmtree( localDir )
+        except Exception as e:
+            Campaign.logger.exceptionTraceback()
+            errors.append( e )
+
     def prepareHost(self, host):
         """
         Client specific preparations on a host, irrespective of execution.
@@ -281,19 +394,25 @@ class client(coreObject):
                     host.sendCommand( 'mkdir -p "{0}/{1}"'.format( self.getClientDir(host), entry ) )
         # Make sure client is uploaded/present
         if self.isRemote:
-            if self.builder:
-                # Only say we're compiling if a builder was given
-                print "Remotely compiling client {0}".format( self.name )
-            if not self.sourceObj.prepareRemote( self, host ):
-                if self.isInCleanup():
-                    return
-                raise Exception( "The source of client {0} could not be prepared remotely on host {1}".format( self.name, host.name ) )
-            if self.isInCleanup():
-                return
-            if not self.builderObj.buildRemote( self, host ):
+            self.remoteBuilds__lock.acquire()
+            try:
+                alreadyBuilt = host in self.remoteBuilds
+            finally:
+                self.remoteBuilds__lock.release()
+            if not alreadyBuilt:
+                if self.builder:
+                    # Only say we're compiling if a builder was given
+                    print "Remotely compiling client {0}".format( self.name )
+                if not self.sourceObj.prepareRemote( self, host ):
+                    if self.isInCleanup():
+                        return
+                    raise Exception( "The source of client {0} could not be prepared remotely on host {1}".format( self.name, host.name ) )
                 if self.isInCleanup():
                     return
-                raise Exception( "A remote build of client {0} failed on host {1}".format( self.name, host.name ) )
+                if not self.builderObj.buildRemote( self, host ):
+                    if self.isInCleanup():
+                        return
+                    raise Exception( "A remote build of client {0} failed on host {1}".format( self.name, host.name ) )
             # Check and shuffle files
             if self.getBinaryLayout():
                 if self.isInCleanup():
@@ -356,6 +475,11 @@ class client(coreObject):
                 raise Exception( "Client {0} has requested profiling, but a usable /proc seems not to be available on host {1}.".format( self.name, host.name ) )
             else:
                 raise Exception( "Client {0} has requested profiling, but a strange response was received when testing availability of /proc on host {1}: {2}".format( self.name, host.name, res ) )
+            # Profile using the resource sampler of the host, falling back to a sampling loop per execution
+            if sampler.start( host, self.profileInterval ):
+                self.samplerHosts[host] = True
+            else:
+                Campaign.logger.log( "Warning: the resource sampler could not be started on host {0}, client {1} falls back to profiling every second with a shell loop per execution".format( host.name, self.name ) )
 
     def getClientDir(self, host, persistent = False):
         """
@@ -554,7 +678,13 @@ class client(coreObject):
                             print "DEBUG: Preparing execution {0} of leecher client:{4} {1} on host {2} with complex command line:\n{3}".format( execution.getNumber(), self.name, execution.host.name, complexCommandLine, self.__class__.__name__ )
                     fileObj.write( '( {0} ) &\n'.format( complexCommandLine ) )
                 print ""
-                if self.profile:
+                if self.profile and execution.host in self.samplerHosts:
+                    fileObj.write( 'myPid=$!\n' )
+                    fileObj.write( 'echo $myPid\n' )
+                    # The sampler creates the file itself, but only if it sees the process before it ends
+                    fileObj.write( ': > {0}/cpu.bin\n'.format( self.getExecutionLogDir(execution) ) )
+                    fileObj.write( '{0}\n'.format( sampler.registerCommand( execution.host, '$myPid', '{0}/cpu.bin'.format( self.getExecutionLogDir(execution) ) ) ) )
+                elif self.profile:
                     fileObj.write( 'myPid=$!\n' )
                     fileObj.write( 'echo $myPid\n' )
                     # FIXME: CLK_TCK is deprecated, but the linux kernel uses it for stats??? - needs sysconf(), really
@@ -791,7 +921,9 @@ class client(coreObject):
         @param  localLogDestination     A string that is the path to a local directory in which the logs are to be stored.
         """
         if self.getExecutionLogDir(execution):
-            if self.profile:
+            if self.profile and execution.host in self.samplerHosts:
+                execution.host.getFile( '{0}/cpu.bin'.format( self.getExecutionLogDir(execution) ), os.path.join( localLogDestination, 'cpu.bin' ) )
+            elif self.profile:
                 execution.host.getFile( '{0}/cpu.log'.format( self.getExecutionLogDir(execution) ), os.path.join( localLogDestination, 'cpu.log' ) )
             if self.logStart:
                 execution.host.getFile( '{0}/starttime.log'.format( self.getExecutionLogDir(execution) ), os.path.join( localLogDestination, 'starttime.log' ) )
@@ -808,6 +940,8 @@ class client(coreObject):
         connection = True
         if reuseConnection:
             connection = reuseConnection
+        if host in self.samplerHosts:
+            sampler.stop( host, connection )
         if host.getTestDir() and host.getPersistentTestDir():
             host.sendCommand( 'rm -rf "{0}/clients/{2}" "{0}/logs/{2}" "{1}/clients/{2}" "{1}/logs/{2}"'.format( host.getTestDir(), host.getPersistentTestDir(), self.name ), connection )
         elif host.getTestDir():
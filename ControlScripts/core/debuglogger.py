@@ -1,12 +1,20 @@
 import os
 import time
 
+from core.logwriter import logwriter
+
 class debuglogger:
-    fileObject = None       # The file to be logged to. (combined)
-    fileObjects = {}        # The files to be logged to. (separate, indexed by channel number)
+    """
+    Logs the traffic of the connections to the hosts, per channel.
+
+    Messages are written by a background core.logwriter.logwriter, so logging a message only queues it. Callers
+    that build expensive messages should check the enabled attribute first.
+    """
+    writer = None           # The logwriter writing the files
     
     separate = False
     combined = True
+    enabled = False         # True iff messages are logged at all; check this before building a message
     
     zerotime = 0
     
@@ -14,16 +22,15 @@ class debuglogger:
     
     def __init__(self, basedir = None, separate = False, combined = False):
         self.zerotime = time.time()
-        self.fileObjects = {}
         self.basedir = basedir
         self.separate = separate
         self.combined = combined
+        self.enabled = separate or combined
         if (combined or separate) and basedir == None:
             raise Exception( "Debug logging without basedir" )
         if basedir and not (combined or separate):
             raise Exception( "Debug logging without debug options" )
-        if combined:
-            self.fileObject = open( os.path.join( self.basedir, 'debug_channels' ), 'a' )
+        self.writer = logwriter()
 
     def log(self, channelnumber, msg):
         """
@@ -35,17 +42,15 @@ class debuglogger:
         @param  channelnumber   The number of the channel.
         @param  msg             The message to be logged.
         """
+        if not self.enabled:
+            return
         t = time.time() - self.zerotime
         if msg[-1:] != '\n':
             msg += '\n'
         if self.combined:
-            self.fileObject.write( '{1:012.4f} CHANNEL {0}: '.format( channelnumber, float(t) ) + msg )
-            self.fileObject.flush()
+            self.writer.write( None, os.path.join( self.basedir, 'debug_channels' ), '{1:012.4f} CHANNEL {0}: '.format( channelnumber, float(t) ) + msg )
         if self.separate:
-            if channelnumber not in self.fileObjects:
-                self.fileObjects[channelnumber] = open( os.path.join( self.basedir, 'debug_channel_{0}'.format( channelnumber ) ), 'a' )
-            self.fileObjects[channelnumber].write( '{0:012.4f}: '.format( float(t) ) + msg )
-            self.fileObjects[channelnumber].flush()
+            self.writer.write( channelnumber, os.path.join( self.basedir, 'debug_channel_{0}'.format( channelnumber ) ), '{0:012.4f}: '.format( float(t) ) + msg )
     
     def closeChannel(self, channelnumber):
         """
@@ -54,14 +59,18 @@ class debuglogger:
         @param  channelnumber   The number of the channel.
         """
         self.log( channelnumber, 'CLOSED' )
-        if self.separate and channelnumber in self.fileObjects:
-            self.fileObjects[channelnumber].close()
-            del self.fileObjects[channelnumber]
+        if self.separate:
+            self.writer.close( channelnumber )
+
+    def flush(self):
+        """
+        Waits until all logged messages have been written.
+        """
+        self.writer.flush()
     
     def cleanup(self):
-        if self.combined:
-            self.fileObject.close()
-        delset = [f for f in self.fileObjects]
-        for f in delset:
-            self.fileObjects[f].close()
+        """
+        Writes all logged messages and closes all files.
+        """
+        self.writer.stop()
             
\ No newline at end of file
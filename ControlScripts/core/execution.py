@@ -10,6 +10,7 @@ def _getDataTree(host, number, _type, files):
     Internal implementation method for getDataDirTree() (type == 'd') and getDataFileTree() (type == 'f').
     """
     l = []
+    ldict = {}
     fdict = {}
     for f in files:
         fdict[f] = 0
@@ -40,12 +41,12 @@ def _getDataTree(host, number, _type, files):
                 p = np + 1
         # Check the unicity of each element in t and build the results 
         for d in t:
-            for ed in l:
-                if ed[1] == d:
-                    if _type == 'd':
-                        raise Exception( "Duplicate relative data directory found in files for execution {0}.".format( number ) )
-                    else:
-                        raise Exception( "Duplicate relative data file found in files for execution {0}.".format( number ) )
+            if tuple(d) in ldict:
+                if _type == 'd':
+                    raise Exception( "Duplicate relative data directory found in files for execution {0}.".format( number ) )
+                else:
+                    raise Exception( "Duplicate relative data file found in files for execution {0}.".format( number ) )
+            ldict[tuple(d)] = 0
             l.append( (basedir + d, d) )
     return l
     
@@ -69,6 +70,8 @@ class execution(coreObject):
     # Yes, that's a warning below. That's OK, though.
     files = None                # The files array, consist of multiple file objects
     parsers = None              # The list of parser objects
+    liveParsers = None          # Dictionary id(parser)->list of liveParser objects of the parsers that parse this execution live
+    defaultParsers = None       # The list of default parser objects of the client, loaded once by getParsers()
 
     seeder = False              # True iff this execution is a seeder
 
@@ -113,6 +116,8 @@ class execution(coreObject):
         - number
         - runnerConnection
         - executionConnection
+        - liveParsers
+        - defaultParsers
         - parent variables
         
         @param  other          The execution object from which the values are to be copied.
@@ -304,14 +309,63 @@ class execution(coreObject):
         @param  logDir      The path to the directory on the local machine where the logs reside.
         @param  outputDir   The path to the directory on the local machine where the parsed logs are to be stored.
         """
+        for parser in self.getParsers():
+            if self.liveParsers and id(parser) in self.liveParsers:
+                # Parsed during the run: only the rest of the raw logs remains
+                for live in self.liveParsers[id(parser)]:
+                    live.finish( logDir )
+            else:
+                parser.parseLogs( self, logDir, outputDir )
+
+    def getParsers(self):
+        """
+        Returns the parsers for this execution.
+
+        These are the parsers given for the execution, or else the default parsers of the client.
+
+        @return The list of parser objects.
+        """
         # The parser loading has already been done
         if self.parsers:
-            for parser in self.parsers:
-                parser.parseLogs( self, logDir, outputDir )
-        else:
-            p = self.client.loadDefaultParsers(self)
-            for parser in p:
-                parser.parseLogs(self, logDir, outputDir)
+            return self.parsers
+        if self.defaultParsers is None:
+            self.defaultParsers = self.client.loadDefaultParsers(self)
+        return self.defaultParsers
+
+    def getLiveParsers(self, outputDir):
+        """
+        Creates the live parsers for this execution, which parse its raw logs while it runs.
+
+        After this runParsers(...) finishes the live parsers instead of running the parsers they belong to.
+
+        @param  outputDir   The path to the directory on the local machine where the parsed logs are to be stored.
+
+        @return The list of all liveParser objects for this execution.
+        """
+        self.liveParsers = {}
+        lives = []
+        for parser in self.getParsers():
+            parserLives = parser.getLiveParsers( self, outputDir )
+            if parserLives:
+                self.liveParsers[id(parser)] = parserLives
+                lives += parserLives
+        return lives
+
+    def getLiveProgress(self):
+        """
+        Returns the progress of this execution as parsed so far by its live parsers.
+
+        @return A tuple (percentage done, upload speed in KiB/s, download speed in KiB/s), or None if no live parser
+                has reported progress.
+        """
+        if not self.liveParsers:
+            return None
+        for lives in self.liveParsers.values():
+            for live in lives:
+                progress = live.getProgress()
+                if progress is not None:
+                    return progress
+        return None
 
     def getModuleType(self):
         """
@@ -431,13 +485,18 @@ class execution(coreObject):
         Campaign.logger.log("WARNING! execution.getMetaFileDirList() was used, but is treacherous and hence deprecated. Backtrace follows.")
         Campaign.logger.localTraceback()
         l = []
+        fdict = {}
+        for f in self.files:
+            fdict[f] = 0
+        ldict = {}
         for f in self.host.files:
-            if f not in self.files:
+            if f not in fdict:
                 continue
             d = f.getMetaFileDir(self.host)
             if d is not None:
-                if d not in l:
+                if d not in ldict:
                     l.append(d)
+                    ldict[d] = 0
         return l
     
     def getMetaFileList(self, required = False):
@@ -22,9 +22,6 @@ class file(coreObject):
                             # legacy format) to the actual roothash
     metaFile = None         # The meta file of the file, such as a torrent file.
 
-    onHosts = None          # Temporary list of hosts where this client will run; do not use
-    onSeedingHosts = None   # Temporary list of hosts where this client will run; do not use
-
     def __init__(self, scenario):
         """
         Initialization of a generic file object.
@@ -33,8 +30,6 @@ class file(coreObject):
         """
         coreObject.__init__(self, scenario)
         self.rootHashes = {}
-        self.onHosts = []
-        self.onSeedingHosts = []
 
     def parseSetting(self, key, value):
         """
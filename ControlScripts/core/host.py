@@ -276,6 +276,8 @@ class host(coreObject):
     files = None                # List of files that are to be used on this host. Will be filled when all executions are known.
     seedingFiles = None         # List of files that are to be seeded from this host. Will be filled when all executions are known.
 
+    platformFingerprint = None  # String identifying the kernel, architecture, libc and compiler of the remote host; collected by prepare()
+
     def __init__(self, scenario):
         """
         Initialization of a generic module object.
@@ -844,6 +846,25 @@ class host(coreObject):
                 res = self.tempDirectory
                 self.tempDirectory = None
                 raise Exception( "Could not correctly create a remote temporary directory on host {1} or could not verify it. Response: {0}\nResponse to the verification: {2}".format( res, self.name, testres ) )
+        if self.isInCleanup():
+            return
+        self.getPlatformFingerprint()
+
+    def getPlatformFingerprint(self):
+        """
+        Returns a string identifying the platform of the remote host.
+
+        Hosts with equal fingerprints are expected to be able to run each other's binaries, which allows building
+        a client once and distributing the result to all hosts with that fingerprint.
+
+        The default implementation combines the kernel release, machine architecture, libc version and the version
+        of the default C compiler. It is collected by prepare() and cached.
+
+        @return The platform fingerprint.
+        """
+        if self.platformFingerprint is None:
+            self.platformFingerprint = self.sendCommand( 'echo "$(uname -srm)|$(ldd --version 2>&1 | head -n 1)|$(cc --version 2>/dev/null | head -n 1)|$(c++ --version 2>/dev/null | head -n 1)"' ).strip()
+        return self.platformFingerprint
 
     # Indeed, PyLint, host.cleanup() has more arguments than coreObject.cleanup(). This is actually CORRECT in normal OO.
     # pylint: disable-msg=W0221
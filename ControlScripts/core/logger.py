@@ -1,26 +1,35 @@
 import os
 import traceback
 
+from core.logwriter import logwriter
+
 class logger:
-    fileObject = None       # The file to be logged to. None for stdout
+    """
+    The generic logger.
+
+    Messages for the log file are written by a background core.logwriter.logwriter; messages for the screen are
+    printed immediately.
+    """
+    fileName = None         # The path to the file to be logged to. None for stdout
+    writer = None           # The logwriter writing the log file
     
     def __init__(self):
-        pass
+        self.writer = logwriter()
 
     def log(self, msg, alwaysPrint = False):
         """
         Logs the message.
 
-        The message msg is either sent to stdout (self.fileObject is None) or to the file being logged to.
+        The message msg is either sent to stdout (self.fileName is None) or to the file being logged to.
         Newlines will be added.
 
         @param  msg             The message to be logged.
         @param  alwaysPrint     Set to True to make sure this message is printed to the screen as well as being logged.
         """
-        if self.fileObject is None or alwaysPrint:
+        if self.fileName is None or alwaysPrint:
             print msg
-        if self.fileObject:
-            self.fileObject.write( msg + '\n' )
+        if self.fileName:
+            self.writer.write( None, self.fileName, msg + '\n' )
 
     def logPre(self, msg, alwaysPrint = False):
         """
@@ -29,10 +38,10 @@ class logger:
         @param  msg             The message to be logged, which includes any needed newlines.
         @param  alwaysPrint     Set to True to make sure this message is printed to the screen as well as being logged.
         """
-        if self.fileObject is None or alwaysPrint:
+        if self.fileName is None or alwaysPrint:
             print msg,
-        if self.fileObject:
-            self.fileObject.write( msg )
+        if self.fileName:
+            self.writer.write( None, self.fileName, msg )
 
     def logToFile(self, pathname):
         """
@@ -46,18 +55,25 @@ class logger:
         self.closeLogFile()
         if os.path.exists( pathname ) and not os.path.isfile( pathname ):
             raise Exception( 'Logging to "{0}" requested, but that already exists and is not a file' )
-        self.fileObject = open( pathname, 'a', 0 )
+        # Fail right away if the file can't be written, rather than in the background
+        open( pathname, 'a' ).close()
+        self.fileName = pathname
 
     def closeLogFile(self):
         """
         Reset the logger to stdout logging.
+
+        All messages logged so far are written to the log file before it is closed.
+        """
+        if not self.fileName is None:
+            self.writer.stop()
+            self.fileName = None
+
+    def flush(self):
+        """
+        Waits until all messages logged so far have been written to the log file.
         """
-        if not self.fileObject is None:
-            try:
-                self.fileObject.close()
-            except IOError:
-                pass    # Ignore IOError on closing
-            self.fileObject = None
+        self.writer.flush()
 
     def loggingToFile(self):
         """
@@ -65,7 +81,7 @@ class logger:
         
         @return True iff a file is being used for logging.
         """
-        return not self.fileObject is None
+        return not self.fileName is None
 
     def exceptionTraceback(self, alwaysPrint = False):
         """
@@ -0,0 +1,204 @@
+import time
+import atexit
+import threading
+import Queue
+
+# The maximum number of queued messages written in one batch
+BATCH_SIZE = 4096
+
+# The logwriter objects that have been started and not yet stopped, see flushAll()
+_writers = []
+_writers__lock = threading.Lock()
+
+def flushAll( timeout = None ):
+    """
+    Writes all queued messages of all running logwriter objects to their files.
+
+    This is called at exit and should be called from signal handlers, so no diagnostics are lost.
+
+    @param  timeout     The maximum number of seconds to wait for each logwriter, None to wait until done.
+    """
+    _writers__lock.acquire()
+    try:
+        writers = list(_writers)
+    finally:
+        _writers__lock.release()
+    for writer in writers:
+        writer.flush( timeout )
+
+atexit.register( flushAll )
+
+class logwriter:
+    """
+    Writes log messages to files from a background thread.
+
+    Callers only queue their messages, so logging never waits for the disk. The background thread takes all
+    queued messages at once and writes them with a single write per file, after which the files are flushed.
+    Messages for the same file are written in the order in which they were queued.
+
+    The thread is started on first use. Use flush() to wait until all queued messages have been written and
+    stop() to close all files.
+    """
+
+    queue = None            # The queue of (key, path, data) tuples to write; data is None to close the file of key
+    thread = None           # The background thread, None if not started
+    files = None            # Dictionary key->file object of the open files; only used by the background thread
+    thread__lock = None     # Lock object to guard starting and stopping the thread
+
+    def __init__(self):
+        self.queue = Queue.Queue()
+        self.files = {}
+        self.thread__lock = threading.Lock()
+
+    def write(self, key, path, data):
+        """
+        Queues data to be appended to a file.
+
+        @param  key     The key identifying the file, e.g. a channel number.
+        @param  path    The path to the file, which is opened for appending when the key is first used.
+        @param  data    The string to write.
+        """
+        if not self.thread:
+            self.start()
+        self.queue.put( (key, path, data) )
+
+    def close(self, key):
+        """
+        Queues closing the file identified by key, after all data queued for it has been written.
+
+        @param  key     The key identifying the file.
+        """
+        if self.thread:
+            self.queue.put( (key, None, None) )
+
+    def flush(self, timeout = None):
+        """
+        Waits until all queued messages have been written and flushed.
+
+        This polls instead of using Queue.join(), so it is safe to call from a signal handler that interrupted a
+        thread while it was queueing a message.
+
+        @param  timeout     The maximum number of seconds to wait, None to wait until done.
+        """
+        if not self.thread:
+            return
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        while self.queue.unfinished_tasks > 0 and self.thread.is_alive():
+            if deadline is not None and time.time() > deadline:
+                return
+            time.sleep( 0.01 )
+
+    def start(self):
+        """
+        Starts the background thread, if it is not running yet.
+        """
+        self.thread__lock.acquire()
+        try:
+            if self.thread:
+                return
+            self.thread = threading.Thread( target = self.run, name = 'logwriter' )
+            # The thread must never keep the framework alive; flushAll() is called at exit instead
+            self.thread.daemon = True
+            self.thread.start()
+        finally:
+            self.thread__lock.release()
+        _writers__lock.acquire()
+        try:
+            _writers.append( self )
+        finally:
+            _writers__lock.release()
+
+    def stop(self):
+        """
+        Writes all queued messages, closes all files and stops the background thread.
+
+        The logwriter can be used again afterwards; the thread is restarted when needed.
+        """
+        self.thread__lock.acquire()
+        try:
+            if not self.thread:
+                return
+            self.queue.put( None )
+            self.thread.join()
+            self.thread = None
+        finally:
+            self.thread__lock.release()
+        _writers__lock.acquire()
+        try:
+            if self in _writers:
+                _writers.remove( self )
+        finally:
+            _writers__lock.release()
+
+    def run(self):
+        """
+        The main loop of the background thread.
+        """
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            try:
+                while len(batch) < BATCH_SIZE:
+                    batch.append( self.queue.get_nowait() )
+            except Queue.Empty:
+                pass
+            # Collect the data per file, keeping the order of messages and closes per file
+            pending = {}
+            order = []
+            for item in batch:
+                if item is None:
+                    stopping = True
+                    continue
+                key, path, data = item
+                if data is None:
+                    self.writePending( key, pending, order )
+                    if key in self.files:
+                        self.closeFile( key )
+                    continue
+                if key not in pending:
+                    pending[key] = ( path, [] )
+                    order.append( key )
+                pending[key][1].append( data )
+            for key in list(order):
+                self.writePending( key, pending, order )
+            if stopping:
+                for key in self.files.keys():
+                    self.closeFile( key )
+            for _ in batch:
+                self.queue.task_done()
+
+    def writePending(self, key, pending, order):
+        """
+        Writes the collected data for a file in one write and flushes it. Used by the background thread.
+
+        @param  key         The key identifying the file.
+        @param  pending     Dictionary key->(path, list of strings) with the collected data.
+        @param  order       The list of keys in pending, in order of first use.
+        """
+        if key not in pending:
+            return
+        path, data = pending[key]
+        del pending[key]
+        order.remove( key )
+        try:
+            if key not in self.files:
+                self.files[key] = open( path, 'a' )
+            self.files[key].write( ''.join( data ) )
+            self.files[key].flush()
+        except IOError as exc:
+            # There is nowhere left to log this to but the console
+            print "Could not write to log file {0}: {1}".format( path, exc )
+
+    def closeFile(self, key):
+        """
+        Closes the file identified by key. Used by the background thread.
+
+        @param  key     The key identifying the file.
+        """
+        try:
+            self.files[key].close()
+        except IOError:
+            pass    # Ignore IOError on closing
+        del self.files[key]
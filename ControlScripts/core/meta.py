@@ -1,6 +1,7 @@
 import os
 import math
 import hashlib
+import multiprocessing
 
 import external.bencode
 
@@ -17,29 +18,334 @@ def buildFileList( path, subdirs = [] ):
         return reduce(lambda x,y: x+y, map(lambda x: buildFileList(path, subdirs+[x]), os.listdir(fullpath)))
 # pylint: enable-msg=W0102,W0142,W0141
 
-def buildPieces( path, fileList_, blocksize ):
-    fileList = list(fileList_)
-    pieces = ''
-    leftToRead = blocksize
-    h = hashlib.new( 'sha1' )
-    f = None
-    while len(fileList) > 0:
-        if not f:
-            f = open(os.path.join(path, *(fileList.pop(0)['path'])))
-        while f:
-            data = f.read( leftToRead )
-            h.update( data )
-            leftToRead -= len(data)
-            if leftToRead == 0:
-                pieces += h.digest()
-                h = hashlib.new( 'sha1' )
-                leftToRead = blocksize
+# Inputs smaller than this many bytes are always hashed in-process; starting workers costs more than it gains
+PARALLEL_PIECES_MINSIZE = 64 * 1024 * 1024
+
+def _hashPieceRange( args ):
+    """
+    Hashes a range of pieces of the concatenated data of the files in a torrent.
+
+    Worker function for buildPieces(...). The range may start and end anywhere in any file and cross file
+    boundaries.
+
+    @param  args    Tuple (path, fileList_, blocksize, firstPiece, lastPiece): the arguments to buildPieces(...)
+                    and the range of pieces [firstPiece, lastPiece) to hash.
+
+    @return Tuple (firstPiece, pieces) with pieces the concatenated hashes of the range.
+    """
+    path, fileList_, blocksize, firstPiece, lastPiece = args
+    hasher = pieceHasher( blocksize )
+    start = firstPiece * blocksize
+    end = lastPiece * blocksize
+    fileStart = 0
+    for fileEntry in fileList_:
+        fileEnd = fileStart + fileEntry['length']
+        if fileEnd > start and fileStart < end:
+            f = open(os.path.join(path, *(fileEntry['path'])), 'rb')
+            f.seek( max( start - fileStart, 0 ) )
+            left = min( fileEnd, end ) - max( fileStart, start )
+            while left > 0:
+                data = f.read( min( left, blocksize ) )
+                if data == '':
+                    raise Exception( "File {0} is shorter than expected".format( os.path.join(path, *(fileEntry['path'])) ) )
+                hasher.update( data )
+                left -= len(data)
+            f.close()
+        fileStart = fileEnd
+        if fileStart >= end:
+            break
+    return (firstPiece, hasher.digest())
+
+def buildPieces( path, fileList_, blocksize, workers = None ):
+    """
+    Calculates the pieces string of a torrent.
+
+    Large inputs are split into ranges of pieces that are hashed in parallel by worker processes.
+
+    @param  path        The file or the root directory of the torrent.
+    @param  fileList_   The list of files in the torrent, as returned by buildFileList(...); the files
+                        are concatenated in this order.
+    @param  blocksize   The piece length in bytes.
+    @param  workers     The number of worker processes. None to use one per CPU; 1 to hash in-process.
+
+    @return The concatenated binary SHA1 hashes of all pieces.
+    """
+    totalSize = sum( [fileEntry['length'] for fileEntry in fileList_] )
+    pieceCount = ( totalSize + blocksize - 1 ) // blocksize
+    if workers is None:
+        try:
+            workers = multiprocessing.cpu_count()
+        except NotImplementedError:
+            workers = 1
+    workers = min( workers, pieceCount )
+    if workers < 2 or totalSize < PARALLEL_PIECES_MINSIZE:
+        return _hashPieceRange( (path, fileList_, blocksize, 0, pieceCount) )[1]
+    # A few ranges per worker to even out the load, but no range below 16MB so each worker reads sequentially for a while
+    rangePieces = max( ( 16 * 1024 * 1024 ) // blocksize, 1, ( pieceCount + workers * 4 - 1 ) // ( workers * 4 ) )
+    jobs = [(path, fileList_, blocksize, first, min( first + rangePieces, pieceCount )) for first in range( 0, pieceCount, rangePieces )]
+    pieces = bytearray( pieceCount * 20 )
+    pool = multiprocessing.Pool( workers )
+    try:
+        for (firstPiece, rangeHashes) in pool.imap_unordered( _hashPieceRange, jobs ):
+            pieces[firstPiece * 20:firstPiece * 20 + len(rangeHashes)] = rangeHashes
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return str(pieces)
+
+class pieceHasher:
+    """
+    Incremental calculation of the pieces string of a torrent.
+
+    Feed the concatenated data of all files in the torrent to update(...) in
+    chunks of any size, then call digest() to get the pieces string.
+    """
+
+    blocksize = None        # The piece length in bytes
+    pieces = None           # List of SHA1 digests of the completed pieces
+    h = None                # SHA1 object for the current piece
+    leftToRead = None       # Number of bytes still needed to complete the current piece
+
+    def __init__(self, blocksize):
+        """
+        Initialize the hasher.
+
+        @param  blocksize   The piece length in bytes.
+        """
+        self.blocksize = blocksize
+        self.pieces = []
+        self.h = hashlib.new( 'sha1' )
+        self.leftToRead = blocksize
+
+    def update(self, data):
+        """
+        Add data to the hasher.
+
+        @param  data        A string with the next bytes of the torrent data.
+        """
+        offset = 0
+        dataLen = len(data)
+        while dataLen - offset >= self.leftToRead:
+            self.h.update( buffer( data, offset, self.leftToRead ) )
+            offset += self.leftToRead
+            self.pieces.append( self.h.digest() )
+            self.h = hashlib.new( 'sha1' )
+            self.leftToRead = self.blocksize
+        if offset < dataLen:
+            self.h.update( buffer( data, offset ) )
+            self.leftToRead -= dataLen - offset
+
+    def digest(self):
+        """
+        Returns the pieces string for all data fed so far, including the last partial piece.
+
+        @return The concatenated binary SHA1 hashes of all pieces.
+        """
+        if self.leftToRead < self.blocksize:
+            return ''.join( self.pieces ) + self.h.digest()
+        return ''.join( self.pieces )
+
+class merkleHasher:
+    """
+    Incremental calculation of a Merkle root hash.
+
+    Feed the data of the file to update(...) in chunks of any size, then call
+    digest() to get the root hash. See meta.calculateMerkleRootHash(...) for a
+    description of the hash tree.
+    """
+
+    maxLevel = None         # The highest level in the hash tree
+    chunksize = None        # The size of a leaf chunk in bytes
+    hashes = None           # Map of level to pending left hash on that level, or None
+    h = None                # SHA1 object for the current leaf chunk
+    leftToRead = None       # Number of bytes still needed to complete the current leaf chunk
+
+    def __init__(self, size, compact = False, blocksize = 1):
+        """
+        Initialize the hasher.
+
+        @param  size        The total size of the data in bytes. Only used for compact hashes.
+        @param  compact     True iff the compact hash calculation is to be used.
+        @param  blocksize   The blocksize to use in kilobytes (default: 1).
+        """
+        if not isinstance( blocksize, int ):
+            raise TypeError( "blocksize must be an int" )
+        if blocksize < 1:
+            raise ValueError( "blocksize must be > 0" )
+
+        if compact:
+            chunks = math.ceil( size / ( 1024.0 * blocksize ) )
+            maxLevel = 0
+            while maxLevel < 64 and 2**maxLevel < chunks:
+                maxLevel += 1
+            if maxLevel > 63:
+                raise Exception( "files of size greater than {0}KB can't be hashed with blocksize {1}KB".format( ( 2**63 * blocksize ), blocksize ) )
+        else:
+            maxLevel = 63
+        self.maxLevel = maxLevel
+        self.chunksize = 1024 * blocksize
+        self.hashes = {}
+        for a in range( 0, maxLevel + 1 ):
+            self.hashes[a] = None
+        self.h = None
+        self.leftToRead = self.chunksize
+
+    def _addLeaf(self, h):
+        """
+        Adds the hash of a leaf chunk to the tree.
+
+        @param  h           The binary SHA1 hash of the leaf chunk.
+        """
+        hashes = self.hashes
+        for a in range( 0, self.maxLevel + 1 ):
+            if not hashes[a]:
+                hashes[a] = h
+                break
+            else:
+                h2 = hashlib.new( 'sha1' )
+                h2.update( hashes[a] )
+                h2.update( h )
+                h = h2.digest()
+                hashes[a] = None
+
+    def update(self, data):
+        """
+        Add data to the hasher.
+
+        @param  data        A string with the next bytes of the file.
+        """
+        offset = 0
+        dataLen = len(data)
+        while dataLen - offset >= self.leftToRead:
+            if self.h:
+                self.h.update( buffer( data, offset, self.leftToRead ) )
+            else:
+                self.h = hashlib.new( 'sha1', buffer( data, offset, self.leftToRead ) )
+            offset += self.leftToRead
+            self._addLeaf( self.h.digest() )
+            self.h = None
+            self.leftToRead = self.chunksize
+        if offset < dataLen:
+            if not self.h:
+                self.h = hashlib.new( 'sha1' )
+            self.h.update( buffer( data, offset ) )
+            self.leftToRead -= dataLen - offset
+
+    def digest(self):
+        """
+        Returns the root hash for all data fed so far.
+
+        A trailing partial leaf chunk is hashed as is. The hasher should not be updated after this.
+
+        @return The binary string containing the root hash, which is an SHA1 hash.
+        """
+        if self.h:
+            self._addLeaf( self.h.digest() )
+            self.h = None
+            self.leftToRead = self.chunksize
+
+        hashes = self.hashes
+        maxLevel = self.maxLevel
+        h = ZERO
+        index = 0
+        while index <= maxLevel and not hashes[index]:
+            index += 1
+
+        if index == maxLevel:
+            return hashes[maxLevel]
+
+        while index < maxLevel:
+            h2 = hashlib.new( 'sha1' )
+            if not hashes[index]:
+                h2.update( h )
+                h2.update( ZERO )
             else:
-                f.close()
-                f = None
-    if leftToRead > 0 and leftToRead < blocksize:
-        pieces += h.digest()
-    return pieces
+                h2.update( hashes[index] )
+                h2.update( h )
+            h = h2.digest()
+            index += 1
+
+        return h
+
+def buildTorrent( announce, nodes, httpSeeds, URIList, private, multiFile ):
+    """
+    Builds the torrent dictionary without the info dictionary.
+
+    See meta.generateTorrentFile(...) for the parameters.
+
+    @return The torrent dictionary.
+    """
+    torrent = {'encoding': 'UTF-8'}
+    if announce == '' or len( announce ) < 1:
+        announce = None
+    trackerless = False
+    if announce:
+        if isinstance( announce, list ):
+            oneAnnounce = None
+            for announceTier in announce:
+                if not isinstance( announceTier, list ):
+                    raise TypeError( "If announce is given a list, it must be a list of lists of announce URIs." )
+                if len( announceTier ) < 1:
+                    raise ValueError( "No sublists of the announce list may be empty." )
+                for announceURI in announceTier:
+                    if not isinstance( announceURI, basestring ):
+                        raise TypeError( "Announce may be None, an URI string or a list of lists of URI strings." )
+                    if not oneAnnounce:
+                        oneAnnounce = announceURI
+            torrent['announce'] = oneAnnounce
+            torrent['announce-list'] = announce
+        elif not isinstance( announce, basestring ):
+            raise TypeError( "Announce may be None, an URI string or a list of lists of URI strings." )
+        else:
+            torrent['announce'] = announce
+    else:
+        trackerless = True
+    if private:
+        torrent['private'] = 1
+    if nodes and len(nodes) < 1:
+        nodes = None
+    if nodes:
+        if not isinstance( nodes, list ):
+            raise TypeError( "Nodes is either None or a list or ['hostaddress', portnumber] items." )
+        for node in nodes:
+            if not isinstance( node, list ) or not isinstance( node[0], basestring ) or not isinstance( node[1], int ) or not len( node ) == 2:
+                raise TypeError( "Nodes is either None or a list or ['hostaddress', portnumber] items." )
+        torrent['nodes'] = nodes
+    elif trackerless:
+        raise ValueError( "A torrent needs either an announce or a list of nodes." )
+    if httpSeeds and len(httpSeeds) < 1:
+        httpSeeds = None
+    if httpSeeds:
+        if not isinstance( httpSeeds, list ):
+            raise TypeError( "httpSeeds is either None or a list of strings with HTTP seeding script URIs." )
+        for seed in httpSeeds:
+            if not isinstance( seed, basestring ):
+                raise TypeError( "httpSeeds is either None or a list of strings with HTTP seeding script URIs." )
+        torrent['httpseeds'] = httpSeeds
+    if URIList and len(URIList) < 1:
+        URIList = None
+    if URIList:
+        if not isinstance( URIList, list ):
+            raise TypeError( "URIList is either None or a list of strings with HTTP or FTP URIs." )
+        for URI in URIList:
+            if not isinstance( URI, basestring ):
+                raise TypeError( "URIList is either None or a list of strings with HTTP or FTP URIs." )
+            if multiFile and URI[-1:] != '/':
+                URI += '/'
+        torrent['url-list'] = URIList
+    return torrent
+
+def writeTorrent( torrent, torrentPath ):
+    """
+    Bencodes a torrent dictionary and writes it to torrentPath.
+    """
+    torrentFileContent = external.bencode.bencode( torrent )
+    f = open( torrentPath, 'w' )
+    f.write( torrentFileContent )
+    f.close()
 
 class meta:
     """
@@ -113,65 +419,17 @@ class meta:
         if not os.path.isfile( path ):
             raise ValueError( "path must point to a file" )
 
-        if compact:
-            st = os.stat( path )
-            size = math.ceil( st.st_size / ( 1024.0 * blocksize ) )
-            maxLevel = 0
-            while maxLevel < 64 and 2**maxLevel < size:
-                maxLevel += 1
-            if maxLevel > 63:
-                raise Exception( "files of size greater than {0}KB can't be hashed with blocksize {1}KB".format( ( 2**63 * blocksize ), blocksize ) )
-        else:
-            maxLevel = 63
-
-        hashes = {}
-        for a in range( 0, maxLevel + 1 ):
-            hashes[a] = None
-
+        hasher = merkleHasher( os.stat( path ).st_size, compact, blocksize )
         f = open( path, 'r' )
         data = f.read( 1024 * blocksize )
         while data != '':
-            h = hashlib.new( 'sha1' ) 
-            h.update( data )
-            h = h.digest()
-
-            for a in range( 0, maxLevel + 1 ):
-                if not hashes[a]:
-                    hashes[a] = h
-                    break
-                else:
-                    h2 = hashlib.new( 'sha1' )
-                    h2.update( hashes[a] )
-                    h2.update( h )
-                    h = h2.digest()
-                    hashes[a] = None
-                    del h2
+            hasher.update( data )
             data = f.read( 1024 * blocksize )
         f.close()
-
-        h = ZERO
-        index = 0
-        while index <= maxLevel and not hashes[index]:
-            index += 1
-
-        if index == maxLevel:
-            return hashes[maxLevel]
-
-        while index < maxLevel:
-            h2 = hashlib.new( 'sha1' )
-            if not hashes[index]:
-                h2.update( h )
-                h2.update( ZERO )
-            else:
-                h2.update( hashes[index] )
-                h2.update( h )
-            h = h2.digest()
-            index += 1
-
-        return h
+        return hasher.digest()
 
     @staticmethod
-    def generateTorrentFile( path, torrentPath, blocksize = 1024 * 1024, name = None, announce = 'http://127.0.0.1/announce', nodes = None, httpSeeds = None, URIList = None, private = False ):
+    def generateTorrentFile( path, torrentPath, blocksize = 1024 * 1024, name = None, announce = 'http://127.0.0.1/announce', nodes = None, httpSeeds = None, URIList = None, private = False, pieces = None ):
         """
         Creates a .torrent file for the given path.
 
@@ -214,6 +472,8 @@ class meta:
         @param  httpSeeds   A list of HTTP seed scripts, or None.
         @param  URIList     A list of HTTP or FTP URIs for extra seeds, or None.
         @param  private     True for a private torrent.
+        @param  pieces      The pieces string for the data at path with this blocksize, as returned by
+                            buildPieces(...), to skip hashing the data. None to hash the data.
         """
         # A torrent file is just a bencoded dictionary.
         #
@@ -270,65 +530,8 @@ class meta:
         if os.path.exists( torrentPath ) and os.path.isdir( torrentPath ):
             raise ValueError( "{0} is a directory".format( torrentPath ) )
 
-        torrent = {'encoding': 'UTF-8'}
         multiFile = os.path.isdir( path )
-        if announce == '' or len( announce ) < 1:
-            announce = None
-        trackerless = False
-        if announce:
-            if isinstance( announce, list ):
-                oneAnnounce = None
-                for announceTier in announce:
-                    if not isinstance( announceTier, list ):
-                        raise TypeError( "If announce is given a list, it must be a list of lists of announce URIs." )
-                    if len( announceTier ) < 1:
-                        raise ValueError( "No sublists of the announce list may be empty." )
-                    for announceURI in announceTier:
-                        if not isinstance( announceURI, basestring ):
-                            raise TypeError( "Announce may be None, an URI string or a list of lists of URI strings." )
-                        if not oneAnnounce:
-                            oneAnnounce = announceURI
-                torrent['announce'] = oneAnnounce
-                torrent['announce-list'] = announce
-            elif not isinstance( announce, basestring ):
-                raise TypeError( "Announce may be None, an URI string or a list of lists of URI strings." )
-            else:
-                torrent['announce'] = announce
-        else:
-            trackerless = True
-        if private:
-            torrent['private'] = 1
-        if nodes and len(nodes) < 1:
-            nodes = None
-        if nodes:
-            if not isinstance( nodes, list ):
-                raise TypeError( "Nodes is either None or a list or ['hostaddress', portnumber] items." )
-            for node in nodes:
-                if not isinstance( node, list ) or not isinstance( node[0], basestring ) or not isinstance( node[1], int ) or not len( node ) == 2:
-                    raise TypeError( "Nodes is either None or a list or ['hostaddress', portnumber] items." )
-            torrent['nodes'] = nodes
-        elif trackerless:
-            raise ValueError( "A torrent needs either an announce or a list of nodes." )
-        if httpSeeds and len(httpSeeds) < 1:
-            httpSeeds = None
-        if httpSeeds:
-            if not isinstance( httpSeeds, list ):
-                raise TypeError( "httpSeeds is either None or a list of strings with HTTP seeding script URIs." )
-            for seed in httpSeeds:
-                if not isinstance( seed, basestring ):
-                    raise TypeError( "httpSeeds is either None or a list of strings with HTTP seeding script URIs." )
-            torrent['httpseeds'] = httpSeeds
-        if URIList and len(URIList) < 1:
-            URIList = None
-        if URIList:
-            if not isinstance( URIList, list ):
-                raise TypeError( "URIList is either None or a list of strings with HTTP or FTP URIs." )
-            for URI in URIList:
-                if not isinstance( URI, basestring ):
-                    raise TypeError( "URIList is either None or a list of strings with HTTP or FTP URIs." )
-                if multiFile and URI[-1:] != '/':
-                    URI += '/'
-            torrent['url-list'] = URIList
+        torrent = buildTorrent( announce, nodes, httpSeeds, URIList, private, multiFile )
         infodict = {}
         if name:
             if not isinstance( name, basestring ):
@@ -345,16 +548,49 @@ class meta:
         if os.path.isfile( path ):
             st = os.stat( path )
             infodict['length'] = st.st_size
-            infodict['pieces'] = buildPieces( path, [{'length': st.st_size, 'path': []}], blocksize )
+            if pieces is None:
+                pieces = buildPieces( path, [{'length': st.st_size, 'path': []}], blocksize )
         else:
             infodict['files'] = buildFileList( path )
-            infodict['pieces'] = buildPieces( path, infodict['files'], blocksize )
+            if pieces is None:
+                pieces = buildPieces( path, infodict['files'], blocksize )
+        infodict['pieces'] = pieces
         torrent['info'] = infodict
 
-        torrentFileContent = external.bencode.bencode( torrent )
-        f = open( torrentPath, 'w' )
-        f.write( torrentFileContent )
-        f.close()
+        writeTorrent( torrent, torrentPath )
+
+    @staticmethod
+    def generateTorrentFileFromPieces( name, length, pieces, torrentPath, blocksize = 1024 * 1024, announce = 'http://127.0.0.1/announce', nodes = None, httpSeeds = None, URIList = None, private = False ):
+        """
+        Creates a single file .torrent file from precalculated pieces.
+
+        This allows creating torrents for data that is never written to disk, such as
+        generated data fed to a pieceHasher. The result is identical to what
+        generateTorrentFile(...) would create for a file with that name and data.
+
+        @param  name        The suggested name for saving the file.
+        @param  length      The size of the file in bytes.
+        @param  pieces      The pieces string, e.g. from pieceHasher.digest().
+        @param  torrentPath The file to save the torrent file to. Either an existing file
+                            or one that can be created. The file will be overwritten.
+        @param  blocksize   The chunk size for the torrent, which must match the one used
+                            to calculate pieces. Default: 1MB.
+
+        See generateTorrentFile(...) for the other parameters.
+        """
+        if os.path.exists( torrentPath ) and os.path.isdir( torrentPath ):
+            raise ValueError( "{0} is a directory".format( torrentPath ) )
+        if not isinstance( name, basestring ) or name == '':
+            raise TypeError( "name must be a non-empty string." )
+        if not isinstance( blocksize, int ) or blocksize < 1:
+            raise ValueError( "blocksize must be a positive integer" )
+        if len( pieces ) != 20 * ( ( length + blocksize - 1 ) // blocksize ):
+            raise ValueError( "pieces does not match a file of {0} bytes with blocksize {1}".format( length, blocksize ) )
+
+        torrent = buildTorrent( announce, nodes, httpSeeds, URIList, private, False )
+        torrent['info'] = {'name': name, 'piece length': blocksize, 'length': length, 'pieces': pieces}
+
+        writeTorrent( torrent, torrentPath )
 
     @staticmethod
     def APIVersion():
@@ -0,0 +1,196 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+
+from core.campaign import Campaign
+import core.meta
+from core.meta import meta
+
+# Default limit on the total size of the values kept in the cache, in bytes
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+def fileIdentity( path ):
+    """
+    Returns a string identifying the current state of a file or directory.
+
+    For a file the identity consists of its absolute path, size, mtime and inode. For a directory it is a hash over
+    the identities of all files in it, so any change to any of those files changes the identity of the directory.
+
+    @param  path    The path to the file or directory.
+
+    @return The identity string.
+    """
+    path = os.path.abspath( path )
+    if os.path.isfile( path ):
+        st = os.stat( path )
+        return '{0}|{1}|{2!r}|{3}'.format( path, st.st_size, st.st_mtime, st.st_ino )
+    h = hashlib.new( 'sha1' )
+    for root, dirs, files in os.walk( path ):
+        dirs.sort()
+        for f in sorted( files ):
+            st = os.stat( os.path.join( root, f ) )
+            h.update( '{0}|{1}|{2!r}|{3}\n'.format( os.path.relpath( os.path.join( root, f ), path ), st.st_size, st.st_mtime, st.st_ino ) )
+    return '{0}|dir|{1}'.format( path, h.hexdigest() )
+
+class metacache:
+    """
+    A persistent cache for meta data of local files, such as root hashes and torrents.
+
+    The cache is an sqlite database, by default in the 'meta' cache directory (see Campaign.getCacheDir(...)),
+    so it is kept across campaigns. Entries are keyed by the identity of the file (see fileIdentity(...)) and
+    the parameters of the meta data, so changing a file invalidates its entries. Campaigns running in parallel
+    may share the database: sqlite locks it for each write. When the total size of the cached values exceeds
+    the maximum size the least recently used entries are evicted.
+
+    Use metacache.getCache() to get the shared instance.
+    """
+
+    path = None                 # The path to the sqlite database
+    maxSize = None              # The maximum total size of all cached values in bytes
+    connection = None           # The sqlite connection
+    connection__lock = None     # Lock guarding the connection
+
+    instance = None             # The shared instance, see getCache()
+    instance__lock = threading.Lock()
+
+    def __init__(self, path = None, maxSize = DEFAULT_MAX_SIZE):
+        """
+        Opens the cache, creating it if needed.
+
+        @param  path        The path to the sqlite database, None for the default location.
+        @param  maxSize     The maximum total size of all cached values in bytes.
+        """
+        if not path:
+            path = os.path.join( Campaign.getCacheDir( 'meta' ), 'metacache.sqlite' )
+        self.path = path
+        self.maxSize = maxSize
+        self.connection__lock = threading.Lock()
+        # Transactions are handled explicitly: BEGIN IMMEDIATE takes the write lock up front, so parallel campaigns just wait
+        self.connection = sqlite3.connect( path, timeout = 300, isolation_level = None, check_same_thread = False )
+        self.connection.text_factory = str
+        self.connection.execute( 'CREATE TABLE IF NOT EXISTS entries ( key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, lastUsed REAL NOT NULL )' )
+        self.connection.execute( 'CREATE INDEX IF NOT EXISTS entriesLastUsed ON entries ( lastUsed )' )
+
+    @staticmethod
+    def getCache():
+        """
+        Returns the shared cache instance, opening it on first use.
+
+        @return The shared metacache object.
+        """
+        metacache.instance__lock.acquire()
+        try:
+            if not metacache.instance:
+                metacache.instance = metacache()
+            return metacache.instance
+        finally:
+            metacache.instance__lock.release()
+
+    def get(self, key):
+        """
+        Returns a cached value and marks it as recently used.
+
+        @param  key     The key of the value.
+
+        @return The cached string, or None if it is not cached.
+        """
+        self.connection__lock.acquire()
+        try:
+            row = self.connection.execute( 'SELECT value FROM entries WHERE key = ?', (key,) ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute( 'UPDATE entries SET lastUsed = ? WHERE key = ?', (time.time(), key) )
+            return str(row[0])
+        finally:
+            self.connection__lock.release()
+
+    def put(self, key, value):
+        """
+        Stores a value in the cache, evicting the least recently used entries if the cache grows too large.
+
+        @param  key     The key of the value.
+        @param  value   The string to store.
+        """
+        self.connection__lock.acquire()
+        try:
+            self.connection.execute( 'BEGIN IMMEDIATE' )
+            try:
+                self.connection.execute( 'INSERT OR REPLACE INTO entries ( key, value, size, lastUsed ) VALUES ( ?, ?, ?, ? )', (key, sqlite3.Binary( value ), len(value), time.time()) )
+                total = self.connection.execute( 'SELECT SUM(size) FROM entries' ).fetchone()[0]
+                if total > self.maxSize:
+                    evicted = 0
+                    for (oldKey, size) in self.connection.execute( 'SELECT key, size FROM entries WHERE key != ? ORDER BY lastUsed', (key,) ).fetchall():
+                        if total <= self.maxSize:
+                            break
+                        self.connection.execute( 'DELETE FROM entries WHERE key = ?', (oldKey,) )
+                        total -= size
+                        evicted += 1
+                    Campaign.logger.log( "Evicted {0} entries from meta data cache {1}".format( evicted, self.path ) )
+                self.connection.execute( 'COMMIT' )
+            except:
+                self.connection.execute( 'ROLLBACK' )
+                raise
+        finally:
+            self.connection__lock.release()
+
+    def calculateMerkleRootHash(self, path, compact = False, blocksize = 1):
+        """
+        Returns the Merkle root hash for a file, from the cache if possible.
+
+        See core.meta.meta.calculateMerkleRootHash(...) for the parameters.
+
+        @return The binary string containing the root hash.
+        """
+        key = 'roothash|{0}|{1}|{2}'.format( fileIdentity( path ), compact, blocksize )
+        rootHash = self.get( key )
+        if rootHash is None:
+            rootHash = meta.calculateMerkleRootHash( path, compact, blocksize )
+            self.put( key, rootHash )
+        return rootHash
+
+    def buildPieces(self, path, blocksize):
+        """
+        Returns the torrent pieces string for a file or directory, from the cache if possible.
+
+        @param  path        The file or directory.
+        @param  blocksize   The piece length in bytes.
+
+        @return The pieces string as used by core.meta.meta.generateTorrentFile(...).
+        """
+        key = 'pieces|{0}|{1}'.format( fileIdentity( path ), blocksize )
+        pieces = self.get( key )
+        if pieces is None:
+            if os.path.isfile( path ):
+                pieces = core.meta.buildPieces( path, [{'length': os.stat( path ).st_size, 'path': []}], blocksize )
+            else:
+                pieces = core.meta.buildPieces( path, core.meta.buildFileList( path ), blocksize )
+            self.put( key, pieces )
+        return pieces
+
+    def generateTorrentFile(self, path, torrentPath, blocksize = 1024 * 1024, name = None, announce = 'http://127.0.0.1/announce', nodes = None, httpSeeds = None, URIList = None, private = False ):
+        """
+        Creates a .torrent file for the given path, from the cache if possible.
+
+        A cached torrent is only used if all parameters are equal. Otherwise the cached pieces, if any, are used
+        to create the torrent without hashing the data again.
+
+        See core.meta.meta.generateTorrentFile(...) for the parameters.
+        """
+        key = 'torrent|{0}|{1!r}'.format( fileIdentity( path ), (blocksize, name, announce, nodes, httpSeeds, URIList, private) )
+        torrent = self.get( key )
+        if torrent is None:
+            pieces = self.buildPieces( path, blocksize )
+            meta.generateTorrentFile( path, torrentPath, blocksize, name, announce, nodes, httpSeeds, URIList, private, pieces )
+            f = open( torrentPath, 'rb' )
+            self.put( key, f.read() )
+            f.close()
+        else:
+            f = open( torrentPath, 'wb' )
+            f.write( torrent )
+            f.close()
+
+    @staticmethod
+    def APIVersion():
+        return "2.4.0-core"
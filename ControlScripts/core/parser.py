@@ -1,3 +1,10 @@
+import os
+import sys
+import mmap
+import array
+import struct
+import tempfile
+
 from core.parsing import isValidName
 from core.campaign import Campaign
 from core.coreObject import coreObject
@@ -5,6 +12,423 @@ from core.coreObject import coreObject
 def parseError( msg ):
     raise Exception( "Parse error for parser object on line {0}: {1}".format( Campaign.currentLineNumber, msg ) )
 
+# The columnar binary format of parsed logs
+#
+# A columnar parsed log (a .cols file) is written next to each text parsed log (a .data file) by dataWriter. It holds
+# the same rows as the text file, stored per column as arrays of little-endian 64-bit floats. The file starts with a
+# header of COLUMNS_HEADER (magic, version, number of columns, offset of the first column, number of rows), followed
+# by the names of the columns separated by newlines and padded with NUL bytes to the offset of the first column. The
+# columns follow each other directly after the offset, in order.
+COLUMNS_MAGIC = 'P2PCOLS\0'
+COLUMNS_VERSION = 1
+COLUMNS_HEADER = struct.Struct( '<8sHHIQ' )
+
+# The number of rows dataWriter keeps in memory before writing them to the text file and its temporary column files
+DATA_WRITER_BUFFER_ROWS = 65536
+
+# The number of bytes of a retrieved raw log liveParser.finish(...) reads at once
+LIVE_READ_SIZE = 1024 * 1024
+
+def columnsPath( path ):
+    """
+    Returns the path of the columnar parsed log that belongs to a text parsed log.
+
+    @param  path    The path to the text parsed log, e.g. .../log.data
+
+    @return The path to the columnar parsed log, e.g. .../log.cols
+    """
+    return os.path.splitext( path )[0] + '.cols'
+
+def hasColumns( path ):
+    """
+    Returns whether a text parsed log has a columnar parsed log that is at least as recent.
+
+    @param  path    The path to the text parsed log.
+
+    @return True iff the columnar parsed log exists and was not written before the text parsed log.
+    """
+    cols = columnsPath( path )
+    if not os.path.isfile( cols ):
+        return False
+    if not os.path.exists( path ):
+        return True
+    return os.path.getmtime( cols ) >= os.path.getmtime( path )
+
+class dataWriter:
+    """
+    Writes a parsed log both as text, for gnuplot and other text tools, and in the columnar binary format.
+
+    The text file gets a header line and then one line per row, with the values formatted just like
+    "{0} {1} ...".format( *values ) would. The columnar file is written next to it, see columnsPath(...); rows are
+    kept in memory per column and spilled to temporary files, which are joined into the columnar file by close().
+    Each row must have a value for every column, so readers of the text file and of the columnar file see the same rows.
+
+    No files are kept open between calls: rows are buffered in memory and the files are opened in append mode
+    whenever the buffers are written. Many writers can thus be open at the same time, e.g. those of the live parsers
+    of all executions of a scenario.
+
+    Use close() in a finally clause: without it the text file is only partially written and the columnar file not at all.
+    """
+
+    path = None             # The path to the text file
+    names = None            # The names of the columns
+    lines = None            # The list of buffered lines of the text file, None once closed
+    buffers = None          # The list of arrays with the buffered values per column
+    spills = None           # The list of paths of the temporary files per column
+    rows = 0                # The number of rows written
+
+    def __init__(self, path, names, header = None):
+        """
+        Creates the text parsed log and prepares the columnar parsed log.
+
+        @param  path        The path to the text parsed log, e.g. .../log.data
+        @param  names       The list of names of the columns.
+        @param  header      The header line of the text file, without the newline; defaults to the names of the
+                            columns separated by spaces.
+        """
+        if len(names) == 0:
+            raise Exception( "A parsed log needs at least one column" )
+        for name in names:
+            if name == '' or '\n' in name or '\0' in name:
+                raise Exception( 'Invalid column name for a parsed log: "{0}"'.format( name ) )
+        self.path = path
+        self.names = list(names)
+        self.buffers = [array.array( 'd' ) for _ in self.names]
+        self.spills = []
+        self.rows = 0
+        if header is None:
+            header = ' '.join( self.names )
+        text = open( path, 'w' )
+        try:
+            text.write( header + '\n' )
+        finally:
+            text.close()
+        self.lines = []
+
+    def write(self, *values):
+        """
+        Writes a row.
+
+        @param  values      The values of the row, one per column; anything that formats as a number and can be converted
+                            by float(...).
+        """
+        if len(values) != len(self.names):
+            raise Exception( "Row of {0} values written to parsed log {1} of {2} columns".format( len(values), self.path, len(self.names) ) )
+        self.lines.append( ' '.join( ['{0}'.format( value ) for value in values] ) + '\n' )
+        for i in xrange( len(values) ):
+            self.buffers[i].append( float( values[i] ) )
+        self.rows += 1
+        if len(self.buffers[0]) >= DATA_WRITER_BUFFER_ROWS:
+            self.spill()
+
+    def flush(self):
+        """
+        Appends the buffered rows to the text parsed log, so the rows written so far can be read while it is still
+        being written.
+
+        The columnar parsed log is only written by close().
+        """
+        if not self.lines:
+            return
+        text = open( self.path, 'a' )
+        try:
+            text.write( ''.join( self.lines ) )
+        finally:
+            text.close()
+        self.lines = []
+
+    def spill(self):
+        """
+        Appends the buffered rows to the text parsed log and the buffered values to the temporary column files.
+        """
+        self.flush()
+        if not self.spills:
+            for _ in self.names:
+                fd, tmpPath = tempfile.mkstemp( prefix = '.cols-', dir = os.path.dirname( os.path.abspath( self.path ) ) )
+                os.close( fd )
+                self.spills.append( tmpPath )
+        for i in xrange( len(self.names) ):
+            if sys.byteorder != 'little':
+                self.buffers[i].byteswap()
+            spill = open( self.spills[i], 'ab' )
+            try:
+                self.buffers[i].tofile( spill )
+            finally:
+                spill.close()
+            self.buffers[i] = array.array( 'd' )
+
+    def close(self):
+        """
+        Closes the text parsed log and writes the columnar parsed log.
+
+        The columnar parsed log is written to a temporary file that is renamed when complete, so it is never seen
+        half-written. Calling close() more than once has no effect.
+        """
+        if self.lines is None:
+            return
+        try:
+            self.flush()
+            self.lines = None
+            names = '\n'.join( self.names )
+            offset = COLUMNS_HEADER.size + len(names)
+            offset += ( 8 - offset % 8 ) % 8
+            cols = columnsPath( self.path )
+            fd, tmpPath = tempfile.mkstemp( prefix = '.cols-', dir = os.path.dirname( os.path.abspath( cols ) ) )
+            fObj = os.fdopen( fd, 'wb' )
+            try:
+                fObj.write( COLUMNS_HEADER.pack( COLUMNS_MAGIC, COLUMNS_VERSION, len(self.names), offset, self.rows ) )
+                fObj.write( names.ljust( offset - COLUMNS_HEADER.size, '\0' ) )
+                for i in xrange( len(self.names) ):
+                    if self.spills:
+                        spill = open( self.spills[i], 'rb' )
+                        try:
+                            while True:
+                                data = spill.read( 1024 * 1024 )
+                                if not data:
+                                    break
+                                fObj.write( data )
+                        finally:
+                            spill.close()
+                    if sys.byteorder != 'little':
+                        self.buffers[i].byteswap()
+                    self.buffers[i].tofile( fObj )
+                fObj.close()
+                os.rename( tmpPath, cols )
+            except:
+                fObj.close()
+                os.remove( tmpPath )
+                raise
+        finally:
+            self.lines = None
+            for tmpPath in self.spills:
+                os.remove( tmpPath )
+            self.spills = []
+            self.buffers = None
+
+class dataReader:
+    """
+    Reads a columnar parsed log, see dataWriter.
+
+    The file is memory mapped, so reading a column only touches the part of the file where that column is stored.
+    Use close() when done.
+    """
+
+    path = None             # The path to the columnar parsed log
+    names = None            # The names of the columns
+    rows = 0                # The number of rows
+    offset = 0              # The offset of the first column in the file
+    fileObj = None          # The file object of the columnar parsed log
+    mapping = None          # The mmap object of the columnar parsed log
+
+    def __init__(self, path):
+        """
+        Opens a columnar parsed log.
+
+        @param  path        The path to the columnar parsed log, or to the text parsed log it belongs to.
+        """
+        if os.path.splitext( path )[1] != '.cols':
+            path = columnsPath( path )
+        self.path = path
+        self.fileObj = open( path, 'rb' )
+        try:
+            size = os.fstat( self.fileObj.fileno() ).st_size
+            if size < COLUMNS_HEADER.size:
+                raise Exception( "Columnar parsed log {0} is truncated".format( path ) )
+            self.mapping = mmap.mmap( self.fileObj.fileno(), 0, access = mmap.ACCESS_READ )
+            magic, version, count, self.offset, self.rows = COLUMNS_HEADER.unpack_from( self.mapping )
+            if magic != COLUMNS_MAGIC:
+                raise Exception( "{0} is not a columnar parsed log".format( path ) )
+            if version != COLUMNS_VERSION:
+                raise Exception( "Columnar parsed log {0} has unsupported version {1}".format( path, version ) )
+            self.names = self.mapping[COLUMNS_HEADER.size:self.offset].rstrip( '\0' ).split( '\n' )
+            if len(self.names) != count or size != self.offset + count * self.rows * 8:
+                raise Exception( "Columnar parsed log {0} is truncated or corrupt".format( path ) )
+        except:
+            self.close()
+            raise
+
+    def columnIndex(self, column):
+        """
+        Returns the index of a column.
+
+        @param  column      The index or the name of the column.
+
+        @return The index of the column.
+        """
+        if isinstance( column, basestring ):
+            if column not in self.names:
+                raise Exception( "Columnar parsed log {0} has no column {1}".format( self.path, column ) )
+            return self.names.index( column )
+        if column < 0 or column >= len(self.names):
+            raise Exception( "Columnar parsed log {0} has no column {1}".format( self.path, column ) )
+        return column
+
+    def column(self, column, start = 0, stop = None):
+        """
+        Reads (part of) a column.
+
+        @param  column      The index or the name of the column.
+        @param  start       The first row to read.
+        @param  stop        The row to stop before, None for all remaining rows.
+
+        @return An array of floats with the values.
+        """
+        index = self.columnIndex( column )
+        if stop is None or stop > self.rows:
+            stop = self.rows
+        values = array.array( 'd' )
+        if start < stop:
+            values.fromstring( buffer( self.mapping, self.offset + ( index * self.rows + start ) * 8, ( stop - start ) * 8 ) )
+            if sys.byteorder != 'little':
+                values.byteswap()
+        return values
+
+    def chunks(self, columns, rows):
+        """
+        Reads columns in chunks of rows.
+
+        @param  columns     The list of indices or names of the columns to read.
+        @param  rows        The number of rows per chunk.
+
+        @return A generator of lists that hold for each requested column the array of its values in the chunk.
+        """
+        columns = [self.columnIndex( column ) for column in columns]
+        for start in xrange( 0, self.rows, rows ):
+            yield [self.column( column, start, start + rows ) for column in columns]
+
+    def close(self):
+        """
+        Closes the columnar parsed log.
+        """
+        if self.mapping is not None:
+            self.mapping.close()
+            self.mapping = None
+        if self.fileObj is not None:
+            self.fileObj.close()
+            self.fileObj = None
+
+class liveParser:
+    """
+    Parses one raw log of an execution incrementally, as it is being written.
+
+    In live mode (see the live parameter of scenarios in the campaign file) the raw log is tailed on the remote host
+    while the execution runs and each new part of it is passed to feed(...), so the parsed logs grow during the run.
+    After the run finish(...) feeds the part of the retrieved raw log that was not fed yet and closes the parsed logs.
+    Lines are always parsed whole, however the raw log was split into parts, so the result is the same as parsing the
+    complete raw log at once. Parsers with a live parser use it for normal parsing as well, by calling finish(...) on
+    a new one; see parser.getLiveParsers(...).
+
+    Subclassers must implement parseLine(...) and close() and may implement complete() and flush().
+    """
+
+    logName = None          # The name of the raw log in the log directory of the execution, e.g. 'log.log'
+    offset = 0              # The number of bytes of the raw log fed so far
+    pending = ''            # The last, incomplete line fed so far
+    failed = False          # True iff parsing a part of the raw log failed, after which the parsed logs are incomplete
+
+    def __init__(self, logName):
+        """
+        Initialization of a generic live parser object.
+
+        @param  logName     The name of the raw log in the log directory of the execution.
+        """
+        self.logName = logName
+        self.offset = 0
+        self.pending = ''
+
+    def feed(self, chunk):
+        """
+        Parses the next part of the raw log.
+
+        @param  chunk       The bytes of the raw log that directly follow those fed before.
+        """
+        if not chunk:
+            return
+        self.offset += len(chunk)
+        lines = ( self.pending + chunk ).split( '\n' )
+        self.pending = lines.pop()
+        try:
+            for line in lines:
+                self.parseLine( line + '\n' )
+        except:
+            self.failed = True
+            raise
+        self.flush()
+
+    def finish(self, logDir):
+        """
+        Parses the rest of the raw log from the retrieved copy and closes the parsed logs.
+
+        The raw log must have been retrieved, just like parsing after the run requires it, so the parsed logs are
+        always those of the complete raw log.
+
+        @param  logDir      The path to the directory on the local machine where the raw logs reside.
+        """
+        try:
+            if self.failed:
+                raise Exception( "Parsing {0} failed during the run, see the log of the run".format( self.logName ) )
+            logfile = os.path.join( logDir, self.logName )
+            if not os.path.isfile( logfile ):
+                raise Exception( "Raw log {0} was not retrieved, so the {1} bytes of it that were parsed during the run can't be completed".format( logfile, self.offset ) )
+            if os.path.getsize( logfile ) < self.offset:
+                raise Exception( "Raw log {0} is shorter than the {1} bytes of it that were parsed during the run".format( logfile, self.offset ) )
+            fl = open( logfile, 'r' )
+            try:
+                fl.seek( self.offset )
+                while True:
+                    data = fl.read( LIVE_READ_SIZE )
+                    if not data:
+                        break
+                    self.feed( data )
+            finally:
+                fl.close()
+            if self.pending:
+                self.parseLine( self.pending )
+                self.pending = ''
+            self.complete()
+        finally:
+            self.close()
+
+    def parseLine(self, line):
+        """
+        Parses a single line of the raw log.
+
+        Subclassers must override this method.
+
+        @param  line        The line, including its newline; the last line of the raw log may lack it.
+        """
+        raise Exception( "Not implemented" )
+
+    def complete(self):
+        """
+        Called when the whole raw log has been parsed, before close(), to write anything that depends on all of it.
+        """
+        pass
+
+    def flush(self):
+        """
+        Flushes the parsed logs, so the rows written so far can be read during the run.
+        """
+        pass
+
+    def getProgress(self):
+        """
+        Returns the progress of the execution as parsed so far, e.g. for the stop conditions of scenarios.
+
+        Live parsers of raw logs that do not show progress return None, which is the default.
+
+        @return A tuple (percentage done, upload speed in KiB/s, download speed in KiB/s) of the last row parsed, or None.
+        """
+        return None
+
+    def close(self):
+        """
+        Closes the parsed logs. This is also called if parsing failed.
+
+        Subclassers must override this method.
+        """
+        raise Exception( "Not implemented" )
+
 class parser(coreObject):
     """
     The parent class for all parsers.
@@ -87,6 +511,35 @@ class parser(coreObject):
         @param  outputDir   The path to the directory on the local machine where the parsed logs are to be stored.
         """
         raise Exception( "Not implemented" )
+
+    def getLiveParsers(self, execution, outputDir):
+        """
+        Returns the live parsers that parse the raw logs of the execution while it runs.
+
+        This is only called in live mode, before the execution is started. If any live parsers are returned, they
+        replace parseLogs(...) for this execution: after the run they are finished on the retrieved raw logs instead.
+        Parsers that create their parsed logs from their live parsers should also use them in parseLogs(...), so
+        parsing after the run gives the same results. See liveParser.
+
+        By default this returns [], to parse the logs after the run only.
+
+        @param  execution   The execution for which to parse the logs.
+        @param  outputDir   The path to the directory on the local machine where the parsed logs are to be stored.
+
+        @return A list of liveParser objects, one per raw log to tail.
+        """
+        return []
+
+    def reportsLiveProgress(self):
+        """
+        Returns whether the live parsers of this parser report the progress of the execution.
+
+        The stop conditions 'completed' and 'throughput' of scenarios need this of a parser of each leeching execution.
+        By default this returns False; parsers whose live parsers implement getProgress() should return True.
+
+        @return True iff getProgress() of the live parsers of this parser returns the progress.
+        """
+        return False
     # pylint: enable-msg=W0613
 
     def getModuleType(self):
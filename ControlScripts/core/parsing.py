@@ -2,6 +2,52 @@ import re
 
 from core.campaign import Campaign
 
+# The patterns used by the functions below, compiled once
+_sectionGarbagePattern = re.compile( "\[.*\]." )
+_sectionWhitespacePattern = re.compile( "\[.*\s.*\]" )
+_parameterPattern = re.compile( "^([^=].*)=(.+)$" )
+_parameterNamePattern = re.compile( "^([^=].*)=..*$" )
+_parameterValuePattern = re.compile( "^[^=].*=(.*)$" )
+_whitespacePattern = re.compile( "\s" )
+_validNamePattern = re.compile( '^[a-zA-Z][a-zA-Z0-9_\\-\\.]*$' )
+_nonDigitPattern = re.compile( "\\D" )
+_nonFloatPattern = re.compile( "[^0-9\\.]" )
+_spacePattern = re.compile( '[ \t\r\n]' )
+
+# The kinds of tokens yielded by tokenize(...)
+TOKEN_SECTION = 0
+TOKEN_PARAMETER = 1
+
+def tokenize( lines ):
+    """
+    Tokenizes the lines of a scenario or campaign file in a single pass.
+
+    Empty lines and comments are skipped. While a token is being handled by the caller, Campaign.currentLineNumber
+    is the number of its line (starting at 1), so exceptions raised while handling it refer to the right line.
+
+    Will throw an exception on a malformed line.
+
+    @param  lines   An iterable over the lines, such as an open file.
+
+    @return A generator of tuples (TOKEN_SECTION, section name, None) and (TOKEN_PARAMETER, parameter name, value).
+    """
+    lineNumber = 0
+    for line in lines:
+        lineNumber += 1
+        Campaign.currentLineNumber = lineNumber
+        line = line.strip()
+        if line == '' or line[0] == '#':
+            continue
+        if line[0] == '[':
+            yield ( TOKEN_SECTION, getSectionName( line ), None )
+        else:
+            m = _parameterPattern.match( line )
+            if m is None:
+                raise Exception( "Malformed parameter on line {0}".format( lineNumber ) )
+            if _whitespacePattern.search( m.group(1) ):
+                raise Exception( "Parameter names are not allowed to have whitespace in them (line {0})".format( lineNumber ) )
+            yield ( TOKEN_PARAMETER, m.group(1), m.group(2) )
+
 def isSectionHeader( s ):
     """
     Returns whether str is a section header (i.e. starts with a [).
@@ -23,9 +69,9 @@ def getSectionName( s ):
     @return The section name (i.e. the string between []).
     """
     s = s.strip()
-    if not re.match( "\[.*\].", s ) is None:
+    if not _sectionGarbagePattern.match( s ) is None:
         raise Exception( "Found garbage after section header on line {0}".format( Campaign.currentLineNumber ) )
-    if not re.match( "\[.*\s.*\]", s ) is None:
+    if not _sectionWhitespacePattern.match( s ) is None:
         raise Exception( "Section names are not allowd to have whitespace in them (line {0})".format( Campaign.currentLineNumber ) )
     if s == '[]':
         raise Exception( "Empty section name on line {0}".format( Campaign.currentLineNumber ) )
@@ -41,10 +87,10 @@ def getParameterName( s ):
 
     @return The parameter name (i.e. the string before =).
     """
-    m = re.match( "^([^=].*)=..*$", s )
+    m = _parameterNamePattern.match( s )
     if m is None:
         raise Exception( "Malformed parameter on line {0}".format( Campaign.currentLineNumber ) )
-    if not re.match( ".*\s.*", m.group(1) ) is None:
+    if not _whitespacePattern.search( m.group(1) ) is None:
         raise Exception( "Parameter names are not allowed to have whitespace in them (line {0})".format( Campaign.currentLineNumber ) )
     return m.group(1)
 
@@ -58,7 +104,7 @@ def getParameterValue( s ):
 
     @return The parameter value (i.e. the string after =).
     """
-    m = re.match( "^[^=].*=(.*)$", s )
+    m = _parameterValuePattern.match( s )
     if m is None:
         raise Exception( "Malformed parameter on line {0}".format( Campaign.currentLineNumber ) )
     return m.group(1)
@@ -71,7 +117,7 @@ def hasModuleSubType( section ):
 
     @return True iff the section consists of a module type and subtype (i.e. contains a :).
     """
-    return not re.search( ':', section ) is None
+    return ':' in section
 
 def getModuleType( section ):
     """
@@ -83,9 +129,8 @@ def getModuleType( section ):
 
     @return The module type in the section name.
     """
-    m = re.match( '^(.*):.*$', section )
-    if m:
-        return m.group( 1 )
+    if ':' in section:
+        return section.rsplit( ':', 1 )[0]
     else:
         return section
 
@@ -99,10 +144,9 @@ def getModuleSubType( section ):
 
     @return The module subtype in the section name.
     """
-    m = re.match( '^.*:(.*)$', section )
-    if m is None:
+    if ':' not in section:
         return ''
-    return m.group( 1 )
+    return section.rsplit( ':', 1 )[1]
 
 def isValidName( name ):
     """
@@ -112,7 +156,7 @@ def isValidName( name ):
 
     @return True iff the name is valid.
     """
-    return not re.match( '^[a-zA-Z][a-zA-Z0-9_\\-\\.]*$', name ) is None
+    return not _validNamePattern.match( name ) is None
 
 def isPositiveInt( value, nonZero = False ):
     """
@@ -123,7 +167,7 @@ def isPositiveInt( value, nonZero = False ):
 
     @return True iff the string value represents a positive integer.
     """
-    if re.search( "\\D", value ) is not None:
+    if _nonDigitPattern.search( value ) is not None:
         return False
     return value != '' and ((not nonZero) or (value != "0"))
 
@@ -136,7 +180,7 @@ def isPositiveFloat( value, nonZero = False ):
 
     @return True iff the string value represents a positive float.
     """
-    if value == '' or re.search( "[^0-9\\.]", value ) is not None:
+    if value == '' or _nonFloatPattern.search( value ) is not None:
         return False
     return (not nonZero) or (float(value) != 0)
 
@@ -146,5 +190,5 @@ def containsSpace( value ):
     
     @return True iff value contains whitespace.
     """
-    m = re.match( '[ \t\r\n]', value )
+    m = _spacePattern.match( value )
     return m is not None
\ No newline at end of file
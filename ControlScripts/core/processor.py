@@ -1,11 +1,148 @@
 import os
+import math
+import operator
 
 from core.campaign import Campaign
 from core.coreObject import coreObject
+from core.parser import dataReader, hasColumns
 
 def parseError( msg ):
     raise Exception( "Parse error for processor object on line {0}: {1}".format( Campaign.currentLineNumber, msg ) )
 
+# The approximate number of bytes of a parsed log that readDataChunks(...) reads at once
+DATA_CHUNK_SIZE = 1024 * 1024
+
+def readDataChunks( path, columns, chunkSize = DATA_CHUNK_SIZE, keepOpen = True ):
+    """
+    Reads columns of a parsed log (a .data file) in chunks of rows, so even large logs are read in bounded memory.
+
+    If the parsed log has an up-to-date columnar parsed log next to it (see core.parser.dataWriter), the columns are
+    read from that instead, without parsing any text. Otherwise the text is parsed as follows.
+
+    A chunk is split into fields in one go and each requested column is sliced from the fields and converted to
+    floats at once. This relies on all rows in the chunk having the same number of fields as the first row of the
+    file; chunks for which the number of fields doesn't add up are split row by row. The first line is skipped if
+    it is a header, i.e. if its first field is not a number. Rows that have fewer fields than needed for the
+    requested columns are skipped.
+
+    @param  path        The path to the parsed log.
+    @param  columns     The list of indices of the columns to read.
+    @param  chunkSize   The approximate number of bytes to read per chunk.
+    @param  keepOpen    False to close the file between chunks, so many parsed logs can be read side by side without
+                        running out of file descriptors.
+
+    @return A generator of lists that hold for each requested column the list of its values in the chunk.
+    """
+    if hasColumns( path ):
+        reader = dataReader( path )
+        try:
+            indices = [reader.columnIndex( column ) for column in columns]
+            rows = max( 1, chunkSize / 8 / len(reader.names) )
+            for start in xrange( 0, reader.rows, rows ):
+                if reader is None:
+                    reader = dataReader( path )
+                chunk = [reader.column( index, start, start + rows ).tolist() for index in indices]
+                if not keepOpen:
+                    reader.close()
+                    reader = None
+                yield chunk
+        finally:
+            if reader:
+                reader.close()
+        return
+    needed = max( columns ) + 1
+    width = None
+    offset = 0
+    fObj = open( path, 'r' )
+    try:
+        while True:
+            if fObj is None:
+                fObj = open( path, 'r' )
+                fObj.seek( offset )
+            lines = fObj.readlines( chunkSize )
+            if not keepOpen:
+                offset = fObj.tell()
+                fObj.close()
+                fObj = None
+            if not lines:
+                return
+            if width is None:
+                fields = lines[0].split()
+                width = len(fields)
+                if fields:
+                    try:
+                        float( fields[0] )
+                    except ValueError:
+                        lines = lines[1:]
+                        if len(lines) > 0:
+                            width = len(lines[0].split())
+            fields = ''.join( lines ).split()
+            if not fields:
+                continue
+            if width >= needed and len(fields) == width * len(lines):
+                yield [map( float, fields[c::width] ) for c in columns]
+                continue
+            rows = [row for row in [l.split() for l in lines] if len(row) >= needed]
+            if not rows:
+                continue
+            transposed = zip( *rows )
+            yield [map( float, transposed[c] ) for c in columns]
+    finally:
+        if fObj:
+            fObj.close()
+
+def percentile( values, p ):
+    """
+    Returns a percentile of a sorted list of values, interpolating linearly between the closest ranks.
+
+    @param  values      The non-empty sorted list of values.
+    @param  p           The percentile, between 0 and 100.
+
+    @return The percentile.
+    """
+    rank = ( len(values) - 1 ) * p / 100.0
+    lower = int( math.floor( rank ) )
+    upper = min( lower + 1, len(values) - 1 )
+    return values[lower] + ( values[upper] - values[lower] ) * ( rank - lower )
+
+def readLogData( path ):
+    """
+    Reads the download statistics of one execution from its log.data, in chunks.
+
+    The download time is the time of the first row with a completion of 100%. The mean speeds are weighted by
+    time: the speeds on a row are taken to hold since the time of the previous row.
+
+    @param  path        The path to log.data.
+
+    @return A tuple (completion, download time, mean upload speed, mean download speed). The completion is that of
+            the last row or 100.0 if completed and the download time is None if not completed.
+    """
+    completion = 0.0
+    downloadTime = None
+    firstTime = None
+    lastTime = None
+    totalUp = 0.0
+    totalDown = 0.0
+    for times, percents, upspeeds, dlspeeds in readDataChunks( path, [0, 1, 2, 3] ):
+        if firstTime is None:
+            firstTime = times[0]
+            lastTime = firstTime
+        if downloadTime is None:
+            for i in xrange( len(percents) ):
+                if percents[i] > 99.999999:
+                    downloadTime = times[i]
+                    break
+            completion = percents[-1]
+        durations = map( operator.sub, times, [lastTime] + times[:-1] )
+        totalUp += sum( map( operator.mul, upspeeds, durations ) )
+        totalDown += sum( map( operator.mul, dlspeeds, durations ) )
+        lastTime = times[-1]
+    if downloadTime is not None:
+        completion = 100.0
+    if firstTime is None or lastTime <= firstTime:
+        return ( completion, downloadTime, 0.0, 0.0 )
+    return ( completion, downloadTime, totalUp / (lastTime - firstTime), totalDown / (lastTime - firstTime) )
+
 class processor(coreObject):
     """
     The parent class for all processors.
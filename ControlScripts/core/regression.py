@@ -0,0 +1,328 @@
+import os
+import math
+import random
+
+from core.processor import readLogData, percentile
+
+# Performance regression comparison between campaigns
+#
+# The executions of a scenario in a baseline and a candidate campaign are matched by their number and role. For each
+# metric below the values of the matched executions form two samples, which are compared with a statistical test: a
+# two-sided Mann-Whitney U test or a bootstrap confidence interval of the relative change of the median. A metric
+# regresses if the change is significant and its median is worse than in the baseline by more than a threshold, or if
+# the candidate has no values at all where the baseline has enough. The fraction of the matched leechers that
+# completed is compared as well, without a statistical test: it regresses if it is lower than in the baseline by more
+# than the threshold.
+# Used by processor:regression and ControlScripts/compare_campaigns.py.
+
+# The metrics that are compared: (name, role of the executions, index in the tuple of readLogData(...), whether lower is better)
+# The download time is only known for completed leechers; how many completed is compared separately, see
+# compareCompletion(...).
+METRICS = [
+    ( 'downloadtime', 'leecher', 1, True ),
+    ( 'dlspeed', 'leecher', 3, False ),
+    ( 'upspeed', 'seeder', 2, False ),
+]
+
+# The tests that can decide whether a change is significant
+TESTS = ['mannwhitney', 'bootstrap']
+
+# The minimum number of values in each sample to compare a metric
+MIN_SAMPLES = 2
+
+# The seed of the bootstrap resampling, so the same results always give the same report
+BOOTSTRAP_SEED = 0
+
+def scenarioExecutions( scenarioDir ):
+    """
+    Returns the executions found in the results directory of a scenario.
+
+    As in reparse.py, executions with no raw logs are side services and left out, and an execution is a leecher unless
+    processor:saveisseeder saved that it is a seeder.
+
+    @param  scenarioDir     The results directory of the scenario.
+
+    @return A list of tuples (execution number, True iff a seeder, parsed log directory).
+    """
+    execDir = os.path.join( scenarioDir, 'executions' )
+    executions = []
+    if not os.path.isdir( execDir ):
+        return executions
+    for d in os.listdir( execDir ):
+        if d[:5] != 'exec_' or not d[5:].isdigit():
+            continue
+        logDir = os.path.join( execDir, d, 'logs' )
+        if not os.path.isdir( logDir ) or len( os.listdir( logDir ) ) == 0:
+            continue
+        seeder = False
+        seederPath = os.path.join( scenarioDir, 'processed', 'isSeeder_{0}'.format( d[5:] ) )
+        if os.path.isfile( seederPath ):
+            fObj = open( seederPath, 'r' )
+            try:
+                seeder = ( fObj.read() == 'YES' )
+            finally:
+                fObj.close()
+        executions.append( ( int( d[5:] ), seeder, os.path.join( execDir, d, 'parsedLogs' ) ) )
+    executions.sort()
+    return executions
+
+def summarizeExecutions( executions ):
+    """
+    Reads the download statistics of executions.
+
+    @param  executions      A list of tuples (execution number, True iff a seeder, parsed log directory).
+
+    @return A dictionary execution number->(role, summary), with role 'seeder' or 'leecher' and summary the tuple of
+            readLogData(...) for its log.data or None if it has none.
+    """
+    summaries = {}
+    for number, seeder, parsedLogDir in executions:
+        role = 'leecher'
+        if seeder:
+            role = 'seeder'
+        summary = None
+        path = os.path.join( parsedLogDir, 'log.data' )
+        if os.path.isfile( path ):
+            summary = readLogData( path )
+        summaries[number] = ( role, summary )
+    return summaries
+
+def mannWhitney( a, b ):
+    """
+    Performs a two-sided Mann-Whitney U test on two samples.
+
+    The p-value uses the normal approximation with a correction for ties and for continuity, which is reasonable from
+    about 8 values per sample onwards.
+
+    @param  a       The first sample, a non-empty list of numbers.
+    @param  b       The second sample, a non-empty list of numbers.
+
+    @return A tuple (U of the first sample, p-value).
+    """
+    values = sorted( [( value, 0 ) for value in a] + [( value, 1 ) for value in b] )
+    n = len(values)
+    rankSum = 0.0
+    tieTerm = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and values[j + 1][0] == values[i][0]:
+            j += 1
+        # Tied values share the mean of their ranks, which are i+1 up to j+1
+        rank = ( i + j + 2 ) / 2.0
+        for k in xrange( i, j + 1 ):
+            if values[k][1] == 0:
+                rankSum += rank
+        ties = j - i + 1
+        tieTerm += ties ** 3 - ties
+        i = j + 1
+    n1 = len(a)
+    n2 = len(b)
+    u = rankSum - n1 * ( n1 + 1 ) / 2.0
+    variance = n1 * n2 / 12.0 * ( ( n + 1 ) - tieTerm / ( n * ( n - 1 ) ) )
+    if variance <= 0:
+        return ( u, 1.0 )
+    z = max( 0.0, abs( u - n1 * n2 / 2.0 ) - 0.5 ) / math.sqrt( variance )
+    return ( u, math.erfc( z / math.sqrt( 2 ) ) )
+
+def median( values ):
+    """
+    Returns the median of a non-empty list of values.
+
+    @param  values      The values.
+
+    @return The median.
+    """
+    return percentile( sorted( values ), 50 )
+
+def bootstrapInterval( baseline, candidate, confidence, resamples ):
+    """
+    Calculates a bootstrap percentile confidence interval of the relative change of the median between two samples.
+
+    Both samples are resampled with replacement; the change is relative to the median of the whole baseline sample.
+
+    @param  baseline        The baseline sample, a non-empty list of numbers with a median other than 0.
+    @param  candidate       The candidate sample, a non-empty list of numbers.
+    @param  confidence      The confidence level, between 0 and 1.
+    @param  resamples       The number of resamples.
+
+    @return A tuple (lower bound, upper bound) of the relative change (e.g. 0.1 for 10% higher).
+    """
+    rng = random.Random( BOOTSTRAP_SEED )
+    base = median( baseline )
+    changes = []
+    for _ in xrange( resamples ):
+        baselineMedian = median( [baseline[int( rng.random() * len(baseline) )] for _ in xrange( len(baseline) )] )
+        candidateMedian = median( [candidate[int( rng.random() * len(candidate) )] for _ in xrange( len(candidate) )] )
+        changes.append( ( candidateMedian - baselineMedian ) / abs( base ) )
+    changes.sort()
+    tail = ( 1 - confidence ) / 2 * 100
+    return ( percentile( changes, tail ), percentile( changes, 100 - tail ) )
+
+def compareSamples( baseline, candidate, lowerIsBetter, threshold, alpha, test, resamples ):
+    """
+    Compares the samples of a metric in the baseline and the candidate.
+
+    @param  baseline        The list of values in the baseline.
+    @param  candidate       The list of values in the candidate.
+    @param  lowerIsBetter   True iff lower values of the metric are better.
+    @param  threshold       The relative change of the median that is allowed, e.g. 0.05 for 5%.
+    @param  alpha           The significance level.
+    @param  test            The test that decides significance, one of TESTS.
+    @param  resamples       The number of bootstrap resamples.
+
+    @return A tuple (baseline median, candidate median, relative change of the median, lower bound and upper bound of
+            its bootstrap confidence interval, Mann-Whitney p-value, verdict). The verdict is 'regression', 'improvement',
+            'unchanged' or 'insufficient' if a sample is too small. An empty candidate sample is a regression if the
+            baseline sample is large enough. Values that can't be calculated are None.
+    """
+    if len(baseline) >= MIN_SAMPLES and len(candidate) == 0:
+        return ( median( baseline ), None, None, None, None, None, 'regression' )
+    if len(baseline) < MIN_SAMPLES or len(candidate) < MIN_SAMPLES:
+        return ( None, None, None, None, None, None, 'insufficient' )
+    baselineMedian = median( baseline )
+    candidateMedian = median( candidate )
+    p = mannWhitney( baseline, candidate )[1]
+    change = None
+    low = None
+    high = None
+    if baselineMedian != 0:
+        change = ( candidateMedian - baselineMedian ) / abs( baselineMedian )
+        low, high = bootstrapInterval( baseline, candidate, 1 - alpha, resamples )
+    if test == 'bootstrap':
+        significant = low is not None and ( low > 0 or high < 0 )
+    else:
+        significant = p < alpha
+    verdict = 'unchanged'
+    if significant and candidateMedian != baselineMedian:
+        # Without a relative change, any significant change of a zero median exceeds the threshold
+        if change is None or abs( change ) > threshold:
+            if ( candidateMedian > baselineMedian ) == lowerIsBetter:
+                verdict = 'regression'
+            else:
+                verdict = 'improvement'
+    return ( baselineMedian, candidateMedian, change, low, high, p, verdict )
+
+def compareCompletion( baselineCompleted, candidateCompleted, count, threshold ):
+    """
+    Compares the fraction of the matched leechers that completed in the baseline and the candidate.
+
+    @param  baselineCompleted   The number of matched leechers that completed in the baseline.
+    @param  candidateCompleted  The number of matched leechers that completed in the candidate.
+    @param  count               The number of matched leechers.
+    @param  threshold           The relative change of the fraction that is allowed, e.g. 0.05 for 5%.
+
+    @return A tuple like that of compareSamples(...), with the fractions that completed instead of the medians and
+            no confidence interval or p-value. The verdict is 'insufficient' if there are no matched leechers.
+    """
+    if count == 0:
+        return ( None, None, None, None, None, None, 'insufficient' )
+    baselineFraction = float(baselineCompleted) / count
+    candidateFraction = float(candidateCompleted) / count
+    change = None
+    verdict = 'unchanged'
+    if baselineFraction != 0:
+        change = ( candidateFraction - baselineFraction ) / baselineFraction
+        if change < -threshold:
+            verdict = 'regression'
+        elif change > threshold:
+            verdict = 'improvement'
+    elif candidateFraction != 0:
+        verdict = 'improvement'
+    return ( baselineFraction, candidateFraction, change, None, None, None, verdict )
+
+def compareScenario( baseline, candidate, threshold, alpha, test, resamples ):
+    """
+    Compares the executions of a scenario in the baseline and the candidate.
+
+    Executions are matched by number and role; unmatched executions and executions without log.data are left out of
+    the comparison and counted in the notes.
+
+    @param  baseline        The executions in the baseline, as returned by summarizeExecutions(...).
+    @param  candidate       The executions in the candidate, as returned by summarizeExecutions(...).
+    @param  threshold       The relative change of the median that is allowed, e.g. 0.05 for 5%.
+    @param  alpha           The significance level.
+    @param  test            The test that decides significance, one of TESTS.
+    @param  resamples       The number of bootstrap resamples.
+
+    @return A tuple (results, notes): results is a list with per metric a tuple (name, role, baseline sample size,
+            candidate sample size) followed by the tuple returned by compareSamples(...), preceded by the metric
+            'completed' of the leechers from compareCompletion(...); notes is a list of strings.
+    """
+    notes = []
+    matched = []
+    unmatched = len( [number for number in baseline if number not in candidate] ) + len( [number for number in candidate if number not in baseline] )
+    mismatched = 0
+    missing = 0
+    for number in sorted( baseline ):
+        if number not in candidate:
+            continue
+        if baseline[number][0] != candidate[number][0]:
+            mismatched += 1
+        elif baseline[number][1] is None or candidate[number][1] is None:
+            missing += 1
+        else:
+            matched.append( ( baseline[number][0], baseline[number][1], candidate[number][1] ) )
+    if unmatched:
+        notes.append( '{0} executions are only in one of the campaigns'.format( unmatched ) )
+    if mismatched:
+        notes.append( '{0} executions have a different role in the campaigns'.format( mismatched ) )
+    if missing:
+        notes.append( '{0} matched executions have no log.data in one of the campaigns'.format( missing ) )
+    leechers = [m for m in matched if m[0] == 'leecher']
+    baselineCompleted = len( [m for m in leechers if m[1][1] is not None] )
+    candidateCompleted = len( [m for m in leechers if m[2][1] is not None] )
+    results = [( 'completed', 'leecher', len(leechers), len(leechers) ) + compareCompletion( baselineCompleted, candidateCompleted, len(leechers), threshold )]
+    for name, role, index, lowerIsBetter in METRICS:
+        baselineSample = [m[1][index] for m in matched if m[0] == role and m[1][index] is not None]
+        candidateSample = [m[2][index] for m in matched if m[0] == role and m[2][index] is not None]
+        results.append( ( name, role, len(baselineSample), len(candidateSample) ) + compareSamples( baselineSample, candidateSample, lowerIsBetter, threshold, alpha, test, resamples ) )
+    return ( results, notes )
+
+def hasRegression( results ):
+    """
+    Returns whether any metric regressed.
+
+    @param  results     The results as returned by compareScenario(...).
+
+    @return True iff the verdict of any metric is 'regression'.
+    """
+    return len( [result for result in results if result[-1] == 'regression'] ) > 0
+
+def formatNumber( value, percentage = False ):
+    """
+    Formats a number for the report.
+
+    @param  value       The number or None.
+    @param  percentage  True to format a relative change as a percentage.
+
+    @return The formatted number, '-' for None.
+    """
+    if value is None:
+        return '-'
+    if percentage:
+        return '{0:+.1f}%'.format( value * 100 )
+    return '{0:.4g}'.format( value )
+
+def writeReport( fObj, name, results, notes ):
+    """
+    Writes the comparison of a scenario as text.
+
+    @param  fObj        The file object to write to.
+    @param  name        The name of the scenario.
+    @param  results     The results as returned by compareScenario(...).
+    @param  notes       The notes as returned by compareScenario(...).
+    """
+    verdict = 'PASS'
+    if hasRegression( results ):
+        verdict = 'FAIL'
+    fObj.write( '{0}: {1}\n'.format( name, verdict ) )
+    for note in notes:
+        fObj.write( '    {0}\n'.format( note ) )
+    fObj.write( '    {0:<14}{1:<9}{2:>6}{3:>6}{4:>12}{5:>12}{6:>9}{7:>20}{8:>10}  {9}\n'.format( 'metric', 'role', 'n', 'n\'', 'baseline', 'candidate', 'change', 'interval', 'p', 'verdict' ) )
+    for metric, role, baselineCount, candidateCount, baselineMedian, candidateMedian, change, low, high, p, resultVerdict in results:
+        interval = '-'
+        if low is not None:
+            interval = '[{0}, {1}]'.format( formatNumber( low, True ), formatNumber( high, True ) )
+        fObj.write( '    {0:<14}{1:<9}{2:>6}{3:>6}{4:>12}{5:>12}{6:>9}{7:>20}{8:>10}  {9}\n'.format( metric, role, baselineCount, candidateCount,
+                formatNumber( baselineMedian ), formatNumber( candidateMedian ), formatNumber( change, True ), interval, formatNumber( p ), resultVerdict ) )
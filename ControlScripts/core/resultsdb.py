@@ -0,0 +1,126 @@
+import os
+import sqlite3
+
+# The results database of a campaign
+#
+# processor:database loads the metadata of the executions, summaries of the parsed and processed logs and the
+# statistics of each scenario into an SQLite database, by default results.db in the results directory of the campaign.
+# All rows are keyed by the name of the scenario; reprocessing a scenario replaces its rows. query_results.py queries
+# the databases of one or more campaigns together, see openDatabases(...).
+
+# The version of the schema, stored as the user_version of the database
+SCHEMA_VERSION = 1
+
+# The name of the database file in the results directory of a campaign
+DATABASE_NAME = 'results.db'
+
+# The tables of the database, in the order in which they are created
+TABLES = ['scenarios', 'executions', 'parameters', 'series', 'statistics']
+
+SCHEMA = [
+    # One row per scenario: when the scenario was loaded and why its run stopped
+    'CREATE TABLE IF NOT EXISTS scenarios (scenario TEXT PRIMARY KEY, loaded REAL, stopreason TEXT)',
+    # One row per execution
+    'CREATE TABLE IF NOT EXISTS executions (scenario TEXT, execution INTEGER, client TEXT, host TEXT, seeder INTEGER, timeout REAL, files TEXT, PRIMARY KEY (scenario, execution))',
+    'CREATE INDEX IF NOT EXISTS executions_client ON executions (client)',
+    'CREATE INDEX IF NOT EXISTS executions_host ON executions (host)',
+    # The parameters of a scenario, as given to processor:database
+    'CREATE TABLE IF NOT EXISTS parameters (scenario TEXT, name TEXT, value TEXT)',
+    'CREATE INDEX IF NOT EXISTS parameters_scenario ON parameters (scenario)',
+    'CREATE INDEX IF NOT EXISTS parameters_name ON parameters (name, value)',
+    # One row per column of each parsed log (execution is the number of the execution) and processed log (execution is NULL)
+    'CREATE TABLE IF NOT EXISTS series (scenario TEXT, execution INTEGER, log TEXT, name TEXT, rows INTEGER, first REAL, last REAL, minimum REAL, maximum REAL, mean REAL)',
+    'CREATE INDEX IF NOT EXISTS series_scenario ON series (scenario, execution)',
+    'CREATE INDEX IF NOT EXISTS series_log ON series (log, name)',
+    # One row per value in the stats.* files of a scenario; value is a number where possible
+    'CREATE TABLE IF NOT EXISTS statistics (scenario TEXT, file TEXT, row INTEGER, name TEXT, value)',
+    'CREATE INDEX IF NOT EXISTS statistics_scenario ON statistics (scenario)',
+    'CREATE INDEX IF NOT EXISTS statistics_name ON statistics (file, name)',
+]
+
+def databasePath( path ):
+    """
+    Returns the path to a results database.
+
+    @param  path    The path to the database file or to the results directory of a campaign.
+
+    @return The path to the database file.
+    """
+    if os.path.isdir( path ):
+        return os.path.join( path, DATABASE_NAME )
+    return path
+
+def openDatabase( path ):
+    """
+    Opens a results database, creating it if it does not exist yet.
+
+    @param  path    The path to the database file.
+
+    @return The sqlite3 connection.
+    """
+    # Several scenarios may be reparsed at the same time: wait for each other's transactions
+    connection = sqlite3.connect( path, timeout = 60 )
+    try:
+        version = connection.execute( 'PRAGMA user_version' ).fetchone()[0]
+        if version == 0:
+            # Create the schema in a single write transaction, so concurrent openers of a new database wait for each
+            # other; the version is read again since another opener may have created the schema in the meantime
+            connection.isolation_level = None
+            try:
+                connection.execute( 'BEGIN IMMEDIATE' )
+                try:
+                    version = connection.execute( 'PRAGMA user_version' ).fetchone()[0]
+                    if version == 0:
+                        for statement in SCHEMA:
+                            connection.execute( statement )
+                        connection.execute( 'PRAGMA user_version = {0}'.format( SCHEMA_VERSION ) )
+                        version = SCHEMA_VERSION
+                    connection.execute( 'COMMIT' )
+                except:
+                    connection.execute( 'ROLLBACK' )
+                    raise
+            finally:
+                connection.isolation_level = ''
+        if version != SCHEMA_VERSION:
+            raise Exception( "Results database {0} has schema version {1}, but version {2} is supported".format( path, version, SCHEMA_VERSION ) )
+    except:
+        connection.close()
+        raise
+    return connection
+
+def openDatabases( paths ):
+    """
+    Opens one or more results databases to query them together.
+
+    Each table is available as a temporary view with the union of that table in all databases, with an extra first
+    column campaign that holds the name of the campaign directory of the database (suffixed with its index if that
+    name is used more than once). SQLite attaches at most 10 databases by default.
+
+    @param  paths   The list of paths to the database files.
+
+    @return A tuple (sqlite3 connection, list of the campaign names in the order of paths).
+    """
+    connection = sqlite3.connect( ':memory:' )
+    try:
+        labels = []
+        selects = dict( [( table, [] ) for table in TABLES] )
+        for index in xrange( len(paths) ):
+            path = paths[index]
+            if not os.path.isfile( path ):
+                raise Exception( "Results database {0} does not exist".format( path ) )
+            connection.execute( 'ATTACH DATABASE ? AS db{0}'.format( index ), ( path, ) )
+            version = connection.execute( 'PRAGMA db{0}.user_version'.format( index ) ).fetchone()[0]
+            if version != SCHEMA_VERSION:
+                raise Exception( "Results database {0} has schema version {1}, but version {2} is supported".format( path, version, SCHEMA_VERSION ) )
+            label = os.path.basename( os.path.dirname( os.path.abspath( path ) ) )
+            if label in labels:
+                label = '{0}#{1}'.format( label, index )
+            labels.append( label )
+            for table in TABLES:
+                selects[table].append( "SELECT '{0}' AS campaign, * FROM db{1}.{2}".format( label.replace( "'", "''" ), index, table ) )
+        for table in TABLES:
+            connection.execute( 'CREATE TEMP VIEW {0} AS {1}'.format( table, ' UNION ALL '.join( selects[table] ) ) )
+    except:
+        connection.close()
+        raise
+    return ( connection, labels )
@@ -0,0 +1,233 @@
+import time
+import struct
+import threading
+
+from core.campaign import Campaign
+from core.utility import utility
+
+# The list of files needed for the resource sampler utility
+samplerSourceFiles = ['resourcesampler.c']
+
+# The magic string at the start of each sample file
+SAMPLE_MAGIC = 'RSAMPLE\0'
+# The version of the sample file format written by the resource sampler
+SAMPLE_VERSION = 2
+# The fields of each sample in version 1 sample files, which do not describe their fields
+SAMPLE_FIELDS_V1 = [('utime', 'ticks'), ('stime', 'ticks'), ('cutime', 'ticks'), ('cstime', 'ticks'), ('vsize', 'kB'), ('rss', 'kB')]
+
+# The resource sampler utility, see core.utility
+samplerUtility = utility( 'the resource sampler', 'sampler', 'resourcesampler', 'resourcesampler', samplerSourceFiles, 'gcc' )
+
+def readSamples( path ):
+    """
+    Reads a sample file as written by the resource sampler.
+
+    Sample files describe their own fields, so fields added by later versions of the sampler are read as well.
+    See Utils/resourcesampler/resourcesampler.c for the fields and the format.
+
+    @param  path    The path to the sample file.
+
+    @return A tuple (clockTicks, interval, fields, samples), with clockTicks the number of clock ticks per second of
+            the CPU times, interval the sampling interval in seconds, fields a list of (name, unit) tuples of the
+            fields of each sample and samples a list of tuples (time, value, value, ...), with time in seconds since
+            the epoch followed by the value of each field.
+    """
+    f = open( path, 'rb' )
+    try:
+        data = f.read()
+    finally:
+        f.close()
+    if len(data) < 32 or data[:8] != SAMPLE_MAGIC:
+        raise Exception( "{0} is not a resource sample file".format( path ) )
+    # The sampler writes in the native byte order of the sampling host
+    for order in ['<', '>']:
+        if struct.unpack( order + 'I', data[8:12] )[0] == 0x01020304:
+            break
+    else:
+        raise Exception( "Unknown byte order in resource sample file {0}".format( path ) )
+    version, clockTicks, intervalUs = struct.unpack( order + 'III', data[12:24] )
+    if version == 1:
+        fields = SAMPLE_FIELDS_V1
+        offset = 32
+    elif version == SAMPLE_VERSION:
+        fieldCount, descriptionSize = struct.unpack( order + 'II', data[24:32] )
+        offset = 32 + descriptionSize
+        descriptions = data[32:offset].split( '\0' )[:fieldCount]
+        if len(data) < offset or len(descriptions) != fieldCount:
+            raise Exception( "Resource sample file {0} has an incomplete header".format( path ) )
+        fields = [tuple( ( d.split( ' ', 1 ) + [''] )[:2] ) for d in descriptions]
+    else:
+        raise Exception( "Resource sample file {0} has version {1}, only versions up to {2} are supported".format( path, version, SAMPLE_VERSION ) )
+    recordFormat = order + 'd' + 'Q' * len(fields)
+    recordSize = struct.calcsize( recordFormat )
+    samples = []
+    # A sample that was being written when the file was retrieved is ignored
+    for start in xrange( offset, len(data) - recordSize + 1, recordSize ):
+        samples.append( struct.unpack( recordFormat, data[start:start + recordSize] ) )
+    return ( clockTicks, intervalUs / 1000000.0, fields, samples )
+
+def sampleColumns( fields, samples, names ):
+    """
+    Returns the values of the given fields from samples as read by readSamples(...).
+
+    @param  fields      The fields of the samples, as returned by readSamples(...).
+    @param  samples     The samples, as returned by readSamples(...).
+    @param  names       The names of the fields to return.
+
+    @return A list with for each sample a tuple (time, value, value, ...) with the values of the requested fields
+            in the requested order; fields that are not in the samples have value 0.
+    """
+    index = dict( [(fields[i][0], i + 1) for i in range(len(fields))] )
+    indices = [0] + [index.get( name, -1 ) for name in names]
+    return [tuple( [sample[i] if i >= 0 else 0 for i in indices] ) for sample in samples]
+
+def convertToCpuLog( samplePath, cpuLogPath ):
+    """
+    Converts a sample file as written by the resource sampler to the cpu.log format of the old profiling loop.
+
+    The dates in the cpu.log are in the local time zone of the commanding host.
+
+    @param  samplePath  The path to the sample file.
+    @param  cpuLogPath  The path to the cpu.log file to write.
+    """
+    clockTicks, _, fields, samples = readSamples( samplePath )
+    samples = sampleColumns( fields, samples, ['utime', 'stime', 'cutime', 'cstime', 'vsize', 'rss'] )
+    f = open( cpuLogPath, 'w' )
+    try:
+        f.write( '{0}\n'.format( clockTicks ) )
+        for sample in samples:
+            f.write( '{0}.{1:09d}\n'.format( time.strftime( '%y-%m-%d %H:%M:%S', time.localtime( sample[0] ) ), int( ( sample[0] % 1 ) * 1000000000 ) ) )
+            f.write( '0 (sampled) S 0 0 0 0 0 0 0 0 0 0 {0} {1} {2} {3} 0 0 0\n'.format( sample[1], sample[2], sample[3], sample[4] ) )
+            f.write( '{0} {1}\n'.format( sample[5], sample[6] ) )
+    finally:
+        f.close()
+
+class sampler:
+    """
+    Manages the resource sampler on the remote hosts.
+
+    The resource sampler (Utils/resourcesampler) is a small native utility that samples the resource usage of all
+    registered processes on a host from /proc, without forking. One sampler runs per host; each profiled execution
+    registers its PID and sample file with it through the command returned by registerCommand(...). The sampler
+    stops when stop(...) removes its registration file.
+
+    The sampler is built once locally and shipped to hosts of the same architecture, where it is kept in the
+    persistent test dir. It is only compiled remotely as a fallback. See core.utility.
+    """
+
+    running = {}                # Dictionary host->(PID, interval) of the samplers started by start(...)
+    running__lock = threading.Lock()
+
+    @staticmethod
+    def getRemoteBinary(host):
+        """
+        Makes sure the resource sampler is available on the host and returns its path.
+
+        @param  host        The host on which the sampler is needed.
+
+        @return The path to the binary on the remote host, or None if it could not be made available.
+        """
+        return samplerUtility.getRemoteBinary( host )
+
+    @staticmethod
+    def getRegistrationFile(host):
+        """
+        Returns the path to the registration file of the sampler on the host.
+
+        @param  host        The host of the sampler.
+
+        @return The path to the registration file on the remote host.
+        """
+        return '{0}/resourcesampler.reg'.format( host.getTestDir() )
+
+    @staticmethod
+    def start(host, interval):
+        """
+        Makes sure a resource sampler runs on the host with at most the given interval.
+
+        If a sampler already runs on the host with a larger interval it is restarted with the new interval. This
+        is meant to be called while preparing the host, before any process is registered.
+
+        @param  host        The host on which to run the sampler.
+        @param  interval    The sampling interval in seconds.
+
+        @return True iff the sampler is running, False if it could not be started.
+        """
+        intervalMs = max( 1, int( round( interval * 1000 ) ) )
+        try:
+            sampler.running__lock.acquire()
+            if host in sampler.running:
+                if sampler.running[host] is None:
+                    return False
+                if sampler.running[host][1] <= intervalMs:
+                    return True
+            binary = sampler.getRemoteBinary( host )
+            if not binary:
+                sampler.running[host] = None
+                return False
+            if host in sampler.running:
+                host.sendCommand( 'kill {0} 2>/dev/null'.format( sampler.running[host][0] ) )
+            res = host.sendCommand( 'touch "{1}" && ( nohup "{0}" {2} "{1}" > /dev/null 2>&1 < /dev/null & echo "PID $!" )'.format( binary, sampler.getRegistrationFile( host ), intervalMs ) )
+            if res[:4] != 'PID ':
+                Campaign.logger.log( "Could not start the resource sampler on host {0}. Response: {1}".format( host.name, res ) )
+                sampler.running[host] = None
+                return False
+            sampler.running[host] = ( res[4:].strip(), intervalMs )
+            return True
+        finally:
+            sampler.running__lock.release()
+
+    @staticmethod
+    def isRunning(host):
+        """
+        Returns whether start(...) started a sampler on the host.
+
+        @param  host        The host to check.
+
+        @return True iff a sampler was started and not stopped.
+        """
+        try:
+            sampler.running__lock.acquire()
+            return host in sampler.running and sampler.running[host] is not None
+        finally:
+            sampler.running__lock.release()
+
+    @staticmethod
+    def registerCommand(host, pidExpression, samplePath):
+        """
+        Returns the command to register a process with the sampler on the host.
+
+        @param  host            The host of the sampler.
+        @param  pidExpression   The shell expression for the PID of the process, e.g. $myPid.
+        @param  samplePath      The path to the sample file on the remote host.
+
+        @return The command to include in a script on the host.
+        """
+        return 'echo "{0} {1}" >> "{2}"'.format( pidExpression, samplePath, sampler.getRegistrationFile( host ) )
+
+    @staticmethod
+    def stop(host, reuseConnection = None):
+        """
+        Stops the sampler on the host, if any.
+
+        The sampler finishes its current samples and exits once it notices its registration file is gone.
+
+        @param  host            The host on which to stop the sampler.
+        @param  reuseConnection If not None, force the use of this connection object for commands to the host.
+        """
+        connection = True
+        if reuseConnection:
+            connection = reuseConnection
+        try:
+            sampler.running__lock.acquire()
+            if host not in sampler.running:
+                return
+            if sampler.running[host] is not None and host.getTestDir():
+                host.sendCommand( 'rm -f "{0}"'.format( sampler.getRegistrationFile( host ) ), connection )
+            del sampler.running[host]
+        finally:
+            sampler.running__lock.release()
+
+    @staticmethod
+    def APIVersion():
+        return "2.4.0-core"
@@ -128,6 +128,21 @@ class source(coreObject):
 
     # This method has unused arguments; that's fine
     # pylint: disable-msg=W0613
+    def revision(self, client):
+        """
+        Returns an identifier of the exact revision of the local sources of the client.
+
+        This is used to look up local builds in the local build cache: builds are only cached for sources of
+        which the revision is known. Valid after prepareLocal(...) has been called.
+
+        The default implementation returns None, i.e. the revision is unknown.
+
+        @param  client      The client for which the local sources were prepared.
+
+        @return The revision identifier string, or None if it is unknown.
+        """
+        return None
+
     def localLocation(self, client):
         """
         Returns the local location of the client sources.
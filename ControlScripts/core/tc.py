@@ -41,6 +41,25 @@ class tc(coreObject):
         raise Exception( "Not implemented" )
     # pylint: enable-msg=W0613
 
+    # This method has unused arguments; that's fine
+    # pylint: disable-msg=W0613
+    def verify(self, host, reuseConnection = None):
+        """
+        Verifies that the traffic control installed by install(...) is active on the host.
+
+        This is called after install(...) and before any client is started, so a failed installation is detected
+        instead of resulting in unshaped measurements.
+
+        The default implementation assumes install(...) would have raised an Exception on failure and returns True.
+
+        @param  host            The host on which TC was installed.
+        @param  reuseConnection If not None, force the use of this connection object for commands to the host.
+
+        @return True iff the traffic control is active.
+        """
+        return True
+    # pylint: enable-msg=W0613
+
     # This method has unused arguments; that's fine
     # pylint: disable-msg=W0613
     def remove(self, host, reuseConnection = None):
@@ -0,0 +1,176 @@
+import os
+import random
+import hashlib
+import platform
+import subprocess
+import threading
+
+from core.campaign import Campaign
+
+class utility:
+    """
+    A small native utility from Utils that is needed on the remote hosts, such as the fakedata utility.
+
+    The utility is built only once locally and kept in the local cache, keyed by architecture and by a hash of its
+    sources. It is shipped to hosts of the same architecture, where it is kept in the persistent test dir so later
+    scenarios reuse it; on other hosts, or if the local build does not run there, it is compiled remotely as a
+    fallback. Since both the local cache and the persistent test dirs may be shared, e.g. by campaigns running in
+    parallel or over NFS, binaries are always built under a temporary name and renamed in place.
+    """
+
+    name = None                 # The name of the utility in log messages, e.g. 'the fakedata utility'
+    cacheName = None            # The name of the local cache and the prefix of the remote directories
+    binaryName = None           # The name of the binary, which is suffixed by architecture and source hash
+    sourceDir = None            # The path to the directory of the sources
+    sourceFiles = None          # The list of the names of the source files; the ones that aren't headers are compiled
+    compiler = None             # The command of the compiler, e.g. 'gcc'
+
+    localBinaries = None        # Locally built binary: maps source hash to the path of the binary, or to None if building failed
+    localBinaries__lock = None
+
+    def __init__(self, name, cacheName, binaryName, sourceDir, sourceFiles, compiler):
+        """
+        Initialization of a utility.
+
+        @param  name            The name of the utility in log messages.
+        @param  cacheName       The name of the local cache; the remote directories are cacheName-bin and
+                                cacheName-source-hash.
+        @param  binaryName      The name of the binary.
+        @param  sourceDir       The name of the directory of the sources in Utils.
+        @param  sourceFiles     The list of the names of the source files.
+        @param  compiler        The command of the compiler.
+        """
+        self.name = name
+        self.cacheName = cacheName
+        self.binaryName = binaryName
+        self.sourceDir = sourceDir
+        self.sourceFiles = sourceFiles
+        self.compiler = compiler
+        self.localBinaries = {}
+        self.localBinaries__lock = threading.Lock()
+
+    def getSourcePath(self, f):
+        """
+        Returns the local path to a source file of the utility.
+
+        @param  f       The name of the source file.
+
+        @return The path to the source file.
+        """
+        return os.path.join( Campaign.testEnvDir, 'Utils', self.sourceDir, f )
+
+    def getCompiledFiles(self):
+        """
+        Returns the names of the source files that are compiled.
+
+        @return The list of the names of the source files that aren't headers.
+        """
+        return [f for f in self.sourceFiles if f[-2:] != '.h']
+
+    def sourceHash(self):
+        """
+        Returns a hash identifying the current sources of the utility.
+
+        @return The hexadecimal SHA1 hash over the names and contents of the source files.
+        """
+        h = hashlib.new( 'sha1' )
+        for f in self.sourceFiles:
+            fObj = open( self.getSourcePath( f ), 'r' )
+            h.update( '{0}\0{1}\0'.format( f, fObj.read() ) )
+            fObj.close()
+        return h.hexdigest()
+
+    def getLocalBinary(self):
+        """
+        Returns the locally built utility for the current sources, building it if needed.
+
+        A static build is tried first, since that is the most likely to run on other hosts with the same architecture.
+
+        @return A tuple (arch, path) with the architecture and the path to the local binary, or None if it could not be built.
+        """
+        srcHash = self.sourceHash()
+        arch = platform.machine()
+        try:
+            self.localBinaries__lock.acquire()
+            if srcHash not in self.localBinaries:
+                binary = os.path.join( Campaign.getCacheDir( self.cacheName ), '{0}-{1}-{2}'.format( self.binaryName, arch, srcHash ) )
+                if not os.path.isfile( binary ):
+                    print "Locally compiling {0} for {1}".format( self.name, arch )
+                    sources = [self.getSourcePath( f ) for f in self.getCompiledFiles()]
+                    # Build next to the final binary and rename afterwards: the cache may be shared by parallel campaigns
+                    tmpBinary = '{0}.tmp{1}'.format( binary, os.getpid() )
+                    for flags in [['-O2', '-static'], ['-O2']]:
+                        try:
+                            proc = subprocess.Popen( [self.compiler] + flags + sources + ['-o', tmpBinary], stdout=subprocess.PIPE, stderr=subprocess.STDOUT )
+                            out = proc.communicate()[0]
+                        except OSError as exc:
+                            out = exc.__str__()
+                            proc = None
+                        if proc and proc.returncode == 0:
+                            os.rename( tmpBinary, binary )
+                            break
+                        Campaign.logger.log( "Could not locally compile {0} with flags {1}: {2}".format( self.name, ' '.join( flags ), out ) )
+                    else:
+                        if os.path.exists( tmpBinary ):
+                            os.remove( tmpBinary )
+                        binary = None
+                self.localBinaries[srcHash] = binary
+            if self.localBinaries[srcHash] is None:
+                return None
+            return ( arch, self.localBinaries[srcHash] )
+        finally:
+            self.localBinaries__lock.release()
+
+    def getRemoteBinary(self, host):
+        """
+        Makes sure the utility is available on the host and returns its path.
+
+        A binary for the current sources that is already in the persistent test dir of the host is reused. Otherwise
+        the local build is shipped if the architectures match and it runs on the host, or else the utility is compiled
+        on the host.
+
+        The binary is checked by running it without arguments, which must print its usage.
+
+        @param  host        The host on which the utility is needed.
+
+        @return The path to the binary on the remote host, or None if it could not be made available.
+        """
+        srcHash = self.sourceHash()
+        remoteBinDir = '{0}/{1}-bin'.format( host.getPersistentTestDir(), self.cacheName )
+        checkCommand = '[ -x "{0}" ] && "{0}" | grep -q "^Usage:" && echo && echo "OK"'
+        res = host.sendCommand( 'A=`uname -m`; echo "$A"; B="{0}/{1}-$A-{2}"; {3}'.format( remoteBinDir, self.binaryName, srcHash, checkCommand.format( '$B' ) ) )
+        remoteArch = res.splitlines()[0].strip() if res != '' else ''
+        if remoteArch == '':
+            Campaign.logger.log( "Could not determine the architecture of host {0} for {1}. Response: {2}".format( host.name, self.name, res ) )
+            return None
+        remoteBinary = '{0}/{1}-{2}-{3}'.format( remoteBinDir, self.binaryName, remoteArch, srcHash )
+        if res[-2:] == "OK":
+            return remoteBinary
+
+        host.sendCommand( 'mkdir -p "{0}"'.format( remoteBinDir ) )
+        # Other hosts may share the persistent dir (e.g. over NFS), so upload or build under a temporary name and move it in place
+        tmpBinary = '{0}.tmp{1}'.format( remoteBinary, random.randint( 0, 2**31 ) )
+        localBinary = self.getLocalBinary()
+        if localBinary and localBinary[0] == remoteArch:
+            host.sendFile( localBinary[1], tmpBinary, True )
+            res = host.sendCommand( 'chmod +x "{0}"; {1}'.format( tmpBinary, checkCommand.format( tmpBinary ) ) )
+            if res[-2:] == "OK":
+                host.sendCommand( 'mv -f "{0}" "{1}"'.format( tmpBinary, remoteBinary ) )
+                return remoteBinary
+            host.sendCommand( 'rm -f "{0}"'.format( tmpBinary ) )
+            Campaign.logger.log( "The local build of {0} does not run on host {1}, compiling it remotely".format( self.name, host.name ) )
+
+        remoteBaseDir = '{0}/{1}-source-{2}'.format( remoteBinDir, self.cacheName, srcHash )
+        host.sendCommand( 'mkdir -p "{0}"'.format( remoteBaseDir ) )
+        for f in self.sourceFiles:
+            host.sendFile( self.getSourcePath( f ), '{0}/{1}'.format( remoteBaseDir, f ), True )
+        res = host.sendCommand( '( cd "{0}"; {1} -O2 {2} -o "{3}" && mv -f "{3}" "{4}" && echo && echo "OK" )'.format(
+                remoteBaseDir, self.compiler, ' '.join( self.getCompiledFiles() ), tmpBinary, remoteBinary ) )
+        if res[-2:] != "OK":
+            Campaign.logger.log( "Could not build {0} in directory {1} on host {2}. Response: {3}".format( self.name, remoteBaseDir, host.name, res ) )
+            return None
+        return remoteBinary
+
+    @staticmethod
+    def APIVersion():
+        return "2.4.0-core"
@@ -87,16 +87,19 @@ class workload(coreObject):
         if not self.applyList:
             self.applyList = [c for c in self.scenario.getObjectsDict('client')]
         self.applyList = list(set(self.applyList))
-        found = False
         for c in self.applyList:
             if c not in self.scenario.getObjectsDict('client'):
                 if c.find('@') >= 0:
                     raise Exception( "Workload {0} is instructed to apply itself to client {1}, but that client contains an argument selector. Argument selectors are not supported by workloads.".format( self.__class__.__name__, c ) )
                 else:
                     raise Exception( "Workload {0} is instructed to apply itself to client {1}, but that client does not exist.".format( self.__class__.__name__, c ) )
-            for e in [e for e in self.scenario.getObjects('execution') if e.client.name == c]:
-                if not e.isSeeder() or self.applySeeders:
-                    found = True
+        # The scenario has not indexed its executions yet, so go over all of them once
+        applySet = set(self.applyList)
+        found = False
+        for e in self.scenario.getObjects('execution'):
+            if e.client.name in applySet and ( not e.isSeeder() or self.applySeeders ):
+                found = True
+                break
         if not found:
             Campaign.logger.log( "Workload {0} has not found any executions to which it will apply itself." )
 
@@ -109,10 +112,24 @@ class workload(coreObject):
         The parent implementation will check each of those executions to see if no timeout was set, yet.
         If any non-zero timeout is found a warning will be generated in the log.
         """
-        for e in [e for e in self.scenario.getObjects('execution') if e.client.name in self.applyList]:
-            if self.applySeeders or not e.isSeeder():
-                if e.timeout != 0:
-                    Campaign.logger.log( "Workload {0} is instructed to apply to client {1}, which includes execution {2}. That execution already has a timeout, however, which will be overwritten. Note that it is not supported to have multiple workloads apply to the same client, nor is it supported to have manual timeout parameters on execution that will be touched by a workload.".format( self.__class__.__name__, e.client.name, e.getNumber() ) )
+        for e in self.getExecutions():
+            if e.timeout != 0:
+                Campaign.logger.log( "Workload {0} is instructed to apply to client {1}, which includes execution {2}. That execution already has a timeout, however, which will be overwritten. Note that it is not supported to have multiple workloads apply to the same client, nor is it supported to have manual timeout parameters on execution that will be touched by a workload.".format( self.__class__.__name__, e.client.name, e.getNumber() ) )
+
+    def getExecutions(self):
+        """
+        Returns the executions this workload applies to: those of the clients in the apply list, without the seeders
+        unless the workload also applies to seeders.
+
+        Uses the execution index of the scenario, so this may only be used from applyWorkload() on.
+
+        @return A list of execution objects, in order of their number.
+        """
+        clients = self.scenario.getObjectsDict('client')
+        executions = []
+        for c in self.applyList:
+            executions += [e for e in self.scenario.getExecutionsOfClient( clients[c] ) if self.applySeeders or not e.isSeeder()]
+        return sorted( executions, key = lambda e: e.getNumber() )
     
     def getModuleType(self):
         """
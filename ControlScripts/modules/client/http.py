@@ -238,7 +238,7 @@ class http(client):
                 return
             # Figure out all the servers (yes, HTTP cheats by knowing all the servers ahead)
             servers = []
-            for e in [e for e in self.scenario.getObjects('execution') if e.isSeeder()]:
+            for e in self.scenario.getSeedingExecutions():
                 if e.host.getAddress() == '':
                     raise Exception( 'client:http requires each seeding host to return a valid address in their getAddress() method, but host {0} return ""'.format( e.host.name ) )
                 p = self.port
@@ -146,12 +146,14 @@ class opentracker(client):
                 raise Exception( "Client {0} was instructed to change some torrent files to update their trackers, but host {1} won't give an address for that.".format( self.name, host.name ) )
             newTracker = 'http://{0}:{1}/announce'.format( newTracker, self.port )
             # Grab all executions for clients in our changeClientTrackers list and go over their files, adding them to changeTrackers as needed
-            for e in [e for e in self.scenario.getObjects('execution') if e.client.getName() in self.changeClientTrackers]:
-                for f in e.files:
-                    if not f.metaFile or not os.path.exists( f.metaFile ) or os.path.isdir( f.metaFile ):
-                        continue
-                    if f.getName() not in self.changeTrackers:
-                        self.changeTrackers.append( f.getName() )
+            clients = self.scenario.getObjectsDict( 'client' )
+            for c in self.changeClientTrackers:
+                for e in self.scenario.getExecutionsOfClient( clients[c] ):
+                    for f in e.files:
+                        if not f.metaFile or not os.path.exists( f.metaFile ) or os.path.isdir( f.metaFile ):
+                            continue
+                        if f.getName() not in self.changeTrackers:
+                            self.changeTrackers.append( f.getName() )
             # Update all file objects mentioned in changeTrackers
             for f in self.changeTrackers:
                 tmpfd = None
@@ -1,13 +1,16 @@
 from core.parsing import isPositiveInt
 from core.campaign import Campaign
 import core.file
+import core.meta
 from core.meta import meta
+from core.metacache import metacache
+from core.utility import utility
 
 import os
 import pickle
+import pipes
 import tempfile
 import shutil
-import subprocess
 import random
 
 def parseError( msg ):
@@ -19,20 +22,96 @@ def parseError( msg ):
 # The list of files needed for the fakedata utility
 fakedataGeneratorFiles = ['compat.h', 'fakedata.h', 'fakedata.cpp', 'genfakedata.cpp']
 
+# The fakedata utility, see core.utility
+fakedataUtility = utility( 'the fakedata utility', 'fakedata', 'genfakedata', 'fakedata', fakedataGeneratorFiles, 'g++' )
+
+# Lookup tables for the two least significant bytes of the fake data counter, see fakedataBlocks(...)
+_lowByteTable = ''.join( [chr(b) for b in range(256)] ) * 2
+_secondByteTable = ''.join( [chr(b) * 256 for b in range(256)] ) * 2
+
+def _counterByteCycle( table, start, count ):
+    """
+    Returns count bytes of the periodic sequence in table, starting at index start.
+
+    The table must contain the period of the sequence twice.
+    """
+    period = len(table) / 2
+    start = start % period
+    if count <= period:
+        return table[start:start + count]
+    return ( table[start:start + period] * ( count / period + 1 ) )[:count]
+
+def _counterByteRuns( start, count, shift ):
+    """
+    Returns the string of byte ((start + k) >> shift) & 0xFF for k in [0, count).
+
+    For large shifts this string consists of only a few long runs of the same byte.
+    """
+    runs = []
+    k = 0
+    while k < count:
+        value = start + k
+        runLength = min( count - k, ( ( ( value >> shift ) + 1 ) << shift ) - value )
+        runs.append( chr( ( value >> shift ) & 0xFF ) * runLength )
+        k += runLength
+    return ''.join( runs )
+
+def fakedataBlocks( ksize, offset = 0, blocksize = 1024 * 1024 ):
+    """
+    Generates the contents of a fake data file in memory, without any disk I/O.
+
+    The generated data is byte-for-byte identical to what Utils/fakedata/genfakedata writes when
+    called as 'genfakedata file ksize offset': each 4 bytes hold a 32-bit big-endian counter,
+    starting at offset and wrapping around at 2^32.
+
+    Instead of packing each counter separately, every byte position of the counter is filled for
+    the whole block at once using extended slice assignment on a bytearray. The two least
+    significant bytes cycle quickly and are taken from lookup tables, the other two are long runs
+    of the same value.
+
+    @param  ksize       The size of the fake data in kbytes; rounded up to a multiple of 4 like genfakedata does.
+    @param  offset      The initial value of the counter.
+    @param  blocksize   The maximum size of the generated blocks in bytes; must be a multiple of 4.
+
+    @return A generator yielding strings of blocksize bytes, except possibly the last one.
+    """
+    if blocksize < 4 or blocksize % 4 != 0:
+        raise ValueError( "blocksize must be a positive multiple of 4" )
+    if ksize % 4 != 0:
+        ksize = ksize - ( ksize % 4 ) + 4
+    words = ksize * 256
+    word = 0
+    while word < words:
+        count = min( blocksize / 4, words - word )
+        start = offset + word
+        buf = bytearray( 4 * count )
+        buf[3::4] = _counterByteCycle( _lowByteTable, start, count )
+        buf[2::4] = _counterByteCycle( _secondByteTable, start, count )
+        buf[1::4] = _counterByteRuns( start, count, 16 )
+        buf[0::4] = _counterByteRuns( start, count, 24 )
+        yield str( buf )
+        word += count
+
 class fakedata(core.file.file):
     """
     A file implementation for generated, fake data.
     
-    This module uses Utils/fakedata to generate the data for the files.
+    This module uses Utils/fakedata to generate the data for the files on the seeding hosts. Root hashes and torrents are
+    calculated locally from the same data generated in memory by fakedataBlocks(...), so no local files are written.
     
     Extra parameters:
     - ksize             A positive integer, divisible by 4, that denotes the size of the generated file in kbytes. Required.
-    - binary            The path of the remote binary to use. This might be needed when g++ does not work on one of the hosts
-                        this file is used on. Optional, defaults to "" which will have the binary compiled on the fly.
+    - binary            The path of the remote binary to use. This might be needed when neither the locally built binary nor
+                        g++ works on one of the hosts this file is used on. Optional, defaults to "" which will have the binary
+                        built once locally and shipped to hosts of the same architecture, or compiled on the fly on other hosts.
     - filename          The name of the file that will be created. Optional, defaults to "fakedata".
     - multiple          The number of fake data files to generate. Optional positive integer, defaults to 1. If a multiple
                         higher than 1 is specified, the filenames will be "{0}_{1}".format( filename, filecounter ) for
                         filecounter from 0 to (multiple-1)
+    - writers           The maximum number of fake data files generated in parallel on each seeding host. Optional positive
+                        integer, defaults to 4, and never more than the number of cores of the host. Use 1 for hosts that
+                        write to a single rotational disk. Files left by an earlier scenario in a persistent remote directory
+                        are reused if their size and the recorded root hashes still match.
     - generateTorrent   If set to anything but "" the file:fakedata will create torrent meta files for each fake data file
                         and associate the file:fakedata instances with those meta files. Optional, requires metaFile to not
                         be set.
@@ -49,6 +128,8 @@ class fakedata(core.file.file):
     - rootHashCache     Path to a local file. If set, this file is taken to be a root hash cache for fakedata files. The cache
                         is a binary file containing a pickled python dictionary. Any present root hashes will be used from
                         cache, others will be added. Optional, must point to a writable (possibly not existing) file.
+                        Generated root hashes are always kept in the shared meta data cache (see core.metacache) as well,
+                        so this is only needed to carry root hashes between testing environments.
     
     Selection arguments:
     - '?'               Will select a random file object from this file:fakedata's collection. Especially useful if multiple > 1
@@ -74,7 +155,10 @@ class fakedata(core.file.file):
     rootHashMap = None          # Map of generated root hashes
     tmpTorrentDir = None        # Path to a temporary torrent directory
 
+    writers = None              # The maximum number of fake data files to generate in parallel on a seeding host
+
     seedingHostSeen = None      # A list of seeding hosts which have already been seen for sendToSeedingHost
+    manifests = None            # Map of seeding host to the manifest of fake data files generated on that host
 
     def __init__(self, scenario):
         """
@@ -85,6 +169,7 @@ class fakedata(core.file.file):
         core.file.file.__init__(self, scenario)
         self.slaves = {}
         self.seedingHostSeen = []
+        self.manifests = {}
         self.generateRootHashes = []
 
     def parseSetting(self, key, value):
@@ -135,6 +220,12 @@ class fakedata(core.file.file):
             if not isPositiveInt( value, True ):
                 parseError( "multiple must be a positive, non-zero integer" )
             self.multiple = int(value)
+        elif key == 'writers':
+            if self.writers:
+                parseError( "writers may be specified only once" )
+            if not isPositiveInt( value, True ):
+                parseError( "writers must be a positive, non-zero integer" )
+            self.writers = int(value)
         elif key == 'generateRootHash':
             fallback = False
             if value[-1:] == 'L':
@@ -193,7 +284,9 @@ class fakedata(core.file.file):
                     raise Exception( "A file seems to be missing from Utils/fakedata: {0} is required to build the fakedata utility.".format( f ) )
         if not self.multiple:
             self.multiple = 1
-        elif self.multiple > 1:
+        if not self.writers:
+            self.writers = 4
+        if self.multiple > 1:
             if self.metaFile:
                 raise Exception( "Meta files are not supported when setting multiple > 1." )
             if len(self.rootHashes) > 0:
@@ -226,6 +319,16 @@ class fakedata(core.file.file):
                             break
                 else:
                     self.rootHashMap = {}
+                # Fill in missing root hashes from the shared meta data cache
+                cache = metacache.getCache()
+                for count in range(self.multiple):
+                    for cs in self.generateRootHashes:
+                        if (self.size, count) not in self.rootHashMap or cs not in self.rootHashMap[(self.size, count)]:
+                            rootHash = cache.get( 'fakedata-roothash|{0}|{1}|{2}'.format( self.size, count, cs ) )
+                            if rootHash is not None:
+                                if (self.size, count) not in self.rootHashMap:
+                                    self.rootHashMap[(self.size, count)] = {}
+                                self.rootHashMap[(self.size, count)][cs] = rootHash
             torrentDir = '' # So os.path.join(torrentDir,...) won't complain
             if self.generateTorrent:
                 # Set torrentDir to either the cache dir or a new temporary dir
@@ -234,7 +337,6 @@ class fakedata(core.file.file):
                 else:
                     self.tmpTorrentDir = tempfile.mkdtemp()
                     torrentDir = self.tmpTorrentDir
-            tempdir = ''
             torrentFound = 0
             rootHashFound = 0
             for count in range(self.multiple):
@@ -266,56 +368,52 @@ class fakedata(core.file.file):
                     print "- {0} out of {1} root hashes are cached, calculating {2}".format( rootHashFound, self.multiple * len(self.generateRootHashes), (self.multiple * len(self.generateRootHashes)) - rootHashFound )
                     needGeneration = True
             if needGeneration:
-                if not os.path.exists( os.path.join( Campaign.testEnvDir, 'Utils', 'fakedata', 'genfakedata' ) ):
-                    raise Exception( "The Utils/fakedata/genfakedata utility is required to build a fakedata file for on-the-fly torrent and root hash creation. Please run something like 'g++ *.cpp -o genfakedata' inside Utils/fakedata/ to create it." )
-                try:
-                    tempdir = tempfile.mkdtemp()
-                    for count in range(self.multiple):
-                        # Figure out the would-be names of the file and the torrent file
-                        if count == 0 and self.multiple == 1:
-                            # Special naming convention for multiple == 1
-                            torrentName = os.path.join( torrentDir, '{0}.torrent'.format( self.size ) )
-                            filename = os.path.join( tempdir, self.filename )
-                        else: 
-                            torrentName = os.path.join( torrentDir, '{0}_{1}.torrent'.format( self.size, count ) )
-                            filename = os.path.join( tempdir, '{0}_{1}'.format( self.filename, count ) )
-                        # Check whether root hashes and/or torrent files are needed and not cached
-                        needRootHashes = []
-                        if len(self.generateRootHashes) > 0:
-                            if (self.size, count) not in self.rootHashMap:
-                                needRootHashes = self.generateRootHashes
+                for count in range(self.multiple):
+                    # Figure out the would-be names of the file and the torrent file
+                    if count == 0 and self.multiple == 1:
+                        # Special naming convention for multiple == 1
+                        torrentName = os.path.join( torrentDir, '{0}.torrent'.format( self.size ) )
+                        filename = self.filename
+                    else: 
+                        torrentName = os.path.join( torrentDir, '{0}_{1}.torrent'.format( self.size, count ) )
+                        filename = '{0}_{1}'.format( self.filename, count )
+                    # Check whether root hashes and/or torrent files are needed and not cached
+                    needRootHashes = []
+                    if len(self.generateRootHashes) > 0:
+                        if (self.size, count) not in self.rootHashMap:
+                            needRootHashes = self.generateRootHashes
+                        else:
+                            hm = self.rootHashMap[(self.size, count)]
+                            for cs in self.generateRootHashes:
+                                if cs not in hm:
+                                    needRootHashes.append( cs )
+                    needTorrent = self.generateTorrent and not os.path.isfile( torrentName )
+                    if len(needRootHashes) > 0 or needTorrent:
+                        # Only generate the data if either is needed and not cached
+                        # The data is generated in memory and fed to all hashers in a single pass, no file is written
+                        hashers = {}
+                        for cs in needRootHashes:
+                            # Only calculate root hashes that are needed and not cached
+                            if type(cs) != int and cs[-1:] == 'L':
+                                hashers[cs] = core.meta.merkleHasher( self.size * 1024, False, int(cs[:-1]) )
                             else:
-                                hm = self.rootHashMap[(self.size, count)]
-                                for cs in self.generateRootHashes:
-                                    if cs not in hm:
-                                        needRootHashes.append( cs )
-                        needTorrent = self.generateTorrent and not os.path.isfile( torrentName )
-                        if len(needRootHashes) > 0 or needTorrent:
-                            # Only create data file if either is needed and not cached
-                            # Creation is done by external process, since python is TOO RUDDY SLOW for it! Takes about the same time to build (not write) a handful of kilobytes of data as the external (native) program needs to write 50M of it
-                            proc = subprocess.Popen([os.path.abspath(os.path.join( Campaign.testEnvDir, 'Utils', 'fakedata', 'genfakedata' )), os.path.abspath(filename), '{0}'.format(self.size), '{0}'.format(count)], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-                            (out,_) = proc.communicate()
-                            if proc.returncode != 0:
-                                raise Exception( "Generating file {0} of file:fakedata {1} failed. Output: {2}".format( count, self.name, out ) )
-                            
-                            for cs in needRootHashes:
-                                if (self.size, count) not in self.rootHashMap:
-                                    self.rootHashMap[(self.size, count)] = {}
-                                # Only calculate root hashes that are needed and not cached
-                                if type(cs) != int and cs[-1:] == 'L':
-                                    self.rootHashMap[(self.size, count)][cs] = meta.calculateMerkleRootHash( filename, False, int(cs[:-1]))
-                                else:
-                                    self.rootHashMap[(self.size, count)][cs] = meta.calculateMerkleRootHash( filename, True, cs )
-                            if needTorrent:
-                                # Only generate torrent file if needed and not cached
-                                meta.generateTorrentFile( filename, torrentName )
-                            # Better remove the file after calculating and generating: don't need it anymore and we might need the space
-                            os.remove(filename)
-                finally:
-                    # Clean up temp dir with data files
-                    if tempdir and tempdir != '':
-                        shutil.rmtree(tempdir, True)
-                        #pass
+                                hashers[cs] = core.meta.merkleHasher( self.size * 1024, True, cs )
+                        torrentHasher = None
+                        if needTorrent:
+                            # Only generate torrent file if needed and not cached
+                            torrentHasher = core.meta.pieceHasher( 1024 * 1024 )
+                        for data in fakedataBlocks( self.size, count ):
+                            for h in hashers.itervalues():
+                                h.update( data )
+                            if torrentHasher:
+                                torrentHasher.update( data )
+                        if len(needRootHashes) > 0 and (self.size, count) not in self.rootHashMap:
+                            self.rootHashMap[(self.size, count)] = {}
+                        for cs in needRootHashes:
+                            self.rootHashMap[(self.size, count)][cs] = hashers[cs].digest()
+                            metacache.getCache().put( 'fakedata-roothash|{0}|{1}|{2}'.format( self.size, count, cs ), self.rootHashMap[(self.size, count)][cs] )
+                        if torrentHasher:
+                            meta.generateTorrentFileFromPieces( filename, self.size * 1024, torrentHasher.digest(), torrentName )
                 if len(self.generateRootHashes) > 0:
                     if self.rootHashCacheFile: 
                         # Save root hash cache
@@ -357,6 +455,7 @@ class fakedata(core.file.file):
         if self.multiple > 1:
             name1 = self.getName()
             name2 = '{0}@'.format(name1)
+            referringExecutions = [e for e in self.scenario.getObjects('execution') if e.fileNames and (name1 in e.fileNames or name2 in e.fileNames)]
             # Build slave objects that refer to this master for each fake data file beyond number 0
             for count in range(1, self.multiple):
                 fd = fakedata(self.scenario)
@@ -381,7 +480,7 @@ class fakedata(core.file.file):
                         fd.metaFile = os.path.join( self.tmpTorrentDir, '{0}_{1}.torrent'.format( self.size, count ) )
                 self.scenario.addObject(fd)
                 self.slaves[count] = fd
-                for e in [e for e in self.scenario.getObjects('execution') if e.fileNames and (name1 in e.fileNames or name2 in e.fileNames)]:
+                for e in referringExecutions:
                     e.fileNames.append("{0}@{1}".format( self.getName(), count ))
 
     def getByArguments(self, argumentString):
@@ -460,36 +559,79 @@ class fakedata(core.file.file):
         # Figure out command
         binaryCommand = None
         if not self.binary:
-            remoteBaseDir = '{0}/fakedata-source'.format( self.getFileDir(host) )
-            host.sendCommand( 'mkdir -p "{0}"'.format( remoteBaseDir ) )
-            for f in fakedataGeneratorFiles:
-                host.sendFile( os.path.join( Campaign.testEnvDir, 'Utils', 'fakedata', f ), '{0}/{1}'.format( remoteBaseDir, f ), True )
-            res = host.sendCommand( '( cd "{0}"; g++ *.cpp -o genfakedata && echo && echo "OK" )'.format( remoteBaseDir ) )
-            if len(res) < 2:
-                raise Exception( "Too short a response when trying to build genfakedata for file {0} in directory {1} on host {2}: {3}".format( self.name, remoteBaseDir, host.name, res ) )
-            if res[-2:] != "OK":
-                raise Exception( "Could not build genfakedata for file {0} in directory {1} on host {2}. Reponse: {3}".format( self.name, remoteBaseDir, host.name, res ) )
-            binaryCommand = '{0}/genfakedata'.format( remoteBaseDir )
+            binaryCommand = self.getRemoteBinary(host)
         else:
-            res = host.sendCommand( '[ -e "{0}" -a -x "{0}" ] && echo "Y" || echo "N"' )
+            res = host.sendCommand( '[ -e "{0}" -a -x "{0}" ] && echo "Y" || echo "N"'.format( self.binary ) )
             if res != 'Y':
                 raise Exception( "Binary {0} for file {1} does not exist on host {2}".format( self.binary, self.name, host.name ) )
             binaryCommand = self.binary
 
         # Generate files
-        if self.multiple > 1:
-            for filecounter in range(self.multiple):
-                res = host.sendCommand( '"{0}" "{1}/files/{2}_{4}" {3} {4} && echo && echo "OK"'.format( binaryCommand, self.getFileDir(host), self.filename, self.size, filecounter ) )
-                if len(res) < 2:
-                    raise Exception( "Too short a response when trying to generate the fake data file {0}_{3} on host {1}: {2}".format( self.name, host.name, res, filecounter ) )
-                if res[-2:] != "OK":
-                    raise Exception( "Could not generate fake data file {0}_{3} on host {1}: {2}".format( self.name, host.name, res, filecounter ) )
-        else:
-            res = host.sendCommand( '"{0}" "{1}/files/{2}" {3} && echo && echo "OK"'.format( binaryCommand, self.getFileDir(host), self.filename, self.size ) )
-            if len(res) < 2:
-                raise Exception( "Too short a response when trying to generate the fake data file {0} on host {1}: {2}".format( self.name, host.name, res ) )
-            if res[-2:] != "OK":
-                raise Exception( "Could not generate fake data file {0} on host {1}: {2}".format( self.name, host.name, res ) )
+        manifest = self.generateFiles( host, binaryCommand )
+        reused = len([name for name in manifest if manifest[name] == 'REUSED'])
+        if reused > 0:
+            Campaign.logger.log( "Reused {0} out of {1} fake data files of file {2} on host {3}".format( reused, self.multiple, self.name, host.name ) )
+        self.manifests[host] = manifest
+
+    def generateFiles(self, host, binaryCommand):
+        """
+        Generates all fake data files of this file object on a seeding host in a single remote invocation.
+        
+        Up to self.writers files are written in parallel. Each generated file gets a hidden stamp file next to it that
+        records the size, counter offset and the root hashes known for the file. Files of an earlier scenario that still
+        have the expected size and a matching stamp are reused instead of being generated again.
+        
+        @param  host            The seeding host on which to generate the files.
+        @param  binaryCommand   The path to the fakedata utility on the host.
+        
+        @return The manifest of the files: a dictionary from file name to 'CREATED' or 'REUSED'.
+        """
+        specs = []
+        for count in range(self.multiple):
+            if self.multiple > 1:
+                name = '{0}_{1}'.format( self.filename, count )
+            else:
+                name = self.filename
+            fileObj = self.slaves[count] if count in self.slaves else self
+            stamp = '_'.join( ['k{0}'.format( self.size ), 'o{0}'.format( count )] + sorted( ['{0}={1}'.format( cs, fileObj.rootHashes[cs] ) for cs in fileObj.rootHashes] ) )
+            # Quoted for the shell and passed NUL-delimited to xargs, so names may hold spaces and quotes
+            specs += [pipes.quote( str(field) ) for field in [name, self.size, count, stamp]]
+        # The script below is run by sh -c for each file with arguments: name ksize offset stamp
+        script = ( 'if [ -f "$1" ] && [ `wc -c < "$1"` -eq $(( $2 * 1024 )) ] && [ "`cat ".$1.fakedata" 2>/dev/null`" = "$4" ]; '
+                    'then echo "REUSED $1"; '
+                    'elif rm -f "$1" ".$1.fakedata" && "{0}" "$1" $2 $3 > /dev/null && echo "$4" > ".$1.fakedata"; '
+                    'then echo "CREATED $1"; '
+                    'else echo "FAILED $1"; fi' ).format( binaryCommand )
+        res = host.sendCommand( '( cd "{0}/files" && P={1} && N=`nproc 2>/dev/null || echo 1` && if [ $N -lt $P ]; then P=$N; fi && printf \'%s\\0\' {2} | xargs -0 -n 4 -P $P sh -c \'{3}\' sh; echo; echo "DONE" )'.format( self.getFileDir(host), self.writers, ' '.join( specs ), script ) )
+        if res[-4:] != "DONE":
+            raise Exception( "Could not generate the fake data files of file {0} on host {1}: {2}".format( self.name, host.name, res ) )
+        manifest = {}
+        for line in res.splitlines():
+            parts = line.strip().split( ' ', 1 )
+            if len(parts) == 2 and parts[0] in ['CREATED', 'REUSED', 'FAILED']:
+                manifest[parts[1]] = parts[0]
+        failed = [name for name in manifest if manifest[name] == 'FAILED']
+        if len(failed) > 0 or len(manifest) != self.multiple:
+            raise Exception( "Could not generate the fake data files {0} of file {1} on host {2}: {3}".format( ', '.join( failed ), self.name, host.name, res ) )
+        return manifest
+
+    def getRemoteBinary(self, host):
+        """
+        Makes sure the fakedata utility is available on the host and returns its path.
+        
+        The binary is kept in the persistent test dir of the host, keyed by architecture and source hash, so it is reused
+        by later scenarios on hosts with a persistent remote directory. A missing binary is shipped from the local build
+        cache if the architectures match and it runs on the host; otherwise it is compiled on the host as a fallback.
+        See core.utility.
+        
+        @param  host        The host on which the binary is needed.
+        
+        @return The path to the binary on the remote host.
+        """
+        remoteBinary = fakedataUtility.getRemoteBinary( host )
+        if remoteBinary is None:
+            raise Exception( "Could not make the fakedata utility available on host {0} for file {1}, see the log for details".format( host.name, self.name ) )
+        return remoteBinary
 
     def getFileDir(self, host):
         """
@@ -28,6 +28,9 @@ class local(core.file.file):
     - renameFile            Set this to "yes" to have the file renamed when uploaded to an automatically generated
                             name. This is forbidden when automated torent generation is requested. Not valid if
                             path points to a directory.
+
+    Generated root hashes and torrents are kept in the persistent meta data cache (see core.metacache) and are reused
+    as long as the path, size, mtime and inode of the file(s) do not change.
     """
 
     path = None                 # The path of the local file or directory
@@ -120,14 +123,15 @@ class local(core.file.file):
             if self.renameFile:
                 raise Exception( "file:local {0} has requested the uploaded file to be renamed, but {1} is a directory, for which this is not supported".format( self.name, self.path ) )
         if len(self.generateRootHashes) > 0 or self.generateTorrent:
-            meta = Campaign.loadCoreModule('meta')
+            # Root hashes and torrents are taken from the persistent meta data cache when the file has not changed
+            cache = Campaign.loadCoreModule('metacache').getCache()
             # PyLint really doesn't understand dynamic loading
             # pylint: disable-msg=E1101
             for cs in self.generateRootHashes:
                 if type(cs) != int and cs[-1:] == 'L':
-                    self.rootHashes[cs] = meta.calculateMerkleRootHash( self.path, False, int(cs[:-1]) ).encode( 'hex' )
+                    self.rootHashes[cs] = cache.calculateMerkleRootHash( self.path, False, int(cs[:-1]) ).encode( 'hex' )
                 else:
-                    self.rootHashes[cs] = meta.calculateMerkleRootHash( self.path, True, cs).encode( 'hex' )
+                    self.rootHashes[cs] = cache.calculateMerkleRootHash( self.path, True, cs).encode( 'hex' )
                 if cs == 1:
                     self.rootHash = self.rootHashes[1]
             if self.generateTorrent:
@@ -136,7 +140,7 @@ class local(core.file.file):
                 tempfd, self.tempMetaFile = tempfile.mkstemp('.torrent')
                 os.close(tempfd)
                 self.metaFile = self.tempMetaFile
-                meta.generateTorrentFile( self.path, self.metaFile )
+                cache.generateTorrentFile( self.path, self.metaFile )
             # pylint: enable-msg=E1101
 
     def resolveNames(self):
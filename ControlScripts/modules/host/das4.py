@@ -323,7 +323,8 @@ class das4MuxConnectionObject(countedConnectionObject):
             self.muxIO__lock[0].acquire()
             self.muxIO[0].write( '-{0}'.format( self.connNumber ) )
             self.muxIO[0].flush()
-            Campaign.debuglogger.log( self.muxConnectionNumber, 'SEND - {0}'.format( self.connNumber ) )
+            if Campaign.debuglogger.enabled:
+                Campaign.debuglogger.log( self.muxConnectionNumber, 'SEND - {0}'.format( self.connNumber ) )
         except socket.error as e:
             if (not type(e.args) == types.TupleType) or e.args[0] != 'Socket is closed':
                 raise
@@ -385,10 +386,12 @@ class das4MuxConnectionObject(countedConnectionObject):
         try:
             self.muxIO__lock[0].acquire()
             if multi:
-                Campaign.debuglogger.log( self.muxConnectionNumber, 'SEND 1 - {0} - {1}'.format( len(msg), msg ) )
+                if Campaign.debuglogger.enabled:
+                    Campaign.debuglogger.log( self.muxConnectionNumber, 'SEND 1 - {0} - {1}'.format( len(msg), msg ) )
                 self.muxIO[0].write( '1{0}{1}{2}'.format( self.connNumber, struct.pack( '!I', len(msg) ), msg ) )
             else:
-                Campaign.debuglogger.log( self.muxConnectionNumber, 'SEND 0 - {1}'.format( len(msg), msg ) )
+                if Campaign.debuglogger.enabled:
+                    Campaign.debuglogger.log( self.muxConnectionNumber, 'SEND 0 - {1}'.format( len(msg), msg ) )
                 self.muxIO[0].write( '0{0}{1}'.format( self.connNumber, msg ) )
             self.muxIO[0].flush()
         finally:
@@ -432,7 +435,8 @@ class das4MuxConnectionObject(countedConnectionObject):
             muxIO__lock[1].acquire()
             while True:
                 opcode = muxIO[1].read(1)
-                Campaign.debuglogger.log( mux_connection_number, 'RECV OPCODE {0}'.format( opcode ) )
+                if Campaign.debuglogger.enabled:
+                    Campaign.debuglogger.log( mux_connection_number, 'RECV OPCODE {0}'.format( opcode ) )
                 if opcode == '':
                     if isinstance(muxIO[1], das4MuxConnectionObject):
                         Campaign.logger.log( "Unexpected EOF on secondary mux number {0}".format( mux_connection_number ) )
@@ -443,15 +447,19 @@ class das4MuxConnectionObject(countedConnectionObject):
                     # Muxer quit, failure
                     buf = muxIO[1].read(4)
                     if len(buf) < 4:
-                        Campaign.debuglogger.log( mux_connection_number, 'RECV BAD LEN {0}'.format( buf ) )
+                        if Campaign.debuglogger.enabled:
+                            Campaign.debuglogger.log( mux_connection_number, 'RECV BAD LEN {0}'.format( buf ) )
                         raise Exception( "Remote demuxer {1} suddenly quit, followed by unexpected EOF on mux channel; expected 4 bytes error message length, got {0} bytes".format( len( buf, mux_connection_number ) ) )
                     errlen = struct.unpack( '!I', buf )[0]
-                    Campaign.debuglogger.log( mux_connection_number, 'RECV DECODED LEN {0}'.format( errlen ) )
+                    if Campaign.debuglogger.enabled:
+                        Campaign.debuglogger.log( mux_connection_number, 'RECV DECODED LEN {0}'.format( errlen ) )
                     problem = muxIO[1].read(errlen)
                     if len(problem) < errlen:
-                        Campaign.debuglogger.log( mux_connection_number, 'RECV TOO SHORT PROBLEM {0}'.format( problem ) )
+                        if Campaign.debuglogger.enabled:
+                            Campaign.debuglogger.log( mux_connection_number, 'RECV TOO SHORT PROBLEM {0}'.format( problem ) )
                         raise Exception( "Remote demuxer {3} suddenly quit, followed by unexpected EOF on mux channel; expected {0} bytes of error message, got {1} bytes: '{2}'".format( errlen, len(problem), problem, mux_connection_number ) )
-                    Campaign.debuglogger.log( mux_connection_number, 'RECV PROBLEM {0}'.format( problem ) )
+                    if Campaign.debuglogger.enabled:
+                        Campaign.debuglogger.log( mux_connection_number, 'RECV PROBLEM {0}'.format( problem ) )
                     raise Exception( "Remote demuxer {1} suddenly quit. Reported problem: {0}".format( problem, mux_connection_number ) )
                 elif opcode == '+':
                     # Response to a '+' message: new connection. Fail if unexpected
@@ -459,7 +467,8 @@ class das4MuxConnectionObject(countedConnectionObject):
                         raise Exception( "A connection was apparently opened, but I was just reading data. Insanity." )
                     # Read the result
                     result = muxIO[1].read(1)
-                    Campaign.debuglogger.log( mux_connection_number, 'RECV RESULT {0}'.format( result ) )
+                    if Campaign.debuglogger.enabled:
+                        Campaign.debuglogger.log( mux_connection_number, 'RECV RESULT {0}'.format( result ) )
                     if result == '+':
                         # Succesful connection setup, we're done
                         return
@@ -467,15 +476,19 @@ class das4MuxConnectionObject(countedConnectionObject):
                         # Failed connection setup, read error message and raise exception
                         buf = muxIO[1].read(4)
                         if len(buf) < 4:
-                            Campaign.debuglogger.log( mux_connection_number, 'RECV BAD LEN {0}'.format( buf ) )
+                            if Campaign.debuglogger.enabled:
+                                Campaign.debuglogger.log( mux_connection_number, 'RECV BAD LEN {0}'.format( buf ) )
                             raise Exception( "The connection could not be set up over the mux channel, followed by unexpected EOF on mux channel {1}; expected 4 bytes error message length, got {0} bytes".format( len( buf ), mux_connection_number ) )
                         errlen = struct.unpack( '!I', buf )[0]
-                        Campaign.debuglogger.log( mux_connection_number, 'RECV DECODED LEN {0}'.format( errlen ) )
+                        if Campaign.debuglogger.enabled:
+                            Campaign.debuglogger.log( mux_connection_number, 'RECV DECODED LEN {0}'.format( errlen ) )
                         problem = muxIO[1].read(errlen)
                         if len(problem) < errlen:
-                            Campaign.debuglogger.log( mux_connection_number, 'RECV TOO SHORT PROBLEM {0}'.format( problem ) )
+                            if Campaign.debuglogger.enabled:
+                                Campaign.debuglogger.log( mux_connection_number, 'RECV TOO SHORT PROBLEM {0}'.format( problem ) )
                             raise Exception( "The connection could not be set up over the mux channel, followed by unexpected EOF on mux channel {3}; expected {0} bytes of error message, got {1} bytes: '{2}'".format( errlen, len(problem), problem, mux_connection_number ) )
-                        Campaign.debuglogger.log( mux_connection_number, 'RECV PROBLEM {0}'.format( problem ) )
+                        if Campaign.debuglogger.enabled:
+                            Campaign.debuglogger.log( mux_connection_number, 'RECV PROBLEM {0}'.format( problem ) )
                         raise Exception( "The connection could not be set up over the mux channel. Reported problem: {0}".format( problem ) )
                     elif result == '':
                         raise Exception( "Unexpected EOF on mux channel {0}; expected 1 byte new connection result, got ''".format( mux_connection_number ) )
@@ -485,10 +498,12 @@ class das4MuxConnectionObject(countedConnectionObject):
                     # Response to a '-' message: close connection. Done if expected
                     connbuf = muxIO[1].read(4)
                     if len(connbuf) < 4:
-                        Campaign.debuglogger.log( mux_connection_number, 'RECV BAD CONNNUMBER {0}'.format( connbuf ) )
+                        if Campaign.debuglogger.enabled:
+                            Campaign.debuglogger.log( mux_connection_number, 'RECV BAD CONNNUMBER {0}'.format( connbuf ) )
                         raise Exception( "Unexpected EOF on mux channel {1}; expected 4 bytes connection number, got {0} bytes".format( len( connbuf ), mux_connection_number ) )
                     connNumber = struct.unpack( '!I', connbuf )[0]
-                    Campaign.debuglogger.log( mux_connection_number, 'RECV DECODED CONNNUMBER {0}'.format( connNumber ) )
+                    if Campaign.debuglogger.enabled:
+                        Campaign.debuglogger.log( mux_connection_number, 'RECV DECODED CONNNUMBER {0}'.format( connNumber ) )
                     if connNumber in muxIO[2]:
                         muxIO[2][connNumber].noMoreInput = True
                         if expect == '0{0}'.format( connbuf ):
@@ -501,31 +516,39 @@ class das4MuxConnectionObject(countedConnectionObject):
                     # Data for a connection: read the connection number
                     connbuf = muxIO[1].read(4)
                     if len(connbuf) < 4:
-                        Campaign.debuglogger.log( mux_connection_number, 'RECV BAD CONNNUMBER {0}'.format( connbuf ) )
+                        if Campaign.debuglogger.enabled:
+                            Campaign.debuglogger.log( mux_connection_number, 'RECV BAD CONNNUMBER {0}'.format( connbuf ) )
                         raise Exception( "Unexpected EOF on mux channel {1}; expected 4 bytes connection number, got {0} bytes".format( len( connbuf ), mux_connection_number ) )
                     incomingConnNumber = struct.unpack( '!I', connbuf )[0]
-                    Campaign.debuglogger.log( mux_connection_number, 'RECV DECODED CONNNUMBER {0}'.format( struct.unpack( '!I', connbuf )[0] ) )
+                    if Campaign.debuglogger.enabled:
+                        Campaign.debuglogger.log( mux_connection_number, 'RECV DECODED CONNNUMBER {0}'.format( struct.unpack( '!I', connbuf )[0] ) )
                     if opcode == '0':
                         # Opcode '0': a single line of data, read that
                         data = muxIO[1].readline()
                         if data == '' or data[-1] != '\n':
-                            Campaign.debuglogger.log( mux_connection_number, 'RECV BAD LINE {0}'.format( data ) )
+                            if Campaign.debuglogger.enabled:
+                                Campaign.debuglogger.log( mux_connection_number, 'RECV BAD LINE {0}'.format( data ) )
                             raise Exception( "Unexpected EOF on mux channel {1}; expected a single line, got '{0}'".format( data, mux_connection_number ) )
-                        Campaign.debuglogger.log( mux_connection_number, 'RECV LINE {0}'.format( data ) )
+                        if Campaign.debuglogger.enabled:
+                            Campaign.debuglogger.log( mux_connection_number, 'RECV LINE {0}'.format( data ) )
                         datalen = len(data)
                     else:
                         # Opcode '1': a number of characters of data, read them
                         buf = muxIO[1].read(4)
                         if len(buf) != 4:
-                            Campaign.debuglogger.log( mux_connection_number, 'RECV BAD LEN {0}'.format( buf ) )
+                            if Campaign.debuglogger.enabled:
+                                Campaign.debuglogger.log( mux_connection_number, 'RECV BAD LEN {0}'.format( buf ) )
                             raise Exception( "Unexpected EOF on mux channel {1}; expected 4 bytes length, got {0} bytes".format( len( buf ), mux_connection_number ) )
                         datalen = struct.unpack( '!I', buf )[0]
-                        Campaign.debuglogger.log( mux_connection_number, 'RECV DECODED LEN {0}'.format( datalen ) )
+                        if Campaign.debuglogger.enabled:
+                            Campaign.debuglogger.log( mux_connection_number, 'RECV DECODED LEN {0}'.format( datalen ) )
                         data = muxIO[1].read(datalen)
                         if len(data) != datalen:
-                            Campaign.debuglogger.log( mux_connection_number, 'RECV TOO SHORT DATA {0}'.format( data ) )
+                            if Campaign.debuglogger.enabled:
+                                Campaign.debuglogger.log( mux_connection_number, 'RECV TOO SHORT DATA {0}'.format( data ) )
                             raise Exception( "Unexpected EOF on mux channel {3}; expected {0} bytes of data, got {1} bytes: '{2}'".format( datalen, len(data), data, mux_connection_number ) )
-                        Campaign.debuglogger.log( mux_connection_number, 'RECV DATA {0}'.format( data ) )
+                        if Campaign.debuglogger.enabled:
+                            Campaign.debuglogger.log( mux_connection_number, 'RECV DATA {0}'.format( data ) )
                     # A connection's data. Write into that connection's buffer.
                     if incomingConnNumber not in muxIO[2]:
                         raise Exception( "Received data on mux channel for unknown mux connection {0}. Data: {1}".format( incomingConnNumber, data ) )
@@ -1172,7 +1195,7 @@ empty
                     return
                 self.scenario.addObject(newObj)
                 self.slaves[c] = newObj
-            for e in [e for e in self.scenario.getObjects('execution') if self.scenario.resolveObjectName('host', e.hostName) == self]:
+            for e in self.scenario.getExecutionsOnHost( self ):
                 n = self.nNodes # Number of nodes this execution refers to, all nodes by default
                 i = None        # List of indices of nodes this execution refers to, None if not yet initialized
                 if e.hostName.find('@') >= 0:
@@ -1278,7 +1301,8 @@ empty
                 self.muxIO[0].flush()
             finally:
                 self.muxIO__lock[0].release()
-            Campaign.debuglogger.log( 'das4_master_mux', 'SEND + {0} - {1} - {2} - {3} - {4}'.format( connNumber, len(self.nodeSet[0]), len('python python_ssh_demux.py'), self.nodeSet[0], 'python python_ssh_demux.py' ) )
+            if Campaign.debuglogger.enabled:
+                Campaign.debuglogger.log( 'das4_master_mux', 'SEND + {0} - {1} - {2} - {3} - {4}'.format( connNumber, len(self.nodeSet[0]), len('python python_ssh_demux.py'), self.nodeSet[0], 'python python_ssh_demux.py' ) )
             try:
                 self.muxIO__lock[1].acquire()
                 # Do some reading
@@ -1299,7 +1323,8 @@ empty
                 obj = das4MuxConnectionObject( connNumber, self.muxIO, self.muxIO__lock, self.masterConnection, "{0}/das4_sftp/sftp_fwd_{1}".format( self.getPersistentTestDir(), self.nodeSet[0] ), self.sftpConnections[self.nodeSet[0]], 'das4_master_mux' )
                 self.secondaryMuxIO[self.nodeSet[0]] = (obj, obj, {})
                 self.secondaryMuxIO__lock[self.nodeSet[0]] = (threading.RLock(), threading.RLock())
-                Campaign.debuglogger.log('mux_{0}'.format( connNumber ), "PRIMARY MUX OPENED")
+                if Campaign.debuglogger.enabled:
+                    Campaign.debuglogger.log('mux_{0}'.format( connNumber ), "PRIMARY MUX OPENED")
                 i = len(self.keepAliveTimers)
                 self.keepAliveTimers.append(threading.Timer(30.0, keepAlive, args=[self.secondaryMuxIO[self.nodeSet[0]], self.secondaryMuxIO__lock[self.nodeSet[0]], self, self.keepAliveTimers, i, 'mux_{0}'.format( connNumber )]))
                 self.keepAliveTimers[i].start()
@@ -1323,7 +1348,8 @@ empty
             muxIO_[0].flush()
         finally:
             muxIO__lock_[0].release()
-        Campaign.debuglogger.log( 'mux_{0}'.format( muxIO_[0].unpackedConnNumber ), 'SEND + {0} - {1} - {2} - {3} - {4}'.format( connNumber, len(self.nodeSet[0]), len('python python_ssh_demux.py'), self.nodeSet[0], 'python python_ssh_demux.py' ) )
+        if Campaign.debuglogger.enabled:
+            Campaign.debuglogger.log( 'mux_{0}'.format( muxIO_[0].unpackedConnNumber ), 'SEND + {0} - {1} - {2} - {3} - {4}'.format( connNumber, len(self.nodeSet[0]), len('python python_ssh_demux.py'), self.nodeSet[0], 'python python_ssh_demux.py' ) )
         try:
             muxIO__lock_[1].acquire()
             # Do some reading
@@ -1333,8 +1359,10 @@ empty
             muxIO_[2][connNumber] = obj
         finally:
             muxIO__lock_[1].release()
-        Campaign.debuglogger.log( obj.getIdentification(), 'CREATED in scenario {2} for DAS4 host {0} to node {1} over mux channel'.format( self.name, self.nodeSet[0], self.scenario.name ) )
-        Campaign.debuglogger.log('mux_{0}'.format( connNumber ), "SECONDARY MUX OPENED")
+        if Campaign.debuglogger.enabled:
+            Campaign.debuglogger.log( obj.getIdentification(), 'CREATED in scenario {2} for DAS4 host {0} to node {1} over mux channel'.format( self.name, self.nodeSet[0], self.scenario.name ) )
+        if Campaign.debuglogger.enabled:
+            Campaign.debuglogger.log('mux_{0}'.format( connNumber ), "SECONDARY MUX OPENED")
         try:
             self.connections__lock.acquire()
             if self.isInCleanup():
@@ -1382,7 +1410,8 @@ empty
         chan2.exec_command( 'ssh {0} -T'.format( self.nodeSet[0] ) )
         io = (chan2.makefile( 'wb', -1 ), chan2.makefile( 'rb', -1 ) )
         obj = das4ConnectionObject( client, io, "{0}/das4_sftp/sftp_fwd_{1}".format( self.getPersistentTestDir(), self.nodeSet[0] ) )
-        Campaign.debuglogger.log( obj.getIdentification(), 'CREATED in scenario {2} for DAS4 host {0} to node {1}'.format( self.name, self.nodeSet[0], self.scenario.name ) )
+        if Campaign.debuglogger.enabled:
+            Campaign.debuglogger.log( obj.getIdentification(), 'CREATED in scenario {2} for DAS4 host {0} to node {1}'.format( self.name, self.nodeSet[0], self.scenario.name ) )
         try:
             self.connections__lock.acquire()
             if self.isInCleanup():
@@ -1437,7 +1466,8 @@ empty
                 connection.outOfOrderResult = res
             connection.write( command+'\n# `\n# \'\n# "\necho "\nblabladibla__156987349253457979__noonesGonnaUseThis__right__p2ptestframework"\n' )
             connection.setInAsync()
-            Campaign.debuglogger.log( connection.getIdentification(), 'SEND {0}'.format( command ) )
+            if Campaign.debuglogger.enabled:
+                Campaign.debuglogger.log( connection.getIdentification(), 'SEND {0}'.format( command ) )
         finally:
             self.releaseConnection(reuseConnection, connection)
 
@@ -1467,7 +1497,8 @@ empty
             res = ''
             line = connection.readline()
             while line != '' and line.strip() != 'blabladibla__156987349253457979__noonesGonnaUseThis__right__p2ptestframework':
-                Campaign.debuglogger.log( connection.getIdentification(), 'RECV {0}'.format( line ) )
+                if Campaign.debuglogger.enabled:
+                    Campaign.debuglogger.log( connection.getIdentification(), 'RECV {0}'.format( line ) )
                 res += line
                 line = connection.readline()
             connection.clearInAsync()
@@ -1503,7 +1534,8 @@ empty
                         raise Exception( "Sending file {0} to {1} on host {2} with overwrite, but the destination already exsits and is a directory".format( localSourcePath, remoteDestinationPath, self.name ) )
                 if self.isInCleanup():
                     return
-                Campaign.debuglogger.log( connection.getIdentification(), 'SFTP SEND FILE {0} TO {1}'.format( localSourcePath, remoteDestinationPath ) )
+                if Campaign.debuglogger.enabled:
+                    Campaign.debuglogger.log( connection.getIdentification(), 'SFTP SEND FILE {0} TO {1}'.format( localSourcePath, remoteDestinationPath ) )
                 sftp.put( localSourcePath, remoteDestinationPath )
                 sftp.chmod( remoteDestinationPath, os.stat(localSourcePath).st_mode )
             finally:
@@ -1550,14 +1582,16 @@ empty
                         return
                     if os.path.isdir( localPath ):
                         if not das4ConnectionObject.existsRemote(sftp, remotePath):
-                            Campaign.debuglogger.log( connection.getIdentification(), 'SFTP CREATE REMOTE DIR {0}'.format( remotePath ) )
+                            if Campaign.debuglogger.enabled:
+                                Campaign.debuglogger.log( connection.getIdentification(), 'SFTP CREATE REMOTE DIR {0}'.format( remotePath ) )
                             sftp.mkdir( remotePath )
                             sftp.chmod( remotePath, os.stat(localPath).st_mode )
                         paths += [(os.path.join( localPath, path ), '{0}/{1}'.format( remotePath, path )) for path in os.listdir( localPath )]
                     else:
                         if das4ConnectionObject.existsRemote(sftp, remotePath) and das4ConnectionObject.isRemoteDir(sftp, remotePath):
                             raise Exception( "Sending file {0} to {1} on host {2} with overwrite, but the destination already exsits and is a directory".format( localPath, remotePath, self.name ) )
-                        Campaign.debuglogger.log( connection.getIdentification(), 'SFTP SEND FILE {0} TO {1}'.format( localPath, remotePath ) )
+                        if Campaign.debuglogger.enabled:
+                            Campaign.debuglogger.log( connection.getIdentification(), 'SFTP SEND FILE {0} TO {1}'.format( localPath, remotePath ) )
                         sftp.put( localPath, remotePath )
                         sftp.chmod( remotePath, os.stat(localPath).st_mode )
             finally:
@@ -1596,7 +1630,8 @@ empty
                 sftp = connection.sftpChannel
                 if self.isInCleanup():
                     return
-                Campaign.debuglogger.log( connection.getIdentification(), 'SFTP RETRIEVE FILE {0} TO {1}'.format( remoteSourcePath, localDestinationPath ) )
+                if Campaign.debuglogger.enabled:
+                    Campaign.debuglogger.log( connection.getIdentification(), 'SFTP RETRIEVE FILE {0} TO {1}'.format( remoteSourcePath, localDestinationPath ) )
                 sftp.get( remoteSourcePath, localDestinationPath )
             finally:
                 connection.unlockSFTP()
@@ -1615,12 +1650,14 @@ empty
         """
         # Send command
         self.masterIO[0].write( command+'\n# `\n# \'\n# "\necho "\nblabladibla__156987349253457979__noonesGonnaUseThis__right__p2ptestframework"\n' )
-        Campaign.debuglogger.log('das4_master', 'SEND {0}'.format( command ) )
+        if Campaign.debuglogger.enabled:
+            Campaign.debuglogger.log('das4_master', 'SEND {0}'.format( command ) )
         # Read output of command
         res = ''
         line = self.masterIO[1].readline()
         while line != '' and line.strip() != 'blabladibla__156987349253457979__noonesGonnaUseThis__right__p2ptestframework':
-            Campaign.debuglogger.log('das4_master', 'RECV {0}'.format( line ) )
+            if Campaign.debuglogger.enabled:
+                Campaign.debuglogger.log('das4_master', 'RECV {0}'.format( line ) )
             res += line
             line = self.masterIO[1].readline()
         # Return output (ditch the last trailing \n)
@@ -1663,11 +1700,13 @@ empty
             chan2.set_combine_stderr( True )
             chan2.exec_command( 'bash -l' )
             self.masterIO = (chan2.makefile( 'wb', -1 ), chan2.makefile( 'rb', -1 ))
-            Campaign.debuglogger.log( 'das4_master', 'CREATED in scenario {2} for DAS4 host {0} to headnode {1}'.format( self.name, self.headNode, self.scenario.name ) )
+            if Campaign.debuglogger.enabled:
+                Campaign.debuglogger.log( 'das4_master', 'CREATED in scenario {2} for DAS4 host {0} to headnode {1}'.format( self.name, self.headNode, self.scenario.name ) )
             masterSFTP = self.masterConnection.open_sftp()
             Campaign.debuglogger.log( 'das4_master', 'SFTP CHANNEL CREATED' )
             masterSFTP.put( demux_script, 'python_ssh_demux.py' )
-            Campaign.debuglogger.log( 'das4_master', 'SFTP SEND FILE {0} TO {1}'.format( demux_script, 'python_ssh_demux.py' ) )
+            if Campaign.debuglogger.enabled:
+                Campaign.debuglogger.log( 'das4_master', 'SFTP SEND FILE {0} TO {1}'.format( demux_script, 'python_ssh_demux.py' ) )
             masterSFTP.close()
             Campaign.debuglogger.log( 'das4_master', 'SFTP CHANNEL REMOVED' )
             chan2 = trans.open_session()
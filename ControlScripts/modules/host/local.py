@@ -119,7 +119,8 @@ class local(host):
         if self.isInCleanup():
             return
         proc = Popen(['{0}'.format(local.bashProgram), '-l'], bufsize=8192, stdin=PIPE, stdout=PIPE, stderr=STDOUT)
-        Campaign.debuglogger.log( 'local_{0}'.format(self.name), 'CREATED in scenario {1} for LOCAL host {0}'.format( self.name, self.scenario.name ) )
+        if Campaign.debuglogger.enabled:
+            Campaign.debuglogger.log( 'local_{0}'.format(self.name), 'CREATED in scenario {1} for LOCAL host {0}'.format( self.name, self.scenario.name ) )
         try:
             self.connections__lock.acquire()
             if self.isInCleanup():
@@ -205,7 +206,8 @@ class local(host):
             connection.stdin().write( command+'\n# `\n# \'\n# \"\necho "\nblabladibla__156987349253457979__noonesGonnaUseThis__right__p2ptestframework"\n' )
             connection.stdin().flush()
             connection.setInAsync()
-            Campaign.debuglogger.log( 'local_{0}'.format(self.name), 'SEND {0}'.format( command ) )
+            if Campaign.debuglogger.enabled:
+                Campaign.debuglogger.log( 'local_{0}'.format(self.name), 'SEND {0}'.format( command ) )
         finally:
             self.releaseConnection(reuseConnection, connection)
 
@@ -235,7 +237,8 @@ class local(host):
             res = ''
             line = out.readline()
             while line != '' and line != 'blabladibla__156987349253457979__noonesGonnaUseThis__right__p2ptestframework\n':
-                Campaign.debuglogger.log( 'local_{0}'.format(self.name), 'RECV {0}'.format( line ) )
+                if Campaign.debuglogger.enabled:
+                    Campaign.debuglogger.log( 'local_{0}'.format(self.name), 'RECV {0}'.format( line ) )
                 res += line
                 line = out.readline()
             connection.clearInAsync()
@@ -267,7 +270,8 @@ class local(host):
             elif os.path.isdir( remoteDestinationPath ):
                 raise Exception( "Sending local file {0} to remote file {1}: destination would be overwritten, but is a directory".format( localSourcePath, remoteDestinationPath ) )
             try:
-                Campaign.debuglogger.log( 'local_{0}'.format(self.name), 'CP SEND FILE {0} TO {1}'.format( localSourcePath, remoteDestinationPath ) )
+                if Campaign.debuglogger.enabled:
+                    Campaign.debuglogger.log( 'local_{0}'.format(self.name), 'CP SEND FILE {0} TO {1}'.format( localSourcePath, remoteDestinationPath ) )
                 subprocess.check_output( 'cp "{0}" "{1}"'.format( escapeFileName( localSourcePath ), escapeFileName( remoteDestinationPath ) ), shell=True, stderr=STDOUT )
             except subprocess.CalledProcessError as cpe:
                 Campaign.logger.log( cpe.output )
@@ -298,7 +302,8 @@ class local(host):
             elif os.path.isdir( localDestinationPath ):
                 raise Exception( "Getting remote file {0} to local file {1}: destination would be overwritten, but is a directory".format( remoteSourcePath, localDestinationPath ) )
             try:
-                Campaign.debuglogger.log( 'local_{0}'.format(self.name), 'CP RETRIEVE FILE {0} TO {1}'.format( remoteSourcePath, localDestinationPath ) )
+                if Campaign.debuglogger.enabled:
+                    Campaign.debuglogger.log( 'local_{0}'.format(self.name), 'CP RETRIEVE FILE {0} TO {1}'.format( remoteSourcePath, localDestinationPath ) )
                 subprocess.check_output( 'cp "{0}" "{1}"'.format( escapeFileName( remoteSourcePath ), escapeFileName( localDestinationPath ) ), shell=True, stderr=STDOUT )
             except subprocess.CalledProcessError as cpe:
                 Campaign.logger.log( cpe.output )
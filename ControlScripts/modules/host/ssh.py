@@ -349,7 +349,8 @@ class ssh(host):
             chan2.exec_command( 'bash -l' )
             io = (chan2.makefile( 'wb', -1 ), chan2.makefile( 'rb', -1 ) )
             obj = sshParamikoConnectionObject( client, io )
-            Campaign.debuglogger.log( obj.getIdentification(), 'CREATED in scenario {2} for SSH host {0} to node {1} type paramiko'.format( self.name, self.hostname, self.scenario.name ) )
+            if Campaign.debuglogger.enabled:
+                Campaign.debuglogger.log( obj.getIdentification(), 'CREATED in scenario {2} for SSH host {0} to node {1} type paramiko'.format( self.name, self.hostname, self.scenario.name ) )
         else:
             args = ['{0}'.format(sshFallbackConnectionObject.getSSHProgram()), '-l', self.user]
             if self.port:
@@ -365,7 +366,8 @@ class ssh(host):
                         raise e
                 return
             obj = sshFallbackConnectionObject( proc )
-            Campaign.debuglogger.log( obj.getIdentification(), 'CREATED in scenario {2} for SSH host {0} to node {1} type fallback'.format( self.name, self.hostname, self.scenario.name ) )
+            if Campaign.debuglogger.enabled:
+                Campaign.debuglogger.log( obj.getIdentification(), 'CREATED in scenario {2} for SSH host {0} to node {1} type fallback'.format( self.name, self.hostname, self.scenario.name ) )
         try:
             self.connections__lock.acquire()
             if self.isInCleanup():
@@ -441,7 +443,8 @@ class ssh(host):
                 connection.outOfOrderResult = res
             connection.write( command+'\n# `\n# \'\n# "\necho "\nblabladibla__156987349253457979__noonesGonnaUseThis__right__p2ptestframework"\n' )
             connection.setInAsync()
-            Campaign.debuglogger.log( connection.getIdentification(), 'SEND {0}'.format( command ) )
+            if Campaign.debuglogger.enabled:
+                Campaign.debuglogger.log( connection.getIdentification(), 'SEND {0}'.format( command ) )
         finally:
             self.releaseConnection(reuseConnection, connection)
 
@@ -471,7 +474,8 @@ class ssh(host):
             res = ''
             line = connection.readline()
             while line != '' and line.strip() != 'blabladibla__156987349253457979__noonesGonnaUseThis__right__p2ptestframework':
-                Campaign.debuglogger.log( connection.getIdentification(), 'RECV {0}'.format( line ) )
+                if Campaign.debuglogger.enabled:
+                    Campaign.debuglogger.log( connection.getIdentification(), 'RECV {0}'.format( line ) )
                 res += line
                 line = connection.readline()
             connection.clearInAsync()
@@ -507,7 +511,8 @@ class ssh(host):
                             raise Exception( "Sending file {0} to {1} on host {2} with overwrite, but the destination already exsits and is a directory".format( localSourcePath, remoteDestinationPath, self.name ) )
                     if self.isInCleanup():
                         return
-                    Campaign.debuglogger.log( connection.getIdentification(), 'SFTP SEND FILE {0} TO {1}'.format( localSourcePath, remoteDestinationPath ) )
+                    if Campaign.debuglogger.enabled:
+                        Campaign.debuglogger.log( connection.getIdentification(), 'SFTP SEND FILE {0} TO {1}'.format( localSourcePath, remoteDestinationPath ) )
                     sftp.put( localSourcePath, remoteDestinationPath )
                     sftp.chmod( remoteDestinationPath, os.stat(localSourcePath).st_mode )
                 finally:
@@ -533,7 +538,8 @@ class ssh(host):
                 args.append( localSourcePath )
                 args.append( '{0}@{1}:{2}'.format( self.user, self.hostname, remoteDestinationPath ) )
                 try:
-                    Campaign.debuglogger.log( connection.getIdentification(), 'SCP SEND FILE {0} TO {1}'.format( localSourcePath, remoteDestinationPath ) )
+                    if Campaign.debuglogger.enabled:
+                        Campaign.debuglogger.log( connection.getIdentification(), 'SCP SEND FILE {0} TO {1}'.format( localSourcePath, remoteDestinationPath ) )
                     subprocess.check_output( args, bufsize=8192 )
                 except subprocess.CalledProcessError as e:
                     Campaign.logger.log( "Sending file {1} to {2} on host {0} failed: {3}".format( self.name, localSourcePath, remoteDestinationPath, e.output ) )
@@ -581,14 +587,16 @@ class ssh(host):
                             return
                         if os.path.isdir( localPath ):
                             if not sshParamikoConnectionObject.existsRemote(sftp, remotePath):
-                                Campaign.debuglogger.log( connection.getIdentification(), 'SFTP CREATE REMOTE DIR {0}'.format( remotePath ) )
+                                if Campaign.debuglogger.enabled:
+                                    Campaign.debuglogger.log( connection.getIdentification(), 'SFTP CREATE REMOTE DIR {0}'.format( remotePath ) )
                                 sftp.mkdir( remotePath )
                                 sftp.chmod( remotePath, os.stat(localPath).st_mode )
                             paths += [(os.path.join( localPath, path ), '{0}/{1}'.format( remotePath, path )) for path in os.listdir( localPath )]
                         else:
                             if sshParamikoConnectionObject.existsRemote(sftp, remotePath) and sshParamikoConnectionObject.isRemoteDir(sftp, remotePath):
                                 raise Exception( "Sending file {0} to {1} on host {2} with overwrite, but the destination already exsits and is a directory".format( localPath, remotePath, self.name ) )
-                            Campaign.debuglogger.log( connection.getIdentification(), 'SFTP SEND FILE {0} TO {1}'.format( localPath, remotePath ) )
+                            if Campaign.debuglogger.enabled:
+                                Campaign.debuglogger.log( connection.getIdentification(), 'SFTP SEND FILE {0} TO {1}'.format( localPath, remotePath ) )
                             sftp.put( localPath, remotePath )
                             sftp.chmod( remotePath, os.stat(localPath).st_mode )
                 finally:
@@ -633,7 +641,8 @@ class ssh(host):
                     sftp = connection.sftpChannel
                     if self.isInCleanup():
                         return
-                    Campaign.debuglogger.log( connection.getIdentification(), 'SFTP RETRIEVE FILE {0} TO {1}'.format( remoteSourcePath, localDestinationPath ) )
+                    if Campaign.debuglogger.enabled:
+                        Campaign.debuglogger.log( connection.getIdentification(), 'SFTP RETRIEVE FILE {0} TO {1}'.format( remoteSourcePath, localDestinationPath ) )
                     sftp.get( remoteSourcePath, localDestinationPath )
                 finally:
                     if newConnection:
@@ -651,7 +660,8 @@ class ssh(host):
                 args.append( '{0}@{1}:{2}'.format( self.user, self.hostname, remoteSourcePath ) )
                 args.append( localDestinationPath )
                 try:
-                    Campaign.debuglogger.log( connection.getIdentification(), 'SCP RETRIEVE FILE {0} TO {1}'.format( remoteSourcePath, localDestinationPath ) )
+                    if Campaign.debuglogger.enabled:
+                        Campaign.debuglogger.log( connection.getIdentification(), 'SCP RETRIEVE FILE {0} TO {1}'.format( remoteSourcePath, localDestinationPath ) )
                     subprocess.check_output( args, bufsize=8192 )
                 except subprocess.CalledProcessError as e:
                     Campaign.logger.log( "Retrieving file {1} to {2} from host {0} failed: {3}".format( self.name, remoteSourcePath, localDestinationPath, e.output ) )
@@ -141,9 +141,23 @@ class _skeleton_(parser):
         #       f.write( c+"\n" );
         #   f.close()
         #
+        # Numerical parsed logs are best written with core.parser.dataWriter, which also writes them in the columnar
+        # binary format that processors read quickly:
+        #
+        #   fd = dataWriter( os.path.join( outputDir, 'log.data' ), ['time', 'percent', 'upspeed', 'dlspeed'] )
+        #   try:
+        #       fd.write( 0, 0, 0, 0 )
+        #   finally:
+        #       fd.close()
+        #
         # You really must implement this:
         raise Exception( "Not implemented" )
 
+    # TODO: To parse raw logs while the executions run (the live parameter of scenarios), override getLiveParsers(...)
+    # to return a core.parser.liveParser for each raw log and use a new one in parseLogs(...) as well; see
+    # parser:swift for an example. If the live parsers implement getProgress(), override reportsLiveProgress() to return
+    # True so the completed and throughput stop conditions accept this parser.
+
     def canReparse(self):
         """
         Return whether this parser can be used to reparse after a run has already been torn down.
@@ -1,4 +1,4 @@
-from core.parser import parser
+from core.parser import parser, dataWriter
 
 import os
 import re
@@ -22,6 +22,8 @@ class aria2(parser):
     -- % done
     -- upload speed (kB/s)
     -- download speed (kB/s)
+    - log.cols
+    -- the same columns in the columnar binary format, see core.parser.dataWriter
     """
 
     def __init__(self, scenario):
@@ -92,8 +94,8 @@ class aria2(parser):
         fd = None
         try:
             fl = open( logfile, 'r' )
-            fd = open( datafile, 'w' )
-            fd.write( "time percent upspeed dlspeed\n0 0 0 0\n" )
+            fd = dataWriter( datafile, ['time', 'percent', 'upspeed', 'dlspeed'] )
+            fd.write( 0, 0, 0, 0 )
             firstTime = -1
             relTime = -1
             firstDay = ''
@@ -119,7 +121,7 @@ class aria2(parser):
                 if re.match( '.*NOTICE - Download complete', line ):
                     if relTime == -1:
                         relTime = lastRelTime + 1
-                    fd.write( "{0} 100.0 0 0\n".format( relTime ) )
+                    fd.write( relTime, 100.0, 0, 0 )
                     relTime = -1
                 
                 if relTime == -1:
@@ -127,7 +129,7 @@ class aria2(parser):
                 
                 m = re.match( '^\\[\\#1 SIZE:0B/0B CN:[0-9]* SPD:0Bs.*', line )
                 if m:
-                    fd.write( "{0} 0 0 0\n".format( relTime ) )
+                    fd.write( relTime, 0, 0, 0 )
                     lastRelTime = relTime
                     relTime = -1
                 
@@ -136,7 +138,7 @@ class aria2(parser):
                     percentDone = 100.0 * ( float(int(m.group(1))) / float(int(m.group(2))) )
                     downspeed = int(m.group(3)) / 1024.0
                     
-                    fd.write( "{0} {1} 0 {2}\n".format( relTime, percentDone, downspeed ) )
+                    fd.write( relTime, percentDone, 0, downspeed )
                     
                     lastRelTime = relTime
                     relTime = -1
@@ -1,28 +1,196 @@
-from core.parser import parser
+from core.parser import parser, liveParser, dataWriter
+from core.sampler import readSamples, sampleColumns
 
 import os
 import re
 
+fullDatePattern = '^([0-9]*-[0-9]*-[0-9]*) ([0-9]*):([0-9]*):([0-9]*)\\.([0-9]*)$'
+brokenDatePattern = '^([0-9]*-[0-9]*-[0-9]*) ([0-9]*):([0-9]*):([0-9]*)\\.%N$'
+# pid (comm) state ppid pgrp session tty_nr tpgid flags minflt cminflt majflt cmajflt utime stime cutime cstime
+# %d  (%s)   %c    %d   %d   %d      %d     %d    %d    %d     %d      %d     %d      %d    %d    %d     %d
+statPattern = '^{0}\\([^)]*\\) +. +{0}{0}{0}{0}{0}{0}{0}{0}{0}{0}({0})({0})({0})({0})'.format( '-?[0-9]* +' )
+
+def fullDateToSecs( m ):
+    return brokenDateToSecs( m ) + float(m.group(5)) * 10**(-1 * len(m.group(5)))
+
+def brokenDateToSecs( m ):
+    return int(m.group(2)) * 3600 + 60 * int(m.group(3)) + int(m.group(4))
+
+class cpulogLiveParser(liveParser):
+    """
+    Parses a cpu.log incrementally into cpu.data and peak.data, see parser:cpulog.
+
+    peak.data is only written when the whole cpu.log has been parsed.
+    """
+
+    fd = None               # The dataWriter of cpu.data
+    fp = None               # The dataWriter of peak.data
+    clockticks = -1         # The number of clock ticks per second, -1 before the first line
+    startTime = -1          # The time of the first date line in seconds since midnight, -1 before it
+    startDate = None        # The date of the first date line
+    datePattern = None      # The pattern of the date lines
+    dateFunc = None         # The function that converts a match of datePattern to seconds since midnight
+    relTime = -1            # The relative time of the last date line
+    prevRelTime = -1.0      # The relative time of the previous row in cpu.data
+    utime = 0               # The cumulative times of the last stat line, in clock ticks
+    stime = 0
+    cutime = 0
+    cstime = 0
+    cpuTime = 0.0           # The CPU usage since the previous stat line
+    maxcputime = 0.0        # The total CPU time so far
+    maxmemsize = 0          # The peak resident memory size so far
+    maxvirtmemsize = 0      # The peak virtual memory size so far
+
+    def __init__(self, datafile, peakfile):
+        """
+        Creates cpu.data and peak.data.
+
+        @param  datafile    The path to cpu.data.
+        @param  peakfile    The path to peak.data.
+        """
+        liveParser.__init__(self, 'cpu.log')
+        self.datePattern = fullDatePattern
+        self.dateFunc = fullDateToSecs
+        try:
+            self.fd = dataWriter( datafile, ['time', 'cpu', 'rss', 'vsize'], 'time cpu% mem' )
+            self.fp = dataWriter( peakfile, ['cputime', 'maxmem', 'maxvirtmem'] )
+            self.fd.write( 0, 0, 0, 0 )
+        except:
+            self.close()
+            raise
+
+    def parseLine(self, line):
+        """
+        Parses a single line of cpu.log.
+
+        @param  line        The line.
+        """
+        # First line must be clocks ticks per sec (sysconf(_SC_CLK_TCK))
+        if self.clockticks == -1:
+            self.clockticks = float(line)
+            return
+        #12-03-15 12:22:12.386824326
+        m = re.match(self.datePattern, line)
+        if self.startTime == -1:
+            if m:
+                self.startDate = m.group(1)
+                self.startTime = self.dateFunc(m)
+            else:
+                # See if we need to fall back to full secs due to unextended ps
+                m = re.match(brokenDatePattern, line)
+                if m:
+                    self.datePattern = brokenDatePattern
+                    self.dateFunc = brokenDateToSecs
+                    self.startDate = m.group(1)
+                    self.startTime = self.dateFunc(m)
+            self.relTime = 0
+            return
+        if m:
+            self.relTime = self.dateFunc(m) - self.startTime
+            if m.group(1) != self.startDate:
+                self.relTime += 24 * 3600
+            return
+        m = re.match(statPattern, line)
+        if m:
+            newutime = int(m.group(1))
+            newstime = int(m.group(2))
+            newcutime = int(m.group(3))
+            newcstime = int(m.group(4))
+            self.cpuTime = (((newutime - self.utime) + (newstime - self.stime) + (newcutime - self.cutime) + (newcstime - self.cstime)) / (self.clockticks * (self.relTime - self.prevRelTime))) * 100.0
+            self.utime = newutime
+            self.stime = newstime
+            self.cutime = newcutime
+            self.cstime = newcstime
+            self.maxcputime = 1.0 * (self.utime + self.stime + self.cutime + self.cstime) / self.clockticks
+            # By definition maxcputime will always grow (since the base data is cumulative and will always grow)
+            return
+        # VSZ, RSS
+        m = re.match('^[ \\t]*([0-9]*)[ \\t]+([0-9]*)$', line)
+        if m:
+            if int(m.group(2)) > self.maxmemsize:
+                self.maxmemsize = int(m.group(2))
+            if int(m.group(1)) > self.maxvirtmemsize:
+                self.maxvirtmemsize = int(m.group(1))
+            self.fd.write( self.relTime, self.cpuTime, m.group(2), m.group(1) )
+            self.prevRelTime = self.relTime
+
+    def complete(self):
+        """
+        Writes peak.data.
+        """
+        self.fp.write( self.maxcputime, self.maxmemsize, self.maxvirtmemsize )
+
+    def flush(self):
+        """
+        Flushes cpu.data.
+        """
+        self.fd.flush()
+
+    def close(self):
+        """
+        Closes cpu.data and peak.data.
+        """
+        try:
+            if self.fp:
+                self.fp.close()
+        except Exception:
+            pass
+        try:
+            if self.fd:
+                self.fd.close()
+        except Exception:
+            pass
+
 class cpulog(parser):
     """
-    Parser for the cpu.log file created by having the profile parameter on a client active.
+    Parser for the cpu.bin or cpu.log file created by having the profile parameter on a client active.
     
     Extra parameters:
     - [none]
     
     Raw logs expected:
-    - cpu.log    A cpu log as created by the profiling function. Not being present is not a problem.
+    - cpu.bin    A sample file as created by the resource sampler. Not being present is not a problem.
+    - cpu.log    A cpu log as created by the profiling loop, used if cpu.bin is not present. Not being present is not a problem.
+                 Parsed during the run in live mode.
     
     Parse log files created:
     - cpu.data
     -- relative time (seconds, float)
     -- % CPU
-    -- resident memory size (bytes)
-    -- virtual memory size (bytes)
-    - peaks.data
+    -- resident memory size (kB)
+    -- virtual memory size (kB)
+    - peak.data
     -- total CPU time (seconds, float)
-    -- peak resident memory size (bytes)
-    -- peak virtual memory size (bytes)
+    -- peak resident memory size (kB)
+    -- peak virtual memory size (kB)
+    - resources.data (only for cpu.bin); rates are over the time since the previous sample, 0 for the first sample
+    -- relative time (seconds, float)
+    -- % CPU, as in cpu.data
+    -- resident memory size (kB)
+    -- virtual memory size (kB)
+    -- disk read rate: bytes read from storage per second (float)
+    -- disk write rate: bytes written to storage per second (float)
+    -- I/O read rate: bytes read by read-like system calls per second, including pipes and cached files (float)
+    -- I/O write rate: bytes written by write-like system calls per second, including pipes and cached files (float)
+    -- voluntary context switches per second (float)
+    -- involuntary context switches per second (float)
+    -- TCP receive rate: bytes received on TCP sockets per second (float)
+    -- TCP send rate: bytes sent and acknowledged on TCP sockets per second (float)
+    - resourcetotals.data (only for cpu.bin)
+    -- bytes read from storage
+    -- bytes written to storage
+    -- bytes read by read-like system calls
+    -- bytes written by write-like system calls
+    -- voluntary context switches
+    -- involuntary context switches
+    -- bytes received on TCP sockets
+    -- bytes sent and acknowledged on TCP sockets
+    - cpu.cols, peak.cols, resources.cols and resourcetotals.cols
+    -- the same columns in the columnar binary format, see core.parser.dataWriter
+
+    Traffic on other sockets, such as UDP, is not measured, since the kernel keeps no byte counters for those sockets;
+    it only shows in the I/O rates if it is sent or received with read(2) and write(2). All values are of the profiled
+    process itself, not of its children.
     """
 
     def __init__(self, scenario):
@@ -71,15 +239,6 @@ class cpulog(parser):
         """
         parser.resolveNames(self)
     
-    fullDatePattern = '^([0-9]*-[0-9]*-[0-9]*) ([0-9]*):([0-9]*):([0-9]*)\\.([0-9]*)$'
-    brokenDatePattern = '^([0-9]*-[0-9]*-[0-9]*) ([0-9]*):([0-9]*):([0-9]*)\\.%N$'
-    
-    def fullDateToSecs(self, m):
-        return self.brokenDateToSecs(m) + float(m.group(5)) * 10**(-1 * len(m.group(5))) 
-
-    def brokenDateToSecs(self, m):
-        return int(m.group(2)) * 3600 + 60 * int(m.group(3)) + int(m.group(4))
-
     def parseLogs(self, execution, logDir, outputDir):
         """
         Parse the logs for the current execution.
@@ -92,95 +251,31 @@ class cpulog(parser):
         @param  logDir      The path to the directory on the local machine where the logs reside.
         @param  outputDir   The path to the directory on the local machine where the parsed logs are to be stored.
         """
+        samplefile = os.path.join(logDir, 'cpu.bin')
         logfile = os.path.join(logDir, 'cpu.log')
         datafile = os.path.join(outputDir, 'cpu.data')
         peakfile = os.path.join(outputDir, 'peak.data')
-        if not os.path.exists( logfile ) or not os.path.isfile( logfile ):
+        useSamples = os.path.isfile( samplefile ) and os.path.getsize( samplefile ) > 0
+        if not useSamples and ( not os.path.exists( logfile ) or not os.path.isfile( logfile ) ):
             return
+        if useSamples:
+            for f in ['resources.data', 'resourcetotals.data']:
+                if os.path.exists( os.path.join( outputDir, f ) ) and not execution.isFake():
+                    raise Exception( "parser:cpulog wants to create {3}, but that already exists for execution {0} of client {1} on host {2}".format( execution.getNumber(), execution.client.name, execution.host.name, f ) )
         if os.path.exists( datafile ) and not execution.isFake():
             raise Exception( "parser:cpulog wants to create cpu.data, but that already exists for execution {0} of client {1} on host {2}".format( execution.getNumber(), execution.client.name, execution.host.name ) )
         if os.path.exists( peakfile ) and not execution.isFake():
             raise Exception( "parser:cpulog wants to create peak.data, but that already exists for execution {0} of client {1} on host {2}".format( execution.getNumber(), execution.client.name, execution.host.name ) )
-        fl = None
+        if not useSamples:
+            cpulogLiveParser( datafile, peakfile ).finish( logDir )
+            return
         fd = None
         fp = None
         try:
-            fl = open( logfile, 'r' )
-            fd = open( datafile, 'w' )
-            fp = open( peakfile, 'w' )
-            fd.write( "time cpu% mem\n0 0 0\n" )
-            fp.write( "cputime maxmem maxvirtmem\n")
-            startTime = -1
-            startDate = None
-            datePattern = cpulog.fullDatePattern
-            dateFunc = cpulog.fullDateToSecs
-            # pid (comm) state ppid pgrp session tty_nr tpgid flags minflt cminflt majflt cmajflt utime stime cutime cstime
-            # %d  (%s)   %c    %d   %d   %d      %d     %d    %d    %d     %d      %d     %d      %d    %d    %d     %d
-            statPattern = '^{0}\([^)]*\) +. +{0}{0}{0}{0}{0}{0}{0}{0}{0}{0}({0})({0})({0})({0})'.format( '-?[0-9]* +' )
-            relTime = -1
-            clockticks = -1
-            cpuTime = -1
-            utime = 0
-            stime = 0
-            cutime = 0
-            cstime = 0
-            cpuTime = 0.0
-            prevRelTime = -1.0
-            maxcputime = 0.0
-            maxmemsize = 0
-            maxvirtmemsize = 0
-            for line in fl:
-                # First line must be clocks ticks per sec (sysconf(_SC_CLK_TCK))
-                if clockticks == -1:
-                    clockticks = float(line)
-                    continue                
-                #12-03-15 12:22:12.386824326
-                m = re.match(datePattern, line)
-                if startTime == -1:
-                    if m:
-                        startDate = m.group(1)
-                        startTime = dateFunc(self, m)
-                    else:
-                        # See if we need to fall back to full secs due to unextended ps
-                        m = re.match(cpulog.brokenDatePattern, line)
-                        if m:
-                            datePattern = cpulog.brokenDatePattern
-                            dateFunc = cpulog.brokenDateToSecs
-                            startDate = m.group(1)
-                            startTime = dateFunc(self, m)
-                    relTime = 0
-                    continue
-                if m:
-                    relTime = dateFunc(self, m) - startTime
-                    if m.group(1) != startDate:
-                        relTime += 24 * 3600
-                    continue
-                # pid (comm) state ppid pgrp session tty_nr tpgid flags minflt cminflt majflt cmajflt utime stime cutime cstime
-                # %d  (%s)   %c    %d   %d   %d      %d     %d    %d    %d     %d      %d     %d      %d    %d    %d     %d
-                m = re.match(statPattern, line)
-                if m:
-                    newutime = int(m.group(1))
-                    newstime = int(m.group(2))
-                    newcutime = int(m.group(3))
-                    newcstime = int(m.group(4))
-                    cpuTime = (((newutime - utime) + (newstime - stime) + (newcutime - cutime) + (newcstime - cstime)) / (clockticks * (relTime - prevRelTime))) * 100.0
-                    utime = newutime
-                    stime = newstime
-                    cutime = newcutime
-                    cstime = newcstime
-                    maxcputime = 1.0 * (utime + stime + cutime + cstime) / clockticks
-                    # By definition maxcputime will always grow (since the base data is cumulative and will always grow)
-                    continue 
-                # VSZ, RSS
-                m = re.match('^[ \\t]*([0-9]*)[ \\t]+([0-9]*)$', line)
-                if m:
-                    if int(m.group(2)) > maxmemsize:
-                        maxmemsize = int(m.group(2))
-                    if int(m.group(1)) > maxvirtmemsize:
-                        maxvirtmemsize = int(m.group(1))
-                    fd.write( '{0} {1} {2} {3}\n'.format( relTime, cpuTime, m.group(2), m.group(1) ) )
-                    prevRelTime = relTime
-            fp.write( '{0} {1} {2}\n'.format( maxcputime, maxmemsize, maxvirtmemsize ) )
+            fd = dataWriter( datafile, ['time', 'cpu', 'rss', 'vsize'], 'time cpu% mem' )
+            fp = dataWriter( peakfile, ['cputime', 'maxmem', 'maxvirtmem'] )
+            fd.write( 0, 0, 0, 0 )
+            fp.write( *self.parseSamples( samplefile, fd, outputDir ) )
         finally:
             try:
                 if fp:
@@ -192,11 +287,99 @@ class cpulog(parser):
                     fd.close()
             except Exception:
                 pass
-            try:
-                if fl:
-                    fl.close()
-            except Exception:
-                pass
+
+    def getLiveParsers(self, execution, outputDir):
+        """
+        Returns the live parsers that parse the raw logs of the execution while it runs.
+
+        Only cpu.log is parsed live: cpu.bin of the resource sampler is only complete after the run.
+
+        @param  execution   The execution for which to parse the logs.
+        @param  outputDir   The path to the directory on the local machine where the parsed logs are to be stored.
+
+        @return A list with the live parser of cpu.log, or [] if the execution is not profiled with a cpu.log.
+        """
+        if not execution.client.profile or execution.host in execution.client.samplerHosts:
+            return []
+        datafile = os.path.join(outputDir, 'cpu.data')
+        peakfile = os.path.join(outputDir, 'peak.data')
+        if os.path.exists( datafile ) and not execution.isFake():
+            raise Exception( "parser:cpulog wants to create cpu.data, but that already exists for execution {0} of client {1} on host {2}".format( execution.getNumber(), execution.client.name, execution.host.name ) )
+        if os.path.exists( peakfile ) and not execution.isFake():
+            raise Exception( "parser:cpulog wants to create peak.data, but that already exists for execution {0} of client {1} on host {2}".format( execution.getNumber(), execution.client.name, execution.host.name ) )
+        return [cpulogLiveParser( datafile, peakfile )]
+
+    # The fields of the sample file used for resources.data and resourcetotals.data, after the CPU times and memory sizes
+    resourceFields = ['read_bytes', 'write_bytes', 'rchar', 'wchar', 'voluntary_ctxt_switches', 'nonvoluntary_ctxt_switches', 'tcp_rx_bytes', 'tcp_tx_bytes']
+    # The names of the columns in resources.data and resourcetotals.data for resourceFields, in the same order
+    resourceNames = ['diskread', 'diskwrite', 'ioread', 'iowrite', 'vcsw', 'nvcsw', 'tcprx', 'tcptx']
+
+    def parseSamples(self, samplefile, fd, outputDir):
+        """
+        Writes the cpu.data lines, resources.data and resourcetotals.data for a sample file of the resource sampler.
+
+        The calculations for cpu.data are the same as for a cpu.log. A sample taken no later than the previous row has
+        no interval to calculate rates over, so it gets no row: its counters are covered by the next row.
+
+        @param  samplefile  The path to the sample file.
+        @param  fd          The dataWriter object of cpu.data, with the first row already written.
+        @param  outputDir   The path to the directory where resources.data and resourcetotals.data are to be stored.
+
+        @return A tuple (total CPU time, peak resident memory size, peak virtual memory size) for peak.data.
+        """
+        clockticks, _, fields, samples = readSamples( samplefile )
+        samples = sampleColumns( fields, samples, ['utime', 'stime', 'cutime', 'cstime', 'vsize', 'rss'] + cpulog.resourceFields )
+        clockticks = float(clockticks)
+        startTime = None
+        prevRelTime = -1.0
+        prevTicks = 0
+        prevSample = None
+        lastSample = None
+        maxcputime = 0.0
+        maxmemsize = 0
+        maxvirtmemsize = 0
+        fr = None
+        try:
+            fr = dataWriter( os.path.join( outputDir, 'resources.data' ), ['time', 'cpu', 'rss', 'vsize'] + cpulog.resourceNames )
+            for sample in samples:
+                if startTime is None:
+                    startTime = sample[0]
+                relTime = sample[0] - startTime
+                ticks = sample[1] + sample[2] + sample[3] + sample[4]
+                maxcputime = ticks / clockticks
+                if sample[6] > maxmemsize:
+                    maxmemsize = sample[6]
+                if sample[5] > maxvirtmemsize:
+                    maxvirtmemsize = sample[5]
+                lastSample = sample
+                if prevSample is not None and relTime <= prevRelTime:
+                    # No time passed since the previous row, so there is no rate: the next sample covers this one
+                    continue
+                cpuTime = ( ( ticks - prevTicks ) / ( clockticks * ( relTime - prevRelTime ) ) ) * 100.0
+                prevTicks = ticks
+                prevRelTime = relTime
+                fd.write( relTime, cpuTime, sample[6], sample[5] )
+                if prevSample is None:
+                    rates = [0.0] * len(cpulog.resourceFields)
+                else:
+                    # Counters of a process never decrease, but the sampler may have missed a value
+                    rates = [max( 0, sample[i] - prevSample[i] ) / ( sample[0] - prevSample[0] ) for i in range(7, len(sample))]
+                fr.write( relTime, cpuTime, sample[6], sample[5], *rates )
+                prevSample = sample
+        finally:
+            if fr:
+                fr.close()
+        ft = None
+        try:
+            ft = dataWriter( os.path.join( outputDir, 'resourcetotals.data' ), cpulog.resourceNames )
+            if lastSample is None:
+                ft.write( *( [0] * len(cpulog.resourceFields) ) )
+            else:
+                ft.write( *lastSample[7:] )
+        finally:
+            if ft:
+                ft.close()
+        return ( maxcputime, maxmemsize, maxvirtmemsize )
 
     def canReparse(self):
         """
@@ -1,4 +1,4 @@
-from core.parser import parser
+from core.parser import parser, dataWriter
 import os
 import re
 
@@ -17,6 +17,8 @@ class libtorrent(parser):
     -- % done
     -- upload speed (kB/s)
     -- download speed (kB/s)
+    - log.cols
+    -- the same columns in the columnar binary format, see core.parser.dataWriter
     """
 
     def __init__(self, scenario):
@@ -79,8 +81,8 @@ class libtorrent(parser):
         fd = None
         try:
             fl = open( logfile, 'r' )
-            fd = open( datafile, 'w' )
-            fd.write( "time percent upspeed dlspeed\n0 0 0 0\n" )
+            fd = dataWriter( datafile, ['time', 'percent', 'upspeed', 'dlspeed'] )
+            fd.write( 0, 0, 0, 0 )
             
             for line in fl:
                 m = re.match( '^([0-9\\.]+)[ \\t]+([0-9\\.]+)[ \\t]+([0-9\\.]+)[ \\t]+([0-9\\.]+)[ \\t]*$', line )
@@ -90,7 +92,7 @@ class libtorrent(parser):
                     up = int(m.group(3))/1024.0
                     down = int(m.group(4))/1024.0
                         
-                    fd.write( "{0} {1} {2} {3}\n".format( time, percent, up, down ) )
+                    fd.write( time, percent, up, down )
         finally:
             try:
                 if fd:
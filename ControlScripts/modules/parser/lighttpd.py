@@ -1,4 +1,4 @@
-from core.parser import parser
+from core.parser import parser, dataWriter
 
 import os
 import re
@@ -19,6 +19,8 @@ class lighttpd(parser):
     -- % done
     -- upload speed (kB/s)
     -- download speed (kB/s)
+    - log.cols
+    -- the same columns in the columnar binary format, see core.parser.dataWriter
     """
 
     def __init__(self, scenario):
@@ -89,8 +91,8 @@ class lighttpd(parser):
         fd = None
         try:
             fl = open( logfile, 'r' )
-            fd = open( datafile, 'w' )
-            fd.write( "time percent upspeed dlspeed\n0 100.0 0 0\n" )
+            fd = dataWriter( datafile, ['time', 'percent', 'upspeed', 'dlspeed'] )
+            fd.write( 0, 100.0, 0, 0 )
             firstTime = -1
             relTime = -1
             lastUploaded = 0
@@ -112,7 +114,7 @@ class lighttpd(parser):
                 if m:
                     upspeed = int(m.group(1)) - lastUploaded
                     lastUploaded = int(m.group(1))
-                    fd.write( "{0} 100.0 {1} 0\n".format( relTime, upspeed ) )
+                    fd.write( relTime, 100.0, upspeed, 0 )
                     relTime = -1
         finally:
             try:
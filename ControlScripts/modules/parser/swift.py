@@ -1,7 +1,72 @@
-from core.parser import parser
+from core.parser import parser, liveParser, dataWriter
 
 import os
 
+class swiftLiveParser(liveParser):
+    """
+    Parses a swift log.log incrementally into log.data, see parser:swift.
+    """
+
+    fd = None               # The dataWriter of log.data
+    relTime = 0             # The relative time of the next line
+    upBytes = 0             # The number of bytes uploaded up to the previous line
+    downBytes = 0           # The number of bytes downloaded up to the previous line
+    progress = None         # The tuple (percent, upspeed, dlspeed) of the last row written
+
+    def __init__(self, datafile):
+        """
+        Creates log.data.
+
+        @param  datafile    The path to log.data.
+        """
+        liveParser.__init__(self, 'log.log')
+        self.fd = dataWriter( datafile, ['time', 'percent', 'upspeed', 'dlspeed'] )
+        self.fd.write( 0, 0, 0, 0 )
+
+    def parseLine(self, line):
+        """
+        Parses a single line of log.log.
+
+        @param  line        The line.
+        """
+        if line[:5] == 'SLEEP':
+            self.relTime += 1
+        elif line[:4] == 'done' or line[:4] == 'DONE':
+            # Split over ' ', then over ',', then over '(', then over ')', and keep it all in one array
+            split = reduce( lambda x,y: x + y.split( ')' ), reduce(lambda x,y: x + y.split( '(' ), reduce(lambda x,y: x + y.split( ',' ), line.split( ' ' ), []), []), [])
+            dlspeed = (int(split[16]) - self.downBytes) / 1024.0
+            self.downBytes = int(split[16])
+            upspeed = (int(split[10]) - self.upBytes) / 1024.0
+            self.upBytes = int(split[10])
+
+            percent = 0
+            if int(split[3]) > 0:
+                percent = 100.0 * ( float(int(split[1])) / float(int(split[3])) )
+
+            self.fd.write( self.relTime, percent, upspeed, dlspeed )
+            self.progress = ( percent, upspeed, dlspeed )
+            self.relTime += 1
+
+    def flush(self):
+        """
+        Flushes log.data.
+        """
+        self.fd.flush()
+
+    def getProgress(self):
+        """
+        Returns the progress of the execution as parsed so far.
+
+        @return A tuple (percentage done, upload speed in KiB/s, download speed in KiB/s) of the last row, or None.
+        """
+        return self.progress
+
+    def close(self):
+        """
+        Closes log.data.
+        """
+        self.fd.close()
+
 class swift(parser):
     """
     Implementation of the basic swift parser.
@@ -12,7 +77,7 @@ class swift(parser):
     - [none]
     
     Raw logs expected:
-    - log.log
+    - log.log, which is parsed during the run in live mode
     
     Parsed log files creates by this module:
     - log.data
@@ -20,6 +85,8 @@ class swift(parser):
     -- % done
     -- upload speed (kB/s)
     -- download speed (kB/s)
+    - log.cols
+    -- the same columns in the columnar binary format, see core.parser.dataWriter
     """
 
     def __init__(self, scenario):
@@ -86,43 +153,29 @@ class swift(parser):
             raise Exception( "parser:swift expects the file log.log to be available for execution {0} of client {1} on host {2}".format( execution.getNumber(), execution.client.name, execution.host.name ) )
         if os.path.exists( datafile ) and not execution.isFake():
             raise Exception( "parser:swift wants to create log.data, but that already exists for execution {0} of client {1} on host {2}".format( execution.getNumber(), execution.client.name, execution.host.name ) )
-        fl = None
-        fd = None
-        try:
-            fl = open( logfile, 'r' )
-            fd = open( datafile, 'w' )
-            fd.write( "time percent upspeed dlspeed\n0 0 0 0\n" )
-            relTime = 0
-            up_bytes = 0
-            down_bytes = 0
-            for line in fl:
-                if line[:5] == 'SLEEP':
-                    relTime += 1
-                elif line[:4] == 'done' or line[:4] == 'DONE':
-                    # Split over ' ', then over ',', then over '(', then over ')', and keep it all in one array
-                    split = reduce( lambda x,y: x + y.split( ')' ), reduce(lambda x,y: x + y.split( '(' ), reduce(lambda x,y: x + y.split( ',' ), line.split( ' ' ), []), []), [])
-                    dlspeed = (int(split[16]) - down_bytes) / 1024.0
-                    down_bytes = int(split[16])
-                    upspeed = (int(split[10]) - up_bytes) / 1024.0
-                    up_bytes = int(split[10])
-                                        
-                    percent = 0
-                    if int(split[3]) > 0:
-                        percent = 100.0 * ( float(int(split[1])) / float(int(split[3])) )
-                        
-                    fd.write( "{0} {1} {2} {3}\n".format( relTime, percent, upspeed, dlspeed ) )
-                    relTime += 1
-        finally:
-            try:
-                if fd:
-                    fd.close()
-            except Exception:
-                pass
-            try:
-                if fl:
-                    fl.close()
-            except Exception:
-                pass
+        swiftLiveParser( datafile ).finish( logDir )
+
+    def getLiveParsers(self, execution, outputDir):
+        """
+        Returns the live parsers that parse the raw logs of the execution while it runs.
+
+        @param  execution   The execution for which to parse the logs.
+        @param  outputDir   The path to the directory on the local machine where the parsed logs are to be stored.
+
+        @return A list with the live parser of log.log.
+        """
+        datafile = os.path.join(outputDir, 'log.data')
+        if os.path.exists( datafile ) and not execution.isFake():
+            raise Exception( "parser:swift wants to create log.data, but that already exists for execution {0} of client {1} on host {2}".format( execution.getNumber(), execution.client.name, execution.host.name ) )
+        return [swiftLiveParser( datafile )]
+
+    def reportsLiveProgress(self):
+        """
+        Returns whether the live parsers of this parser report the progress of the execution.
+
+        @return True, since swiftLiveParser reports the progress of each row it writes.
+        """
+        return True
 
     def canReparse(self):
         """
@@ -1,4 +1,4 @@
-from core.parser import parser
+from core.parser import parser, dataWriter
 from core.campaign import Campaign
 
 import os
@@ -19,6 +19,8 @@ class utorrent(parser):
     -- % done
     -- upload speed (kB/s)
     -- download speed (kB/s)
+    - log.cols
+    -- the same columns in the columnar binary format, see core.parser.dataWriter
     """
 
     def __init__(self, scenario):
@@ -89,8 +91,8 @@ class utorrent(parser):
         fd = None
         try:
             fl = open( logfile, 'r' )
-            fd = open( datafile, 'w' )
-            fd.write( "time percent upspeed dlspeed\n0 0 0 0\n" )
+            fd = dataWriter( datafile, ['time', 'percent', 'upspeed', 'dlspeed'] )
+            fd.write( 0, 0, 0, 0 )
             firstTime = -1
             relTime = -1
             percentDone = ''
@@ -136,7 +138,7 @@ class utorrent(parser):
                     prevDown = down
                     prevUp = up
                     
-                    fd.write( "{0} {1} {2} {3}\n".format( relTime, percentDone, upspeed, downspeed ) )
+                    fd.write( relTime, percentDone, upspeed, downspeed )
                     
                     prevRelTime = relTime
                     relTime = -1
@@ -0,0 +1,389 @@
+from core.campaign import Campaign
+from core.processor import processor, readDataChunks
+from core.parser import dataReader, hasColumns
+from core.parsing import isValidName
+from core.resultsdb import DATABASE_NAME, openDatabase
+
+import os
+import time
+
+def parseError( msg ):
+    """
+    A simple helper function to make parsing a lot of parameters a bit nicer.
+    """
+    raise Exception( "Parse error for processor object on line {0}: {1}".format( Campaign.currentLineNumber, msg ) )
+
+# The names of the values in the statistics files of processor:statistics that have no header line
+STATISTICS_COLUMNS = {
+    'stats.leecher': ['leechers', 'maxmem', 'avgmem', 'avgcputime', 'completed', 'avgdownloadtime', 'avgcompletion', 'maxvirtmem', 'avgvirtmem',
+                      'avgdiskread', 'avgdiskwrite', 'avgioread', 'avgiowrite', 'avgvcsw', 'avgnvcsw', 'avgtcprx', 'avgtcptx', 'avgdlspeed', 'avgupspeed'],
+    'stats.seeder': ['seeders', 'maxmem', 'avgmem', 'avgcputime', 'maxvirtmem', 'avgvirtmem',
+                     'avgdiskread', 'avgdiskwrite', 'avgioread', 'avgiowrite', 'avgvcsw', 'avgnvcsw', 'avgtcprx', 'avgtcptx', 'avgdlspeed', 'avgupspeed'],
+}
+
+def isNumber( value ):
+    """
+    Returns whether a string is a number.
+
+    @param  value   The string.
+
+    @return True iff float(value) succeeds.
+    """
+    try:
+        float( value )
+    except ValueError:
+        return False
+    return True
+
+def seriesColumns( path ):
+    """
+    Returns the names of the columns of a parsed log.
+
+    The names are those of the columnar parsed log if there is one, otherwise those in the header line if it has one
+    name per column, otherwise column0, column1, etc.
+
+    @param  path    The path to the parsed log (.data).
+
+    @return The list of names, [] if the parsed log has no rows.
+    """
+    if hasColumns( path ):
+        reader = dataReader( path )
+        try:
+            if reader.rows == 0:
+                return []
+            return reader.names
+        finally:
+            reader.close()
+    header = None
+    fObj = open( path, 'r' )
+    try:
+        for line in fObj:
+            fields = line.split()
+            if not fields:
+                continue
+            if not isNumber( fields[0] ):
+                if header is None:
+                    header = fields
+                continue
+            if header is not None and len(header) == len(fields):
+                return header
+            return ['column{0}'.format( i ) for i in xrange( len(fields) )]
+    finally:
+        fObj.close()
+    return []
+
+def summarizeSeries( path ):
+    """
+    Summarizes each column of a parsed log.
+
+    @param  path    The path to the parsed log (.data).
+
+    @return A list of tuples (name, number of rows, first value, last value, minimum, maximum, mean), one per column.
+    """
+    names = seriesColumns( path )
+    if not names:
+        return []
+    rows = 0
+    first = None
+    last = None
+    minimum = [None] * len(names)
+    maximum = [None] * len(names)
+    sums = [0.0] * len(names)
+    for chunk in readDataChunks( path, range( len(names) ) ):
+        if not chunk[0]:
+            continue
+        if first is None:
+            first = [values[0] for values in chunk]
+        last = [values[-1] for values in chunk]
+        rows += len(chunk[0])
+        for i in xrange( len(names) ):
+            low = min( chunk[i] )
+            high = max( chunk[i] )
+            if minimum[i] is None or low < minimum[i]:
+                minimum[i] = low
+            if maximum[i] is None or high > maximum[i]:
+                maximum[i] = high
+            sums[i] += sum( chunk[i] )
+    if rows == 0:
+        return []
+    return [( names[i], rows, first[i], last[i], minimum[i], maximum[i], sums[i] / rows ) for i in xrange( len(names) )]
+
+class database(processor):
+    """
+    Loads the scenario into the results database of the campaign, an SQLite database, for queries across scenarios and
+    campaigns with ControlScripts/query_results.py. See core.resultsdb for the tables.
+
+    Loaded are the scenario with the reason its run stopped, the executions with their client, host, role, timeout and
+    files, the parameters given to this processor, a summary of each column of each parsed and processed log (number of
+    rows, first, last, minimum, maximum and mean) and all values in the stats.* files of processor:statistics.
+
+    The rows of the scenario are replaced every time it is processed, so the database is built one scenario at a time
+    and can be updated with reparse.py. When reprocessing, the client and host names and the parameters stored by the
+    original run are kept where they are not available then; parameters given again replace the stored ones. Declare
+    this processor after those whose output it loads, such as processor:statistics, processor:savehostname and
+    processor:savefiles.
+
+    Extra parameters:
+    - database      The path to the database file. Optional, defaults to results.db in the results directory of the campaign.
+    - parameter     A parameter of the scenario to store, as name:value, to select and compare scenarios by (e.g.
+                    parameter=bandwidth:10mbit). Optional, may be specified multiple times.
+
+    Raw logs expected:
+    - [none]
+
+    Parsed logs expected:
+    - *.data      (all are summarized, none are required)
+
+    Processed log files created:
+    - [none]; the database is written instead
+    """
+
+    databasePath = None     # The path to the database file, None for the default
+    parameters = None       # The list of (name, value) of the parameters to store
+
+    def __init__(self, scenario):
+        """
+        Initialization of a generic processor object.
+
+        @param  scenario        The ScenarioRunner object this processor object is part of.
+        """
+        processor.__init__(self, scenario)
+        self.parameters = []
+
+    def parseSetting(self, key, value):
+        """
+        Parse a single setting for this object.
+
+        Settings are written in text files in a key=value fashion.
+        For each such setting that belongs to this object this method will be called.
+
+        After all settings have been given, the method checkSettings will be called.
+
+        If a setting does not parse correctly, this method raises an Exception with a descriptive message.
+
+        Subclassers should first parse their own settings and then call this implementation to have the
+        generic settings parsed and to have any unknown settings raise an Exception.
+
+        @param  key     The name of the parameter, i.e. the key from the key=value pair.
+        @param  value   The value of the parameter, i.e. the value from the key=value pair.
+        """
+        if key == 'database':
+            if self.databasePath is not None:
+                parseError( "database may be specified only once" )
+            if value == '':
+                parseError( "database must be a path" )
+            self.databasePath = value
+        elif key == 'parameter':
+            # Parameter values can't hold '=', since the part before the last '=' is taken as the name
+            if ':' not in value:
+                parseError( 'parameter must be given as name:value, unlike "{0}"'.format( value ) )
+            name, parameterValue = value.split( ':', 1 )
+            if not isValidName( name ):
+                parseError( '"{0}" is not a valid parameter name'.format( name ) )
+            if name in [parameter[0] for parameter in self.parameters]:
+                parseError( 'parameter {0} may be specified only once'.format( name ) )
+            self.parameters.append( ( name, parameterValue ) )
+        else:
+            processor.parseSetting(self, key, value)
+
+    def checkSettings(self):
+        """
+        Check the sanity of the settings in this object.
+
+        This method is called after all calls to parseSetting(...) have been done.
+        Any defaults may be set here as well.
+
+        An Exception is raised in the case of insanity.
+        """
+        processor.checkSettings(self)
+
+    def resolveNames(self):
+        """
+        Resolve any names given in the parameters.
+
+        This methods is called after all objects have been initialized.
+        """
+        processor.resolveNames(self)
+
+    def processLogs(self, baseDir, outputDir):
+        """
+        Process the raw and parsed logs found in the base directory.
+
+        The raw logs are found in self.getRawLogDir( execution, baseDir ).
+        The parsed logs are found in self.getParsedLogDir( execution, baseDir ).
+
+        Be sure to document in the header of your module which (parsed) logs you expect to be present and with which filename.
+
+        Subclassers must override this method.
+
+        @param  baseDir     The base directory for the logs.
+        @param  outputDir   The path to the directory on the local machine where the processed logs are to be stored.
+        """
+        # baseDir is .../<campaign>/scenarios/<scenario>/executions
+        scenarioDir = os.path.dirname( os.path.abspath( baseDir ) )
+        campaignDir = os.path.dirname( os.path.dirname( scenarioDir ) )
+        path = self.databasePath
+        if path is None:
+            path = os.path.join( campaignDir, DATABASE_NAME )
+        name = self.scenario.name
+        stopReason = None
+        if os.path.isfile( os.path.join( scenarioDir, 'stopreason' ) ):
+            fObj = open( os.path.join( scenarioDir, 'stopreason' ), 'r' )
+            try:
+                stopReason = fObj.read().strip()
+            finally:
+                fObj.close()
+        # Read everything before touching the database, so its transaction is short
+        executions = []
+        series = []
+        for execution in self.scenario.getObjects('execution'):
+            executions.append( self.describeExecution( execution, outputDir ) )
+            parsedLogDir = self.getParsedLogDir( execution, baseDir )
+            if os.path.isdir( parsedLogDir ):
+                for log in sorted( os.listdir( parsedLogDir ) ):
+                    if log[-5:] == '.data':
+                        for summary in summarizeSeries( os.path.join( parsedLogDir, log ) ):
+                            series.append( ( name, execution.getNumber(), log ) + summary )
+        statistics = []
+        for log in sorted( os.listdir( outputDir ) ):
+            if log[-5:] == '.data':
+                for summary in summarizeSeries( os.path.join( outputDir, log ) ):
+                    series.append( ( name, None, log ) + summary )
+            elif log[:6] == 'stats.':
+                statistics += [( name, log ) + value for value in self.readStatistics( os.path.join( outputDir, log ) )]
+        connection = openDatabase( path )
+        try:
+            stored = dict( [( row[0], row[1:] ) for row in connection.execute( 'SELECT execution, client, host FROM executions WHERE scenario = ?', ( name, ) )] )
+            parameters = []
+            if self.scenario.isFake():
+                given = [parameter[0] for parameter in self.parameters]
+                parameters = [row for row in connection.execute( 'SELECT name, value FROM parameters WHERE scenario = ? ORDER BY rowid', ( name, ) ).fetchall() if row[0] not in given]
+            parameters += self.parameters
+            executions = [( name, ) + self.keepStored( e, stored.get( e[0] ) ) for e in executions]
+            for table in ['scenarios', 'executions', 'parameters', 'series', 'statistics']:
+                connection.execute( 'DELETE FROM {0} WHERE scenario = ?'.format( table ), ( name, ) )
+            connection.execute( 'INSERT INTO scenarios VALUES (?, ?, ?)', ( name, time.time(), stopReason ) )
+            connection.executemany( 'INSERT INTO executions VALUES (?, ?, ?, ?, ?, ?, ?)', executions )
+            connection.executemany( 'INSERT INTO parameters VALUES (?, ?, ?)', [( name, ) + tuple(parameter) for parameter in parameters] )
+            connection.executemany( 'INSERT INTO series VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', series )
+            connection.executemany( 'INSERT INTO statistics VALUES (?, ?, ?, ?, ?)', statistics )
+            connection.commit()
+        finally:
+            connection.close()
+
+    def describeExecution(self, execution, outputDir):
+        """
+        Returns the row of an execution for the executions table, without the scenario.
+
+        The host, role, timeout and files are taken from the files of processor:savehostname, processor:saveisseeder,
+        processor:savetimeout and processor:savefiles when reprocessing, which reparse.py already does for the first three.
+
+        @param  execution   The execution.
+        @param  outputDir   The directory with the processed logs.
+
+        @return A tuple (number, client name, host name, 1 for a seeder else 0, timeout, file names separated by newlines).
+        """
+        files = None
+        filesPath = os.path.join( outputDir, 'files_{0}'.format( execution.getNumber() ) )
+        if os.path.isfile( filesPath ):
+            fObj = open( filesPath, 'r' )
+            try:
+                files = fObj.read().strip()
+            finally:
+                fObj.close()
+        elif not execution.isFake() and execution.files:
+            files = '\n'.join( [f.name for f in execution.files] )
+        seeder = 0
+        if execution.isSeeder():
+            seeder = 1
+        return ( execution.getNumber(), execution.client.name, execution.host.name, seeder, execution.timeout, files )
+
+    def keepStored(self, row, storedRow):
+        """
+        Replaces the client and host names of an execution that are unknown when reprocessing by the stored ones.
+
+        @param  row         The row of the execution as returned by describeExecution(...).
+        @param  storedRow   The tuple (client name, host name) stored for the execution, or None.
+
+        @return The row with the names replaced where needed.
+        """
+        if storedRow is None:
+            return row
+        client, host = row[1:3]
+        if client == '__reparse__':
+            client = storedRow[0]
+        if host == '__reparse__':
+            host = storedRow[1]
+        return ( row[0], client, host ) + row[3:]
+
+    def readStatistics(self, path):
+        """
+        Reads the values of a statistics file.
+
+        The files of processor:statistics without a header line get the names in STATISTICS_COLUMNS; other files are
+        taken to start with a header line.
+
+        @param  path    The path to the statistics file.
+
+        @return A list of tuples (row, name, value), with numbers as floats.
+        """
+        fileName = os.path.basename( path )
+        fObj = open( path, 'r' )
+        try:
+            lines = [line.split() for line in fObj if line.strip() != '']
+        finally:
+            fObj.close()
+        names = []
+        if fileName in STATISTICS_COLUMNS:
+            names = STATISTICS_COLUMNS[fileName]
+        elif lines:
+            names = lines[0]
+            lines = lines[1:]
+        values = []
+        for row in xrange( len(lines) ):
+            for i in xrange( len(lines[row]) ):
+                name = 'column{0}'.format( i )
+                if i < len(names):
+                    name = names[i]
+                value = lines[row][i]
+                if isNumber( value ):
+                    value = float( value )
+                values.append( ( row, name, value ) )
+        return values
+
+    def canReprocess(self):
+        """
+        Return whether this processor can be used to reprocess after a run has already been torn down.
+
+        This mainly signals that this parser functions within the following constraints:
+        - resolveNames is never called
+        - host, client and file object are explicitly unavailable
+        - Only part of the scenario object is available:
+            - scenario.isFake() is available and returns True
+            - scenario.name is available and correct
+            - scenario.getObjects(...) is available and will return all executions but an empty list otherwise
+            - scenario.getObjectsDict(...) is available and will return all executions but an empty dictionary otherwise
+            - The executions returned by this scenario are limited as described below
+            - The methods are not available during initialization
+        - Only part of the static Campaign object is available:
+            - Campaign.logger is available as normally and logs to stdout
+            - Campaign.which is available as normally
+        - Only part of the execution object is available:
+            - execution.isFake() is available and returns True
+            - execution.getNumber() is available and limited
+            - execution.client is available but incomplete
+                - execution.client.name is available and reads '__reparse__'
+                - execution.client.isSideService() is available
+                    - returns True unless any log exists for the execution
+            - execution.timeout is available and 0.0 unless the data was saved using processor:savetimeout
+            - execution.isSeeder() is available and False unless the data was saved using processor:isSeeder (and this was a seeder)
+            - execution.host is available but limited
+                - execution.host.name is available and reads '__reparse__' unless the data was saved using processor:savehostname
+
+        @return True iff this processor can reprocess.
+        """
+        return True
+
+    @staticmethod
+    def APIVersion():
+        return "2.4.0"
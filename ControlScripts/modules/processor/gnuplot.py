@@ -1,10 +1,15 @@
 from core.campaign import Campaign
 from core.processor import processor
+from core.parsing import isPositiveInt
 
 import os
+import uuid
+import Queue
 import tempfile
+import threading
 import subprocess
-from subprocess import Popen, PIPE
+import multiprocessing
+from subprocess import Popen, PIPE, STDOUT
 
 def parseError( msg ):
     """
@@ -12,6 +17,114 @@ def parseError( msg ):
     """
     raise Exception( "Parse error for processor object on line {0}: {1}".format( Campaign.currentLineNumber, msg ) )
 
+class gnuplotWorker:
+    """
+    A long-lived gnuplot process that runs scripts fed to it over stdin.
+
+    Each script is written to a temporary file of the worker and loaded by the gnuplot process, followed by a line
+    that prints a marker with the error state once the script is done. An error aborts the loaded script just like
+    it aborts a script run by a fresh gnuplot process. After each script the output is closed, the terminal is
+    restored and the session is reset, so the next script starts from a clean state.
+
+    This requires gnuplot 5.2 or newer for reset session. With older versions, or if gnuplot can't be started this
+    way, each script is run by a fresh gnuplot process instead.
+    """
+
+    process = None          # The gnuplot process, None if not running
+    persistent = True       # False iff each script is to be run by a fresh gnuplot process
+    scriptFile = None       # The path to the temporary file the scripts are written to
+    marker = None           # The marker printed by gnuplot when a script is done
+
+    def __init__(self):
+        tmpfd, self.scriptFile = tempfile.mkstemp()
+        os.close(tmpfd)
+        self.marker = 'GNUPLOT_WORKER_DONE_{0}'.format( uuid.uuid4().hex )
+
+    def start(self):
+        """
+        Starts the gnuplot process and checks whether it can be used as a persistent worker.
+        """
+        self.process = Popen( [gnuplot.gnuplot], stdin = PIPE, stdout = PIPE, stderr = STDOUT, close_fds = True )
+        done, ok, _ = self.send( "set print\nprint '{0}', (GPVAL_VERSION >= 5.2 ? 0 : 1)\nset terminal push\n".format( self.marker ) )
+        if not done or not ok:
+            self.stop()
+            self.persistent = False
+
+    def send(self, commands):
+        """
+        Sends commands to the gnuplot process and collects its output up to the marker.
+
+        The commands must end by printing the marker followed by a number that is 0 on success.
+
+        @param  commands    The commands to send.
+
+        @return A tuple (done, ok, output): done is False iff the process ended before printing the marker, in which
+                case ok is True iff it exited normally.
+        """
+        output = []
+        try:
+            self.process.stdin.write( commands )
+            self.process.stdin.flush()
+        except IOError:
+            # The process died; its output and exit status are collected below
+            pass
+        while True:
+            line = self.process.stdout.readline()
+            if line == '':
+                returncode = self.process.wait()
+                self.process = None
+                return ( False, returncode == 0, ''.join( output ) )
+            if line.startswith( self.marker ):
+                return ( True, line[len(self.marker):].strip() == '0', ''.join( output ) )
+            output.append( line )
+
+    def run(self, script):
+        """
+        Runs a gnuplot script.
+
+        @param  script      The script to run.
+
+        @return A tuple (ok, output): ok is True iff the script ran without errors, output is what gnuplot printed.
+        """
+        f = open( self.scriptFile, 'w' )
+        try:
+            f.write( script )
+        finally:
+            f.close()
+        if self.persistent and not self.process:
+            self.start()
+        if not self.persistent:
+            try:
+                return ( True, subprocess.check_output( [gnuplot.gnuplot, self.scriptFile], bufsize=8192, stderr=subprocess.STDOUT ) )
+            except subprocess.CalledProcessError as e:
+                return ( False, e.output )
+        # If the script ends gnuplot (e.g. by exit) the process is restarted for the next script
+        _, ok, output = self.send( "reset errors\nload '{0}'\nunset output\nset print\nprint '{1}', GPVAL_ERRNO\nset terminal pop\nset terminal push\nreset session\n".format( self.scriptFile, self.marker ) )
+        return ( ok, output )
+
+    def stop(self):
+        """
+        Stops the gnuplot process, if running.
+
+        The worker can still be used afterwards; the process is restarted when needed.
+        """
+        if self.process:
+            try:
+                self.process.stdin.close()
+            except IOError:
+                pass
+            self.process.wait()
+            self.process = None
+
+    def cleanup(self):
+        """
+        Stops the worker and removes its temporary file.
+        """
+        self.stop()
+        if self.scriptFile:
+            os.remove( self.scriptFile )
+            self.scriptFile = None
+
 class gnuplot(processor):
     """
     A gnuplot processor.
@@ -28,6 +141,11 @@ class gnuplot(processor):
     - showErrors   Set to 'yes' to have processor:gnuplot show errors found when running gnuplot; these are normally
                    hidden since it's not uncommon to have gnuplot scripts that can run for only a part of the executions
                    but hence would spam the log with output. Be sure to enable this while testing new gnuplot scripts.
+    - workers      The number of gnuplot processes that run the scripts in parallel. Optional positive integer,
+                   defaults to the number of local CPUs.
+
+    The gnuplot processes are kept running while the executions are processed and are fed one script per
+    execution, so gnuplot is not started over and over again (see gnuplotWorker).
     
     Raw logs expected:
     - depends on the gnuplot script
@@ -41,6 +159,7 @@ class gnuplot(processor):
     
     script = None       # Location of the script file
     showErrors = False  # Whether to show gnuplot errors
+    workers = None      # The number of gnuplot processes to run in parallel
     
     # @static
     gnuplot = None      # The location of gnuplot
@@ -89,6 +208,12 @@ class gnuplot(processor):
         elif key == 'showErrors':
             if value == 'yes':
                 self.showErrors = True
+        elif key == 'workers':
+            if self.workers:
+                parseError( "workers may be specified only once" )
+            if not isPositiveInt( value, True ):
+                parseError( "workers must be a positive, non-zero integer" )
+            self.workers = int(value)
         else:
             processor.parseSetting(self, key, value)
 
@@ -105,6 +230,11 @@ class gnuplot(processor):
         
         if not self.script:
             raise Exception( "Gnuplot processor must have a script defined" )
+        if not self.workers:
+            try:
+                self.workers = multiprocessing.cpu_count()
+            except NotImplementedError:
+                self.workers = 1
 
     def resolveNames(self):
         """
@@ -128,42 +258,52 @@ class gnuplot(processor):
         @param  baseDir     The base directory for the logs.
         @param  outputDir   The path to the directory on the local machine where the processed logs are to be stored.
         """
-        f = None
-        tmpFile = None
-        tmpfd = None
+        f = open( self.script, 'r' )
         try:
-            f = open( self.script, 'r' )
             scriptdata = f.read()
+        finally:
             f.close()
-            f = None
-            tmpfd, tmpFile = tempfile.mkstemp()
-            os.close(tmpfd)
-            tmpfd = None
-            for e in self.scenario.getObjects('execution'):
-                if e.client.isSideService():
-                    continue
-                f = open( tmpFile, 'w' )
-                f.write( "indir='{0}'\n".format( self.getParsedLogDir(e, baseDir) ) )
-                f.write( "rawdir='{0}'\n".format( self.getRawLogDir(e, baseDir) ) )
-                f.write( "outdir='{0}'\n".format( outputDir ) )
-                f.write( "execnum='{0}'\n".format( e.getNumber() ) )
-                f.write( scriptdata )
-                f.close()
+        jobs = Queue.Queue()
+        for e in self.scenario.getObjects('execution'):
+            if e.client.isSideService():
+                continue
+            script = "indir='{0}'\n".format( self.getParsedLogDir(e, baseDir) )
+            script += "rawdir='{0}'\n".format( self.getRawLogDir(e, baseDir) )
+            script += "outdir='{0}'\n".format( outputDir )
+            script += "execnum='{0}'\n".format( e.getNumber() )
+            jobs.put( script + scriptdata )
+        threads = []
+        errors = []
+        for _ in range( min( self.workers, jobs.qsize() ) ):
+            t = threading.Thread( target = self.runWorker, args = (jobs, errors) )
+            t.start()
+            threads.append( t )
+        for t in threads:
+            t.join()
+        if len(errors) > 0:
+            raise errors[0]
+
+    def runWorker(self, jobs, errors):
+        """
+        Runs scripts from the queue on one gnuplot worker until the queue is empty.
+
+        @param  jobs        The Queue.Queue of scripts to run.
+        @param  errors      The list to append an exception to if the worker fails.
+        """
+        worker = gnuplotWorker()
+        try:
+            while True:
                 try:
-                    subprocess.check_output( [gnuplot.gnuplot, tmpFile], bufsize=8192, stderr=subprocess.STDOUT )
-                except subprocess.CalledProcessError as e:
-                    if self.showErrors:
-                        Campaign.logger.log( "Running gnuplot failed: {0}. Ignoring.".format( e.output ) )
+                    script = jobs.get_nowait()
+                except Queue.Empty:
+                    return
+                ok, output = worker.run( script )
+                if not ok and self.showErrors:
+                    Campaign.logger.log( "Running gnuplot failed: {0}. Ignoring.".format( output ) )
+        except Exception as exc:
+            errors.append( exc )
         finally:
-            if f:
-                try:
-                    f.close()
-                except Exception:
-                    pass
-            elif tmpfd is not None:
-                os.close(tmpfd)
-            if tmpFile:
-                os.remove( tmpFile )
+            worker.cleanup()
 
     def canReprocess(self):
         """
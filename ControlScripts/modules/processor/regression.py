@@ -0,0 +1,227 @@
+from core.campaign import Campaign
+from core.processor import processor
+from core.parsing import isPositiveFloat, isPositiveInt
+from core.regression import TESTS, scenarioExecutions, summarizeExecutions, compareScenario, hasRegression, writeReport
+
+import os
+
+def parseError( msg ):
+    """
+    A simple helper function to make parsing a lot of parameters a bit nicer.
+    """
+    raise Exception( "Parse error for processor object on line {0}: {1}".format( Campaign.currentLineNumber, msg ) )
+
+class regression(processor):
+    """
+    Compares the scenario with the same scenario in a baseline campaign to find performance regressions.
+
+    The executions are matched with those of the baseline by number and role. The download times of the completed
+    leechers, the mean download speeds of the leechers and the mean upload speeds of the seeders are then compared as
+    distributions, see core.regression. A metric regresses if the change is significant and its median is worse than
+    in the baseline by more than the threshold, or if the candidate has no values where the baseline has enough. The
+    fraction of the matched leechers that completed is compared too and regresses if it drops by more than the
+    threshold. The scenario fails if any metric regresses. The result is logged as well. ControlScripts/compare_campaigns.py compares whole campaigns the same way.
+
+    Extra parameters:
+    - baseline      The path to the results directory of the baseline campaign. Required.
+    - threshold     The change of the median that is allowed, as a percentage. Optional positive float, default 5.
+    - alpha         The significance level. Optional float between 0 and 1, default 0.05.
+    - test          The test that decides whether a change is significant: 'mannwhitney' for a two-sided
+                    Mann-Whitney U test, 'bootstrap' for a bootstrap confidence interval of the change of the median
+                    that excludes 0. Optional, default 'mannwhitney'.
+    - resamples     The number of bootstrap resamples. Optional positive integer, default 2000.
+
+    Raw logs expected:
+    - [none]
+
+    Parsed logs expected:
+    - log.data    (executions without it are left out)
+
+    Processed log files created:
+    - regression.report, the report in text: PASS or FAIL, notes on the matching of the executions and a line per metric
+    - stats.regression, with a header line and one line per metric, the first being completed
+    -- name of the metric and role of the executions
+    -- number of values in the baseline and the candidate
+    -- median in the baseline and the candidate; for the metric completed the fraction of the leechers that completed
+    -- relative change of the median and the lower and upper bound of its bootstrap confidence interval (float)
+    -- Mann-Whitney p-value
+    -- verdict: regression, improvement, unchanged or insufficient
+    -- values that can't be calculated are '-'
+
+    The role of an execution in the baseline is taken from its isSeeder_N file, so the baseline should have been
+    processed with processor:saveisseeder.
+    """
+
+    baseline = None         # The path to the results directory of the baseline campaign
+    threshold = None        # The relative change of the median that is allowed
+    alpha = None            # The significance level
+    test = None             # The test that decides significance
+    resamples = None        # The number of bootstrap resamples
+
+    def __init__(self, scenario):
+        """
+        Initialization of a generic processor object.
+
+        @param  scenario        The ScenarioRunner object this processor object is part of.
+        """
+        processor.__init__(self, scenario)
+
+    def parseSetting(self, key, value):
+        """
+        Parse a single setting for this object.
+
+        Settings are written in text files in a key=value fashion.
+        For each such setting that belongs to this object this method will be called.
+
+        After all settings have been given, the method checkSettings will be called.
+
+        If a setting does not parse correctly, this method raises an Exception with a descriptive message.
+
+        Subclassers should first parse their own settings and then call this implementation to have the
+        generic settings parsed and to have any unknown settings raise an Exception.
+
+        @param  key     The name of the parameter, i.e. the key from the key=value pair.
+        @param  value   The value of the parameter, i.e. the value from the key=value pair.
+        """
+        if key == 'baseline':
+            if self.baseline is not None:
+                parseError( "baseline may be specified only once" )
+            if not os.path.isdir( os.path.join( value, 'scenarios' ) ):
+                parseError( "baseline must be the results directory of a campaign, unlike {0}".format( value ) )
+            self.baseline = value
+        elif key == 'threshold':
+            if self.threshold is not None:
+                parseError( "threshold may be specified only once" )
+            if not isPositiveFloat( value ):
+                parseError( "threshold must be a positive floating point number" )
+            self.threshold = float(value) / 100
+        elif key == 'alpha':
+            if self.alpha is not None:
+                parseError( "alpha may be specified only once" )
+            if not isPositiveFloat( value, True ) or float(value) >= 1:
+                parseError( "alpha must be a floating point number between 0 and 1" )
+            self.alpha = float(value)
+        elif key == 'test':
+            if self.test is not None:
+                parseError( "test may be specified only once" )
+            if value not in TESTS:
+                parseError( "test must be one of {0}".format( ', '.join( TESTS ) ) )
+            self.test = value
+        elif key == 'resamples':
+            if self.resamples is not None:
+                parseError( "resamples may be specified only once" )
+            if not isPositiveInt( value, True ):
+                parseError( "resamples must be a positive, non-zero integer" )
+            self.resamples = int(value)
+        else:
+            processor.parseSetting(self, key, value)
+
+    def checkSettings(self):
+        """
+        Check the sanity of the settings in this object.
+
+        This method is called after all calls to parseSetting(...) have been done.
+        Any defaults may be set here as well.
+
+        An Exception is raised in the case of insanity.
+        """
+        processor.checkSettings(self)
+        if self.baseline is None:
+            raise Exception( "processor:regression needs the baseline parameter" )
+        if self.threshold is None:
+            self.threshold = 0.05
+        if self.alpha is None:
+            self.alpha = 0.05
+        if self.test is None:
+            self.test = 'mannwhitney'
+        if self.resamples is None:
+            self.resamples = 2000
+
+    def resolveNames(self):
+        """
+        Resolve any names given in the parameters.
+
+        This methods is called after all objects have been initialized.
+        """
+        processor.resolveNames(self)
+
+    def processLogs(self, baseDir, outputDir):
+        """
+        Process the raw and parsed logs found in the base directory.
+
+        The raw logs are found in self.getRawLogDir( execution, baseDir ).
+        The parsed logs are found in self.getParsedLogDir( execution, baseDir ).
+
+        Be sure to document in the header of your module which (parsed) logs you expect to be present and with which filename.
+
+        Subclassers must override this method.
+
+        @param  baseDir     The base directory for the logs.
+        @param  outputDir   The path to the directory on the local machine where the processed logs are to be stored.
+        """
+        for name in ['regression.report', 'stats.regression']:
+            if os.path.exists( os.path.join( outputDir, name ) ) and not self.scenario.isFake():
+                raise Exception( 'processor:regression wanted to create {0}, but it already exists'.format( name ) )
+        baselineDir = os.path.join( self.baseline, 'scenarios', self.scenario.name )
+        if not os.path.isdir( baselineDir ):
+            raise Exception( 'processor:regression found no scenario {0} in baseline {1}'.format( self.scenario.name, self.baseline ) )
+        baseline = summarizeExecutions( scenarioExecutions( baselineDir ) )
+        candidate = summarizeExecutions( [( execution.getNumber(), execution.isSeeder(), self.getParsedLogDir( execution, baseDir ) )
+                                            for execution in self.scenario.getObjects('execution') if not execution.client.isSideService()] )
+        results, notes = compareScenario( baseline, candidate, self.threshold, self.alpha, self.test, self.resamples )
+        fObj = None
+        try:
+            fObj = open( os.path.join( outputDir, 'regression.report' ), 'w' )
+            writeReport( fObj, self.scenario.name, results, notes )
+        finally:
+            if fObj:
+                fObj.close()
+        fObj = None
+        try:
+            fObj = open( os.path.join( outputDir, 'stats.regression' ), 'w' )
+            fObj.write( 'metric role baselinecount candidatecount baseline candidate change changelow changehigh p verdict\n' )
+            for result in results:
+                fObj.write( '{0}\n'.format( ' '.join( ['-' if value is None else str(value) for value in result] ) ) )
+        finally:
+            if fObj:
+                fObj.close()
+        if hasRegression( results ):
+            Campaign.logger.log( "processor:regression found a performance regression in scenario {0} compared to {1}: {2}".format(
+                    self.scenario.name, self.baseline, ', '.join( [result[0] for result in results if result[-1] == 'regression'] ) ) )
+
+    def canReprocess(self):
+        """
+        Return whether this processor can be used to reprocess after a run has already been torn down.
+
+        This mainly signals that this parser functions within the following constraints:
+        - resolveNames is never called
+        - host, client and file object are explicitly unavailable
+        - Only part of the scenario object is available:
+            - scenario.isFake() is available and returns True
+            - scenario.name is available and correct
+            - scenario.getObjects(...) is available and will return all executions but an empty list otherwise
+            - scenario.getObjectsDict(...) is available and will return all executions but an empty dictionary otherwise
+            - The executions returned by this scenario are limited as described below
+            - The methods are not available during initialization
+        - Only part of the static Campaign object is available:
+            - Campaign.logger is available as normally and logs to stdout
+            - Campaign.which is available as normally
+        - Only part of the execution object is available:
+            - execution.isFake() is available and returns True
+            - execution.getNumber() is available and limited
+            - execution.client is available but incomplete
+                - execution.client.name is available and reads '__reparse__'
+                - execution.client.isSideService() is available
+                    - returns True unless any log exists for the execution
+            - execution.timeout is available and 0.0 unless the data was saved using processor:savetimeout
+            - execution.isSeeder() is available and False unless the data was saved using processor:isSeeder (and this was a seeder)
+            - execution.host is available but limited
+                - execution.host.name is available and reads '__reparse__' unless the data was saved using processor:savehostname
+
+        @return    True iff this processor can reprocess.
+        """
+        return True
+
+    @staticmethod
+    def APIVersion():
+        return "2.4.0"
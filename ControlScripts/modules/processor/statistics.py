@@ -1,9 +1,8 @@
 # These imports are needed to access the parsing functions (which you're likely to use in parameter parsing),
 # the Campaign data object and the processor parent class.
-from core.processor import processor
+from core.processor import processor, readDataChunks, readLogData, percentile
 
 import os
-import re
 
 class statistics(processor):
     """
@@ -20,8 +19,9 @@ class statistics(processor):
     - [none]
     
     Parsed logs expected:
-    - log.data    (optional, completion and download statistics are 0 without this)
+    - log.data    (optional, completion, download and speed statistics are 0 without this)
     - peak.data   (optional, memory and CPU statistics are 0 without this)
+    - resourcetotals.data   (optional, I/O, context switch and TCP statistics are 0 without this)
     
     Processed log files created:
     - stats.leecher
@@ -34,6 +34,16 @@ class statistics(processor):
     -- average of final completion of each leecher (percentage, float)
     -- maximum of peak virtual memory usage of each leecher (bytes)
     -- average of peak virtual memory usage of each leecher (bytes)
+    -- average of bytes read from storage by each leecher
+    -- average of bytes written to storage by each leecher
+    -- average of bytes read by read-like system calls of each leecher
+    -- average of bytes written by write-like system calls of each leecher
+    -- average of voluntary context switches of each leecher
+    -- average of involuntary context switches of each leecher
+    -- average of bytes received on TCP sockets by each leecher
+    -- average of bytes sent on TCP sockets by each leecher
+    -- average of time-weighted mean download speed of each leecher (KiB/s, float)
+    -- average of time-weighted mean upload speed of each leecher (KiB/s, float)
     - stats.seeder
     -- number of seeders
     -- maximum of peak memory usage of each seeder (bytes)
@@ -41,6 +51,32 @@ class statistics(processor):
     -- average of final cumulative CPU time of each seeder (seconds, float)
     -- maximum of peak virtual memory usage of each seeder (bytes)
     -- average of peak virtual memory usage of each seeder (bytes)
+    -- average of bytes read from storage by each seeder
+    -- average of bytes written to storage by each seeder
+    -- average of bytes read by read-like system calls of each seeder
+    -- average of bytes written by write-like system calls of each seeder
+    -- average of voluntary context switches of each seeder
+    -- average of involuntary context switches of each seeder
+    -- average of bytes received on TCP sockets by each seeder
+    -- average of bytes sent on TCP sockets by each seeder
+    -- average of time-weighted mean download speed of each seeder (KiB/s, float)
+    -- average of time-weighted mean upload speed of each seeder (KiB/s, float)
+    - stats.completion, with a header line
+    -- number of completed leechers
+    -- minimum, median (p50), 90th percentile (p90), 99th percentile (p99) and maximum of the download time of each
+       complete leecher (seconds, float; all 0 if no leecher completed)
+    - stats.hosts, with a header line and one line per host
+    -- name of the host
+    -- number of leechers and number of seeders on the host
+    -- number of completed leechers on the host
+    -- average of download time of each complete leecher on the host (seconds, float)
+    -- average of final completion of each leecher on the host (percentage, float)
+    -- average of time-weighted mean download and upload speed of each execution on the host (KiB/s, float)
+    -- average of final cumulative CPU time of each execution on the host (seconds, float)
+    -- maximum of peak residential memory usage of each execution on the host (bytes)
+
+    The parsed logs are read in chunks, so memory use does not grow with the length of the logs. The speeds in
+    log.data are weighted by the time since the previous row when averaging them over the run of an execution.
     """
 
     def __init__(self, scenario):
@@ -103,10 +139,9 @@ class statistics(processor):
         @param  baseDir     The base directory for the logs.
         @param  outputDir   The path to the directory on the local machine where the processed logs are to be stored.
         """
-        if os.path.exists( os.path.join( outputDir, 'stats.leecher' ) ) and not self.scenario.isFake():
-            raise Exception( 'processor:statistics wanted to create stats.leecher, but it already exists' )
-        if os.path.exists( os.path.join( outputDir, 'stats.seeder' ) ) and not self.scenario.isFake():
-            raise Exception( 'processor:statistics wanted to create stats.seeder, but it already exists' )
+        for name in ['stats.leecher', 'stats.seeder', 'stats.completion', 'stats.hosts']:
+            if os.path.exists( os.path.join( outputDir, name ) ) and not self.scenario.isFake():
+                raise Exception( 'processor:statistics wanted to create {0}, but it already exists'.format( name ) )
         maxmemleech = 0
         maxmemseed = 0
         totalmemleech = 0
@@ -122,111 +157,160 @@ class statistics(processor):
         totalvirtmemseed = 0
         maxvirtmemleech = 0
         totalvirtmemleech = 0
+        # Sums of the columns of resourcetotals.data
+        totalresourcesleech = [0] * 8
+        totalresourcesseed = [0] * 8
+        # Sums of the time-weighted mean download and upload speeds
+        totalspeedsleech = [0.0, 0.0]
+        totalspeedsseed = [0.0, 0.0]
+        # Download times of the completed leechers
+        downloadTimes = []
+        # Dictionary host name->[leechers, seeders, completed leechers, total download time, total completion,
+        #                        total mean download speed, total mean upload speed, total CPU time, maximum peak memory]
+        hosts = {}
         for execution in self.scenario.getObjects('execution'):
             if execution.client.isSideService():
                 continue
-            if not execution.isSeeder():
-                if os.path.exists( os.path.join( self.getParsedLogDir( execution, baseDir ), 'log.data' ) ):
-                    fObj = None
-                    try:
-                        fObj = open( os.path.join( self.getParsedLogDir( execution, baseDir ), 'log.data' ), 'r' )
-                        downloadTime = -1
-                        completion = 0.0
-                        for l in fObj.readlines():
-                            # Download time is the time of the first line with completion == 100%
-                            # Completion is tracked all the time
-                            if l[:4] == 'time':
-                                # header
-                                continue
-                            m = re.match( '^([^ ]*) ([^ ]*) .*', l )
-                            if not m:
-                                # should be last line only
-                                continue
-                            completion = float(m.group(2))
-                            if downloadTime == -1 and completion > 99.999999:
-                                downloadTime = float(m.group(1))
-                                completion = 100.0
-                                break
-                    finally:
-                        if fObj:
-                            fObj.close()
+            parsedLogDir = self.getParsedLogDir( execution, baseDir )
+            if execution.host.name not in hosts:
+                hosts[execution.host.name] = [0, 0, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0]
+            host = hosts[execution.host.name]
+            if os.path.exists( os.path.join( parsedLogDir, 'log.data' ) ):
+                completion, downloadTime, meanUp, meanDown = readLogData( os.path.join( parsedLogDir, 'log.data' ) )
+                host[5] += meanDown
+                host[6] += meanUp
+                if execution.isSeeder():
+                    totalspeedsseed = [totalspeedsseed[0] + meanDown, totalspeedsseed[1] + meanUp]
+                else:
+                    totalspeedsleech = [totalspeedsleech[0] + meanDown, totalspeedsleech[1] + meanUp]
                     totalcompletionleech += completion
-                    if downloadTime > -0.5:
+                    host[4] += completion
+                    if downloadTime is not None:
                         leechcompletedcount += 1
                         totaldownloadtimeleech += downloadTime
-            if os.path.exists( os.path.join( self.getParsedLogDir( execution, baseDir ), 'peak.data' ) ):
-                fObj = None
-                try:
-                    fObj = open( os.path.join( self.getParsedLogDir( execution, baseDir ), 'peak.data' ), 'r' )
-                    for l in fObj.readlines():
-                        if l[:7] == 'cputime':
-                            # header
-                            continue
-                        m = re.match( '^([^ ]*) ([0-9]*) ([0-9]*)', l )
-                        if not m:
-                            # should be last line only
-                            continue
-                        cputime = float(m.group(1))
-                        peakmem = int(m.group(2))
-                        peakvirtmem = int(m.group(3))
-                        if execution.isSeeder():
-                            totalCPUseed += cputime
-                            totalmemseed += peakmem
-                            if peakmem > maxmemseed:
-                                maxmemseed = peakmem
-                            totalvirtmemseed += peakvirtmem
-                            if peakvirtmem > maxvirtmemseed:
-                                maxvirtmemseed = peakvirtmem
-                        else:
-                            totalCPUleech += cputime
-                            totalmemleech += peakmem
-                            if peakmem > maxmemleech:
-                                maxmemleech = peakmem
-                            totalvirtmemleech += peakvirtmem
-                            if peakvirtmem > maxvirtmemleech:
-                                maxvirtmemleech = peakvirtmem
-                        # Should be only one line, so be done with it
-                        break
-                finally:
-                    if fObj:
-                        fObj.close()
+                        downloadTimes.append( downloadTime )
+                        host[2] += 1
+                        host[3] += downloadTime
+            if os.path.exists( os.path.join( parsedLogDir, 'peak.data' ) ):
+                peak = statistics.readFirstRow( os.path.join( parsedLogDir, 'peak.data' ), 3 )
+                if peak:
+                    cputime = peak[0]
+                    peakmem = int(peak[1])
+                    peakvirtmem = int(peak[2])
+                    host[7] += cputime
+                    host[8] = max( host[8], peakmem )
+                    if execution.isSeeder():
+                        totalCPUseed += cputime
+                        totalmemseed += peakmem
+                        if peakmem > maxmemseed:
+                            maxmemseed = peakmem
+                        totalvirtmemseed += peakvirtmem
+                        if peakvirtmem > maxvirtmemseed:
+                            maxvirtmemseed = peakvirtmem
+                    else:
+                        totalCPUleech += cputime
+                        totalmemleech += peakmem
+                        if peakmem > maxmemleech:
+                            maxmemleech = peakmem
+                        totalvirtmemleech += peakvirtmem
+                        if peakvirtmem > maxvirtmemleech:
+                            maxvirtmemleech = peakvirtmem
+            if os.path.exists( os.path.join( parsedLogDir, 'resourcetotals.data' ) ):
+                totals = statistics.readFirstRow( os.path.join( parsedLogDir, 'resourcetotals.data' ), 8 )
+                if totals:
+                    if execution.isSeeder():
+                        totalresourcesseed = [totalresourcesseed[i] + int(totals[i]) for i in range(8)]
+                    else:
+                        totalresourcesleech = [totalresourcesleech[i] + int(totals[i]) for i in range(8)]
             if execution.isSeeder():
                 seedcount += 1
+                host[1] += 1
             else:
                 leechcount += 1
+                host[0] += 1
         
         avgmemleech = 0
         avgcpuleech = 0.0
         avgcompletiontime = 0.0
         avgcompletion = 0.0
+        avgvirtmemleech = 0
+        avgresourcesleech = [0.0] * 8
+        avgspeedsleech = [0.0, 0.0]
         if leechcount > 0:
             avgmemleech = int((float(totalmemleech) / leechcount))
             avgcpuleech = float(totalCPUleech) / leechcount
             avgcompletion = float(totalcompletionleech) / leechcount
             avgvirtmemleech = int(totalvirtmemleech / leechcount)
+            avgresourcesleech = [float(total) / leechcount for total in totalresourcesleech]
+            avgspeedsleech = [total / leechcount for total in totalspeedsleech]
         if leechcompletedcount > 0:
             avgcompletiontime = float(totaldownloadtimeleech) / leechcompletedcount
         avgmemseed = 0
         avgcpuseed = 0.0
+        avgvirtmemseed = 0
+        avgresourcesseed = [0.0] * 8
+        avgspeedsseed = [0.0, 0.0]
         if seedcount > 0:
             avgmemseed = int(totalmemseed / seedcount)
             avgcpuseed = totalCPUseed / seedcount
             avgvirtmemseed = int(totalvirtmemseed / seedcount)
+            avgresourcesseed = [float(total) / seedcount for total in totalresourcesseed]
+            avgspeedsseed = [total / seedcount for total in totalspeedsseed]
         
         fObj = None
         try:
             fObj = open( os.path.join( outputDir, 'stats.leecher' ), 'w' )
-            fObj.write( '{0} {1} {2} {3} {4} {5} {6} {7} {8}\n'.format( leechcount, maxmemleech, avgmemleech, avgcpuleech, leechcompletedcount, avgcompletiontime, avgcompletion, maxvirtmemleech, avgvirtmemleech ) )
+            fObj.write( '{0} {1} {2} {3} {4} {5} {6} {7} {8} {9}\n'.format( leechcount, maxmemleech, avgmemleech, avgcpuleech, leechcompletedcount, avgcompletiontime, avgcompletion, maxvirtmemleech, avgvirtmemleech, ' '.join( [str(avg) for avg in avgresourcesleech + avgspeedsleech] ) ) )
         finally:
             if fObj:
                 fObj.close()
         fObj = None
         try:
             fObj = open( os.path.join( outputDir, 'stats.seeder' ), 'w' )
-            fObj.write( '{0} {1} {2} {3} {4} {5}\n'.format( seedcount, maxmemseed, avgmemseed, avgcpuseed, maxvirtmemseed, avgvirtmemseed ) )
+            fObj.write( '{0} {1} {2} {3} {4} {5} {6}\n'.format( seedcount, maxmemseed, avgmemseed, avgcpuseed, maxvirtmemseed, avgvirtmemseed, ' '.join( [str(avg) for avg in avgresourcesseed + avgspeedsseed] ) ) )
+        finally:
+            if fObj:
+                fObj.close()
+        downloadTimes.sort()
+        fObj = None
+        try:
+            fObj = open( os.path.join( outputDir, 'stats.completion' ), 'w' )
+            fObj.write( 'completed min p50 p90 p99 max\n' )
+            if downloadTimes:
+                fObj.write( '{0} {1} {2} {3} {4} {5}\n'.format( len(downloadTimes), downloadTimes[0], percentile( downloadTimes, 50 ), percentile( downloadTimes, 90 ), percentile( downloadTimes, 99 ), downloadTimes[-1] ) )
+            else:
+                fObj.write( '0 0.0 0.0 0.0 0.0 0.0\n' )
         finally:
             if fObj:
                 fObj.close()
+        fObj = None
+        try:
+            fObj = open( os.path.join( outputDir, 'stats.hosts' ), 'w' )
+            fObj.write( 'host leechers seeders completed avgdownloadtime avgcompletion avgdlspeed avgupspeed avgcputime maxmem\n' )
+            for name in sorted( hosts ):
+                leechers, seeders, completed, downloadTime, completion, meanDown, meanUp, cputime, maxmem = hosts[name]
+                executions = leechers + seeders
+                fObj.write( '{0} {1} {2} {3} {4} {5} {6} {7} {8} {9}\n'.format( name, leechers, seeders, completed,
+                        downloadTime / completed if completed else 0.0, completion / leechers if leechers else 0.0,
+                        meanDown / executions if executions else 0.0, meanUp / executions if executions else 0.0,
+                        cputime / executions if executions else 0.0, maxmem ) )
+        finally:
+            if fObj:
+                fObj.close()
+
+    @staticmethod
+    def readFirstRow(path, count):
+        """
+        Reads the first row of a parsed log that consists of a single row, such as peak.data.
+
+        @param  path        The path to the parsed log.
+        @param  count       The number of fields to read.
+
+        @return The list of the first count fields as floats, or None if there is no such row.
+        """
+        for chunk in readDataChunks( path, range( count ) ):
+            return [column[0] for column in chunk]
+        return None
 
     def canReprocess(self):
         """
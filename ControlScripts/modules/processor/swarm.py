@@ -0,0 +1,323 @@
+from core.campaign import Campaign
+from core.processor import processor, readDataChunks
+from core.parser import dataWriter
+from core.parsing import isPositiveFloat
+
+import os
+import heapq
+import itertools
+
+def parseError( msg ):
+    """
+    A simple helper function to make parsing a lot of parameters a bit nicer.
+    """
+    raise Exception( "Parse error for processor object on line {0}: {1}".format( Campaign.currentLineNumber, msg ) )
+
+# The approximate number of bytes of each log.data that is read at once; small, since all logs are read side by side
+SERIES_CHUNK_SIZE = 16 * 1024
+
+def readSeries( path ):
+    """
+    Reads the rows of a log.data one by one, in bounded memory and without keeping the file open between chunks.
+
+    @param  path        The path to log.data.
+
+    @return A generator of tuples (time, percent, upspeed, dlspeed).
+    """
+    for chunk in readDataChunks( path, [0, 1, 2, 3], SERIES_CHUNK_SIZE, False ):
+        for row in itertools.izip( *chunk ):
+            yield row
+
+class swarm(processor):
+    """
+    Aggregates the log.data of all executions into time series for the whole swarm.
+
+    The rows of all executions are merged in order of time, so every execution is read only once and side by side
+    with the others. Memory use is bounded by the number of executions, not by the length of the logs. The time of a
+    row is the timeout of its execution plus the relative time in log.data, so the series are aligned on the start
+    of the scenario (reprocessed executions only have their timeout if it was saved with processor:savetimeout).
+
+    As in processor:statistics the speeds on a row are taken to hold since the time of the previous row of the same
+    execution, so the throughput in the series is exact: each speed is weighted by the part of the grid interval it
+    covers. Completion and counts are sampled at the grid points.
+
+    Extra parameters:
+    - interval     The distance between two points on the time grid in seconds. Optional positive float, default 1.0.
+
+    Raw logs expected:
+    - [none]
+
+    Parsed logs expected:
+    - log.data    (executions without it are left out)
+
+    Processed log files created:
+    - swarm.data, with a header line and one line for each grid point from time 0 up to the end of the last log
+    -- time since the start of the scenario (seconds, float)
+    -- number of active executions, i.e. executions whose log covers the time
+    -- number of active leechers that have not completed yet
+    -- number of completed leechers
+    -- fraction of the leechers that have completed; over time this is the CDF of the completion times (float)
+    -- average completion of the leechers that have started (percentage, float)
+    -- swarm upload speed: sum of the mean upload speeds of all executions over the preceding interval (KiB/s, float)
+    -- swarm download speed: sum of the mean download speeds of all executions over the preceding interval (KiB/s, float)
+    - swarm_cdf.data, with a header line and one line per completed leecher, ordered by download time
+    -- download time of the leecher, i.e. the time since its own start (seconds, float)
+    -- number of leechers completed within this download time
+    -- fraction of all leechers completed within this download time (float)
+    - swarm.cols and swarm_cdf.cols
+    -- the same columns in the columnar binary format, see core.parser.dataWriter
+    """
+
+    interval = None         # The distance between two points on the time grid in seconds
+
+    def __init__(self, scenario):
+        """
+        Initialization of a generic processor object.
+
+        @param  scenario        The ScenarioRunner object this processor object is part of.
+        """
+        processor.__init__(self, scenario)
+
+    def parseSetting(self, key, value):
+        """
+        Parse a single setting for this object.
+
+        Settings are written in text files in a key=value fashion.
+        For each such setting that belongs to this object this method will be called.
+
+        After all settings have been given, the method checkSettings will be called.
+
+        If a setting does not parse correctly, this method raises an Exception with a descriptive message.
+
+        Subclassers should first parse their own settings and then call this implementation to have the
+        generic settings parsed and to have any unknown settings raise an Exception.
+
+        @param  key     The name of the parameter, i.e. the key from the key=value pair.
+        @param  value   The value of the parameter, i.e. the value from the key=value pair.
+        """
+        if key == 'interval':
+            if self.interval is not None:
+                parseError( "interval may be specified only once" )
+            if not isPositiveFloat( value, True ):
+                parseError( "interval must be a positive, non-zero floating point number" )
+            self.interval = float(value)
+        else:
+            processor.parseSetting(self, key, value)
+
+    def checkSettings(self):
+        """
+        Check the sanity of the settings in this object.
+
+        This method is called after all calls to parseSetting(...) have been done.
+        Any defaults may be set here as well.
+
+        An Exception is raised in the case of insanity.
+        """
+        processor.checkSettings(self)
+        if self.interval is None:
+            self.interval = 1.0
+
+    def resolveNames(self):
+        """
+        Resolve any names given in the parameters.
+
+        This methods is called after all objects have been initialized.
+        """
+        processor.resolveNames(self)
+
+    def processLogs(self, baseDir, outputDir):
+        """
+        Process the raw and parsed logs found in the base directory.
+
+        The raw logs are found in self.getRawLogDir( execution, baseDir ).
+        The parsed logs are found in self.getParsedLogDir( execution, baseDir ).
+
+        Be sure to document in the header of your module which (parsed) logs you expect to be present and with which filename.
+
+        Subclassers must override this method.
+
+        @param  baseDir     The base directory for the logs.
+        @param  outputDir   The path to the directory on the local machine where the processed logs are to be stored.
+        """
+        for name in ['swarm.data', 'swarm_cdf.data']:
+            if os.path.exists( os.path.join( outputDir, name ) ) and not self.scenario.isFake():
+                raise Exception( 'processor:swarm wanted to create {0}, but it already exists'.format( name ) )
+        # Per execution, by index: the generator of its rows, its offset in time, whether it is a leecher, the row
+        # that is applied next (None after its last row), its current completion and whether it has completed
+        series = []
+        offsets = []
+        leecher = []
+        heads = []
+        completions = []
+        completed = []
+        # The heap of (time, index) of the next row of each execution
+        heap = []
+        for execution in self.scenario.getObjects('execution'):
+            if execution.client.isSideService():
+                continue
+            path = os.path.join( self.getParsedLogDir( execution, baseDir ), 'log.data' )
+            if not os.path.exists( path ):
+                continue
+            rows = readSeries( path )
+            for row in rows:
+                heap.append( ( execution.timeout + row[0], len(series) ) )
+                heads.append( row )
+                break
+            else:
+                continue
+            series.append( rows )
+            offsets.append( execution.timeout )
+            leecher.append( not execution.isSeeder() )
+            completions.append( 0.0 )
+            completed.append( False )
+        heapq.heapify( heap )
+        started = [False] * len(series)
+        leecherCount = len( [l for l in leecher if l] )
+        downloadTimes = []
+        active = 0
+        downloading = 0
+        completedCount = 0
+        startedLeechers = 0
+        completionSum = 0.0
+        # The sums of the speeds of the active executions, which hold until the next row of each of them
+        upSpeed = 0.0
+        dlSpeed = 0.0
+        # The amounts uploaded and downloaded since the previous grid point, up to lastTime
+        upAmount = 0.0
+        dlAmount = 0.0
+        lastTime = 0.0
+        point = 0
+        fd = None
+        try:
+            fd = dataWriter( os.path.join( outputDir, 'swarm.data' ), ['time', 'active', 'downloading', 'completed', 'completedfraction', 'avgcompletion', 'upspeed', 'dlspeed'] )
+            while heap:
+                time, index = heap[0]
+                # Write the grid points before this row; rows at a grid point are applied before writing it
+                while point * self.interval < time:
+                    gridTime = point * self.interval
+                    upAmount += upSpeed * ( gridTime - lastTime )
+                    dlAmount += dlSpeed * ( gridTime - lastTime )
+                    lastTime = gridTime
+                    self.writePoint( fd, point, active, downloading, completedCount, leecherCount, completionSum, startedLeechers, upAmount, dlAmount )
+                    upAmount = 0.0
+                    dlAmount = 0.0
+                    point += 1
+                upAmount += upSpeed * ( time - lastTime )
+                dlAmount += dlSpeed * ( time - lastTime )
+                lastTime = time
+                row = heads[index]
+                if started[index]:
+                    # The speeds of this row held since the previous row
+                    upSpeed -= row[2]
+                    dlSpeed -= row[3]
+                else:
+                    started[index] = True
+                    active += 1
+                    if leecher[index]:
+                        startedLeechers += 1
+                        downloading += 1
+                if leecher[index]:
+                    completionSum += row[1] - completions[index]
+                    completions[index] = row[1]
+                    if not completed[index] and row[1] > 99.999999:
+                        completed[index] = True
+                        completedCount += 1
+                        downloading -= 1
+                        downloadTimes.append( row[0] )
+                try:
+                    row = series[index].next()
+                except StopIteration:
+                    heapq.heappop( heap )
+                    heads[index] = None
+                    series[index] = None
+                    active -= 1
+                    if leecher[index] and not completed[index]:
+                        downloading -= 1
+                    continue
+                heads[index] = row
+                upSpeed += row[2]
+                dlSpeed += row[3]
+                # Rows out of order are taken to be at the time of the previous row
+                heapq.heapreplace( heap, ( max( offsets[index] + row[0], time ), index ) )
+            # Write the grid points up to and including the first one after the last row
+            while ( point - 1 ) * self.interval < lastTime:
+                gridTime = point * self.interval
+                upAmount += upSpeed * ( gridTime - lastTime )
+                dlAmount += dlSpeed * ( gridTime - lastTime )
+                lastTime = max( lastTime, gridTime )
+                self.writePoint( fd, point, active, downloading, completedCount, leecherCount, completionSum, startedLeechers, upAmount, dlAmount )
+                upAmount = 0.0
+                dlAmount = 0.0
+                point += 1
+        finally:
+            if fd:
+                fd.close()
+        downloadTimes.sort()
+        fd = None
+        try:
+            fd = dataWriter( os.path.join( outputDir, 'swarm_cdf.data' ), ['downloadtime', 'completed', 'fraction'] )
+            for i in xrange( len(downloadTimes) ):
+                fd.write( downloadTimes[i], i + 1, float( i + 1 ) / leecherCount )
+        finally:
+            if fd:
+                fd.close()
+
+    def writePoint(self, fd, point, active, downloading, completedCount, leecherCount, completionSum, startedLeechers, upAmount, dlAmount):
+        """
+        Writes the row of a grid point to swarm.data.
+
+        @param  fd                  The dataWriter of swarm.data.
+        @param  point               The number of the grid point.
+        @param  active              The number of active executions.
+        @param  downloading         The number of active leechers that have not completed.
+        @param  completedCount      The number of completed leechers.
+        @param  leecherCount        The total number of leechers.
+        @param  completionSum       The sum of the completions of the leechers that have started.
+        @param  startedLeechers     The number of leechers that have started.
+        @param  upAmount            The amount uploaded by all executions since the previous grid point (KiB).
+        @param  dlAmount            The amount downloaded by all executions since the previous grid point (KiB).
+        """
+        fraction = 0.0
+        if leecherCount > 0:
+            fraction = float(completedCount) / leecherCount
+        completion = 0.0
+        if startedLeechers > 0:
+            completion = completionSum / startedLeechers
+        fd.write( point * self.interval, active, downloading, completedCount, fraction, completion, upAmount / self.interval, dlAmount / self.interval )
+
+    def canReprocess(self):
+        """
+        Return whether this processor can be used to reprocess after a run has already been torn down.
+
+        This mainly signals that this parser functions within the following constraints:
+        - resolveNames is never called
+        - host, client and file object are explicitly unavailable
+        - Only part of the scenario object is available:
+            - scenario.isFake() is available and returns True
+            - scenario.name is available and correct
+            - scenario.getObjects(...) is available and will return all executions but an empty list otherwise
+            - scenario.getObjectsDict(...) is available and will return all executions but an empty dictionary otherwise
+            - The executions returned by this scenario are limited as described below
+            - The methods are not available during initialization
+        - Only part of the static Campaign object is available:
+            - Campaign.logger is available as normally and logs to stdout
+            - Campaign.which is available as normally
+        - Only part of the execution object is available:
+            - execution.isFake() is available and returns True
+            - execution.getNumber() is available and limited
+            - execution.client is available but incomplete
+                - execution.client.name is available and reads '__reparse__'
+                - execution.client.isSideService() is available
+                    - returns True unless any log exists for the execution
+            - execution.timeout is available and 0.0 unless the data was saved using processor:savetimeout
+            - execution.isSeeder() is available and False unless the data was saved using processor:isSeeder (and this was a seeder)
+            - execution.host is available but limited
+                - execution.host.name is available and reads '__reparse__' unless the data was saved using processor:savehostname
+
+        @return    True iff this processor can reprocess.
+        """
+        return True
+
+    @staticmethod
+    def APIVersion():
+        return "2.4.0"
@@ -1,4 +1,11 @@
 from core.source import source
+from core.campaign import Campaign
+
+import os
+import fcntl
+import hashlib
+import subprocess
+from subprocess import STDOUT
 
 # You can define anything you like in the scope of your own module: the only thing that will be imported from it
 # is the actual object you're creating, which, incidentally, must be named equal to the module it is in. For example:
@@ -9,8 +16,15 @@ class git(source):
     git source implementation using the command line utility git.
 
     client.location is interpreted as a git repository ready to be cloned.
+
+    Local sources are cloned from a mirror of the repository that is kept in the local git cache, which is updated
+    on each use. The resolved commit is used as the revision of the sources, so the builder may use a cached build
+    for the same commit instead of building (see core.builder.builder.buildLocal(...)).
     """
 
+    localRevision = None        # The commit the local sources were prepared from, or None if unknown
+    localPrepareCommand = None  # The command used by prepareLocal(...) instead of the default clone, or None
+
     def __init__(self, scenario):
         """
         Initialization of a generic source object.
@@ -33,8 +47,76 @@ class git(source):
 
         @param  client      The client for which the sources are to be prepared.
         """
+        if self.localPrepareCommand is not None:
+            return self.localPrepareCommand
         return 'git clone {0} .'.format( client.location )
 
+    def updateMirror(self, client):
+        """
+        Creates or updates the local mirror of the repository of the client.
+
+        The mirror is kept in the local git cache and locked while it is updated, since the cache may be shared by
+        parallel campaigns.
+
+        @param  client      The client for which the sources are to be prepared.
+
+        @return The path to the mirror, or None if it could not be created or updated.
+        """
+        cacheDir = Campaign.getCacheDir( 'git' )
+        mirror = os.path.join( cacheDir, 'mirror-{0}.git'.format( hashlib.sha1( client.location ).hexdigest() ) )
+        lockFile = open( '{0}.lock'.format( mirror ), 'a' )
+        try:
+            fcntl.flock( lockFile, fcntl.LOCK_EX )
+            try:
+                if os.path.isdir( mirror ):
+                    subprocess.check_output( ['git', '--git-dir', mirror, 'fetch', '-q', '--prune'], stderr=STDOUT )
+                else:
+                    subprocess.check_output( ['git', 'clone', '-q', '--mirror', client.location, mirror], stderr=STDOUT )
+            except subprocess.CalledProcessError as cpe:
+                Campaign.logger.log( "Could not update the local mirror of {0} for client {1}, cloning directly: {2}".format( client.location, client.name, cpe.output ) )
+                return None
+        finally:
+            lockFile.close()
+        return mirror
+
+    def prepareLocal(self, client):
+        """
+        Prepare the source code of the client on the local machine.
+
+        This implementation updates the local mirror of the repository and resolves its HEAD to a commit. If a
+        cached build exists for that commit no clone is made at all, otherwise the commit is cloned from the mirror.
+        If the mirror can't be used the repository is cloned directly.
+
+        @param  client      The client for which the sources are to be prepared.
+
+        @return True iff the preparation was succesful.
+        """
+        self.localRevision = None
+        self.localPrepareCommand = None
+        mirror = self.updateMirror( client )
+        if mirror:
+            try:
+                self.localRevision = subprocess.check_output( ['git', '--git-dir', mirror, 'rev-parse', 'HEAD^{commit}'], stderr=STDOUT ).strip()
+            except subprocess.CalledProcessError as cpe:
+                Campaign.logger.log( "Could not resolve HEAD of the local mirror of {0} for client {1}: {2}".format( client.location, client.name, cpe.output ) )
+        if self.localRevision:
+            if client.builderObj.getCachedBuild( client ):
+                # The builder will fill the sources from the build cache: just create the directory
+                self.localPrepareCommand = ''
+            else:
+                self.localPrepareCommand = 'git clone -q --no-checkout "{0}" . && git checkout -q {1} && git remote set-url origin "{2}"'.format( mirror, self.localRevision, client.location )
+        return source.prepareLocal(self, client)
+
+    def revision(self, client):
+        """
+        Returns an identifier of the exact revision of the local sources of the client.
+
+        @param  client      The client for which the local sources were prepared.
+
+        @return The commit the local sources were prepared from, or None if it is unknown.
+        """
+        return self.localRevision
+
     @staticmethod
     def APIVersion():
         return "2.4.0"
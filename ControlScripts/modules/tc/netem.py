@@ -2,17 +2,92 @@ from core.campaign import Campaign
 from core.tc import tc
 
 import time
+import threading
 
-def checkCommand( host, command ):
-    ans = host.sendCommand( command + ' && echo "OK" || echo "NO"' )
-    if ans.splitlines()[-1] == "OK":
-        return True
-    return False
+# Capability bits as reported by the probe script in netem.probe(...)
+CAP_TC = 1                  # tc is installed
+CAP_SUDO = 2                # sudo is installed
+CAP_SUDO_TC = 4             # tc can be run using sudo without a password
+CAP_MODPROBE = 8            # modprobe is installed
+CAP_NETEM = 16              # The netem module is available
+CAP_NETEM_LOADED = 32       # The netem module is loaded
+CAP_IFB = 64                # The IFB module is available
+CAP_IFB_LOADED = 128        # The IFB module is loaded
+CAP_IFCONFIG = 256          # ifconfig is installed
+CAP_INTERFACE = 512         # The requested interface exists
+CAP_IFB_UP = 1024           # Interface ifb0 is up
+
+# The capabilities that don't change while the kernel stays the same; these are cached on the host
+CAP_STATIC = CAP_TC | CAP_SUDO | CAP_SUDO_TC | CAP_MODPROBE | CAP_NETEM | CAP_IFCONFIG | CAP_INTERFACE
+
+# Static capabilities (see CAP_STATIC) of succesfully checked hosts for the whole campaign, (address, interface)->bitmap
+_checkedCapabilities = {}
+_checkedCapabilities__lock = threading.Lock()
 
 def logFail( host, msg ):
     Campaign.logger.log( "tc:netem :: Problem on host {0}. {1}".format( host.name, msg ) )
     return False
 
+# Filter lists with at least this many entries that can be hashed are placed in a hashed u32 table
+HASH_THRESHOLD = 8
+
+# The key hashed on for each field, as (offset in the IP packet, mask); the hash bucket is the lowest byte of the field
+_hashKeys = {
+    'src': (12, 0x000000ff),
+    'dst': (16, 0x000000ff),
+    'sport': (20, 0x00ff0000),
+    'dport': (20, 0x000000ff),
+}
+
+def _hashBucket( field, value ):
+    """
+    Returns the hash bucket for a single value of a field, or None if the value can't be placed in one bucket.
+
+    Ports are always placed in the bucket of their lowest byte. Addresses are placed in the bucket of their
+    last byte, but only for single IPv4 addresses; subnets and host names can't be hashed.
+    """
+    if field == 'sport' or field == 'dport':
+        return int(value) & 0xff
+    value = str(value)
+    if value[-3:] == '/32':
+        value = value[:-3]
+    parts = value.split( '.' )
+    if len(parts) != 4 or not all( [p.isdigit() and int(p) < 256 for p in parts] ):
+        return None
+    return int(parts[3])
+
+def u32Filters( iface, parent, field, values, target ):
+    """
+    Returns the tc commands for u32 filters that send packets matching any of the values to a target.
+
+    Short lists get one linear filter per value, which the kernel checks one by one. When at least HASH_THRESHOLD
+    values can be hashed, those are placed in a hash table of 256 buckets keyed on the lowest byte of the field,
+    so only the filters in one bucket are checked per packet; other values keep a linear filter. Either way the
+    same packets end up at the target.
+
+    @param  iface       The interface.
+    @param  parent      The parent qdisc of the filters, e.g. '50:'.
+    @param  field       The field to match: 'src' or 'dst' for addresses, 'sport' or 'dport' for ports.
+    @param  values      The list of values to match.
+    @param  target      The flowid and possibly actions for matching packets.
+
+    @return The list of commands for tc -batch.
+    """
+    if field == 'sport' or field == 'dport':
+        match = lambda v: 'match ip {0} {1} 0xffff'.format( field, v )
+    else:
+        match = lambda v: 'match ip {0} {1}'.format( field, v )
+    prefix = 'filter add dev {0} parent {1} protocol ip prio 1 u32'.format( iface, parent )
+    hashed = [v for v in values if _hashBucket( field, v ) is not None]
+    if len(hashed) < HASH_THRESHOLD:
+        return ['{0} {1} {2}'.format( prefix, match( v ), target ) for v in values]
+    rules = ['{0} {1} {2}'.format( prefix, match( v ), target ) for v in values if _hashBucket( field, v ) is None]
+    rules.append( 'filter add dev {0} parent {1} protocol ip prio 1 handle 2: u32 divisor 256'.format( iface, parent ) )
+    for v in hashed:
+        rules.append( '{0} ht 2:{1:x}: {2} {3}'.format( prefix, _hashBucket( field, v ), match( v ), target ) )
+    rules.append( '{0} ht 800:: match u32 0 0 hashkey mask 0x{2:08x} at {1} link 2:'.format( prefix, *_hashKeys[field] ) )
+    return rules
+
 class netem(tc):
     """
     A netem implementation of the TC API.
@@ -131,6 +206,9 @@ class netem(tc):
     
     MAX = 1024          # Maximum speed of NIC in mbit; may be to much, not to low
 
+    warned = False                      # True iff the warning about this module has been given
+    warned__lock = threading.Lock()     # Lock guarding warned
+
     def __init__(self, scenario):
         """
         Initialization of a generic tc object.
@@ -138,95 +216,143 @@ class netem(tc):
         @param  scenario        The ScenarioRunner object this tc object is part of.
         """
         tc.__init__(self, scenario)
-        print "WARNING! WARNING! WARNING!"
-        print "The tc:netem module has NOT been tested yet."
-        print "We would gladly hear from you about your experiences."
-        print "However, if you're about to use this on a server that should not break down completely this is the moment to cancel your attempts."
-        print "WARNING! WARNING! WARNING!"
-        for _ in range(0, 20):
-            time.sleep( 1 )
+        # Warn once per campaign, not once for every host
+        netem.warned__lock.acquire()
+        try:
+            if not netem.warned:
+                print "WARNING! WARNING! WARNING!"
+                print "The tc:netem module has NOT been tested yet."
+                print "We would gladly hear from you about your experiences."
+                print "However, if you're about to use this on a server that should not break down completely this is the moment to cancel your attempts."
+                print "WARNING! WARNING! WARNING!"
+                for _ in range(0, 20):
+                    time.sleep( 1 )
+                netem.warned = True
+        finally:
+            netem.warned__lock.release()
+
+    def probe(self, host, inbound, staticCaps = None):
+        """
+        Probes the capabilities of the host needed for traffic control in a single remote command.
+
+        The probe also loads the netem module, and for inbound traffic control the IFB module and the ifb0
+        link, where needed and possible. This is always done, since modules may be unloaded and links brought down
+        between scenarios. The static capabilities (see CAP_STATIC) are only detected if they are not given; they are
+        cached in the persistent test directory of the host, keyed by kernel version and interface, once they are all
+        present. This cache survives across campaigns if the host has a fixed remote directory.
+
+        @param  host        The host on which TC would be installed.
+        @param  inbound     True iff inbound traffic control is needed.
+        @param  staticCaps  The static capabilities of the host if they are already known, or None to detect them.
+
+        @return The capability bitmap, see the CAP_* constants.
+        """
+        if staticCaps is not None:
+            script = 'c={0}; '.format( staticCaps & CAP_STATIC )
+        else:
+            script = 'f="{dir}/.tc-netem-{iface}-`uname -r`"; c=""; [ -f "$f" ] && c=`cat "$f"`; '
+            script += 'if [ -z "$c" ]; then c=0; '
+            script += 'which tc >/dev/null 2>&1 && c=$((c|{TC})); '
+            script += 'which sudo >/dev/null 2>&1 && c=$((c|{SUDO})) && `which sudo` -n -l `which tc` >/dev/null 2>&1 && c=$((c|{SUDO_TC})); '
+            script += 'which modprobe >/dev/null 2>&1 && c=$((c|{MODPROBE})) && `which modprobe` -n sch_netem 2>/dev/null && c=$((c|{NETEM})); '
+            script += 'which ifconfig >/dev/null 2>&1 && c=$((c|{IFCONFIG})) && `which ifconfig` | grep -E "^{iface}[[:space:]]" >/dev/null && c=$((c|{INTERFACE})); '
+            script += '[ $((c&{STATIC})) -eq {STATIC} ] && [ -d "{dir}" ] && echo $((c&{STATIC})) > "$f"; '
+            script += 'fi; '
+        script += 'if [ $((c&{NETEM})) -ne 0 ]; then ( `which modprobe` sch_netem 2>/dev/null || `which sudo` -n `which modprobe` sch_netem >/dev/null 2>&1 ) && c=$((c|{NETEM_LOADED})); fi; '
+        if inbound:
+            script += 'if [ $((c&{MODPROBE})) -ne 0 ] && `which modprobe` -n ifb 2>/dev/null; then c=$((c|{IFB})); '
+            script += '( `which modprobe` ifb 2>/dev/null || `which sudo` -n `which modprobe` ifb >/dev/null 2>&1 ) && c=$((c|{IFB_LOADED})); fi; '
+            script += 'if [ $((c&{IFCONFIG})) -ne 0 ]; then ( `which ifconfig` | grep -E "^ifb0[[:space:]]" >/dev/null || ( `which sudo` `which ip` link set dev ifb0 up && `which ifconfig` | grep -E "^ifb0[[:space:]]" >/dev/null ) ) && c=$((c|{IFB_UP})); fi; '
+        script += 'echo "CAPS $c"'
+        script = script.format( dir = host.getPersistentTestDir(), iface = host.tcInterface, STATIC = CAP_STATIC,
+                                TC = CAP_TC, SUDO = CAP_SUDO, SUDO_TC = CAP_SUDO_TC, MODPROBE = CAP_MODPROBE, NETEM = CAP_NETEM,
+                                NETEM_LOADED = CAP_NETEM_LOADED, IFB = CAP_IFB, IFB_LOADED = CAP_IFB_LOADED, IFCONFIG = CAP_IFCONFIG,
+                                INTERFACE = CAP_INTERFACE, IFB_UP = CAP_IFB_UP )
+        ans = host.sendCommand( script ).splitlines()
+        if len(ans) == 0 or ans[-1][:5] != 'CAPS ':
+            raise Exception( "Unexpected response while probing the traffic control capabilities of host {0}: {1}".format( host.name, '\n'.join( ans ) ) )
+        return int( ans[-1][5:] )
 
     def check(self, host):
         """
         Checks whether traffic control can be set up on the host.
 
+        The capabilities of the host are probed using probe(...). Once the check succeeds the static capabilities
+        are remembered for the rest of the campaign, so checking the same host again in a later scenario only loads
+        the modules and brings up ifb0 again.
+
         @param  host    The host on which TC would be installed.
 
         @return True iff traffic control can be set up.
         """
+        inbound = ( host.tcInboundPortList != [] )
+        key = ( host.getAddress() or host.name, host.tcInterface )
+        _checkedCapabilities__lock.acquire()
+        try:
+            staticCaps = _checkedCapabilities.get( key )
+        finally:
+            _checkedCapabilities__lock.release()
+        caps = self.probe( host, inbound, staticCaps )
         # Check for tc availability, using sudo
-        if not checkCommand( host, 'which tc > /dev/null' ):
+        if not caps & CAP_TC:
             return logFail( host, 'tc is not installed' )
-        if not checkCommand( host, 'which sudo > /dev/null' ):
+        if not caps & CAP_SUDO:
             return logFail( host, 'sudo is not installed' )
-        if not checkCommand( host, '`which sudo` -n -l `which tc` >/dev/null 2>/dev/null' ):
+        if not caps & CAP_SUDO_TC:
             return logFail( host, "Can't call sudo tc without password" )
-        
         # Check for modprobe in order to check for modules
-        if not checkCommand( host, 'which modprobe > /dev/null' ):
+        if not caps & CAP_MODPROBE:
             return logFail( host, "modprobe not found; this is used for checking and loading required kernel modules; please see the documentation about how to bypass this" )
         # Check for netem module
-        if not checkCommand( host, '`which modprobe` -n sch_netem 2>/dev/null' ):
+        if not caps & CAP_NETEM:
             return logFail( host, 'netem module not found' )
-        if not checkCommand( host, '`which modprobe` sch_netem 2>/dev/null' ):
-            # netem not loaded, let's load it
-            if not checkCommand( host, '`which sudo` -n `which modprobe` sch_netem > /dev/null 2>/dev/null' ):
-                return logFail( host, 'netem support available, but the module could not be loaded. Do you have the right to use sudo modprobe without a password? Please load the module manually and try again.' ) 
+        if not caps & CAP_NETEM_LOADED:
+            return logFail( host, 'netem support available, but the module could not be loaded. Do you have the right to use sudo modprobe without a password? Please load the module manually and try again.' ) 
         # If we need to do inbound traffic control, we also need IFB
-        if host.tcInboundPortList != []:
-            if not checkCommand( host, '`which modprobe` -n ifb 2>/dev/null' ):
+        if inbound:
+            if not caps & CAP_IFB:
                 return logFail( host, 'IFB module not found, this is required for inbound traffic control' )
-            if not checkCommand( host, '`which modprobe` ifb 2>/dev/null' ):
-                # ifb not loaded, let's load it
-                if not checkCommand( host, '`which sudo` -n `which modprobe` ifb > /dev/null 2>/dev/null' ):
-                    return logFail( host, 'IFB support available, but the module could not be loaded. Do you have the right to use sudo modprobe without a password? Please load the module manually and try again.' ) 
+            if not caps & CAP_IFB_LOADED:
+                return logFail( host, 'IFB support available, but the module could not be loaded. Do you have the right to use sudo modprobe without a password? Please load the module manually and try again.' ) 
         # Check whether the requested interface is available
-        if not checkCommand( host, 'which ifconfig > /dev/null' ):
+        if not caps & CAP_IFCONFIG:
             return logFail( host, 'ifconfig not found; this is used for checking the availability of the requested interface; please see the documentation about how to bypass this' )
-        if not checkCommand( host, '`which ifconfig` | grep -E "^{0}[[:space:]]" > /dev/null'.format( host.tcInterface ) ):
+        if not caps & CAP_INTERFACE:
             return logFail( host, '{0} does not seem to be a valid interface on this host'.format( host.tcInterface ) )
         # If we need to do inbound traffic control, interface ifb0 should be up as well
-        if host.tcInboundPortList != []:
-            if not checkCommand( host, '`which ifconfig` | grep -E "^ifb0[[:space:]]" > /dev/null' ):
-                # Try and get the link up
-                if not checkCommand( host, '`which sudo` `which ip` link set dev ifb0 up && `which ifconfig` | grep -E "^ifb0[[:space:]]" > /dev/null' ):
-                    return logFail( host, 'IFB support is available and the module is loaded, but it was not possible to get the link up. Please enable it manually, e.g. using "sudo ip link set dev ifb0 up".' )
-        
+        if inbound:
+            if not caps & CAP_IFB_UP:
+                return logFail( host, 'IFB support is available and the module is loaded, but it was not possible to get the link up. Please enable it manually, e.g. using "sudo ip link set dev ifb0 up".' )
+        _checkedCapabilities__lock.acquire()
+        try:
+            _checkedCapabilities[key] = caps & CAP_STATIC
+        finally:
+            _checkedCapabilities__lock.release()
         return True
 
-    def install(self, host, otherhosts):
+    def installRules(self, host, otherhosts):
         """
-        Installs the traffic control on the host.
+        Returns the tc commands that install the traffic control on the host.
+
+        The commands are meant for tc -batch, i.e. without the leading tc. See u32Filters(...) for how the
+        filters are generated.
 
         @param  host        The host on which to install TC.
         @param  otherhosts  List of subnets of other hosts.
+
+        @return The list of commands.
         """
-        # In the commands below the substitutions {tc} {iface} {dbg} and {dbg2} are replaced at the very end
-        cmds = 'dbgfile=`mktemp`; if [ ! -f "$dbgfile" ]; then echo "Could not create temporary file for debug."; exit; fi; '
-        cmds += 'echo "Cleaning before starting" {dbg}; '
+        rules = []
         # Inbound TC
         if host.tcInboundPortList != []:
-            cmds += "{tc} qdisc del dev {iface} ingress 2> /dev/null; "
-            cmds += "{tc} qdisc del dev ifb0 root 2> /dev/null; "
-        # Outbound TC
-        if host.tcOutboundPortList != []:
-            cmds += "{tc} qdisc del dev {iface} root 2> /dev/null; "
-        cmds += 'echo "Cleanup done, setting up tc" {dbg} '
-        # Inbound TC
-        if host.tcInboundPortList != []:
-            cmds += '&& echo "INBOUND TRAFFIC" {dbg} '
             # add ingress
-            cmds += '&& echo "Adding ingress" {dbg} '
-            cmds += '&& {tc} qdisc add dev {iface} ingress {dbg2} '
+            rules.append( 'qdisc add dev {0} ingress'.format( host.tcInterface ) )
             # redirect to ifb0
+            redirect = 'flowid 1:1 action mirred egress redirect dev ifb0'
             if host.tcInboundPortList == -1:
-                for h in otherhosts:
-                    cmds += '&& echo "Redirecting source host {0} to ifb" {dbg} '.format( h )
-                    cmds += '&& {tc} filter add dev {iface} parent ffff: protocol ip prio 1 u32 match ip src {0} flowid 1:1 action mirred egress redirect dev ifb0 {dbg2} '.format( h )
+                rules += u32Filters( host.tcInterface, 'ffff:', 'src', otherhosts, redirect )
             else:
-                for p in host.tcInboundPortList:
-                    cmds += '&& echo "Redirecting destination port {0} to ifb {dbg} '.format( p )
-                    cmds += '&& {tc} filter add dev {iface} parent ffff: protocol ip prio 1 u32 match ip dport {0} 0xffff flowid 1:1 action mirred egress redirect dev ifb0 {dbg2} '.format( p )
+                rules += u32Filters( host.tcInterface, 'ffff:', 'dport', host.tcInboundPortList, redirect )
             # Set the parameters for the inbound traffic control
             params = ''
             if host.tcLoss != 0.0:
@@ -237,11 +363,8 @@ class netem(tc):
                 params += 'duplicate {0}% '.format( host.tcDuplication )
             hasnetem = False
             if params != '':
-                cmds += '&& echo "Setting up netem using options {0}" {dbg} '.format( params )
-                cmds += '&& {tc} qdisc add dev ifb0 root handle 1: netem {0} {dbg2} '.format( params )
+                rules.append( 'qdisc add dev ifb0 root handle 1: netem {0}'.format( params.strip() ) )
                 hasnetem = True
-            else:
-                cmds += '&& echo "Not using netem module" {dbg} '
             params = ''
             if host.tcDown != 0:
                 params += 'rate {0} '.format( host.tcDown )
@@ -251,70 +374,116 @@ class netem(tc):
                     params += 'burst {0} '.format( host.tcDown )
             if params != '':
                 if hasnetem:
-                    cmds += '&& echo "Adding tbf to ifb0 under netem using options {0} latency 50ms" {dbg} '.format( params )
-                    cmds += '&& {tc} qdisc add dev ifb0 parent 1:1 handle 10: tbf {0} latency 50ms {dbg2} '.format( params )
+                    rules.append( 'qdisc add dev ifb0 parent 1:1 handle 10: tbf {0}latency 50ms'.format( params ) )
                 else:
-                    cmds += '&& echo "Adding tbf to ifb0 using options {0} latency 50ms" {dbg} '.format( params )
-                    cmds += '&& {tc} qdisc add dev ifb0 root handle 10: tbf {0} latency 50ms {dbg2} '.format( params )
+                    rules.append( 'qdisc add dev ifb0 root handle 10: tbf {0}latency 50ms'.format( params ) )
         # Outbound TC
         if host.tcOutboundPortList != []:
-            cmds += '&& echo "OUTBOUND TRAFFIC" {dbg} '
             # Add netem on the throttled connection
             hasnetem = False
             if host.tcDelay != 0:
-                cmds += '&& echo "Adding netem under controlled class with delay {0}ms" {dbg} '.format( host.tcDelay )
-                cmds += '&& {tc} qdisc add dev {iface} root handle 51: netem delay {0}ms {dbg2} '.format( host.tcDelay )
+                rules.append( 'qdisc add dev {0} root handle 51: netem delay {1}ms'.format( host.tcInterface, host.tcDelay ) )
                 hasnetem = True
-            else:
-                cmds += '&& echo "No netem needed: no delay to be introduced" {dbg} '
             # Using HTB for outbound speed control, see the Hierarchical Token Bucket (http://luxik.cdi.cz/~devik/qos/htb/)
             if hasnetem:
-                cmds += '&& echo "Setting up htb under netem" {dbg} '
-                cmds += '&& {tc} qdisc add dev {iface} parent 51: handle 50: htb default 11 {dbg2} '
+                rules.append( 'qdisc add dev {0} parent 51: handle 50: htb default 11'.format( host.tcInterface ) )
             else:
-                cmds += '&& echo "Setting up htb" {dbg} '
-                cmds += '&& {tc} qdisc add dev {iface} root handle 50: htb default 11 {dbg2} '
-            cmds += '&& echo "Adding base class to htb (rate {0})" {dbg} '.format( netem.MAX )
-            cmds += '&& {tc} class add dev {iface} parent 50: classid 50:1 htb rate {0} burst {0} {dbg2} '.format( netem.MAX )
+                rules.append( 'qdisc add dev {0} root handle 50: htb default 11'.format( host.tcInterface ) )
+            rules.append( 'class add dev {0} parent 50: classid 50:1 htb rate {1}mbit burst {1}mbit'.format( host.tcInterface, netem.MAX ) )
             if host.tcUp != 0:
                 if host.tcUpBurst != 0:
-                    cmds += '&& echo "Setting up controlled class (rate {0}, burst {1})" {dbg} '.format( host.tcUp, host.tcUpBurst )
-                    cmds += '&& {tc} class add dev {iface} parent 50: classid 50:10 htb rate {0} burst {1} {dbg2} '.format( host.tcUp, host.tcUpBurst )
+                    rules.append( 'class add dev {0} parent 50: classid 50:10 htb rate {1} burst {2}'.format( host.tcInterface, host.tcUp, host.tcUpBurst ) )
                 else:
-                    cmds += '&& echo "Setting up controlled class (rate {0})" {dbg} '.format( host.tcUp )
-                    cmds += '&& {tc} class add dev {iface} parent 50: classid 50:10 htb rate {0} burst {0} {dbg2} '.format( host.tcUp )
+                    rules.append( 'class add dev {0} parent 50: classid 50:10 htb rate {1} burst {1}'.format( host.tcInterface, host.tcUp ) )
             else:
-                cmds += '&& echo "Setting up controlled class without control (just pass traffic on to netem)" {dbg} '
-                cmds += '&& {tc} class add dev {iface} parent 50: classif 50:10 htb rate {0} burst {0} {dbg2} '.format( netem.MAX )
-            cmds += '&& echo "Setting up default class (rate {0})" {dbg} '.format( netem.MAX )
-            cmds += '&& {tc} class add dev {iface} parent 50: classid 50:10 htb rate {0} burst {0} {dbg2} '.format( netem.MAX )
+                # No control: just pass traffic on to netem
+                rules.append( 'class add dev {0} parent 50: classid 50:10 htb rate {1}mbit burst {1}mbit'.format( host.tcInterface, netem.MAX ) )
+            rules.append( 'class add dev {0} parent 50: classid 50:11 htb rate {1}mbit burst {1}mbit'.format( host.tcInterface, netem.MAX ) )
             if host.tcOutboundPortList == -1:
-                for h in otherhosts:
-                    cmds += '&& echo "Filtering destination host {0} to controlled class" {dbg} '.format( h )
-                    cmds += '&& {tc} filter add dev {iface} parent 50: protocol ip prio 1 u32 match ip dst {0} flowid 50:10 {dbg2} '.format( h )
+                rules += u32Filters( host.tcInterface, '50:', 'dst', otherhosts, 'flowid 50:10' )
             else:
-                for p in host.tcOutboundPortList:
-                    cmds += '&& echo "Filtering source port {0} to controlled class" {dbg} '.format( p )
-                    cmds += '&& {tc} filter add dev {iface} parent 50: protocol ip prio 1 u32 match ip sport {0} 0xffff flowid 50:10 {dbg2} '.format( p )
-        # Finish nicely
-        cmds += '&& rm -f "$dbgfile" && echo "OK" && exit; '
+                rules += u32Filters( host.tcInterface, '50:', 'sport', host.tcOutboundPortList, 'flowid 50:10' )
+        return rules
+
+    def install(self, host, otherhosts):
+        """
+        Installs the traffic control on the host.
+
+        All rules, as given by installRules(...), are applied by a single tc -batch invocation. If that fails,
+        all traffic control is removed again from the interface.
+
+        @param  host        The host on which to install TC.
+        @param  otherhosts  List of subnets of other hosts.
+        """
+        cleanRules = []
+        # Inbound TC
+        if host.tcInboundPortList != []:
+            cleanRules.append( 'qdisc del dev {0} ingress'.format( host.tcInterface ) )
+            cleanRules.append( 'qdisc del dev ifb0 root' )
+        # Outbound TC
+        if host.tcOutboundPortList != []:
+            cleanRules.append( 'qdisc del dev {0} root'.format( host.tcInterface ) )
+        rules = self.installRules( host, otherhosts )
+        # The batch file is written with printf: the rules contain no single quotes
+        cmds = 'tcbin="`which sudo` -n `which tc`"; f=`mktemp`; if [ ! -f "$f" ]; then echo "Could not create temporary file for the tc batch."; exit; fi; '
+        cmds += "printf '%s\\n' {0} > \"$f\"; $tcbin -force -batch \"$f\" > /dev/null 2>&1; ".format( ' '.join( ["'{0}'".format( r ) for r in cleanRules] ) )
+        cmds += "printf '%s\\n' {0} > \"$f\"; ".format( ' '.join( ["'{0}'".format( r ) for r in rules] ) )
+        cmds += 'if $tcbin -batch "$f" > "$f.log" 2>&1; then echo "OK"; else '
         # Safety measures to check that setting up has gone right; clean up if not
-        # Note that these are reached only when something in the chain of setup failed, since those are all
-        # connection with &&
-        cmds += '{tc} qdisc del dev {iface} root 2> /dev/null; {tc} qdisc del dev {iface} ingress 2> /dev/null; cat "$dbgfile"; rm -f "$dbgfile"'
-        # Now fill in the not-so-small details
-        cmds = cmds.format(
-                           tc = '`which sudo` -n `which tc`',
-                           iface = host.tcInterface,
-                           dbg = '> "$dbgfile"',
-                           dbg2 = '2> "$dbgfile"'
-                           )
+        cmds += 'cat "$f.log"; $tcbin qdisc del dev {0} root 2> /dev/null; $tcbin qdisc del dev {0} ingress 2> /dev/null; fi; rm -f "$f" "$f.log"'.format( host.tcInterface )
         # Execute all that
         # The commands are executed in a background process to guard against immediately breaking connections while setting up
         ans = host.sendCommand( '( {0} ) &\nwait'.format( cmds ) )
-        if ans.stripLines()[-1] != "OK":
-            raise Exception( "An error occurred while installing TC on host {0}. Commands used:\n{2}\nResponse including debug log:\n{1}".format( host.name, ans, cmds ) )
+        if ans.splitlines()[-1:] != ["OK"]:
+            raise Exception( "An error occurred while installing TC on host {0}. Rules used:\n{2}\nResponse including debug log:\n{1}".format( host.name, ans, '\n'.join( rules ) ) )
         
+    def verify(self, host, reuseConnection = None):
+        """
+        Verifies that the traffic control installed by install(...) is active on the host.
+
+        Checks that all qdiscs are present and that the filters directing traffic to them exist, in one command.
+
+        @param  host            The host on which TC was installed.
+        @param  reuseConnection If not None, force the use of this connection object for commands to the host.
+
+        @return True iff the traffic control is active.
+        """
+        expected = []
+        cmds = []
+        if host.tcInboundPortList != []:
+            cmds.append( 'tc qdisc show dev {0} ingress'.format( host.tcInterface ) )
+            expected.append( 'qdisc ingress ffff:' )
+            cmds.append( 'tc filter show dev {0} parent ffff:'.format( host.tcInterface ) )
+            expected.append( 'mirred' )
+            if host.tcLoss != 0.0 or host.tcCorruption != 0.0 or host.tcDuplication != 0.0:
+                cmds.append( 'tc qdisc show dev ifb0' )
+                expected.append( 'qdisc netem 1:' )
+            if host.tcDown != 0:
+                cmds.append( 'tc qdisc show dev ifb0' )
+                expected.append( 'qdisc tbf 10:' )
+        if host.tcOutboundPortList != []:
+            cmds.append( 'tc qdisc show dev {0}'.format( host.tcInterface ) )
+            expected.append( 'qdisc htb 50:' )
+            if host.tcDelay != 0:
+                cmds.append( 'tc qdisc show dev {0}'.format( host.tcInterface ) )
+                expected.append( 'qdisc netem 51:' )
+            cmds.append( 'tc filter show dev {0} parent 50:'.format( host.tcInterface ) )
+            expected.append( 'flowid 50:10' )
+        if len(cmds) == 0:
+            return True
+        # Run each check and report whether its expected output was found
+        check = '; '.join( ['{0} 2>/dev/null | grep -q "{1}" && echo "Y" || echo "N"'.format( c, e ) for (c, e) in zip( cmds, expected )] )
+        if reuseConnection is None:
+            reuseConnection = True
+        ans = host.sendCommand( 'PATH="$PATH:/sbin:/usr/sbin"; {0}'.format( check ), reuseConnection ).splitlines()
+        if len(ans) < len(expected):
+            return logFail( host, 'Unexpected response while verifying traffic control: {0}'.format( '\n'.join( ans ) ) )
+        ans = ans[-len(expected):]
+        for (e, a) in zip( expected, ans ):
+            if a != 'Y':
+                return logFail( host, 'Traffic control is not active: "{0}" not found'.format( e ) )
+        return True
+
     def remove(self, host, reuseConnection = None):
         """
         Removes the traffic control from the host.
@@ -322,9 +491,9 @@ class netem(tc):
         @param  host    The host from which to remove TC.
         @param  reuseConnection If not None, force the use of this connection object for commands to the host.
         """
-        host.sendCommand( '`which sudo` -n `which tc` qdisc del dev {0} root 2> /dev/null'.format( host.tcInterface ), reuseConnection )
-        host.sendCommand( '`which sudo` -n `which tc` qdisc del dev {0} ingress 2> /dev/null'.format( host.tcInterface ), reuseConnection )
-        host.sendCommand( '`which sudo` -n `which tc` qdisc del dev ifb0 root 2> /dev/null'.format( host.tcInterface ), reuseConnection )
+        if reuseConnection is None:
+            reuseConnection = True
+        host.sendCommand( 'tcbin="`which sudo` -n `which tc`"; $tcbin qdisc del dev {0} root 2> /dev/null; $tcbin qdisc del dev {0} ingress 2> /dev/null; $tcbin qdisc del dev ifb0 root 2> /dev/null'.format( host.tcInterface ), reuseConnection )
 
     @staticmethod
     def APIVersion():
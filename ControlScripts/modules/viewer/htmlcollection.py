@@ -1,11 +1,48 @@
 from core.campaign import Campaign
 from core.viewer import viewer
+from core.parsing import isPositiveInt
 import external.magic.magic
 
 import os
 import re
+import pickle
+import hashlib
 import subprocess
-from subprocess import Popen, PIPE
+import multiprocessing
+from subprocess import Popen, PIPE, STDOUT
+
+def parseError( msg ):
+    """
+    A simple helper function to make parsing a lot of parameters a bit nicer.
+    """
+    raise Exception( "Parse error for viewer object on line {0}: {1}".format( Campaign.currentLineNumber, msg ) )
+
+# The name of the file in the view directory in which htmlcollection keeps what it knows about the processed files
+CACHE_FILE = '.htmlcollection.cache'
+
+# The pattern of the names of processed files that belong to an execution: name_X or name_X.ext
+_executionFilePattern = re.compile( '^(.+)_([0-9]+)(\\..*)?$' )
+
+def _makeThumbnail( job ):
+    """
+    Creates a thumbnail using the convert utility. Used in worker processes.
+
+    @param  job     A tuple (path to convert, path to the image, path to the thumbnail).
+
+    @return A tuple (path to the thumbnail, None or an error message).
+    """
+    convert, source, target = job
+    try:
+        subprocess.check_output( [convert, '-thumbnail', '200x150', source, target], stderr = STDOUT )
+    except subprocess.CalledProcessError as exc:
+        if os.path.exists( target ):
+            os.remove( target )
+        if exc.output.strip():
+            return ( target, "{0}: {1}".format( exc, exc.output.strip() ) )
+        return ( target, str(exc) )
+    except OSError as exc:
+        return ( target, str(exc) )
+    return ( target, None )
 
 class htmlcollection(viewer):
     """
@@ -16,13 +53,25 @@ class htmlcollection(viewer):
     It does, however, understand a couple of formats and will make some sense of them:
     - based on mime magic, either using the python magic package or the unix file utility, the output can be adjusted
     - hostname_X, with X being the execution number, is looked for and, if available, executions are separated
-    -- a table is built with one row per execution
+    -- a table is built with one row per execution, split over pages of at most pagesize executions
     -- each file that matches the regular expression ..*_X(\..*)? with X begin the execution number, is take to be
         part of that very execution
     - subdirectories of the processed directory will not be recursed
+
+    collection.html is the index, with links to the pages of executions and the files that don't belong to an
+    execution. The pages are collection_N.html or, with pageby=host, collection_HOST_N.html.
+
+    Views are updated incrementally: the hash and mime type of each processed file are kept in the view directory,
+    keyed by the size and modification time of the file, and thumbnails are named after the hash of their image. So
+    after a reparse only changed files are inspected, only new images get a thumbnail and only pages whose contents
+    changed are written. Thumbnails are created by up to workers convert processes in parallel.
     
     Extra parameters:
-    - [none]
+    - pagesize      The maximum number of executions per page. Optional positive integer, default 100.
+    - pageby        'number' to split the executions over pages in order of their number, 'host' to give the
+                    executions of each host their own pages. Optional, default 'number'.
+    - workers       The number of convert processes creating thumbnails in parallel. Optional positive integer,
+                    defaults to the number of local CPUs.
     
     Processed data expected:
     - hostname_X, for exection based output (optional); use processor:savehostname to generate these
@@ -31,6 +80,10 @@ class htmlcollection(viewer):
     # @static
     convert = None       # The path to the convert utility
 
+    pagesize = None      # The maximum number of executions per page
+    pageby = None        # 'number' or 'host'
+    workers = None       # The number of convert processes to run in parallel
+
     def __init__(self, scenario):
         """
         Initialization of a generic viewer object.
@@ -45,10 +98,10 @@ class htmlcollection(viewer):
                 htmlcollection.convert = '/usr/bin/convert'
             else:
                 out, _ = Popen( 'which convert', stdout = PIPE, shell = True ).communicate()
-                if out is None or out == '' or not os.path.exists( 'out' ):
+                if out is None or out.strip() == '' or not os.path.exists( out.strip() ):
                     Campaign.logger.log( "viewer:htmlcollection could not find the convert utility. Images will not be presented nicely shrunk. Please install ImageMagick to have better functionality." )
                 else:
-                    htmlcollection.convert = out
+                    htmlcollection.convert = out.strip()
 
     def parseSetting(self, key, value):
         """
@@ -67,7 +120,26 @@ class htmlcollection(viewer):
         @param  key     The name of the parameter, i.e. the key from the key=value pair.
         @param  value   The value of the parameter, i.e. the value from the key=value pair.
         """
-        viewer.parseSetting(self, key, value)
+        if key == 'pagesize':
+            if self.pagesize:
+                parseError( "pagesize may be specified only once" )
+            if not isPositiveInt( value, True ):
+                parseError( "pagesize must be a positive, non-zero integer" )
+            self.pagesize = int(value)
+        elif key == 'pageby':
+            if self.pageby:
+                parseError( "pageby may be specified only once" )
+            if value not in ['number', 'host']:
+                parseError( "pageby must be either 'number' or 'host'" )
+            self.pageby = value
+        elif key == 'workers':
+            if self.workers:
+                parseError( "workers may be specified only once" )
+            if not isPositiveInt( value, True ):
+                parseError( "workers must be a positive, non-zero integer" )
+            self.workers = int(value)
+        else:
+            viewer.parseSetting(self, key, value)
 
     def checkSettings(self):
         """
@@ -79,6 +151,15 @@ class htmlcollection(viewer):
         An Exception is raised in the case of insanity.
         """
         viewer.checkSettings(self)
+        if not self.pagesize:
+            self.pagesize = 100
+        if not self.pageby:
+            self.pageby = 'number'
+        if not self.workers:
+            try:
+                self.workers = multiprocessing.cpu_count()
+            except NotImplementedError:
+                self.workers = 1
 
     def resolveNames(self):
         """
@@ -107,105 +188,317 @@ class htmlcollection(viewer):
                 useExecutions = None
                 break
             useExecutions.append(e)
-        
-        if htmlcollection.convert and not os.path.exists( os.path.join( viewDir, 'thumbs' ) ):
-            os.makedirs(os.path.join( viewDir, 'thumbs' ))
-        
-        fOut = open( os.path.join( viewDir, 'collection.html' ), 'w' )
-        try:
-            fOut.write( "<html><head><title>{0} : HTML collection output</title></head>\n".format( self.scenario.name ) )
-            fOut.write( "<body><h1>{0}</h1><h3>Contents</h3>\n".format( self.scenario.name ) )
-            fOut.write( "<table>\n" )
-            if useExecutions is not None:
-                fOut.write( "<tr><td><a href='#execs'>Executions</a></td></tr>\n" )
-                for e in useExecutions:
-                    fOut.write( "<tr><td><a href='#exec_{0}'>- Execution {0} @ {1}</a></td></tr>\n".format( e.getNumber(), e.host.name ) )
-            fOut.write( "<tr><td><a href='#other'>Other data</a></td></tr>\n" )
-            fOut.write( "</table>\n" )
-            
-            otherFiles = [entry for entry in os.listdir( processedDir ) if os.path.isfile( os.path.join( processedDir, entry ) )]
-            
-            if useExecutions is not None:
-                fOut.write( "<h3><a name='execs'>Executions</a></h3>\n" )
-                fOut.write( "<table>\n" )
-                columns = []
-                for e in useExecutions:
-                    i = 0
-                    while i < len(otherFiles):
-                        if otherFiles[i] == 'hostname_{0}'.format( e.getNumber() ):
-                            del otherFiles[i]
-                            continue
-                        m = re.match( '^(..*)_{0}(\\..*)?'.format( e.getNumber() ), otherFiles[i] )
-                        i += 1
-                        if not m:
-                            continue
-                        if m.group(2):
-                            col = (m.group(1), m.group(2))
-                        else:
-                            col = (m.group(1), '')
-                        if col not in columns:
-                            columns.append( col )
-                fOut.write( "<thead><tr>\n" )
-                fOut.write( "<td>Execution number</td>\n" )
-                fOut.write( "<td>Host name</td>\n" )
-                for col in columns:
-                    fOut.write( "<td>{0}_X{1}</td>\n".format( col[0], col[1] ) )
-                fOut.write( "</tr></thead>\n" )
-                fOut.write( "<tbody>\n" )
-                for e in useExecutions:
-                    fOut.write( "<tr><td><a name='exec_{0}'>{0}</a></td><td>{1}</td>".format( e.getNumber(), e.host.name ) )
-                    for col in columns:
-                        name = '{0}_{1}{2}'.format( col[0], e.getNumber(), col[1] )
-                        f = os.path.join( processedDir, name )
-                        if os.path.exists( f ):
-                            if name in otherFiles:
-                                otherFiles.remove( name )
-                            st = os.stat( f )
-                            if st.st_size == 0:
-                                fOut.write( '<td></td>' )
-                                continue
-                            if ('isSeeder', '') == col:
-                                if e.isSeeder():
-                                    fOut.write( '<td>YES</td>' )
-                                else:
-                                    fOut.write( '<td>NO</td>' )
-                                continue
-                            if ('timeout', '') == col:
-                                fOut.write( '<td>{0} s</td>'.format( e.timeout ) )
-                                continue
-                            mime = external.magic.magic.Magic( mime=True ).from_file( f )
-                            if mime[:6] == 'image/':
-                                if htmlcollection.convert:
-                                    thumb = os.path.join( 'thumbs', name )
-                                    subprocess.check_output( [htmlcollection.convert, '-thumbnail', '200x150', f, os.path.join( viewDir, thumb ) ])
-                                    fOut.write( '<td><a href="{1}"><img src="{0}" alt="{2}" /></a></td>'.format( thumb, os.path.join( relpath, name ), name ) )
-                                else:
-                                    fOut.write( '<td><a href="{0}"><img src="{0}" alt="{1}" /></a></td>'.format( os.path.join( relpath, name ), name ) )
-                            else:
-                                fOut.write( '<td><a href="{0}">{1}</a></td>'.format( os.path.join( relpath, name ), name ) )
-                        else:
-                            fOut.write( '<td></td>' )
-                    fOut.write( "</tr>\n" )
-                fOut.write( "</tbody></table>\n" )
-            fOut.write( '<h3><a name="other">Other data</a></h3><ul>\n' )
-            for name in otherFiles:
-                f = os.path.join( processedDir, name )
+
+        # Sort the non-empty files into those of each execution and the others; files are shown unless their
+        # contents are shown directly (isSeeder_X and timeout_X) or they are not shown at all (hostname_X)
+        files = {}
+        for entry in sorted( os.listdir( processedDir ) ):
+            f = os.path.join( processedDir, entry )
+            if os.path.isfile( f ):
                 st = os.stat( f )
-                if st.st_size == 0:
+                if st.st_size > 0:
+                    files[entry] = st
+        otherFiles = sorted( files )
+        shownFiles = []
+        executionFiles = {}
+        if useExecutions is not None:
+            numbers = set( [e.getNumber() for e in useExecutions] )
+            executionNames = set()
+            for name in sorted( files ):
+                m = _executionFilePattern.match( name )
+                if not m or int(m.group(2)) not in numbers or str(int(m.group(2))) != m.group(2):
+                    continue
+                executionNames.add( name )
+                col = ( m.group(1), m.group(3) or '' )
+                if col == ('hostname', ''):
                     continue
-                mime = external.magic.magic.Magic( mime=True ).from_file( f )
-                if mime[:6] == 'image/':
-                    if htmlcollection.convert:
-                        thumb = os.path.join( 'thumbs', name )
-                        subprocess.check_output( [htmlcollection.convert, '-thumbnail', '200x150', f, os.path.join( viewDir, thumb ) ])
-                        fOut.write( '<li><a href="{1}"><img src="{0}" alt="{2}" /></a></li>\n'.format( thumb, os.path.join( relpath, name ), name ) )
+                if col not in [('isSeeder', ''), ('timeout', '')]:
+                    shownFiles.append( name )
+                if int(m.group(2)) not in executionFiles:
+                    executionFiles[int(m.group(2))] = []
+                executionFiles[int(m.group(2))].append( ( col, name ) )
+            otherFiles = [name for name in otherFiles if name not in executionNames]
+        shownFiles = otherFiles + shownFiles
+
+        # Inspect the files that changed since the last view and create the missing thumbnails
+        oldCache = htmlcollection.readCache( viewDir )
+        cache = {'files': {}, 'pages': []}
+        info = {}
+        magic = None
+        # The known MIME type of each digest, so files with the same contents are not inspected again
+        mimes = dict( [( other[2], other[3] ) for other in oldCache['files'].values()] )
+        for name in shownFiles:
+            st = files[name]
+            cached = oldCache['files'].get( name )
+            if cached and cached[0] == st.st_size and cached[1] == st.st_mtime:
+                digest, mime = cached[2], cached[3]
+            else:
+                digest = htmlcollection.hashFile( os.path.join( processedDir, name ) )
+                mime = mimes.get( digest )
+                if mime is None:
+                    if magic is None:
+                        magic = external.magic.magic.Magic( mime=True )
+                    mime = magic.from_file( os.path.join( processedDir, name ) )
+            mimes.setdefault( digest, mime )
+            cache['files'][name] = ( st.st_size, st.st_mtime, digest, mime )
+            info[name] = ( digest, mime )
+        thumbs = {}
+        if htmlcollection.convert:
+            thumbs = self.makeThumbnails( processedDir, viewDir, info )
+
+        if useExecutions is not None:
+            groups = []
+            if self.pageby == 'host':
+                hosts = {}
+                for e in useExecutions:
+                    if e.host.name not in hosts:
+                        hosts[e.host.name] = []
+                    hosts[e.host.name].append( e )
+                for host in sorted( hosts ):
+                    groups.append( ( 'collection_{0}'.format( host ), 'Host {0}'.format( host ), hosts[host] ) )
+            else:
+                groups.append( ( 'collection', 'Executions', useExecutions ) )
+            pages = []
+            for prefix, title, executions in groups:
+                for start in range( 0, len(executions), self.pagesize ):
+                    pages.append( ( '{0}_{1}.html'.format( prefix, start / self.pagesize + 1 ), title, executions[start:start + self.pagesize] ) )
+            for i in range( len(pages) ):
+                self.writePage( viewDir, pages, i, relpath, executionFiles, info, thumbs )
+                cache['pages'].append( pages[i][0] )
+
+        index = []
+        index.append( "<html><head><title>{0} : HTML collection output</title></head>\n".format( self.scenario.name ) )
+        index.append( "<body><h1>{0}</h1><h3>Contents</h3>\n".format( self.scenario.name ) )
+        index.append( "<table>\n" )
+        if useExecutions is not None:
+            index.append( "<tr><td>Executions</td></tr>\n" )
+            for page, title, executions in pages:
+                if self.pageby == 'host':
+                    title += ': executions'
+                index.append( "<tr><td><a href='{0}'>- {1} {2} to {3} ({4})</a></td></tr>\n".format( page, title, executions[0].getNumber(), executions[-1].getNumber(), len(executions) ) )
+        index.append( "<tr><td><a href='#other'>Other data</a></td></tr>\n" )
+        index.append( "</table>\n" )
+        index.append( '<h3><a name="other">Other data</a></h3><ul>\n' )
+        for name in otherFiles:
+            index.append( '<li>{0}</li>\n'.format( self.fileLink( name, relpath, info, thumbs ) ) )
+        index.append( '</ul></body></html>\n')
+        htmlcollection.writeIfChanged( os.path.join( viewDir, 'collection.html' ), ''.join( index ) )
+
+        # Remove what is left of earlier views
+        for page in oldCache['pages']:
+            if page not in cache['pages'] and os.path.exists( os.path.join( viewDir, page ) ):
+                os.remove( os.path.join( viewDir, page ) )
+        if os.path.isdir( os.path.join( viewDir, 'thumbs' ) ):
+            used = set( thumbs.values() )
+            for entry in os.listdir( os.path.join( viewDir, 'thumbs' ) ):
+                if os.path.join( 'thumbs', entry ) not in used:
+                    os.remove( os.path.join( viewDir, 'thumbs', entry ) )
+        htmlcollection.writeCache( viewDir, cache )
+
+    def makeThumbnails(self, processedDir, viewDir, info):
+        """
+        Creates the thumbnails of the images that don't have one yet.
+
+        Thumbnails are named after the hash of their image, so they are shared by identical images and survive
+        regenerating the processed data. Thumbnails are created by self.workers convert processes in parallel.
+
+        @param  processedDir    The path to the directory on the local machine with the processed data.
+        @param  viewDir         The path to the directory on the local machine where the view should be stored.
+        @param  info            Dictionary name->(hash, mime type) of the processed files.
+
+        @return Dictionary name->path of the thumbnail relative to viewDir, for the images that have a thumbnail.
+        """
+        if not os.path.exists( os.path.join( viewDir, 'thumbs' ) ):
+            os.makedirs( os.path.join( viewDir, 'thumbs' ) )
+        thumbs = {}
+        jobs = {}
+        for name in info:
+            digest, mime = info[name]
+            if mime[:6] != 'image/':
+                continue
+            thumb = os.path.join( 'thumbs', digest + os.path.splitext( name )[1] )
+            thumbs[name] = thumb
+            if not os.path.exists( os.path.join( viewDir, thumb ) ) and thumb not in jobs:
+                jobs[thumb] = ( htmlcollection.convert, os.path.join( processedDir, name ), os.path.join( viewDir, thumb ) )
+        if not jobs:
+            return thumbs
+        if self.workers < 2 or len(jobs) < 2:
+            results = [_makeThumbnail( job ) for job in jobs.values()]
+        else:
+            pool = multiprocessing.Pool( min( self.workers, len(jobs) ) )
+            try:
+                results = pool.map( _makeThumbnail, jobs.values() )
+                pool.close()
+            except:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+        failed = set()
+        for target, error in results:
+            if error is not None:
+                Campaign.logger.log( "viewer:htmlcollection could not create thumbnail {0}: {1}".format( target, error ) )
+                failed.add( os.path.relpath( target, viewDir ) )
+        for name in thumbs.keys():
+            if thumbs[name] in failed:
+                del thumbs[name]
+        return thumbs
+
+    def writePage(self, viewDir, pages, i, relpath, executionFiles, info, thumbs):
+        """
+        Writes a page with the table of executions, if its contents changed.
+
+        @param  viewDir         The path to the directory on the local machine where the view should be stored.
+        @param  pages           The list of pages as tuples (file name, title, list of executions).
+        @param  i               The index of the page to write.
+        @param  relpath         The relative path from viewDir to the directory with the processed data.
+        @param  executionFiles  Dictionary execution number->list of ((name, extension), file name) of its files.
+        @param  info            Dictionary name->(hash, mime type) of the processed files.
+        @param  thumbs          Dictionary name->path of the thumbnail relative to viewDir.
+        """
+        page, title, executions = pages[i]
+        columns = []
+        for e in executions:
+            for col, _ in executionFiles.get( e.getNumber(), [] ):
+                if col not in columns:
+                    columns.append( col )
+        out = []
+        out.append( "<html><head><title>{0} : HTML collection output : {1}</title></head>\n".format( self.scenario.name, title ) )
+        out.append( "<body><h1>{0}</h1><h3>{1}</h3>\n".format( self.scenario.name, title ) )
+        links = ["<a href='collection.html'>Index</a>"]
+        if i > 0:
+            links.append( "<a href='{0}'>Previous</a>".format( pages[i - 1][0] ) )
+        if i + 1 < len(pages):
+            links.append( "<a href='{0}'>Next</a>".format( pages[i + 1][0] ) )
+        out.append( "<p>{0}</p>\n".format( ' | '.join( links ) ) )
+        out.append( "<table>\n" )
+        out.append( "<thead><tr>\n" )
+        out.append( "<td>Execution number</td>\n" )
+        out.append( "<td>Host name</td>\n" )
+        for col in columns:
+            out.append( "<td>{0}_X{1}</td>\n".format( col[0], col[1] ) )
+        out.append( "</tr></thead>\n" )
+        out.append( "<tbody>\n" )
+        for e in executions:
+            out.append( "<tr><td><a name='exec_{0}'>{0}</a></td><td>{1}</td>".format( e.getNumber(), e.host.name ) )
+            names = dict( executionFiles.get( e.getNumber(), [] ) )
+            for col in columns:
+                if col not in names:
+                    out.append( '<td></td>' )
+                elif ('isSeeder', '') == col:
+                    if e.isSeeder():
+                        out.append( '<td>YES</td>' )
                     else:
-                        fOut.write( '<li><a href="{0}"><img src="{0}" alt="{1}" /></a></li>\n'.format( os.path.join( relpath, name ), name ) )
+                        out.append( '<td>NO</td>' )
+                elif ('timeout', '') == col:
+                    out.append( '<td>{0} s</td>'.format( e.timeout ) )
                 else:
-                    fOut.write( '<li><a href="{0}">{1}</a></li>\n'.format( os.path.join( relpath, name ), name ) )
-            fOut.write( '</ul></body></html>\n')
+                    out.append( '<td>{0}</td>'.format( self.fileLink( names[col], relpath, info, thumbs ) ) )
+            out.append( "</tr>\n" )
+        out.append( "</tbody></table>\n" )
+        out.append( "<p>{0}</p>\n".format( ' | '.join( links ) ) )
+        out.append( "</body></html>\n" )
+        htmlcollection.writeIfChanged( os.path.join( viewDir, page ), ''.join( out ) )
+
+    def fileLink(self, name, relpath, info, thumbs):
+        """
+        Returns the HTML linking to a processed file, showing a thumbnail for images.
+
+        @param  name        The name of the processed file.
+        @param  relpath     The relative path from the view directory to the directory with the processed data.
+        @param  info        Dictionary name->(hash, mime type) of the processed files.
+        @param  thumbs      Dictionary name->path of the thumbnail relative to the view directory.
+
+        @return The HTML string.
+        """
+        if info[name][1][:6] == 'image/':
+            if name in thumbs:
+                return '<a href="{1}"><img src="{0}" alt="{2}" /></a>'.format( thumbs[name], os.path.join( relpath, name ), name )
+            return '<a href="{0}"><img src="{0}" alt="{1}" /></a>'.format( os.path.join( relpath, name ), name )
+        return '<a href="{0}">{1}</a>'.format( os.path.join( relpath, name ), name )
+
+    @staticmethod
+    def hashFile(path):
+        """
+        Returns the SHA1 hash of the contents of a file.
+
+        @param  path    The path to the file.
+
+        @return The hex digest.
+        """
+        h = hashlib.new( 'sha1' )
+        f = open( path, 'rb' )
+        try:
+            while True:
+                data = f.read( 1024 * 1024 )
+                if not data:
+                    break
+                h.update( data )
+        finally:
+            f.close()
+        return h.hexdigest()
+
+    @staticmethod
+    def readCache(viewDir):
+        """
+        Reads what is known about the processed files and the pages from an earlier view.
+
+        @param  viewDir     The path to the directory on the local machine where the view is stored.
+
+        @return Dictionary with 'files', a dictionary name->(size, mtime, hash, mime type), and 'pages', a list of
+                the names of the pages written.
+        """
+        path = os.path.join( viewDir, CACHE_FILE )
+        if os.path.exists( path ):
+            f = None
+            try:
+                f = open( path, 'rb' )
+                cache = pickle.load( f )
+                if isinstance( cache, dict ) and 'files' in cache and 'pages' in cache:
+                    return cache
+            except Exception:
+                pass    # A broken cache is ignored
+            finally:
+                if f:
+                    f.close()
+        return {'files': {}, 'pages': []}
+
+    @staticmethod
+    def writeCache(viewDir, cache):
+        """
+        Writes what is known about the processed files and the pages, for the next view.
+
+        @param  viewDir     The path to the directory on the local machine where the view is stored.
+        @param  cache       The dictionary as returned by readCache(...).
+        """
+        path = os.path.join( viewDir, CACHE_FILE )
+        f = open( path + '.tmp', 'wb' )
+        try:
+            pickle.dump( cache, f )
+        finally:
+            f.close()
+        os.rename( path + '.tmp', path )
+
+    @staticmethod
+    def writeIfChanged(path, data):
+        """
+        Writes a file, unless it already has the given contents.
+
+        @param  path    The path to the file.
+        @param  data    The contents of the file.
+        """
+        if os.path.exists( path ) and os.path.getsize( path ) == len(data):
+            f = open( path, 'r' )
+            try:
+                if f.read() == data:
+                    return
+            finally:
+                f.close()
+        f = open( path, 'w' )
+        try:
+            f.write( data )
         finally:
-            fOut.close()
+            f.close()
 
     def canReview(self):
         """
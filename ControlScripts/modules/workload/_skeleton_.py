@@ -143,10 +143,7 @@ class _skeleton_(workload):
         # Example:
         #
         #   workload.applyWorkload( self )
-        #   if self.applySeeders:
-        #       executions = [e for e in self.scenario.getObjects('execution') if e.client.name in self.applyList]
-        #   else:
-        #       executions = [e for e in self.scenario.getObjects('execution') if e.client.name in self.applyList and not e.isSeeder()]
+        #   executions = self.getExecutions()
         #   timeout = self.offset
         #   if self.interval:
         #       interval = self.interval
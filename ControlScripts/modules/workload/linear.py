@@ -112,10 +112,7 @@ class linear(workload):
         If any non-zero timeout is found a warning will be generated in the log.
         """
         workload.applyWorkload( self )
-        if self.applySeeders:
-            executions = [e for e in self.scenario.getObjects('execution') if e.client.name in self.applyList]
-        else:
-            executions = [e for e in self.scenario.getObjects('execution') if e.client.name in self.applyList and not e.isSeeder()]
+        executions = self.getExecutions()
         if len(executions) == 0:
             return
 
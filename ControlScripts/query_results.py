@@ -0,0 +1,120 @@
+#!/usr/bin/python
+
+from core.resultsdb import databasePath, openDatabases
+import sys
+
+if __name__ != "__main__":
+    raise Exception( "Do not import" )
+
+query = None
+compare = None
+scenarioPattern = None
+listScenarios = False
+databaseNames = []
+
+# Parse arguments
+for arg in sys.argv[1:]:
+    if arg[:6] == '--sql=':
+        if query is not None or compare is not None or listScenarios:
+            raise Exception( "Only one of --sql, --compare and --list allowed" )
+        query = arg[6:]
+    elif arg[:10] == '--compare=':
+        if query is not None or compare is not None or listScenarios:
+            raise Exception( "Only one of --sql, --compare and --list allowed" )
+        compare = arg[10:].split( ':' )
+        if len(compare) != 2 or compare[0] == '' or compare[1] == '':
+            raise Exception( "--compare expects file:name, e.g. --compare=stats.leecher:avgdownloadtime" )
+    elif arg[:11] == '--scenario=':
+        scenarioPattern = arg[11:]
+    elif arg == '--list':
+        if query is not None or compare is not None:
+            raise Exception( "Only one of --sql, --compare and --list allowed" )
+        listScenarios = True
+    elif arg == '--help':
+        print """
+query_results.py [options] database [database [...]]
+
+queries the results databases created by processor:database
+Arguments:
+    --sql=query             Run an SQL query and print the result
+    --compare=file:name     Print a value of the statistics of each scenario, with one column per campaign, e.g.
+                            --compare=stats.leecher:avgdownloadtime
+    --scenario=pattern      Only compare the scenarios whose name matches the SQL LIKE pattern, e.g. --scenario=swift_%
+    --list                  List the scenarios in each database and why their runs stopped (the default)
+    --help                  This text and exit
+
+A database is the path to a database file or to the results directory of a campaign, which holds results.db by default.
+The tables of all databases are queried together: each is a view of the union of that table in all databases, with an
+extra first column campaign that holds the name of the campaign directory. The tables are:
+    scenarios   (campaign, scenario, loaded, stopreason)
+    executions  (campaign, scenario, execution, client, host, seeder, timeout, files)
+    parameters  (campaign, scenario, name, value)
+    series      (campaign, scenario, execution, log, name, rows, first, last, minimum, maximum, mean)
+    statistics  (campaign, scenario, file, row, name, value)
+Results are printed tab separated, with a header line.
+
+Example:
+    query_results.py --sql="SELECT campaign, scenario, AVG(mean) FROM series WHERE log = 'log.data' AND name = 'dlspeed' GROUP BY campaign, scenario" /path/to/campaign_1 /path/to/campaign_2
+"""
+        sys.exit()
+    elif arg[:2] == '--':
+        raise Exception( "Unknown argument: {0}. Try --help.".format( arg ) )
+    else:
+        databaseNames.append( arg )
+
+if len(databaseNames) == 0:
+    raise Exception( "No databases given. Try --help." )
+if scenarioPattern is not None and compare is None:
+    raise Exception( "--scenario is only used with --compare" )
+
+def formatValue( value ):
+    """
+    Formats a value of a result for printing.
+
+    @param  value   The value.
+
+    @return The string to print.
+    """
+    if value is None:
+        return ''
+    if isinstance( value, unicode ):
+        return value.encode( 'utf-8' )
+    return str( value )
+
+def printRows( names, rows ):
+    """
+    Prints a header line and rows, tab separated.
+
+    @param  names   The names of the columns.
+    @param  rows    The rows.
+    """
+    print '\t'.join( names )
+    for row in rows:
+        print '\t'.join( [formatValue( value ) for value in row] )
+
+connection, campaigns = openDatabases( [databasePath( name ) for name in databaseNames] )
+try:
+    if query is not None:
+        cursor = connection.execute( query )
+        if cursor.description is None:
+            raise Exception( "The query returns no results" )
+        printRows( [column[0] for column in cursor.description], cursor )
+    elif compare is not None:
+        sql = 'SELECT scenario, campaign, value FROM statistics WHERE file = ? AND name = ? AND row = 0'
+        args = [compare[0], compare[1]]
+        if scenarioPattern is not None:
+            sql += ' AND scenario LIKE ?'
+            args.append( scenarioPattern )
+        values = {}
+        scenarios = []
+        for scenario, campaign, value in connection.execute( sql, args ):
+            if scenario not in values:
+                values[scenario] = {}
+                scenarios.append( scenario )
+            values[scenario][campaign] = value
+        scenarios.sort()
+        printRows( ['scenario'] + campaigns, [[scenario] + [values[scenario].get( campaign ) for campaign in campaigns] for scenario in scenarios] )
+    else:
+        printRows( ['campaign', 'scenario', 'executions', 'stopreason'], connection.execute( 'SELECT s.campaign, s.scenario, (SELECT COUNT(*) FROM executions e WHERE e.campaign = s.campaign AND e.scenario = s.scenario), s.stopreason FROM scenarios s ORDER BY s.campaign, s.scenario' ) )
+finally:
+    connection.close()
@@ -2,6 +2,7 @@
 
 from run_campaign import loadModule
 from core.parsing import isPositiveInt, getParameterName, getParameterValue
+from core.archive import ARCHIVE_EXTENSION, RAW_LOG_PATTERN, archive, archiveOverlay
 import os
 import traceback
 import sys
@@ -17,6 +18,8 @@ parserNames = []
 processorNames = []
 viewerNames = []
 lastObject = None
+archivePath = None
+outputDir = None
 
 class NameOptions:
     name = ''
@@ -48,6 +51,10 @@ for arg in sys.argv[1:]:
         if not lastObject:
             raise Exception( "Given --arg before an object (--parser, --processor or --viewer)." )
         lastObject.args.append( arg[6:] )
+    elif arg[:10] == '--archive=':
+        archivePath = arg[10:]
+    elif arg[:9] == '--output=':
+        outputDir = arg[9:]
     elif arg == '--help':
         print """
 reparse.py [options] [directory [directory [...]]
@@ -60,11 +67,21 @@ Arguments:
     --processor=name  Use processor:name to process the scenario
     --viewer=name     Use viewer:name to view the scenario
     --arg=argument    Add argument as an argument to the last declared object
+    --archive=path    Reparse scenarios from an archive created by archive_results.py; the directories are then the
+                      names of the scenarios in the archive, all scenarios if none are given
+    --output=dir      With --archive: the results directory of the campaign to write to, defaults to the directory
+                      the archive was created from
     --help            This text and exit
 
 Arguments to objects have the same syntax as in normal scenario declaration files.
 Example:
     reparse.py --seeders --parser=cpulog --processor=gnuplot --arg=script=TestSpecs/processors/simple_cpu_plot --viewer=htmlcollection /path/to/results/scenarios/scenario_1 /path/to/results/scenarios/scenario_2
+
+With --archive all files of the scenarios except the raw logs are extracted to the output directory, unless they are
+already there. The raw logs are read straight from the archive: the archive is overlaid on the output directory, see
+core.archive.archiveOverlay. Parsers that run external programs on raw logs need the archive to be extracted.
+Example:
+    reparse.py --archive=/path/to/results.archive --parser=swift --processor=statistics scenario_1
 """
         sys.exit()
     elif arg[:2] == '--':
@@ -72,6 +89,28 @@ Example:
     else:
         dirNames.append( arg )
 
+if outputDir is not None and archivePath is None:
+    raise Exception( "--output is only used with --archive" )
+if archivePath is not None:
+    archiveObject = archive( archivePath )
+    if outputDir is None:
+        if archivePath[-len(ARCHIVE_EXTENSION):] != ARCHIVE_EXTENSION:
+            raise Exception( "Can't tell where to reparse {0} to; use --output".format( archivePath ) )
+        outputDir = archivePath[:-len(ARCHIVE_EXTENSION)]
+    scenarioNames = dirNames
+    if len(scenarioNames) == 0 and archiveObject.isdir( 'scenarios' ):
+        scenarioNames = sorted( archiveObject.listdir( 'scenarios' ) )
+    dirNames = []
+    for scenarioName in scenarioNames:
+        if not archiveObject.isdir( os.path.join( 'scenarios', scenarioName ) ):
+            print "Warning! Scenario {0} is not in archive {1}, skipping.".format( scenarioName, archivePath )
+            continue
+        print "Extracting scenario {0} except its raw logs".format( scenarioName )
+        archiveObject.extract( outputDir, os.path.join( 'scenarios', scenarioName ), RAW_LOG_PATTERN )
+        dirNames.append( os.path.join( outputDir, 'scenarios', scenarioName ) )
+    # The overlay stays installed until reparse.py exits
+    archiveOverlay( archiveObject, outputDir ).install()
+
 # Fake classes
 class FakeScenario:
     executions = []
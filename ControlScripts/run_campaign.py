@@ -14,16 +14,103 @@ import time
 import shutil
 import threading
 import re
+import signal
 import subprocess
+import base64
 
 # P2P Testing Framework imports
 from core.campaign import Campaign
-from core.parsing import isSectionHeader, getModuleType, getSectionName, getModuleSubType, getParameterName, getParameterValue, isPositiveInt, isValidName
+from core.parsing import tokenize, TOKEN_SECTION, getModuleType, getModuleSubType, isPositiveInt, isPositiveFloat, isValidName
 import core.debuglogger
+import core.logwriter
 
 # Global API version of the core
 APIVersion="2.4.0"
 
+# Maximum number of hosts worked on at the same time by forEachHostInParallel(...)
+MAX_PARALLEL_HOSTS = 16
+
+# Maximum number of bytes of a raw log transferred per poll in live mode; the rest follows in later polls
+LIVE_MAX_CHUNK = 1024 * 1024
+
+def parseStopCondition( value ):
+    """
+    Parses the value of a stop parameter of a scenario in the campaign file.
+
+    Supported conditions:
+    - completed             All leechers have completed their download
+    - finished:N            At least N executions have finished
+    - throughput:X:Y        The aggregate download speed has dropped below X KiB/s for Y seconds
+
+    @param  value       The value of the stop parameter.
+
+    @return A tuple with the name of the condition followed by its arguments, e.g. ('finished', 10).
+    """
+    parts = value.split( ':' )
+    if parts[0] == 'completed' and len(parts) == 1:
+        return ( 'completed', )
+    if parts[0] == 'finished' and len(parts) == 2 and isPositiveInt( parts[1], True ):
+        return ( 'finished', int(parts[1]) )
+    if parts[0] == 'throughput' and len(parts) == 3 and isPositiveFloat( parts[1], True ) and isPositiveFloat( parts[2] ):
+        return ( 'throughput', float(parts[1]), float(parts[2]) )
+    raise Exception( 'Invalid stop condition "{0}" on line {1}; expected completed, finished:N or throughput:X:Y'.format( value, Campaign.currentLineNumber ) )
+
+# This function has unused argument frame; that's fine
+# pylint: disable-msg=W0613
+def flushLogsOnSignal( signum, frame ):
+    """
+    Signal handler that writes all queued log messages before the signal takes its default effect.
+
+    @param  signum      The number of the signal.
+    @param  frame       The interrupted stack frame (unused).
+    """
+    core.logwriter.flushAll( 5 )
+    signal.signal( signum, signal.SIG_DFL )
+    os.kill( os.getpid(), signum )
+# pylint: enable-msg=W0613
+
+def forEachHostInParallel( hosts, task, maxParallel = MAX_PARALLEL_HOSTS ):
+    """
+    Runs task(host) for each of the hosts, at most maxParallel at the same time.
+
+    Returns when all tasks have finished. Exceptions raised by tasks are logged and collected.
+
+    @param  hosts           The hosts to run the task for.
+    @param  task            The function to call with each host as argument.
+    @param  maxParallel     The maximum number of tasks running at the same time.
+
+    @return Dictionary host->Exception for each host for which the task raised an Exception.
+    """
+    queue = list(hosts)
+    queue__lock = threading.Lock()
+    errors = {}
+    def worker():
+        while True:
+            queue__lock.acquire()
+            try:
+                if len(queue) == 0:
+                    return
+                host = queue.pop(0)
+            finally:
+                queue__lock.release()
+            try:
+                task( host )
+            except Exception as exc:
+                Campaign.logger.log( "Exception for host {0}: {1}".format( host.name, exc.__str__() ) )
+                Campaign.logger.exceptionTraceback()
+                queue__lock.acquire()
+                try:
+                    errors[host] = exc
+                finally:
+                    queue__lock.release()
+    threads = [threading.Thread( target = worker ) for _ in range( min( maxParallel, len(queue) ) )]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    for t in threads:
+        t.join()
+    return errors
+
 def loadCoreModule( moduleType ):
     """
     Load a single module from the core and return the class.
@@ -382,6 +469,128 @@ class LogProcessor(BusyExecutionThread):
                 self.execution.runParsers( os.path.join( self.execdir, 'logs' ), os.path.join( self.execdir, 'parsedLogs' ) )
         yield
 
+class LiveLogTailer(threading.Thread):
+    """
+    Tails the raw logs of the executions during the run and feeds them to their live parsers (live mode).
+
+    Every interval all hosts with raw logs to tail are polled in parallel. Each host is polled over a connection of
+    its own, with a single command that returns the new part of every raw log tailed on that host. The parts are
+    base64 encoded, so they survive the line-based transfer of command output unchanged.
+    """
+
+    interval = 1.0          # The number of seconds between two polls
+    hosts = None            # The list of hosts with raw logs to tail
+    tails = None            # Dictionary id(host)->list of (remote path of the raw log, liveParser) to tail on the host
+    connections = None      # Dictionary id(host)->the connection to poll the host over
+    stopEvent = None        # Event that is set to stop tailing
+
+    def __init__(self, interval):
+        """
+        Initializes a LiveLogTailer thread.
+
+        @param  interval    The number of seconds between two polls.
+        """
+        threading.Thread.__init__(self, name = 'livetailer')
+        self.daemon = True
+        self.interval = interval
+        self.hosts = []
+        self.tails = {}
+        self.connections = {}
+        self.stopEvent = threading.Event()
+
+    def addExecution(self, execution, outputDir):
+        """
+        Creates the live parsers of an execution and adds their raw logs to the logs to tail.
+
+        @param  execution   The execution.
+        @param  outputDir   The path to the directory on the local machine where the parsed logs are to be stored.
+        """
+        lives = execution.getLiveParsers( outputDir )
+        if not lives:
+            return
+        host = execution.host
+        if id(host) not in self.tails:
+            self.hosts.append( host )
+            self.tails[id(host)] = []
+        logDir = execution.client.getExecutionLogDir( execution )
+        for live in lives:
+            self.tails[id(host)].append( ( '{0}/{1}'.format( logDir, live.logName ), live ) )
+
+    def run(self):
+        """
+        Polls all hosts every interval until stopped.
+        """
+        for host in list(self.hosts):
+            try:
+                self.connections[id(host)] = host.setupNewConnection()
+            except Exception as exc:
+                Campaign.logger.log( "Could not connect to host {0} for live parsing, its logs will be parsed after the run: {1}".format( host.name, exc.__str__() ) )
+                Campaign.logger.exceptionTraceback()
+                self.hosts.remove( host )
+        try:
+            while not self.stopEvent.isSet():
+                self.stopEvent.wait( self.interval )
+                if self.stopEvent.isSet():
+                    break
+                forEachHostInParallel( self.hosts, self.pollHost )
+        finally:
+            for host in self.hosts:
+                try:
+                    host.closeConnection( self.connections[id(host)] )
+                except Exception as exc:
+                    Campaign.logger.log( "Exception while closing live parsing connection to host {0}, will be discarded: {1}".format( host.name, exc.__str__() ) )
+
+    def pollHost(self, host):
+        """
+        Retrieves the new parts of the raw logs tailed on a host and feeds them to their live parsers.
+
+        @param  host        The host.
+        """
+        tails = self.tails[id(host)]
+        if not tails:
+            return
+        # For each raw log: a line with its index and the number of bytes sent, and a line with those bytes in base64
+        commands = []
+        for index in xrange( len(tails) ):
+            path, live = tails[index]
+            commands.append( 'n=$(( $(stat -c %s "{0}" 2>/dev/null || echo {1}) - {1} )); [ $n -gt {2} ] && n={2}; [ $n -lt 0 ] && n=0; echo "@@LIVE {3} $n"; tail -c +{4} "{0}" 2>/dev/null | head -c $n | base64 | tr -d \'\\n\'; echo'.format( path, live.offset, LIVE_MAX_CHUNK, index, live.offset + 1 ) )
+        lines = host.sendCommand( '\n'.join( commands ), self.connections[id(host)] ).splitlines()
+        failed = []
+        for i in xrange( len(lines) ):
+            header = lines[i].strip().split( ' ' )
+            if header[0] != '@@LIVE':
+                continue
+            if len(header) != 3 or not isPositiveInt( header[1] ) or not isPositiveInt( header[2] ) or int(header[1]) >= len(tails):
+                raise Exception( 'Unexpected response while tailing logs on host {0}: {1}'.format( host.name, lines[i] ) )
+            path, live = tails[int(header[1])]
+            size = int(header[2])
+            if size == 0:
+                continue
+            data = ''
+            if i + 1 < len(lines):
+                data = base64.b64decode( lines[i + 1].strip() )
+            if len(data) != size:
+                # Try again at the next poll
+                Campaign.logger.log( "Received {0} bytes instead of {1} of {2} on host {3} while tailing, retrying".format( len(data), size, path, host.name ) )
+                continue
+            try:
+                live.feed( data )
+            except Exception as exc:
+                # The live parser is marked as failed, so this shows again when it is finished after the run
+                Campaign.logger.log( "Exception while parsing {0} of host {1} during the run, tailing it is stopped: {2}".format( path, host.name, exc.__str__() ) )
+                Campaign.logger.exceptionTraceback()
+                failed.append( tails[int(header[1])] )
+        for tail in failed:
+            tails.remove( tail )
+
+    def stop(self):
+        """
+        Stops tailing and waits for the thread to end, so the live parsers can be finished safely.
+        """
+        self.stopEvent.set()
+        if self.isAlive():
+            self.join()
+
 class ScenarioRunner:
     """
     Scenario runner class that will initialize a complete scenario and run it.
@@ -391,6 +600,10 @@ class ScenarioRunner:
     files = None            # List of files that make up the scenario description
     timelimit = 0           # The time in seconds the scenario may at most be running
     doParallel = True       # Whether the scenario should be made sequential
+    live = None             # The number of seconds between two polls of the raw logs in live mode, None if not live
+    stopConditions = None   # The list of stop conditions, see parseStopCondition(...)
+    stopReason = None       # The reason the run stopped, see executeRun()
+    stopState = None        # Dictionary with the state of the stop conditions during the run, see checkStopConditions()
     resultsDir = ''         # The directory where the results of this scenario will be placed
 
     campaign = None         # The campaignRunner object this scenario is part of
@@ -398,7 +611,14 @@ class ScenarioRunner:
     objects = None          # A dictionary from all module types to dictionaries of those objects by name
     threads = None          # Threads that do simple tasks, such as running a client. All these have the cleanup method and the isBusy method.
 
-    def __init__(self, scenarioName, scenarioFiles, scenarioTime, scenarioParallel, campaign):
+    # The indices below are keyed by id(object): hashing the objects themselves is many times slower
+    executionHosts = None       # List of hosts used by at least one execution, see indexObjects()
+    executionsByHost = None     # Dictionary id(host)->list of executions on that host, see indexObjects() and indexHostNames()
+    executionsByClient = None   # Dictionary id(client)->list of executions of that client, see indexObjects()
+    seedersByFile = None        # Dictionary id(file)->list of seeding executions of that file, see indexObjects()
+    seedingExecutions = None    # List of all seeding executions, see indexObjects()
+
+    def __init__(self, scenarioName, scenarioFiles, scenarioTime, scenarioParallel, campaign, scenarioLive = None, scenarioStop = None):
         """
         Sets up the scenario object and checks some sanity.
 
@@ -407,6 +627,9 @@ class ScenarioRunner:
         @param  scenarioTime        The time in seconds the scenario may last at most.
         @param  scenarioParallel    False iff the scenario should be run with clients being started sequentially.
         @param  campaign            The Campaign Runner this scenario is part of.
+        @param  scenarioLive        The number of seconds between two polls of the raw logs to parse them during the
+                                    run, or None to parse them after the run only.
+        @param  scenarioStop        The list of conditions on which to stop the run early, see parseStopCondition(...).
         """
         if scenarioName == '':
             raise Exception( "Scenario started on line {0} has no name parameter".format( Campaign.currentLineNumber ) )
@@ -416,10 +639,20 @@ class ScenarioRunner:
         self.files = scenarioFiles
         self.timelimit = scenarioTime
         self.doParallel = scenarioParallel
+        self.live = scenarioLive
+        self.stopConditions = scenarioStop or []
+        for condition in self.stopConditions:
+            if condition[0] != 'finished' and not self.live:
+                raise Exception( "Scenario {0} has stop condition {1}, which needs the progress parsed during the run: set the live parameter as well".format( scenarioName, condition[0] ) )
         self.campaign = campaign
         self.resultsDir = os.path.join( campaign.campaignResultsDir, 'scenarios', scenarioName )
         self.objects = {}
         self.threads = []
+        self.executionHosts = []
+        self.executionsByHost = None
+        self.executionsByClient = {}
+        self.seedersByFile = {}
+        self.seedingExecutions = []
 
     def getObjects(self, moduleType):
         """
@@ -462,6 +695,141 @@ class ScenarioRunner:
             raise Exception( "Object {0} already in dictionary for module type {1}. If this occurred while reading the scenario files you might have used the same name twice.".format( obj.getName(), obj.getModuleType() ) )
         self.objects[obj.getModuleType()][obj.getName()] = obj
     
+    def indexHostNames(self):
+        """
+        Builds a preliminary index of the executions by host, from the host names of the executions.
+
+        This lets hosts find their executions through getExecutionsOnHost(...) while they are preprocessing, before the
+        names have been resolved and indexObjects() builds the complete indices. It is built on the first such lookup;
+        executions that preprocessing adds or moves to other hosts are only indexed by indexObjects().
+        """
+        self.executionsByHost = {}
+        for execution in sorted( self.getObjects('execution'), key = lambda e: e.number ):
+            hostId = id( self.resolveObjectName( 'host', execution.hostName ) )
+            if hostId not in self.executionsByHost:
+                self.executionsByHost[hostId] = []
+            self.executionsByHost[hostId].append( execution )
+
+    def indexObjects(self):
+        """
+        Builds the indices of the executions by host, by client and by seeded file, and fills the lists of clients,
+        files and seeding files of each host.
+
+        Executions are indexed in order of their number. This must be called again after executions have been added
+        or changed, which is done by prepare() after the hosts have been prepared.
+        """
+        self.executionHosts = []
+        self.executionsByHost = {}
+        self.executionsByClient = {}
+        self.seedersByFile = {}
+        self.seedingExecutions = []
+        for host in self.getObjects('host'):
+            host.clients = []
+            host.files = []
+            host.seedingFiles = []
+        fileIds = set( [id(file_) for file_ in self.getObjects('file')] )
+        hostClients = set()
+        hostFiles = set()
+        hostSeedingFiles = set()
+        for execution in sorted( self.getObjects('execution'), key = lambda e: e.number ):
+            host = execution.host
+            client = execution.client
+            hostId = id(host)
+            clientId = id(client)
+            if hostId not in self.executionsByHost:
+                self.executionsByHost[hostId] = []
+                self.executionHosts.append( host )
+            self.executionsByHost[hostId].append( execution )
+            if clientId not in self.executionsByClient:
+                self.executionsByClient[clientId] = []
+            self.executionsByClient[clientId].append( execution )
+            if (hostId, clientId) not in hostClients:
+                hostClients.add( (hostId, clientId) )
+                host.clients.append( client )
+            seeder = execution.isSeeder()
+            if seeder:
+                self.seedingExecutions.append( execution )
+            for file_ in execution.files:
+                fileId = id(file_)
+                if fileId not in fileIds:
+                    raise Exception( "Insanity! Found a file object named {0} in an execution object that is not registered with the scenario. This is most likely caused by an erroneously initialized multi-file object.".format( file_.getName() ) )
+                if (hostId, fileId) not in hostFiles:
+                    hostFiles.add( (hostId, fileId) )
+                    host.files.append( file_ )
+                if seeder:
+                    if fileId not in self.seedersByFile:
+                        self.seedersByFile[fileId] = []
+                    self.seedersByFile[fileId].append( execution )
+                    if (hostId, fileId) not in hostSeedingFiles:
+                        hostSeedingFiles.add( (hostId, fileId) )
+                        host.seedingFiles.append( file_ )
+
+    def getExecutionHosts(self):
+        """
+        Returns the hosts that are used by at least one execution.
+
+        @return A list of host objects.
+        """
+        return self.executionHosts
+
+    def getExecutionsOnHost(self, host):
+        """
+        Returns the executions that run on a host, in order of their number.
+
+        While the hosts are preprocessing these are taken from the preliminary index of indexHostNames().
+
+        @param  host        The host object.
+
+        @return A list of execution objects, or [] if there are none.
+        """
+        if self.executionsByHost is None:
+            self.indexHostNames()
+        return self.executionsByHost.get( id(host), [] )
+
+    def getExecutionsOfClient(self, client):
+        """
+        Returns the executions of a client, in order of their number.
+
+        @param  client      The client object.
+
+        @return A list of execution objects, or [] if there are none.
+        """
+        return self.executionsByClient.get( id(client), [] )
+
+    def getHostsOfClient(self, client):
+        """
+        Returns the hosts on which a client is executed.
+
+        @param  client      The client object.
+
+        @return A list of host objects, each host occurring once.
+        """
+        hosts = []
+        seen = set()
+        for execution in self.getExecutionsOfClient( client ):
+            if id(execution.host) not in seen:
+                seen.add( id(execution.host) )
+                hosts.append( execution.host )
+        return hosts
+
+    def getSeedersOfFile(self, file_):
+        """
+        Returns the seeding executions of a file, in order of their number.
+
+        @param  file_       The file object.
+
+        @return A list of execution objects, or [] if there are none.
+        """
+        return self.seedersByFile.get( id(file_), [] )
+
+    def getSeedingExecutions(self):
+        """
+        Returns all seeding executions, in order of their number.
+
+        @return A list of execution objects.
+        """
+        return self.seedingExecutions
+
     def resolveObjectName(self, moduleType, name):
         """
         Returns an object of a specific type, after resolving the given name for the given type.
@@ -498,49 +866,44 @@ class ScenarioRunner:
         Read the scenario files, parse them and set up the scenario accordingly.
         """
         print "Reading scenario setup for scenario {0}".format( self.name )
-        # Read all the scenario files and take them together
-        scenarioLines = []
-        for f in self.files:
-            fObj = open( f, 'r' )
-            scenarioLines.append( '# {0}'.format( f ) )
-            for line in fObj:
-                line = line.strip()
-                scenarioLines.append( line )
-            fObj.close()
-
-        # Write the scenario file to the results dir
-        fObj = open( os.path.join( self.resultsDir, 'scenarioFile' ), 'w' )
-        for l in scenarioLines:
-            fObj.write( l + "\n" )
-        fObj.close()
-
-        # Parse scenario file
+        # Parse the scenario files as one, in a single pass, and copy them together to the results dir
         obj = None
-        for Campaign.currentLineNumber in range( 0, len( scenarioLines ) ):
-            line = scenarioLines[Campaign.currentLineNumber]
-            # Filter comments and empty lines
-            if line == '' or re.match( '^\s*#', line ) is not None:
-                print "Parsing " + line
-                continue
-            if isSectionHeader( line ):
-                # Create the object and have it parse the settings
-                if obj is not None:
-                    obj.checkSettings()
-                    self.addObject(obj)
-                print "Parsing " + line
-                objectClass = loadModule( getModuleType( getSectionName( line ) ), getModuleSubType( getSectionName( line ) ) )
-                obj = objectClass( self )
-            else:
-                print "Parsing " + line
-                if obj is None:
-                    raise Exception( "No parameters expected before any object headers. Line {0}.".format( Campaign.currentLineNumber ) )
-                parameterName = getParameterName( line )
-                parameterValue = getParameterValue( line )
-                obj.parseSetting( parameterName, parameterValue )
+        sectionCounts = {}
+        sectionOrder = []
+        scenarioFile = open( os.path.join( self.resultsDir, 'scenarioFile' ), 'w' )
+        try:
+            for f in self.files:
+                scenarioFile.write( '# {0}\n'.format( f ) )
+                fObj = open( f, 'r' )
+                try:
+                    for kind, name, value in tokenize( ScenarioRunner.copyLines( fObj, scenarioFile ) ):
+                        if kind == TOKEN_SECTION:
+                            # Create the object and have it parse the settings
+                            if obj is not None:
+                                obj.checkSettings()
+                                self.addObject(obj)
+                            if name not in sectionCounts:
+                                sectionCounts[name] = 0
+                                sectionOrder.append( name )
+                            sectionCounts[name] += 1
+                            objectClass = loadModule( getModuleType( name ), getModuleSubType( name ) )
+                            obj = objectClass( self )
+                        else:
+                            if obj is None:
+                                raise Exception( "No parameters expected before any object headers. Line {0}.".format( Campaign.currentLineNumber ) )
+                            obj.parseSetting( name, value )
+                except Exception as exc:
+                    raise Exception( "Error in scenario file {0}: {1}".format( f, exc.__str__() ) )
+                finally:
+                    fObj.close()
+        finally:
+            scenarioFile.close()
         if obj is None:
             raise Exception( "No objects found in scenario {0}".format( self.name ) )
         obj.checkSettings()
         self.addObject(obj)
+        for name in sectionOrder:
+            print "Parsed {0} x [{1}]".format( sectionCounts[name], name )
         
         # Allow host objects to do some preprocessing before name resolving
         for obj in self.getObjects('host'):
@@ -558,46 +921,29 @@ class ScenarioRunner:
                 obj.resolveNames()
         
         # Fill in extra cross-object data
-        fdict = {}
-        hdict = {}
-        hlist = []
-        for host in self.getObjects('host'):
-            hdict[host] = len(hlist)
-            hlist.append(host)
-        for file_ in self.getObjects('file'):
-            fdict[file_] = 0
-        for execution in self.getObjects('execution'):
-            hostn = hdict[execution.host]
-            if hostn not in execution.client.onHosts:
-                execution.client.onHosts.append( hostn )
-            for file_ in execution.files:
-                if file_ not in fdict:
-                    raise Exception( "Insanity! Found a file object named {0} in an execution object that is not registered with the scenario. This is most likely caused by an erroneously initialized multi-file object.".format( file_.getName() ) )
-                if hostn not in file_.onHosts:
-                    file_.onHosts.append( hostn )
-                if execution.isSeeder() and hostn not in file_.onSeedingHosts:
-                    file_.onSeedingHosts.append( hostn )
-        for client in self.getObjects('client'):
-            for hostn in client.onHosts:
-                hlist[hostn].clients.append( client )
-            client.onHosts = None
-        for file_ in self.getObjects('file'):
-            for hostn in file_.onHosts:
-                hlist[hostn].files.append( file_ )
-            for hostn in file_.onSeedingHosts:
-                hlist[hostn].seedingFiles.append( file_ )
-            file_.onHosts = None
-            file_.onSeedingHosts = None
-        # The above piece of code seems pretty convoluted. The reason is simple: it's much, much faster.
-        # The end result is that for each host we have a list of which clients, which files and which seeding files are associated with that host
-        # The naive implementation should be obvious: go over all executions, check whether the client is in the hosts' list of clients, if not add; ditto for (seeding) files
-        # Instead, we build a list on each client and file which contains the hosts they're associated with and after that go over those lists to add them
-        #    The speedup here is that there are probably much less hosts than other things, so the if x not in [] check is much faster
-        # Instead of doing this with host objects, we map those objects to integers and keep integers in those lists
-        #    The speedup here is that it's simply much faster to check whether an integer is in a list than to check whether an object is in a list
-        #    So much so that it by far outweighs the cost of creatings those mappings and translations
-        # Instead of looking up whether the file exists in the list of files, we create a dictionary from those files to 0 and check if it's in there...
-        #    I don't know how they implemented the differences, but for 10000 files that went from ~200 to <0.1 seconds...
+        self.indexObjects()
+
+        # The progress stop conditions can only be checked on executions whose parsers report live progress
+        for condition in self.stopConditions:
+            if condition[0] not in ['completed', 'throughput']:
+                continue
+            for execution in self.getObjects('execution'):
+                if execution.client.isSideService() or execution.isSeeder():
+                    continue
+                if not [parser for parser in execution.getParsers() if parser.reportsLiveProgress()]:
+                    raise Exception( "Scenario {0} has stop condition {1}, but none of the parsers of execution {2} of client {3} reports the progress during the run".format( self.name, condition[0], execution.getNumber(), execution.client.name ) )
+
+    @staticmethod
+    def copyLines( lines, copyFile ):
+        """
+        Generator that passes on lines while writing them, stripped, to a file.
+
+        @param  lines       An iterable over the lines.
+        @param  copyFile    The file object to write the stripped lines to.
+        """
+        for line in lines:
+            copyFile.write( line.strip() + '\n' )
+            yield line
 
     def fallbackWarning(self, host, direction):
         """Log a warning that the host has to fall back to full traffic control in the given direction."""
@@ -623,7 +969,7 @@ class ScenarioRunner:
         if not os.path.exists( os.path.join( self.resultsDir, 'executions' ) ):
             os.makedirs( os.path.join( self.resultsDir, 'executions' ) )
         # All hosts that are actually used in executions
-        executionHosts = set([execution.host for execution in self.getObjects('execution')])
+        executionHosts = self.getExecutionHosts()
         
         Campaign.logger.log( "PROFILE: Setup starting @ 0", True )
         startTime = time.time()
@@ -638,7 +984,8 @@ class ScenarioRunner:
         # Executions may by now have been altered by the host.prepare() calls, so rebuild the host list
         # All executions must refer to prepared hosts, which means that any host.prepare() that alters the executions
         # must take precautions to ensure this.
-        executionHosts = set([execution.host for execution in self.getObjects('execution')])
+        self.indexObjects()
+        executionHosts = self.getExecutionHosts()
         # Now change all those executions as needed to get the right workloads
         for workload in self.getObjects('workload'):
             workload.applyWorkload()
@@ -653,93 +1000,23 @@ class ScenarioRunner:
         Campaign.logger.log( "PROFILE: Clients prepared in {0}".format( time.time()-startTime ), True )
         startTime = time.time()
 
-        # Prepare TC and clients
-        for host in executionHosts:
-            # Build traffic control instructions for each host, based on how the clients can be controlled
-            if host.tc != '':
-                # Sanity check: refuse to enable traffic control on the commanding host
-                if host.getSubnet() == '127.0.0.1' or host.getSubnet() == 'localhost':
-                    raise Exception( "Refusing to enable traffic control on local host {0}. This would be a very, very bad idea. Please only use traffic control when commanding a number of remote hosts not including the commanding host.".format( host.name ) )
-                # Figure out how to set up TC for this host
-                tcinbound = 1       # 0 = none, 1 = restricted, 2 = full
-                tcoutbound = 1      # 0 = none, 1 = restricted, 2 = full
-                host.tcProtocol = ''
-                if host.tcDown == '' and host.tcLoss == 0 and host.tcCorruption == 0 and host.tcDuplication == 0:
-                    # Download speed not restricted and no loss, corruption or duplication: no inbound TC
-                    tcinbound = 0
-                if host.tcUp == '' and host.tcDelay == 0:
-                    # Upload speed not restricted and no delay is introduced: no outbound TC
-                    tcoutbound = 0
-                inboundrestrictedlist = []
-                outboundrestrictedlist = []
-                for client in host.clients:
-                    # Go over all clients to see how they think they should be restricted. Aggregate data to be saved in the host.
-                    if host.tcProtocol == '':
-                        host.tcProtocol = client.trafficProtocol()
-                    elif host.tcProtocol != client.trafficProtocol():
-                        # TC at this point only supports restricted control on one protocol
-                        Campaign.logger.log( "Restricted traffic control using multiple protocols is not supported. Falling back to unrestricted traffic control on host {0}.".format( host.name ) )
-                        tcinbound *= 2
-                        tcoutbound *= 2
-                    if tcinbound == 1:
-                        if len(client.trafficInboundPorts()) == 0:
-                            Campaign.logger.log( "Client {0} can't have restricted inbound traffic control. Falling back to unrestricted inbound traffic control on host {1}.".format( client.name, host.name ) )
-                            tcinbound = 2
-                        inboundrestrictedlist += client.trafficInboundPorts()
-                    if tcoutbound == 1:
-                        if len(client.trafficOutboundPorts()) == 0:
-                            Campaign.logger.log( "Client {0} can't have restricted outbound traffic control. Falling back to unrestricted outbound traffic control on host {1}.".format( client.name, host.name ) )
-                            tcoutbound = 2
-                        outboundrestrictedlist += client.trafficOutboundPorts()
-                    if tcoutbound != 1 and tcinbound != 1:
-                        break
-                if tcinbound == 2:
-                    self.unrestrictedTCWarning( host, 'inbound' )
-                    host.tcInboundPortList = -1
-                else:
-                    host.tcInboundPortList = list(set(inboundrestrictedlist))
-                if tcoutbound == 2:
-                    self.unrestrictedTCWarning( host, 'outbound' )
-                    host.tcOutboundPortList = -1
-                else:
-                    host.tcOutboundPortList = list(set(outboundrestrictedlist))
-                # Load TC module and check with that module to see what is possible
-                tcClass = loadModule( 'tc', host.tc )
-                host.tcObj = tcClass()
-                if not host.tcObj.check(host):
-                    # Try to fall back to full control and see if that works
-                    if host.tcInboundPortList != -1 and host.tcInboundPortList != []:
-                        oldTcInboundPortList = host.tcInboundPortList
-                        host.tcInboundPortList = -1
-                        if host.tcObj.check(host):
-                            self.fallbackWarning( host, 'inbound' )
-                        else:
-                            if host.tcOutboundPortList != -1 and host.tcOutboundPortList != []:
-                                host.tcInboundPortList = oldTcInboundPortList
-                                host.tcOutboundPortList = -1
-                                if host.tcObj.check(host):
-                                    self.fallbackWarning( host, 'outbound' )
-                                else:
-                                    host.tcInboundPortList = -1
-                                    if host.tcObj.check(host):
-                                        self.fallbackWarning( host, '' )
-                                    else:
-                                        raise Exception( "Host {0} could not initiate restricted or unrestricted traffic control, but traffic control was requested.".format( host.name ) )
-                            else:
-                                raise Exception( "Host {0} could not initiate restricted or unrestricted inbound traffic control, but traffic control was requested.".format( host.name ) )
-                    elif host.tcOutboundPortList != -1 and host.tcOutboundPortList != []:
-                        host.tcOutboundPortList = -1
-                        if host.tcObj.check(host):
-                            self.fallbackWarning( host, 'outbound' )
-                        else:
-                            raise Exception( "Host {0} could not initiate restricted or unrestricted outbound traffic control, but traffic control was requested.".format( host.name ) )
-                    else:
-                        raise Exception( "Host {0} could not initiate the requested traffic control.".format( host.name ) )
-            # If we've reached this point, then we have a succeeding tc.check(), unless no TC was requested at all
-
-            Campaign.logger.log( "PROFILE: Host TC done in {0}".format( time.time()-startTime ), True )
+        # If we're not just testing: build remote clients once per platform and distribute the builds
+        if not testRun:
+            for client in self.getObjects('client'):
+                client.prepareRemoteBuilds( self.getHostsOfClient( client ) )
+            Campaign.logger.log( "PROFILE: Remote clients built in {0}".format( time.time()-startTime ), True )
             startTime = time.time()
-    
+
+        # Prepare TC, for all hosts in parallel: checking TC takes a few round trips to each host
+        errors = forEachHostInParallel( [host for host in executionHosts if host.tc != ''], self.setupTC )
+        if len(errors) > 0:
+            raise errors.values()[0]
+
+        Campaign.logger.log( "PROFILE: Host TC done in {0}".format( time.time()-startTime ), True )
+        startTime = time.time()
+
+        # Prepare clients
+        for host in executionHosts:
             # If we're not just testing: prepare clients for this host
             if not testRun:
                 for client in host.clients:
@@ -747,7 +1024,6 @@ class ScenarioRunner:
                 Campaign.logger.log( "PROFILE: Clients prepared their hosts in {0}".format( time.time()-startTime ), True )
                 startTime = time.time()
 
-
         # If we're not just testing: prepare files
         if not testRun:
             for host in executionHosts:
@@ -759,6 +1035,97 @@ class ScenarioRunner:
                     f.sendToSeedingHost( host )
             Campaign.logger.log( "PROFILE: Files prepared their hosts in {0}".format( time.time()-startTime ), True )
 
+    def setupTC(self, host):
+        """
+        Figures out how to set up traffic control on the host and checks that this is possible.
+
+        Does nothing for hosts without traffic control. Falls back to less restricted traffic control if needed.
+        This is run for all hosts in parallel.
+
+        @param  host        The host for which traffic control is to be set up.
+        """
+        # Build traffic control instructions for each host, based on how the clients can be controlled
+        if host.tc != '':
+            # Sanity check: refuse to enable traffic control on the commanding host
+            if host.getSubNet() == '127.0.0.1' or host.getSubNet() == 'localhost':
+                raise Exception( "Refusing to enable traffic control on local host {0}. This would be a very, very bad idea. Please only use traffic control when commanding a number of remote hosts not including the commanding host.".format( host.name ) )
+            # Figure out how to set up TC for this host
+            tcinbound = 1       # 0 = none, 1 = restricted, 2 = full
+            tcoutbound = 1      # 0 = none, 1 = restricted, 2 = full
+            host.tcProtocol = ''
+            if host.tcDown == '' and host.tcLoss == 0 and host.tcCorruption == 0 and host.tcDuplication == 0:
+                # Download speed not restricted and no loss, corruption or duplication: no inbound TC
+                tcinbound = 0
+            if host.tcUp == '' and host.tcDelay == 0:
+                # Upload speed not restricted and no delay is introduced: no outbound TC
+                tcoutbound = 0
+            inboundrestrictedlist = []
+            outboundrestrictedlist = []
+            for client in host.clients:
+                # Go over all clients to see how they think they should be restricted. Aggregate data to be saved in the host.
+                if host.tcProtocol == '':
+                    host.tcProtocol = client.trafficProtocol()
+                elif host.tcProtocol != client.trafficProtocol():
+                    # TC at this point only supports restricted control on one protocol
+                    Campaign.logger.log( "Restricted traffic control using multiple protocols is not supported. Falling back to unrestricted traffic control on host {0}.".format( host.name ) )
+                    tcinbound *= 2
+                    tcoutbound *= 2
+                if tcinbound == 1:
+                    if len(client.trafficInboundPorts()) == 0:
+                        Campaign.logger.log( "Client {0} can't have restricted inbound traffic control. Falling back to unrestricted inbound traffic control on host {1}.".format( client.name, host.name ) )
+                        tcinbound = 2
+                    inboundrestrictedlist += client.trafficInboundPorts()
+                if tcoutbound == 1:
+                    if len(client.trafficOutboundPorts()) == 0:
+                        Campaign.logger.log( "Client {0} can't have restricted outbound traffic control. Falling back to unrestricted outbound traffic control on host {1}.".format( client.name, host.name ) )
+                        tcoutbound = 2
+                    outboundrestrictedlist += client.trafficOutboundPorts()
+                if tcoutbound != 1 and tcinbound != 1:
+                    break
+            if tcinbound == 2:
+                self.unrestrictedTCWarning( host, 'inbound' )
+                host.tcInboundPortList = -1
+            else:
+                host.tcInboundPortList = list(set(inboundrestrictedlist))
+            if tcoutbound == 2:
+                self.unrestrictedTCWarning( host, 'outbound' )
+                host.tcOutboundPortList = -1
+            else:
+                host.tcOutboundPortList = list(set(outboundrestrictedlist))
+            # Load TC module and check with that module to see what is possible
+            tcClass = loadModule( 'tc', host.tc )
+            host.tcObj = tcClass(self)
+            if not host.tcObj.check(host):
+                # Try to fall back to full control and see if that works
+                if host.tcInboundPortList != -1 and host.tcInboundPortList != []:
+                    oldTcInboundPortList = host.tcInboundPortList
+                    host.tcInboundPortList = -1
+                    if host.tcObj.check(host):
+                        self.fallbackWarning( host, 'inbound' )
+                    else:
+                        if host.tcOutboundPortList != -1 and host.tcOutboundPortList != []:
+                            host.tcInboundPortList = oldTcInboundPortList
+                            host.tcOutboundPortList = -1
+                            if host.tcObj.check(host):
+                                self.fallbackWarning( host, 'outbound' )
+                            else:
+                                host.tcInboundPortList = -1
+                                if host.tcObj.check(host):
+                                    self.fallbackWarning( host, '' )
+                                else:
+                                    raise Exception( "Host {0} could not initiate restricted or unrestricted traffic control, but traffic control was requested.".format( host.name ) )
+                        else:
+                            raise Exception( "Host {0} could not initiate restricted or unrestricted inbound traffic control, but traffic control was requested.".format( host.name ) )
+                elif host.tcOutboundPortList != -1 and host.tcOutboundPortList != []:
+                    host.tcOutboundPortList = -1
+                    if host.tcObj.check(host):
+                        self.fallbackWarning( host, 'outbound' )
+                    else:
+                        raise Exception( "Host {0} could not initiate restricted or unrestricted outbound traffic control, but traffic control was requested.".format( host.name ) )
+                else:
+                    raise Exception( "Host {0} could not initiate the requested traffic control.".format( host.name ) )
+        # If we've reached this point, then we have a succeeding tc.check(), unless no TC was requested at all
+
     def executeRun(self):
         """
         Executes the actual run.
@@ -777,14 +1144,20 @@ class ScenarioRunner:
         startTime = time.time()
         
         # All hosts that are part of an execution
-        executionHosts = set([execution.host for execution in self.getObjects('execution')])
+        executionHosts = self.getExecutionHosts()
+        liveTailer = None
         # Try to make sure and TC is always removed
         try:
-            # Apply traffic control to all hosts requiring it
-            for host in executionHosts:
-                if host.tc == '':
-                    continue
-                host.tcObj.install( host, list(set([host.getSubnet() for host in executionHosts])) )
+            # Apply traffic control to all hosts requiring it, in parallel
+            # Waiting for all installations is a barrier: no client starts before all traffic control is verified to be active
+            otherhosts = list(set([host.getSubNet() for host in executionHosts]))
+            def installTC(host):
+                host.tcObj.install( host, otherhosts )
+                if not host.tcObj.verify( host ):
+                    raise Exception( "Traffic control was installed on host {0}, but could not be verified to be active".format( host.name ) )
+            errors = forEachHostInParallel( [host for host in executionHosts if host.tc != ''], installTC )
+            if len(errors) > 0:
+                raise Exception( "Traffic control could not be installed on {0} host(s): {1}".format( len(errors), ', '.join( [host.name for host in errors] ) ) )
 
             Campaign.logger.log( "PROFILE: Hosts have TC installed in {0}".format( time.time() - startTime ), True )
             startTime = time.time()
@@ -805,6 +1178,15 @@ class ScenarioRunner:
 
             Campaign.logger.log( "PROFILE: Connections prepared in {0}".format( time.time() - startTime ), True )
             startTime = time.time()
+
+            if self.live:
+                # Create the live parsers before any client starts, so no part of their raw logs is missed
+                liveTailer = LiveLogTailer( self.live )
+                for execution in self.getObjects('execution'):
+                    if not execution.client.isSideService():
+                        parsedLogDir = os.path.join( self.getExecutionDir( execution ), 'parsedLogs' )
+                        os.makedirs( parsedLogDir )
+                        liveTailer.addExecution( execution, parsedLogDir )
             
             # Precalculate when we should be done
             endTime = time.time() + self.timelimit
@@ -819,12 +1201,27 @@ class ScenarioRunner:
                 print "Starting all clients sequentially; this will take until the last client has started"
                 # Then do the actual running sequentially, but intelligently
                 execThreads[0].runSequentially(execThreads)
+            if liveTailer:
+                print "Parsing logs during the run every {0} seconds".format( self.live )
+                liveTailer.start()
             print "Running..."
     
             # While the time limit has not passed yet, keep checking whether all clients have ended, sleeping up to 5 seconds in between each check (note that a check takes time as well)
-            sleepTime = max( 0, min( 5, endTime - time.time() ) )
+            # Stop conditions on the live progress are checked as often as the progress is parsed
+            pollTime = 5
+            if self.stopConditions and self.live:
+                pollTime = min( pollTime, self.live )
+            self.stopReason = 'time limit reached'
+            self.stopState = {}
+            sleepTime = max( 0, min( pollTime, endTime - time.time() ) )
             while sleepTime > 0:
                 time.sleep( sleepTime )
+                if self.stopConditions:
+                    reason = self.checkStopConditions()
+                    if reason:
+                        print "Stopping the run early: {0}".format( reason )
+                        self.stopReason = reason
+                        break
                 for execution in self.getObjects('execution'):
                     if execution.client.isSideService():
                         continue
@@ -834,9 +1231,18 @@ class ScenarioRunner:
                         break
                 else:
                     print "All client have finished before time is up"
+                    self.stopReason = 'all clients finished'
                     break
-                sleepTime = max( 0, min( 5, endTime - time.time() ) )
+                sleepTime = max( 0, min( pollTime, endTime - time.time() ) )
     
+            if liveTailer:
+                liveTailer.stop()
+
+            Campaign.logger.log( "Run of scenario {0} stopped: {1}".format( self.name, self.stopReason ) )
+            f = open( os.path.join( self.resultsDir, 'stopreason' ), 'w' )
+            f.write( self.stopReason + '\n' )
+            f.close()
+
             print "All clients should be done now, checking and killing if needed."
             
             Campaign.logger.log( "PROFILE: After-run starting after {0}".format( time.time() - startTime ), True )
@@ -862,6 +1268,8 @@ class ScenarioRunner:
             startTime = time.time()
         
         finally:
+            if liveTailer:
+                liveTailer.stop()
             print "Removing all traffic control from hosts."
             for host in executionHosts:
                 if host.tc == '':
@@ -872,6 +1280,73 @@ class ScenarioRunner:
             startTime = time.time()
     
 
+    def checkStopConditions(self):
+        """
+        Checks whether any of the stop conditions of the scenario holds.
+
+        Executions that have finished are remembered in self.stopState, so their clients are only queried until they
+        are found to have finished. The progress of the executions is what their live parsers have parsed so far.
+
+        @return A description of the first stop condition that holds, or None if none does.
+        """
+        if 'finished' not in self.stopState:
+            self.stopState['finished'] = {}
+        finished = self.stopState['finished']
+        executions = [execution for execution in self.getObjects('execution') if not execution.client.isSideService()]
+        for execution in executions:
+            if id(execution) in finished:
+                continue
+            if execution.client.isStopped( execution ) or ( execution.client.hasStarted( execution ) and not execution.client.isRunning( execution ) ):
+                finished[id(execution)] = True
+        for index in xrange( len(self.stopConditions) ):
+            condition = self.stopConditions[index]
+            if condition[0] == 'finished':
+                if len(finished) >= condition[1]:
+                    return '{0} executions finished'.format( len(finished) )
+            elif condition[0] == 'completed':
+                # Leechers that exited without completing no longer hold up the run, but are reported as such
+                leechers = [execution for execution in executions if not execution.isSeeder()]
+                incomplete = 0
+                for execution in leechers:
+                    progress = execution.getLiveProgress()
+                    if progress is not None and progress[0] > 99.999999:
+                        continue
+                    if id(execution) not in finished:
+                        break
+                    incomplete += 1
+                else:
+                    if leechers and incomplete:
+                        return 'all leechers completed or exited, {0} of {1} exited without completing'.format( incomplete, len(leechers) )
+                    if leechers:
+                        return 'all leechers completed'
+            elif condition[0] == 'throughput':
+                # Only a drop counts: the condition is armed when the aggregate download speed first reaches the limit
+                speed = 0.0
+                for execution in executions:
+                    if id(execution) in finished:
+                        continue
+                    progress = execution.getLiveProgress()
+                    if progress is not None:
+                        speed += progress[2]
+                if speed >= condition[1]:
+                    self.stopState[index] = None
+                elif index in self.stopState:
+                    if self.stopState[index] is None:
+                        self.stopState[index] = time.time()
+                    elif time.time() - self.stopState[index] >= condition[2]:
+                        return 'aggregate download speed below {0} KiB/s for {1} seconds'.format( condition[1], condition[2] )
+        return None
+
+    def getExecutionDir(self, execution):
+        """
+        Returns the directory where the logs and parsed logs of an execution are stored.
+
+        @param  execution   The execution object.
+
+        @return The path to the directory on the local machine.
+        """
+        return os.path.join( self.resultsDir, 'executions', 'exec_{0}'.format( execution.getNumber() ) )
+
     def parseLogs(self):
         """
         Retrieve and parse logs.
@@ -880,9 +1355,11 @@ class ScenarioRunner:
         """
         logThreads = []
         for execution in self.getObjects('execution'):
-            execdir = os.path.join( self.resultsDir, 'executions', 'exec_{0}'.format( execution.getNumber() ) )
+            execdir = self.getExecutionDir( execution )
             os.makedirs( os.path.join( execdir, 'logs' ) )
-            os.makedirs( os.path.join( execdir, 'parsedLogs' ) )
+            if not os.path.exists( os.path.join( execdir, 'parsedLogs' ) ):
+                # Already created in live mode
+                os.makedirs( os.path.join( execdir, 'parsedLogs' ) )
             if not execution.client.isSideService():
                 logThreads.append( LogProcessor( execution, execdir ) )
         self.threads += logThreads
@@ -909,7 +1386,7 @@ class ScenarioRunner:
         """
         logThreads = []
         for execution in self.getObjects('execution'):
-            execdir = os.path.join( self.resultsDir, 'executions', 'exec_{0}'.format( execution.getNumber() ) )
+            execdir = self.getExecutionDir( execution )
             if not os.path.exists( os.path.join( execdir, 'logs' ) ):
                 os.makedirs( os.path.join( execdir, 'logs' ) )
             if not os.path.exists( os.path.join( execdir, 'parsedLogs' ) ):
@@ -990,13 +1467,9 @@ class ScenarioRunner:
                 Campaign.logger.log( "Exception while cleaning up, will be discarded: {0}".format( exc.__str__() ) )
                 Campaign.logger.exceptionTraceback()
         print "Cleaning up hosts"
+        # Remove traffic control from all hosts in parallel; exceptions are logged and discarded
+        forEachHostInParallel( [host for host in self.getObjects('host') if host.tc != '' and host.tcObj], lambda host: host.tcObj.remove( host, cleanupConnections[host] ) )
         for host in self.getObjects('host'):
-            if host.tc != '' and host.tcObj:
-                try:
-                    host.tcObj.remove( host, cleanupConnections[host] )
-                except Exception as exc:
-                    Campaign.logger.log( "Exception while cleaning up, will be discarded: {0}".format( exc.__str__() ) )
-                    Campaign.logger.exceptionTraceback()
             try:
                 host.cleanup( cleanupConnections[host] )
             except Exception as exc:
@@ -1140,36 +1613,32 @@ class CampaignRunner:
             print "Results for this campaign will be stored in {0}".format( self.campaignResultsDir )
     
             fileObj = open( self.campaignFile, 'r' )
-            Campaign.currentLineNumber = 1
             scenarioName = ''
             scenarioFiles = []
             scenarioLine = 0
             scenarioTimeLimit = 600
             scenarioParallel = True
-            for line in fileObj:
-                line = line.strip()
-                print "Parsing {0}".format(line)
-                if line == '' or re.match( "^ *#", line ):
-                    Campaign.currentLineNumber += 1
-                    continue
-                elif isSectionHeader( line ):
-                    # New section, extract section name and check that it's a scenario
-                    sectionName = getSectionName( line )
+            scenarioLive = None
+            scenarioStop = []
+            for kind, sectionName, parameterValue in tokenize( fileObj ):
+                if kind == TOKEN_SECTION:
+                    # New section, check that it's a scenario
                     if sectionName != 'scenario':
                         raise Exception( "Unexpected section name {0} in campaign file on line {1}. Only scenario sections are allowed in campaign files.".format( sectionName, Campaign.currentLineNumber ) )
                     # New scenario, so check sanity of the old one, but not for the scenario before the first scenario
                     if scenarioLine != 0:
-                        self.scenarios.append( ScenarioRunner( scenarioName, scenarioFiles, scenarioTimeLimit, scenarioParallel, self ) )
+                        self.scenarios.append( ScenarioRunner( scenarioName, scenarioFiles, scenarioTimeLimit, scenarioParallel, self, scenarioLive, scenarioStop ) )
                     # New scenario is OK, let's initialize for the next one
                     scenarioName = ''
                     scenarioFiles = []
                     scenarioLine = Campaign.currentLineNumber
                     scenarioTimeLimit = 300
                     scenarioParallel = True
+                    scenarioLive = None
+                    scenarioStop = []
                 else:
-                    # Not a section, so should be a parameter
-                    parameterName = getParameterName( line )
-                    parameterValue = getParameterValue( line )
+                    # Not a section, so a parameter
+                    parameterName = sectionName
                     if scenarioLine == 0:
                         raise Exception( "Did not expect parameters before any section header (line {0})".format( Campaign.currentLineNumber ) )
                     if parameterName == 'name':
@@ -1199,10 +1668,19 @@ class CampaignRunner:
                         if not isPositiveInt( parameterValue, True ):
                             raise Exception( 'The time limit for the scenario defined on line {0} should be given in second, which is a positive non-zero integever value, unlike "{1}" (line {2})'.format( scenarioLine, parameterValue, Campaign.currentLineNumber ) )
                         scenarioTimeLimit = int(parameterValue)
+                    elif parameterName == 'live':
+                        # Parse the raw logs during the run, polling them every so many seconds
+                        if not isPositiveFloat( parameterValue, True ):
+                            raise Exception( 'The poll interval for live parsing in the scenario defined on line {0} should be given in seconds, which is a positive non-zero floating point value, unlike "{1}" (line {2})'.format( scenarioLine, parameterValue, Campaign.currentLineNumber ) )
+                        scenarioLive = float(parameterValue)
+                    elif parameterName == 'stop':
+                        # Stop the run early when this condition holds
+                        scenarioStop.append( parseStopCondition( parameterValue ) )
                     else:
                         raise Exception( 'Unsupported parameter "{0}" found on line {1}'.format( parameterName, Campaign.currentLineNumber ) )
-                Campaign.currentLineNumber += 1
-            self.scenarios.append( ScenarioRunner( scenarioName, scenarioFiles, scenarioTimeLimit, scenarioParallel, self ) )
+            fileObj.close()
+            self.scenarios.append( ScenarioRunner( scenarioName, scenarioFiles, scenarioTimeLimit, scenarioParallel, self, scenarioLive, scenarioStop ) )
+            print "Parsed {0} scenarios".format( len( self.scenarios ) )
             
             if justScenario:
                 for scName in justScenario:
@@ -1424,10 +1902,21 @@ Debug options are read from left to right; the last basedir is chosen. E.g. --de
             elif not os.path.isdir( Campaign.resultsDir ):
                 print 'Results directory {0} already exists but is not a directory.'.format( Campaign.resultsDir )
                 return
+        if os.getenv('CACHE_DIR', '') != '':
+            if not os.path.exists( os.getenv('CACHE_DIR') ) or not os.path.isdir( os.getenv('CACHE_DIR') ):
+                print 'CACHE_DIR is set to {0}, but that is not a valid directory. Please specify a valid directory in CACHE_DIR or set it to ""'.format( os.getenv('CACHE_DIR') )
+                return
+            Campaign.cacheDir = os.getenv('CACHE_DIR')
+        else:
+            Campaign.cacheDir = os.path.join( Campaign.testEnvDir, 'Cache' )
         
         Campaign.loadModule = staticmethod(loadModule)
         Campaign.loadCoreModule = staticmethod(loadCoreModule)
 
+        # Logs are written in the background: don't lose them when terminated
+        for signum in [signal.SIGTERM, signal.SIGHUP]:
+            signal.signal( signum, flushLogsOnSignal )
+
         # Let's run those campaign files
         for campaign_file in campaign_files:
             try:
@@ -1,7 +1,7 @@
 #!/bin/bash
 
-# This script will go over all directories in the current directory (unless they start with a .) and make tarballs
-# of them. E.g.:
+# This script will go over all directories in the current directory (unless they start with a .) and make archives
+# of them with ControlScripts/archive_results.py. E.g.:
 #
 #   bash$ pwd
 #   /your/path/to/p2p-testframework/Results
@@ -12,14 +12,18 @@
 #   drwxrwx--- three_dir
 #   bash$ ../Utils/compact_results.sh
 #   bash$ ls --example
-#   -rw-r--r-- one_dir.tar.bz2
-#   -rw-r--r-- two_dir.tar.bz2
+#   -rw-r--r-- one_dir.archive
+#   -rw-r--r-- two_dir.archive
 #   -rw-rw-rw- a_file
-#   -rw-r--r-- three_dir.tar.bz2
+#   -rw-r--r-- three_dir.archive
 #   bash$
 #
 # This also shows a weakness in this script: all resulting files will have mode 644, or whatever your default
 # mask is. The ls --example is of a simplified version of ls -l, invented for my typing comfort.
+#
+# The files in the archives are compressed in parallel, on all local CPUs, and in independent blocks, so the archives
+# can be reparsed without extracting them: see reparse.py --archive. Each directory is removed once its archive has
+# been checked. Use archive_results.py --extract to get a directory back.
 
 # You should run this script inside your Results directory.
 # If you're really sure about what you're doing you may give the argument --really to have it run in the current
@@ -43,9 +47,11 @@ if [ "$1" != "--really" ]; then
     fi
 fi
 
+ARCHIVER="`dirname $0`/../ControlScripts/archive_results.py"
+
 for a in `ls`; do
     if [ ! -d $a ]; then
         continue
     fi
-    tar cf $a.tar $a && bzip2 $a.tar && rm -rf $a
+    "$ARCHIVER" --remove "$a"
 done
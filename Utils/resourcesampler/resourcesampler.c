@@ -0,0 +1,454 @@
+#define _GNU_SOURCE
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <stdint.h>
+#include <signal.h>
+#include <errno.h>
+#include <time.h>
+#include <unistd.h>
+#include <dirent.h>
+#include <sys/types.h>
+#include <sys/stat.h>
+#include <sys/socket.h>
+#include <netinet/in.h>
+#include <linux/netlink.h>
+#include <linux/rtnetlink.h>
+#include <linux/sock_diag.h>
+#include <linux/inet_diag.h>
+
+/*
+ * The resource sampler samples the resource usage of a set of processes from /proc at a fixed interval.
+ *
+ * It is started once per host and replaces a sampling loop per process, so sampling costs no forks at all.
+ * Processes are registered by appending a line "<pid> <output file>" to the registration file. The sampler reads
+ * new registrations each interval, samples each registered process and appends one binary record per sample to
+ * the output file of the process. A process is dropped once it is gone; the sampler exits when the registration
+ * file is removed, or when it receives SIGTERM or SIGINT.
+ *
+ * An output file is self-describing: it consists of a header, which names the fields, followed by the records.
+ * All values are in the native byte order of the sampling host, which is why the header includes a marker to
+ * detect the byte order:
+ *   char[8]    magic: "RSAMPLE\0"
+ *   uint32     byte order marker: 0x01020304
+ *   uint32     format version: 2
+ *   uint32     clock ticks per second, for the CPU times
+ *   uint32     sampling interval in microseconds
+ *   uint32     number of fields per record, n
+ *   uint32     size of the field descriptions in bytes, m (a multiple of 8)
+ *   char[m]    n field descriptions "<name> <unit>", each terminated by a '\0', padded with '\0'
+ * Each record is:
+ *   double     time of the sample in seconds since the epoch
+ *   uint64[n]  the values of the fields, all cumulative since the start of the process except vsize and rss
+ *
+ * Values that can't be read, e.g. /proc/<pid>/io on kernels without task I/O accounting, are 0.
+ */
+
+#define MAGIC "RSAMPLE"
+#define VERSION 2
+
+/* The fields of each record, in order */
+static const char* fieldDescriptions[] = {
+    "utime ticks",                      /* /proc/<pid>/stat field 14 */
+    "stime ticks",                      /* /proc/<pid>/stat field 15 */
+    "cutime ticks",                     /* /proc/<pid>/stat field 16 */
+    "cstime ticks",                     /* /proc/<pid>/stat field 17 */
+    "vsize kB",                         /* VmSize from /proc/<pid>/status */
+    "rss kB",                           /* VmRSS from /proc/<pid>/status */
+    "read_bytes bytes",                 /* Bytes read from storage, from /proc/<pid>/io */
+    "write_bytes bytes",                /* Bytes written to storage, from /proc/<pid>/io */
+    "rchar bytes",                      /* Bytes read by system calls, including sockets, from /proc/<pid>/io */
+    "wchar bytes",                      /* Bytes written by system calls, including sockets, from /proc/<pid>/io */
+    "voluntary_ctxt_switches count",    /* From /proc/<pid>/status */
+    "nonvoluntary_ctxt_switches count", /* From /proc/<pid>/status */
+    "tcp_rx_bytes bytes",               /* Bytes received on the TCP sockets of the process, from sock_diag */
+    "tcp_tx_bytes bytes",               /* Bytes sent and acknowledged on the TCP sockets of the process, from sock_diag */
+};
+#define FIELDS ( sizeof(fieldDescriptions) / sizeof(fieldDescriptions[0]) )
+enum { F_UTIME, F_STIME, F_CUTIME, F_CSTIME, F_VSIZE, F_RSS, F_READ, F_WRITE, F_RCHAR, F_WCHAR, F_VCSW, F_NVCSW, F_TCPRX, F_TCPTX };
+
+/*
+ * Offsets of tcpi_bytes_acked and tcpi_bytes_received in struct tcp_info. The layout of struct tcp_info is part of
+ * the kernel ABI, so these are used instead of the struct members, which older kernel headers don't have.
+ */
+#define TCPI_BYTES_ACKED_OFFSET 120
+#define TCPI_BYTES_RECEIVED_OFFSET 128
+
+/* Byte counters of a TCP socket */
+struct socketBytes {
+    unsigned long inode;
+    uint64_t rx;
+    uint64_t tx;
+};
+
+/* A registered process */
+struct tracked {
+    pid_t pid;
+    FILE* out;
+    /* The TCP sockets of the process at the last sample, sorted by inode */
+    struct socketBytes* sockets;
+    size_t socketCount;
+    /* The bytes of the TCP sockets the process has closed */
+    uint64_t closedRx;
+    uint64_t closedTx;
+    struct tracked* next;
+};
+
+static volatile sig_atomic_t stopRequested = 0;
+
+/* The TCP sockets on the host, sorted by inode; refreshed once per interval */
+static struct socketBytes* tcpSockets = NULL;
+static size_t tcpSocketCount = 0;
+static size_t tcpSocketSize = 0;
+static int diagSocket = -1;
+
+static void onSignal( int sig ) {
+    (void)sig;
+    stopRequested = 1;
+}
+
+static int compareSockets( const void* a, const void* b ) {
+    unsigned long ia = ((const struct socketBytes*)a)->inode;
+    unsigned long ib = ((const struct socketBytes*)b)->inode;
+    return ( ia > ib ) - ( ia < ib );
+}
+
+/* Appends a socket to a growing array; returns 0 if out of memory */
+static int addSocket( struct socketBytes** array, size_t* count, size_t* size, unsigned long inode, uint64_t rx, uint64_t tx ) {
+    if( *count == *size ) {
+        size_t newSize = *size ? *size * 2 : 64;
+        struct socketBytes* newArray = realloc( *array, newSize * sizeof(struct socketBytes) );
+        if( !newArray )
+            return 0;
+        *array = newArray;
+        *size = newSize;
+    }
+    (*array)[*count].inode = inode;
+    (*array)[*count].rx = rx;
+    (*array)[*count].tx = tx;
+    (*count)++;
+    return 1;
+}
+
+/* Reads the byte counters of all TCP sockets on the host into tcpSockets using sock_diag */
+static void dumpTcpSockets( void ) {
+    static const int families[] = { AF_INET, AF_INET6 };
+    char buf[32768];
+    unsigned int f;
+
+    tcpSocketCount = 0;
+    if( diagSocket < 0 ) {
+        diagSocket = socket( AF_NETLINK, SOCK_DGRAM | SOCK_CLOEXEC, NETLINK_SOCK_DIAG );
+        if( diagSocket < 0 )
+            return;
+    }
+    for( f = 0; f < sizeof(families) / sizeof(families[0]); f++ ) {
+        struct {
+            struct nlmsghdr nlh;
+            struct inet_diag_req_v2 req;
+        } request;
+        int done = 0;
+        memset( &request, 0, sizeof(request) );
+        request.nlh.nlmsg_len = sizeof(request);
+        request.nlh.nlmsg_type = SOCK_DIAG_BY_FAMILY;
+        request.nlh.nlmsg_flags = NLM_F_REQUEST | NLM_F_DUMP;
+        request.req.sdiag_family = families[f];
+        request.req.sdiag_protocol = IPPROTO_TCP;
+        request.req.idiag_states = ~0U;
+        request.req.idiag_ext = 1 << ( INET_DIAG_INFO - 1 );
+        if( send( diagSocket, &request, sizeof(request), 0 ) < 0 )
+            return;
+        while( !done ) {
+            struct nlmsghdr* h;
+            ssize_t len = recv( diagSocket, buf, sizeof(buf), 0 );
+            if( len <= 0 )
+                return;
+            for( h = (struct nlmsghdr*)buf; NLMSG_OK( h, (size_t)len ); h = NLMSG_NEXT( h, len ) ) {
+                struct inet_diag_msg* msg;
+                struct rtattr* attr;
+                int attrLen;
+                uint64_t rx = 0;
+                uint64_t tx = 0;
+                if( h->nlmsg_type == NLMSG_DONE || h->nlmsg_type == NLMSG_ERROR ) {
+                    done = 1;
+                    break;
+                }
+                msg = NLMSG_DATA( h );
+                attrLen = h->nlmsg_len - NLMSG_LENGTH( sizeof(*msg) );
+                for( attr = (struct rtattr*)( msg + 1 ); RTA_OK( attr, attrLen ); attr = RTA_NEXT( attr, attrLen ) ) {
+                    if( attr->rta_type == INET_DIAG_INFO && RTA_PAYLOAD( attr ) >= TCPI_BYTES_RECEIVED_OFFSET + sizeof(uint64_t) ) {
+                        memcpy( &tx, (char*)RTA_DATA( attr ) + TCPI_BYTES_ACKED_OFFSET, sizeof(tx) );
+                        memcpy( &rx, (char*)RTA_DATA( attr ) + TCPI_BYTES_RECEIVED_OFFSET, sizeof(rx) );
+                    }
+                }
+                if( msg->idiag_inode && !addSocket( &tcpSockets, &tcpSocketCount, &tcpSocketSize, msg->idiag_inode, rx, tx ) )
+                    return;
+            }
+        }
+    }
+    qsort( tcpSockets, tcpSocketCount, sizeof(struct socketBytes), compareSockets );
+}
+
+/* Updates the TCP sockets of a process and returns its total received and sent bytes, including closed sockets */
+static void sampleSockets( struct tracked* t, uint64_t* rx, uint64_t* tx ) {
+    char path[64];
+    char link[64];
+    struct dirent* entry;
+    struct socketBytes* sockets = NULL;
+    size_t count = 0;
+    size_t size = 0;
+    size_t i;
+    size_t j;
+    DIR* dir;
+
+    snprintf( path, sizeof(path), "/proc/%d/fd", (int)t->pid );
+    dir = opendir( path );
+    if( dir ) {
+        while( ( entry = readdir( dir ) ) ) {
+            ssize_t len;
+            unsigned long inode;
+            struct socketBytes key;
+            struct socketBytes* found;
+            if( entry->d_name[0] == '.' )
+                continue;
+            len = readlinkat( dirfd( dir ), entry->d_name, link, sizeof(link) - 1 );
+            if( len <= 0 )
+                continue;
+            link[len] = '\0';
+            if( sscanf( link, "socket:[%lu]", &inode ) != 1 )
+                continue;
+            key.inode = inode;
+            found = bsearch( &key, tcpSockets, tcpSocketCount, sizeof(struct socketBytes), compareSockets );
+            if( found )
+                addSocket( &sockets, &count, &size, inode, found->rx, found->tx );
+        }
+        closedir( dir );
+        qsort( sockets, count, sizeof(struct socketBytes), compareSockets );
+    }
+    else {
+        /* The process is gone: keep the last known values */
+        sockets = t->sockets;
+        count = t->socketCount;
+    }
+
+    /* Sockets that were seen before but are gone now have been closed: remember their last values */
+    for( i = 0, j = 0; i < t->socketCount; i++ ) {
+        while( j < count && sockets[j].inode < t->sockets[i].inode )
+            j++;
+        if( j >= count || sockets[j].inode != t->sockets[i].inode ) {
+            t->closedRx += t->sockets[i].rx;
+            t->closedTx += t->sockets[i].tx;
+        }
+    }
+    if( sockets != t->sockets )
+        free( t->sockets );
+    t->sockets = sockets;
+    t->socketCount = count;
+
+    *rx = t->closedRx;
+    *tx = t->closedTx;
+    for( i = 0; i < count; i++ ) {
+        *rx += sockets[i].rx;
+        *tx += sockets[i].tx;
+    }
+}
+
+/* Reads a small file from /proc completely into buf; returns the number of bytes read or -1 */
+static ssize_t readProcFile( pid_t pid, const char* name, char* buf, size_t size ) {
+    char path[64];
+    FILE* f;
+    size_t r;
+    snprintf( path, sizeof(path), "/proc/%d/%s", (int)pid, name );
+    f = fopen( path, "r" );
+    if( !f )
+        return -1;
+    r = fread( buf, 1, size - 1, f );
+    fclose( f );
+    buf[r] = '\0';
+    return (ssize_t)r;
+}
+
+/* Finds the value of a "key: value" line in the contents of a /proc file; returns 0 if it is not present */
+static uint64_t keyValue( const char* contents, const char* key ) {
+    size_t len = strlen( key );
+    const char* p = contents;
+    while( p && *p ) {
+        if( strncmp( p, key, len ) == 0 && p[len] == ':' )
+            return strtoull( p + len + 1, NULL, 10 );
+        p = strchr( p, '\n' );
+        if( p )
+            p++;
+    }
+    return 0;
+}
+
+/* Takes one sample of a process; returns 0 if the process is gone */
+static int sample( struct tracked* t, double now ) {
+    char buf[4096];
+    char* p;
+    uint64_t values[FIELDS];
+    int i;
+
+    memset( values, 0, sizeof(values) );
+    if( readProcFile( t->pid, "stat", buf, sizeof(buf) ) <= 0 )
+        return 0;
+    /* The command name may contain spaces and parentheses, so start after the last ')': state is field 3 */
+    p = strrchr( buf, ')' );
+    if( !p )
+        return 0;
+    p++;
+    /* Skip fields 3 to 13 */
+    for( i = 3; i <= 13 && p; i++ ) {
+        p = strchr( p + 1, ' ' );
+    }
+    if( !p )
+        return 0;
+    for( i = F_UTIME; i <= F_CSTIME; i++ )
+        values[i] = strtoull( p, &p, 10 );
+
+    if( readProcFile( t->pid, "status", buf, sizeof(buf) ) <= 0 )
+        return 0;
+    values[F_VSIZE] = keyValue( buf, "VmSize" );
+    values[F_RSS] = keyValue( buf, "VmRSS" );
+    values[F_VCSW] = keyValue( buf, "voluntary_ctxt_switches" );
+    values[F_NVCSW] = keyValue( buf, "nonvoluntary_ctxt_switches" );
+
+    if( readProcFile( t->pid, "io", buf, sizeof(buf) ) > 0 ) {
+        values[F_READ] = keyValue( buf, "read_bytes" );
+        values[F_WRITE] = keyValue( buf, "write_bytes" );
+        values[F_RCHAR] = keyValue( buf, "rchar" );
+        values[F_WCHAR] = keyValue( buf, "wchar" );
+    }
+
+    sampleSockets( t, &values[F_TCPRX], &values[F_TCPTX] );
+
+    fwrite( &now, sizeof(now), 1, t->out );
+    fwrite( values, sizeof(values[0]), FIELDS, t->out );
+    fflush( t->out );
+    return 1;
+}
+
+/* Opens the output file for a newly registered process and writes the header */
+static struct tracked* track( pid_t pid, const char* outPath, uint32_t intervalUs ) {
+    struct tracked* t;
+    uint32_t header[6];
+    size_t descriptionSize = 0;
+    size_t i;
+    FILE* out = fopen( outPath, "wb" );
+    if( !out ) {
+        fprintf( stderr, "Could not open %s for writing: %s\n", outPath, strerror( errno ) );
+        return NULL;
+    }
+    for( i = 0; i < FIELDS; i++ )
+        descriptionSize += strlen( fieldDescriptions[i] ) + 1;
+    header[0] = 0x01020304;
+    header[1] = VERSION;
+    header[2] = (uint32_t)sysconf( _SC_CLK_TCK );
+    header[3] = intervalUs;
+    header[4] = FIELDS;
+    header[5] = ( descriptionSize + 7 ) / 8 * 8;
+    fwrite( MAGIC, 1, 8, out );
+    fwrite( header, sizeof(header[0]), 6, out );
+    for( i = 0; i < FIELDS; i++ )
+        fwrite( fieldDescriptions[i], 1, strlen( fieldDescriptions[i] ) + 1, out );
+    for( ; descriptionSize < header[5]; descriptionSize++ )
+        fputc( '\0', out );
+    fflush( out );
+    t = calloc( 1, sizeof(struct tracked) );
+    if( !t ) {
+        fclose( out );
+        return NULL;
+    }
+    t->pid = pid;
+    t->out = out;
+    return t;
+}
+
+static void untrack( struct tracked* t ) {
+    fclose( t->out );
+    free( t->sockets );
+    free( t );
+}
+
+int main( int argc, char** argv ) {
+    const char* registrationFile;
+    long intervalMs;
+    struct timespec interval;
+    struct timespec ts;
+    struct tracked* list = NULL;
+    struct tracked** tp;
+    struct tracked* t;
+    /* Offset up to which the registration file has been read */
+    long offset = 0;
+    char line[4096];
+    struct stat st;
+
+    if( argc < 3 ) {
+        printf( "Usage: %s interval registrationfile\nSamples the resource usage of the processes registered in registrationfile every interval milliseconds.\n", argv[0] );
+        return 1;
+    }
+    intervalMs = strtol( argv[1], NULL, 10 );
+    if( intervalMs <= 0 ) {
+        fprintf( stderr, "Error: invalid interval %s\n", argv[1] );
+        return 2;
+    }
+    registrationFile = argv[2];
+    interval.tv_sec = intervalMs / 1000;
+    interval.tv_nsec = ( intervalMs % 1000 ) * 1000000L;
+
+    signal( SIGTERM, onSignal );
+    signal( SIGINT, onSignal );
+    signal( SIGHUP, SIG_IGN );
+
+    while( !stopRequested ) {
+        if( stat( registrationFile, &st ) != 0 )
+            break;
+        /* Read new registrations; only complete lines are used, a partial line is read again next time */
+        if( st.st_size > offset ) {
+            FILE* reg = fopen( registrationFile, "r" );
+            if( reg ) {
+                fseek( reg, offset, SEEK_SET );
+                while( fgets( line, sizeof(line), reg ) ) {
+                    char* path;
+                    size_t len = strlen( line );
+                    if( len == 0 || line[len - 1] != '\n' )
+                        break;
+                    offset += len;
+                    line[len - 1] = '\0';
+                    path = strchr( line, ' ' );
+                    if( !path )
+                        continue;
+                    *path++ = '\0';
+                    t = track( (pid_t)strtol( line, NULL, 10 ), path, (uint32_t)( intervalMs * 1000 ) );
+                    if( t ) {
+                        t->next = list;
+                        list = t;
+                    }
+                }
+                fclose( reg );
+            }
+        }
+        if( list )
+            dumpTcpSockets();
+        clock_gettime( CLOCK_REALTIME, &ts );
+        tp = &list;
+        while( *tp ) {
+            t = *tp;
+            if( sample( t, ts.tv_sec + ts.tv_nsec / 1e9 ) ) {
+                tp = &t->next;
+            }
+            else {
+                *tp = t->next;
+                untrack( t );
+            }
+        }
+        nanosleep( &interval, NULL );
+    }
+
+    while( list ) {
+        t = list;
+        list = t->next;
+        untrack( t );
+    }
+    return 0;
+}